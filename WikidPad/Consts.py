@@ -81,6 +81,15 @@ CONFIG_GLOBALS_DIRNAME = "WikidPadGlobals"
 
 DEADBLOCKTIMEOUT = 1800
 
+# Number of pages after which bulk operations on the wiki (e.g. rebuild)
+# commit their database changes
+BULKUPDATE_COMMIT_PAGECOUNT = 200
+
+# Minimum number of wiki pages imported at once for which the meta-data
+# of the imported pages is rebuilt in foreground (with progress dialog)
+# instead of being queued for the update thread
+IMPORT_REBUILD_MIN_PAGECOUNT = 50
+
 
 # For use in isinstance(v, BYTETYPES)
 BYTETYPES = (bytes, bytearray) 
@@ -198,6 +198,12 @@ elif len(sys.argv) >= 3 and sys.argv[1] == "--updtrans":
     except:
         traceback.print_exc()
         sys.exit(1)
+
+elif len(sys.argv) >= 2 and sys.argv[1] == "--headless":
+    # Rebuild, export or search without GUI
+    from pwiki import HeadlessApp
+
+    sys.exit(HeadlessApp.main(sys.argv[2:]))
    
     
 
@@ -2,10 +2,11 @@
 ## import profilehooks
 ## profile = profilehooks.profile(filename="profile.prf", immediate=False)
 
-import sys, os, os.path, re, traceback, locale, time, urllib.request, urllib.parse, urllib.error
+import sys, os, os.path, re, traceback, locale, time, hashlib, urllib.request, urllib.parse, urllib.error
 from os.path import join, exists
 from io import StringIO, BytesIO
 import shutil
+from concurrent.futures import as_completed
 
 import pwiki.urllib_red as urllib
 
@@ -27,7 +28,8 @@ from pwiki.TempFileSet import TempFileSet
 from pwiki.SearchAndReplace import SearchReplaceOperation, ListWikiPagesOperation, \
         ListItemWithSubtreeWikiPagesNode
 
-from pwiki import SystemInfo, PluginManager, OsAbstract, DocPages
+from pwiki import SystemInfo, PluginManager, OsAbstract, DocPages, \
+        ParallelParsing, ExportManifest
 
 
 from pwiki.Exporters import AbstractExporter
@@ -70,6 +72,69 @@ def _escapeAnchor(name):
             result.append(c)
     return "".join(result)
 
+
+
+class HtmlOutputSink:
+    """
+    Receives the pieces of HTML appended by HtmlExporter.outAppend().
+    Only the last piece is held back so that it can be inspected and
+    replaced when breaks are eaten. The pieces before it are written to
+    the file object fileObj in chunks of about chunkSize characters or
+    collected in memory if fileObj is None.
+    """
+    def __init__(self, fileObj=None, chunkSize=65536):
+        self.fileObj = fileObj
+        self.chunkSize = chunkSize
+        self.pieces = []
+        self.piecesLen = 0
+        self.last = None
+
+    def append(self, piece):
+        if self.last is not None:
+            self.pieces.append(self.last)
+            if self.fileObj is not None:
+                self.piecesLen += len(self.last)
+                if self.piecesLen >= self.chunkSize:
+                    self._writePieces()
+
+        self.last = piece
+
+    def getLast(self):
+        """
+        Return last appended piece or None if nothing was appended yet.
+        """
+        return self.last
+
+    def replaceLast(self, piece):
+        self.last = piece
+
+    def _writePieces(self):
+        self.fileObj.write("".join(self.pieces))
+        self.pieces = []
+        self.piecesLen = 0
+
+    def flush(self):
+        """
+        Write all pending pieces to the file object (if any). Afterwards the
+        last piece can't be replaced anymore.
+        """
+        if self.last is not None:
+            self.pieces.append(self.last)
+            self.last = None
+        if self.fileObj is not None:
+            self._writePieces()
+
+    def getValue(self):
+        """
+        Return collected output as string (without the pieces already
+        written to the file object).
+        """
+        if self.last is None:
+            return "".join(self.pieces)
+
+        return "".join(self.pieces) + self.last
+
+
 # # Types of export destinations
 # EXPORT_DEST_TYPE_DIR = 1
 # EXPORT_DEST_TYPE_FILE = 2
@@ -417,6 +482,28 @@ class TableCell:
 
 # TODO UTF-8 support for HTML? Other encodings?
 
+# Set in worker processes of a parallel export by _initExportWorker()
+_workerExporter = None
+
+def _initExportWorker(exporter):
+    global _workerExporter
+
+    exporter.wikiDocument.prepareForWorkerProcess()
+    _workerExporter = exporter
+
+
+def _exportPageInWorker(word):
+    """
+    Export page  word  to its own HTML file, returns same as
+    HtmlExporter._exportSingleFile().
+    """
+    result = _workerExporter._exportSingleFile(word)
+    wx.GetApp().getInsertionPluginManager().taskEnd()
+
+    return result
+
+
+
 class HtmlExporter(AbstractExporter):
     
     ADDOPT_IDX_PICS_AS_LINKS = 0
@@ -454,9 +541,20 @@ class HtmlExporter(AbstractExporter):
         self.filenameConverter = FilenameConverter(False)
 #         self.convertFilename = removeBracketsFilename
 
-        self.result = None
+        # ExportManifest.ExportManifest built by an incremental export
+        self.exportManifest = None
+        # ExportManifest.PageDependencies of the page currently exported
+        # by an incremental export
+        self.pageDependencies = None
+        # Cache for _getLinkState(), {<link term>: <state>}
+        self.linkStateCache = {}
+        # Cache for _getAutoLinkDigest()
+        self.autoLinkDigest = None
+
+        # HtmlOutputSink receiving the output of formatContent()
+        self.outSink = None
         
-        # Flag to control how to push output into self.result
+        # Flag to control how to push output into self.outSink
         self.outFlagEatPostBreak = False
         self.outFlagPostBreakEaten = False
         
@@ -660,7 +758,17 @@ class HtmlExporter(AbstractExporter):
         if not self.setJobData(wikiDocument, wordList, exportType, exportDest,
                 compatFilenames, addOpt, progressHandler):
             return
-            
+
+        oldManifest = None
+        if exportType == "html_single" and self.mainControl.getConfig()\
+                .getboolean("main", "html_export_incremental", False):
+            self.linkStateCache = {}
+            self.autoLinkDigest = None
+            self.exportManifest = ExportManifest.ExportManifest(
+                    self._getManifestOptionsKey())
+            oldManifest = ExportManifest.ExportManifest.readFromDir(
+                    self.exportDest)
+
         if exportType in ("html_single", "html_multi"):
             volatileDir = self.addOpt[self.ADDOPT_IDX_VOLATILE_DIRECTORY]
 
@@ -683,7 +791,8 @@ class HtmlExporter(AbstractExporter):
         if exportType == "html_multi":
             browserFile = self.exportHtmlMultiFile()
         elif exportType == "html_single":
-            browserFile = self._exportHtmlSingleFiles(self.wordList)
+            browserFile = self._exportHtmlSingleFiles(self.wordList,
+                    oldManifest)
 
         # Other supported types: html_previewWX, html_previewIE, html_previewMOZ,
         #   html_previewWK
@@ -691,13 +800,21 @@ class HtmlExporter(AbstractExporter):
 
         wx.GetApp().getInsertionPluginManager().taskEnd()
 
+        if self.exportManifest is not None:
+            try:
+                self._writeManifest(oldManifest)
+            finally:
+                self.exportManifest = None
+                self.linkStateCache = {}
+                self.autoLinkDigest = None
+
         if self.referencedStorageFiles is not None:
             # Some files must be available
             wikiPath = self.wikiDocument.getWikiPath()
             
             if not OsAbstract.samefile(wikiPath, self.exportDest):
                 # Now we have to copy the referenced files to new location
-                for rsf in self.referencedStorageFiles:
+                for rsf in sorted(self.referencedStorageFiles):
                     try:
                         OsAbstract.copyFile(join(wikiPath, rsf),
                                 join(self.exportDest, rsf))
@@ -833,9 +950,18 @@ class HtmlExporter(AbstractExporter):
 
 
     def getTempFileSet(self):
+        if self.pageDependencies is not None:
+            # The volatile directory is cleared on each export
+            self.pageDependencies.volatile = True
+
         return self.tempFileSet
 
 
+    # Insertions (key, value) whose result depends only on the page
+    # containing them, value None means any value
+    _LOCAL_INSERTIONS = frozenset((("self", None), ("toc", ""),
+            ("rel", "top"), ("rel", "back")))
+
     _INTERNALJUMP_PREFIXMAP = {
         "html_previewWX": "internaljump:",
         "html_previewIE": "http://internaljump/",
@@ -903,19 +1029,19 @@ class HtmlExporter(AbstractExporter):
                         self.mainControl.getWikiDocument().getWikiName())
             flatTree = rootPage.getFlatTree()
 
-            filePointer.write(('<h2 class="wikidpad">%s</h2>\n'
-                    '%s%s<hr class="wikidpad" />') %
-                    (tocTitle, # = "Table of Contents"
-                    self.getContentTreeBody(flatTree, linkAsFragments=True),
-                    '<br class="wikidpad" />\n' * sepLineCount))
+            filePointer.write('<h2 class="wikidpad">%s</h2>\n' % tocTitle)
+            filePointer.writelines(self.iterContentTreeBody(flatTree,
+                    linkAsFragments=True))
+            filePointer.write('%s<hr class="wikidpad" />' %
+                    ('<br class="wikidpad" />\n' * sepLineCount))
 
         elif tocMode == 2:
             # Write a content list at beginning
-            filePointer.write(('<h2 class="wikidpad">%s</h2>\n'
-                    '%s%s<hr class="wikidpad" />') %
-                    (tocTitle, # = "Table of Contents"
-                    self.getContentListBody(linkAsFragments=True),
-                    '<br class="wikidpad" />\n' * sepLineCount))
+            filePointer.write('<h2 class="wikidpad">%s</h2>\n' % tocTitle)
+            filePointer.writelines(self.iterContentListBody(
+                    linkAsFragments=True))
+            filePointer.write('%s<hr class="wikidpad" />' %
+                    ('<br class="wikidpad" />\n' * sepLineCount))
 
 
         if self.progressHandler is not None:
@@ -937,8 +1063,7 @@ class HtmlExporter(AbstractExporter):
 #                 formatDetails = wikiPage.getFormatDetails()
                     
                 self.wordAnchor = _escapeAnchor(word)
-                formattedContent = self.formatContent(wikiPage)
-                
+
                 if self.addOpt[self.ADDOPT_IDX_LIST_PARENTS] != 0:
                     if self.avoidDeadWikiLinks:
                         parentLinks = self.getParentLinks(wikiPage, False,
@@ -956,10 +1081,14 @@ class HtmlExporter(AbstractExporter):
 
                 filePointer.write(('<span class="wikidpad wiki-name-ref">'
                         '[<a name="{0}" class="wikidpad">{1}</a>]<br class="wikidpad" />'
-                        '<br class="wikidpad" /></span>'
-                        '{2}{3}{4}<hr class="wikidpad" />')\
-                        .format(self.wordAnchor, word, parentLinks,
-                        formattedContent,
+                        '<br class="wikidpad" /></span>{2}')\
+                        .format(self.wordAnchor, word, parentLinks))
+
+                # The page is written while it is formatted so that memory
+                # use doesn't grow with the size of the page
+                self.formatContent(wikiPage, outFile=filePointer)
+
+                filePointer.write('{0}<hr class="wikidpad" />'.format(
                         '<br class="wikidpad" />\n' * sepLineCount))
             except Exception as e:
                 traceback.print_exc()
@@ -977,10 +1106,135 @@ class HtmlExporter(AbstractExporter):
         return outputFile
 
 
-    def _exportHtmlSingleFiles(self, wordListToUpdate):
+    def _assignFilenames(self):
+        """
+        Assign the file names of all pages in a fixed order. Otherwise name
+        collisions would be resolved in the order in which pages are linked
+        which differs between serial and parallel export.
+        """
+        for word in self.wordList:
+            self.filenameConverter.getFilenameForWikiWord(word)
+
+        for word in sorted(
+                self.wikiDocument.getWikiData().getAllDefinedWikiPageNames()):
+            self.filenameConverter.getFilenameForWikiWord(word)
+
+
+    def _createExportPool(self, wordListToUpdate):
+        """
+        Return a pool of worker processes to export pages in parallel or
+        None if pages should be exported in this process.
+        """
+        config = self.mainControl.getConfig()
+        if not config.getboolean("main", "html_export_parallel", False) or \
+                len(wordListToUpdate) < 2:
+            return None
+
+        workers = min(len(wordListToUpdate), ParallelParsing.getWorkerCount(
+                config.getint("main", "processPool_workers", 0)))
+
+        # Workers open their own database connection and read the page
+        # AST cache, so commit and write pending entries first
+        self.wikiDocument.getWikiData().commit()
+        astCache = self.wikiDocument.getPageAstCache()
+        if astCache is not None:
+            astCache.flush()
+
+        return ParallelParsing.createWorkerPool(workers, _initExportWorker,
+                (self,))
+
+
+    def _exportSingleFile(self, word):
+        """
+        Export page  word  to its own HTML file if it should be exported.
+        Returns tuple (storageFiles, manifestEntry) with the set of storage
+        files referenced by the page (or None) and the entry for the export
+        manifest (None if page wasn't exported or export isn't incremental).
+        """
+        wikiPage = self.wikiDocument.getWikiPage(word)
+        if not self.shouldExport(word, wikiPage):
+            return None, None
+
+        allStorageFiles = self.referencedStorageFiles
+        if allStorageFiles is not None:
+            self.referencedStorageFiles = set()
+
+        if self.exportManifest is not None:
+            self.pageDependencies = ExportManifest.PageDependencies()
+
+        try:
+            self.exportWordToHtmlPage(self.exportDest, word, False)
+            storageFiles = self.referencedStorageFiles
+            if self.pageDependencies is None:
+                return storageFiles, None
+
+            try:
+                return storageFiles, self._buildManifestEntry(word, wikiPage,
+                        self.pageDependencies, storageFiles)
+            except Exception:
+                # Keep the written file, but export page again next time
+                traceback.print_exc()
+                deps = ExportManifest.PageDependencies()
+                deps.volatile = True
+                return storageFiles, ExportManifest.ManifestEntry(
+                        self.filenameConverter.getFilenameForWikiWord(word),
+                        dependencies=deps,
+                        storageFiles=sorted(storageFiles or ()))
+        finally:
+            self.referencedStorageFiles = allStorageFiles
+            self.pageDependencies = None
+
+
+    def _pageExported(self, word, storageFiles, manifestEntry):
+        if storageFiles and self.referencedStorageFiles is not None:
+            self.referencedStorageFiles.update(storageFiles)
+
+        if manifestEntry is not None and self.exportManifest is not None:
+            self.exportManifest.setEntry(word, manifestEntry)
+
+
+    def _exportSingleFilesParallel(self, pool, wordListToUpdate):
+        """
+        Export pages to their own HTML files in the worker processes of pool.
+        The shared data (file names, style sheets) must be set up before.
+        """
+        meter = ParallelParsing.ThroughputMeter()
+        step = 0
+        futures = {}
+
+        try:
+            futures = dict((pool.submit(_exportPageInWorker, word), word)
+                    for word in wordListToUpdate)
+
+            for future in as_completed(futures):
+                word = futures[future]
+                try:
+                    self._pageExported(word, *future.result())
+                except Exception:
+                    # Worker process failed, export page here instead
+                    traceback.print_exc()
+                    self._pageExported(word, *self._exportSingleFile(word))
+
+                meter.inc()
+                if self.progressHandler is not None:
+                    step += 1
+                    self.progressHandler.update(step,
+                            _("Exporting %s (%.0f pages/s)") %
+                            (word, meter.getRate()))
+        finally:
+            ParallelParsing.shutdownWorkerPool(pool, futures)
+
+
+    def _exportHtmlSingleFiles(self, wordListToUpdate, oldManifest=None):
+        """
+        oldManifest -- ExportManifest of the previous incremental export
+                into the same directory. Pages which didn't change since
+                then are not written again.
+        """
         self.setLinkConverter(LinkConverterForHtmlSingleFilesExport(
                 self.wikiDocument, self))
         self.buildStyleSheetList()
+        self._assignFilenames()
 
 
         if self.addOpt[self.ADDOPT_IDX_TABLE_OF_CONTENTS] in (1, 2):
@@ -1026,20 +1280,24 @@ class HtmlExporter(AbstractExporter):
                 traceback.print_exc()
 
 
+        if oldManifest is not None:
+            wordListToUpdate = self._keepUnchangedPages(wordListToUpdate,
+                    oldManifest)
+
         if self.progressHandler is not None:
-            self.progressHandler.open(len(self.wordList))
+            self.progressHandler.open(len(wordListToUpdate))
             step = 0
 
-        for word in wordListToUpdate:
-            if self.progressHandler is not None:
-                step += 1
-                self.progressHandler.update(step, _("Exporting %s") % word)
-
-            wikiPage = self.wikiDocument.getWikiPage(word)
-            if not self.shouldExport(word, wikiPage):
-                continue
+        pool = self._createExportPool(wordListToUpdate)
+        if pool is not None:
+            self._exportSingleFilesParallel(pool, wordListToUpdate)
+        else:
+            for word in wordListToUpdate:
+                if self.progressHandler is not None:
+                    step += 1
+                    self.progressHandler.update(step, _("Exporting %s") % word)
 
-            self.exportWordToHtmlPage(self.exportDest, word, False)
+                self._pageExported(word, *self._exportSingleFile(word))
 
         self.copyCssFiles(self.exportDest)
         rootFile = join(self.exportDest,
@@ -1048,6 +1306,211 @@ class HtmlExporter(AbstractExporter):
         return rootFile
 
 
+    # Options which influence the HTML of all pages of an export
+    _MANIFEST_CONFIG_OPTIONS = ("html_header_doctype", "html_body_link",
+            "html_body_alink", "html_body_vlink", "html_body_text",
+            "html_body_bgcolor", "html_body_background",
+            "html_export_proppattern", "html_export_proppattern_is_excluding",
+            "insertions_allow_eval")
+
+    def _getManifestOptionsKey(self):
+        """
+        Return hash of everything which influences the HTML of all pages of
+        an export. If it changes, all pages must be exported again.
+        """
+        config = self.mainControl.getConfig()
+        options = (Consts.VERSION_STRING, self.exportType, tuple(self.addOpt),
+                bool(self.compatFilenames),
+                [url for dummy, url in self.styleSheetList],
+                [config.get("main", option)
+                    for option in self._MANIFEST_CONFIG_OPTIONS],
+                sorted(self.wikiDocument.getWikiData().getGlobalAttributes()
+                    .items()))
+
+        return hashlib.sha1(repr(options).encode("utf-8", "surrogatepass"))\
+                .digest()
+
+
+    @staticmethod
+    def _getContentHash(wikiPage):
+        return hashlib.sha1(wikiPage.getLiveText().encode("utf-8",
+                "surrogatepass")).digest()
+
+
+    @staticmethod
+    def _getFormatKey(wikiPage):
+        """
+        Return hash of the equivalence key of the format details of wikiPage
+        or None if there is no such key.
+        """
+        equivKey = wikiPage.getFormatDetails().getEquivalenceKey()
+        if equivKey is None:
+            return None
+
+        return hashlib.sha1(repr(equivKey).encode("utf-8", "surrogatepass"))\
+                .digest()
+
+
+    def _getLinkState(self, linkTerm):
+        """
+        Return what the HTML of a link to  linkTerm  depends on.
+        """
+        try:
+            return self.linkStateCache[linkTerm]
+        except KeyError:
+            pass
+
+        target = self.wikiDocument.getWikiPageNameForLinkTerm(linkTerm)
+        if target is None or not self.shouldExport(target):
+            state = None
+        else:
+            state = (target,
+                    self.filenameConverter.getFilenameForWikiWord(target),
+                    [triple[2] for triple in
+                        self.wikiDocument.getAttributeTriples(target,
+                        "short_hint", None)])
+
+        self.linkStateCache[linkTerm] = state
+        return state
+
+
+    def _getAutoLinkDigest(self):
+        """
+        Return hash of what decides which words of plain text become links
+        if auto-link is on: all link terms and the camelcase blacklists.
+        """
+        if self.autoLinkDigest is None:
+            state = (sorted(self.wikiDocument.getWikiData()
+                    .getAllProducedWikiLinks()),
+                    sorted(self.wikiDocument.getCcWordBlacklist()),
+                    sorted(self.wikiDocument.getNccWordBlacklist()))
+            self.autoLinkDigest = hashlib.sha1(repr(state).encode("utf-8",
+                    "surrogatepass")).digest()
+
+        return self.autoLinkDigest
+
+
+    def _getDependencyFingerprint(self, word, deps):
+        """
+        Return hash of the current state of the dependencies  deps  (an
+        ExportManifest.PageDependencies object) of page  word.
+        """
+        h = hashlib.sha1()
+
+        def add(value):
+            h.update(repr(value).encode("utf-8", "surrogatepass"))
+
+        for linkTerm in sorted(deps.linkTerms):
+            add((linkTerm, self._getLinkState(linkTerm)))
+
+        # With auto-link, a new page can turn plain text into a link
+        if self.wikiDocument.getWikiPage(word).getFormatDetails()\
+                .autoLinkMode != "off":
+            add(self._getAutoLinkDigest())
+
+        if deps.listsParents:
+            for relation in sorted(self.wikiDocument.getWikiPage(word)
+                    .getParentRelationships()):
+                add((relation, self._getLinkState(relation)))
+
+        for pageName in sorted(deps.includedPages):
+            wikiPage = self.wikiDocument.getWikiPageNoError(pageName)
+            add((pageName, self._getContentHash(wikiPage),
+                    self._getFormatKey(wikiPage)))
+
+        for path in sorted(deps.files):
+            try:
+                st = os.stat(pathEnc(path))
+                add((path, st.st_size, st.st_mtime_ns))
+            except OSError:
+                add((path, None))
+
+        return h.digest()
+
+
+    def _buildManifestEntry(self, word, wikiPage, deps, storageFiles):
+        formatKey = self._getFormatKey(wikiPage)
+        if formatKey is None:
+            deps.volatile = True
+            formatKey = b""
+
+        return ExportManifest.ManifestEntry(
+                self.filenameConverter.getFilenameForWikiWord(word),
+                self._getContentHash(wikiPage), formatKey,
+                self._getDependencyFingerprint(word, deps), deps,
+                sorted(storageFiles or ()))
+
+
+    def _isPageUnchanged(self, word, entry):
+        """
+        Return True if the file written for page  word  as described by
+        manifest entry  entry  is still valid.
+        """
+        if entry.dependencies.volatile:
+            return False
+
+        if entry.fileName != self.filenameConverter.getFilenameForWikiWord(
+                word):
+            return False
+
+        if not exists(pathEnc(join(self.exportDest,
+                entry.fileName + ".html"))):
+            return False
+
+        try:
+            wikiPage = self.wikiDocument.getWikiPage(word)
+            if not self.shouldExport(word, wikiPage):
+                return False
+
+            return entry.contentHash == self._getContentHash(wikiPage) and \
+                    entry.formatKey == self._getFormatKey(wikiPage) and \
+                    entry.fingerprint == self._getDependencyFingerprint(word,
+                    entry.dependencies)
+        except Exception:
+            traceback.print_exc()
+            return False
+
+
+    def _keepUnchangedPages(self, wordListToUpdate, oldManifest):
+        """
+        Take over the manifest entries of the pages which didn't change
+        since the export described by  oldManifest  and return list of the
+        words which must be exported.
+        """
+        if oldManifest.optionsKey != self.exportManifest.optionsKey:
+            return wordListToUpdate
+
+        result = []
+        for word in wordListToUpdate:
+            entry = oldManifest.getEntry(word)
+            if entry is not None and self._isPageUnchanged(word, entry):
+                self._pageExported(word, entry.storageFiles, entry)
+            else:
+                result.append(word)
+
+        return result
+
+
+    def _writeManifest(self, oldManifest):
+        """
+        Delete files of pages which were exported before but not now and
+        store the new manifest in the export directory.
+        """
+        for fileName in oldManifest.getFileNames() - \
+                self.exportManifest.getFileNames():
+            outputFile = join(self.exportDest, fileName + ".html")
+            try:
+                if exists(pathEnc(outputFile)):
+                    os.unlink(pathEnc(outputFile))
+            except OSError:
+                traceback.print_exc()
+
+        try:
+            self.exportManifest.writeToDir(self.exportDest)
+        except (IOError, OSError) as e:
+            raise ExportException(str(e))
+
+
     def exportWordToHtmlPage(self, dir, word, startFile=True,
             onlyInclude=None):
             
@@ -1071,6 +1534,9 @@ class HtmlExporter(AbstractExporter):
         except Exception as e:
             sys.stderr.write("Error while exporting word %s" % repr(word))
             traceback.print_exc()
+            if self.pageDependencies is not None:
+                # Don't keep the broken file in next incremental export
+                self.pageDependencies.volatile = True
 
         return outputFile
 
@@ -1220,6 +1686,9 @@ class HtmlExporter(AbstractExporter):
 """
 
     def getParentLinks(self, wikiPage, asHref=True, wordsToInclude=None):
+        if self.pageDependencies is not None:
+            self.pageDependencies.listsParents = True
+
         parents = ""
         parentRelations = wikiPage.getParentRelationships()[:]
         self.mainControl.getCollator().sort(parentRelations)
@@ -1360,17 +1829,21 @@ class HtmlExporter(AbstractExporter):
 #                 # TODO Use self.convertFilename here?
 #                 return self.linkConverter.getLinkForWikiWord(relUnAlias)
 
-        result = []
+        return "".join(self.iterContentListBody(linkAsFragments))
+
+
+    def iterContentListBody(self, linkAsFragments):
+        """
+        Generator yielding the HTML of the content list piece by piece.
+        """
         wordToLink = self.linkConverter.getLinkForWikiWord
         
-        result.append('<ul class="wikidpad">\n')
+        yield '<ul class="wikidpad">\n'
         for wikiWord in self.wordList:
-            result.append('<li class="wikidpad"><a href="%s" class="wikidpad">%s</a>\n' % (wordToLink(wikiWord),
-                    wikiWord))
+            yield '<li class="wikidpad"><a href="%s" class="wikidpad">%s</a>\n' % (wordToLink(wikiWord),
+                    wikiWord)
 
-        result.append('</ul>\n')
-        
-        return "".join(result)
+        yield '</ul>\n'
 
 
     def getContentTreeBody(self, flatTree, linkAsFragments):   # rootWords
@@ -1390,9 +1863,16 @@ class HtmlExporter(AbstractExporter):
 #                 # TODO Use self.convertFilename here?
 #                 return self.linkConverter.getLinkForWikiWord(relUnAlias)
 
+        return "".join(self.iterContentTreeBody(flatTree, linkAsFragments))
+
+
+    def iterContentTreeBody(self, flatTree, linkAsFragments):
+        """
+        Generator yielding the HTML of the content tree piece by piece.
+        flatTree -- flat tree as returned by DocPages.WikiPage.getFlatTree(),
+            list of tuples (wikiWord, deepness)
+        """
         wordSet = set(self.wordList)
-        deepStack = [-1]
-        result = []
         wordToLink = self.linkConverter.getLinkForWikiWord
         lastdeepness = 0
         
@@ -1403,20 +1883,20 @@ class HtmlExporter(AbstractExporter):
             deepness += 1
             if deepness > lastdeepness:
                 # print "getContentTreeBody9", deepness, lastdeepness
-                result.append('<ul class="wikidpad">\n' * (deepness - lastdeepness))
+                yield '<ul class="wikidpad">\n' * (deepness - lastdeepness)
             elif deepness < lastdeepness:
                 # print "getContentTreeBody10", deepness, lastdeepness
-                result.append('</ul>\n' * (lastdeepness - deepness))
+                yield '</ul>\n' * (lastdeepness - deepness)
                 
             lastdeepness = deepness
 
             wordSet.remove(wikiWord)
 
             # print "getContentTreeBody11", repr(wikiWord)
-            result.append('<li class="wikidpad"><a href="%s" class="wikidpad">%s</a>\n' % (wordToLink(wikiWord),
-                    wikiWord))
+            yield '<li class="wikidpad"><a href="%s" class="wikidpad">%s</a>\n' % (wordToLink(wikiWord),
+                    wikiWord)
 
-        result.append("</ul>\n" * lastdeepness)
+        yield "</ul>\n" * lastdeepness
 
         # list words not in the tree
         if len(wordSet) > 0:
@@ -1425,15 +1905,12 @@ class HtmlExporter(AbstractExporter):
             self.mainControl.getCollator().sort(remainList)
             
             # print "getContentTreeBody14", repr(remainList)
-            result.append('<ul class="wikidpad">\n')
+            yield '<ul class="wikidpad">\n'
             for wikiWord in remainList:
-                result.append('<li class="wikidpad"><a href="%s" class="wikidpad">%s</a>\n' % (wordToLink(wikiWord),
-                        wikiWord))
-
-            result.append('</ul>\n')
-
+                yield '<li class="wikidpad"><a href="%s" class="wikidpad">%s</a>\n' % (wordToLink(wikiWord),
+                        wikiWord)
 
-        return "".join(result)
+            yield '</ul>\n'
 
 
     def getCurrentWikiWord(self):
@@ -1443,7 +1920,12 @@ class HtmlExporter(AbstractExporter):
         return self.wikiWord
 
 
-    def formatContent(self, wikiPage, content=None):
+    def formatContent(self, wikiPage, content=None, outFile=None):
+        """
+        Return HTML of wikiPage (or of content in context of wikiPage).
+        If file object outFile is given, the HTML is written to it while
+        it is created and an empty string is returned.
+        """
         word = wikiPage.getWikiWord()
         formatDetails = wikiPage.getFormatDetails()
         if content is None:
@@ -1460,7 +1942,7 @@ class HtmlExporter(AbstractExporter):
                 "html_previewIE", "html_previewMOZ", "html_previewWK")
         self.wikiWord = word
 
-        self.result = []
+        self.outSink = HtmlOutputSink(outFile)
         self.optsStack = StackedCopyDict()
         self.insertionVisitStack = []
         self.astNodeStack = []
@@ -1502,6 +1984,10 @@ class HtmlExporter(AbstractExporter):
         if self.asHtmlPreview and facename:
             self.outAppend('</font>')
 
+        if outFile is not None:
+            self.outSink.flush()
+            return ""
+
         return self.getOutput()
 
 
@@ -1513,8 +1999,12 @@ class HtmlExporter(AbstractExporter):
         try:
             if absUrl.startswith("file:"):
                 absLink = pathnameFromUrl(absUrl)
+                if self.pageDependencies is not None:
+                    self.pageDependencies.files.add(absLink)
                 imgFile = open(absLink, "rb")
             else:
+                if self.pageDependencies is not None:
+                    self.pageDependencies.volatile = True
                 imgFile = urllib.request.urlopen(absUrl)
                 imgData = imgFile.read()
                 imgFile.close()
@@ -1555,7 +2045,7 @@ class HtmlExporter(AbstractExporter):
 
     def outAppend(self, toAppend, eatPreBreak=False, eatPostBreak=False):
         """
-        Append toAppend to self.result, maybe remove or modify it according to
+        Append toAppend to self.outSink, maybe remove or modify it according to
         flags
         """
         if toAppend == "":    # .strip()
@@ -1566,10 +2056,11 @@ class HtmlExporter(AbstractExporter):
             self.outFlagPostBreakEaten = True
             return
 
-        if eatPreBreak and len(self.result) > 0 and \
-                self.result[-1].strip() == '<br class="wikidpad" />' and \
+        lastAppended = self.outSink.getLast()
+        if eatPreBreak and lastAppended is not None and \
+                lastAppended.strip() == '<br class="wikidpad" />' and \
                 not self.outFlagPostBreakEaten:
-            self.result[-1] = toAppend
+            self.outSink.replaceLast(toAppend)
             self.outFlagEatPostBreak = eatPostBreak
             return
         
@@ -1577,13 +2068,13 @@ class HtmlExporter(AbstractExporter):
             self.outFlagPostBreakEaten = (toAppend.strip() == '<br class="wikidpad" />')
 
         self.outFlagEatPostBreak = eatPostBreak
-        self.result.append(toAppend)
+        self.outSink.append(toAppend)
 
 
     def outEatBreaks(self, toAppend, **kpars):
         """
         Sets flags so that a <br /> before and/or after the item toAppend
-        are eaten (removed) and appends toAppend to self.result
+        are eaten (removed) and appends toAppend to self.outSink
         """
         kpars["eatPreBreak"] = True
         kpars["eatPostBreak"] = True
@@ -1638,7 +2129,7 @@ class HtmlExporter(AbstractExporter):
 
 
     def getOutput(self):
-        return "".join(self.result)
+        return self.outSink.getValue()
 
 
     def getCommonStylesFromAppendix(self, appendix):
@@ -1891,6 +2382,12 @@ class HtmlExporter(AbstractExporter):
         value = astNode.value
         appendices = astNode.appendices
 
+        if self.pageDependencies is not None and key != "page" and \
+                (key, value) not in self._LOCAL_INSERTIONS and \
+                (key, None) not in self._LOCAL_INSERTIONS:
+            # Result of insertion isn't tracked by incremental export
+            self.pageDependencies.volatile = True
+
         if key == "page":
             if ("wikipage/" + value) in self.insertionVisitStack:
                 # Prevent infinite recursion
@@ -1910,6 +2407,9 @@ class HtmlExporter(AbstractExporter):
             except ValueError:
                 return
 
+            if self.pageDependencies is not None:
+                self.pageDependencies.includedPages.add(value)
+
             docpage = self.wikiDocument.getWikiPageNoError(value)
             pageAst = docpage.getLivePageAst()
             
@@ -2247,7 +2747,10 @@ class HtmlExporter(AbstractExporter):
             wikiWord = astNodeOrWord
             anchorLink = None
             titleNode = None
-            
+
+        if self.pageDependencies is not None:
+            self.pageDependencies.linkTerms.add(wikiWord)
+
         if self.avoidDeadWikiLinks and not self.shouldExport(
                 self.wikiDocument.getWikiPageNameForLinkTerm(wikiWord)):
             link = None
@@ -23,6 +23,8 @@ sys.stderr = sys.stdout
 Localization.setLocale("")
 
 from pwiki.WikiPyparsing import *
+from pwiki.WikiPyparsing import registerAstClass
+from pwiki.AutoLinkRelax import AutoLinkRelaxMatcher
 
 
 WIKIDPAD_PLUGIN = (("WikiParser", 1),)
@@ -30,6 +32,10 @@ WIKIDPAD_PLUGIN = (("WikiParser", 1),)
 WIKI_LANGUAGE_NAME = "mediawiki_1"
 WIKI_HR_LANGUAGE_NAME = "MediaWiki 1.0"
 
+# Must be increased whenever the parser creates different page ASTs than
+# before for the same text (invalidates persistently cached ASTs)
+PAGE_AST_VERSION = 1
+
 
 
 
@@ -1344,12 +1350,6 @@ ToDoREWithCapturing = re.compile(r"^([^:\s]+):[ \t]*(.+?)$",
 
 
 
-# For auto-link mode relax
-AutoLinkRelaxSplitRE = re.compile(r"[\W]+", re.IGNORECASE | re.UNICODE)
-
-AutoLinkRelaxJoinPAT = r"[\W]+"
-AutoLinkRelaxJoinFlags = re.IGNORECASE | re.UNICODE
-
 
 
 # For spell checking
@@ -1554,6 +1554,15 @@ class _TheParser:
         return WIKI_LANGUAGE_NAME
 
 
+    @staticmethod
+    def getAstVersion():
+        """
+        Return a hashable version identifier of the page ASTs created by
+        this parser or None if the ASTs shouldn't be cached persistently.
+        """
+        return PAGE_AST_VERSION
+
+
 
     @staticmethod
     def _postProcessing(intLanguageName, content, formatDetails, pageAst,
@@ -1562,9 +1571,8 @@ class _TheParser:
         Do some cleanup after main parsing.
         Not part of public API.
         """
-        autoLinkRelaxRE = None
         if formatDetails.autoLinkMode == "relax":
-            relaxList = formatDetails.wikiDocument.getAutoLinkRelaxInfo()
+            relaxMatcher = formatDetails.wikiDocument.getAutoLinkRelaxInfo()
 
             def recursAutoLink(ast):
                 newAstNodes = []
@@ -1578,52 +1586,37 @@ class _TheParser:
                         start = node.pos
                         
                         threadstop.testValidThread()
-                        while text != "":
-                            # The foundWordText is the text as typed in the page
-                            # foundWord is the word as entered in database
-                            # These two may differ (esp. in whitespaces)
-                            foundPos = len(text)
-                            foundWord = None
-                            foundWordText = None
-                            
-                            # Search all regexes for the earliest match
-                            for regex, word in relaxList:
-                                match = regex.search(text)
-                                if match:
-                                    pos = match.start(0)
-                                    if pos < foundPos:
-                                        # Match is earlier than previous
-                                        foundPos = pos
-                                        foundWord = word
-                                        foundWordText = match.group(0)
-                                        if pos == 0:
-                                            # Can't find a better match -> stop loop
-                                            break
-
+                        prevEnd = 0
+                        # The foundWordText is the text as typed in the page
+                        # foundWord is the word as entered in database
+                        # These two may differ (esp. in whitespaces)
+                        for foundPos, foundEnd, foundWord in \
+                                relaxMatcher.findMatches(text):
                             # Add token for text before found word (if any)
-                            preText = text[:foundPos]
-                            if preText != "":
-                                newAstNodes.append(buildSyntaxNode(preText,
-                                        start, "plainText"))
-                
-                                start += len(preText)
-                                text = text[len(preText):]
-                            
-                            if foundWord is not None:
-                                wwNode = buildSyntaxNode(
-                                        [buildSyntaxNode(foundWordText, start, "word")],
-                                        start, "wikiWord")
-                                        
-                                wwNode.searchFragment = None
-                                wwNode.anchorLink = None
-                                wwNode.wikiWord = foundWord
-                                wwNode.titleNode = buildSyntaxNode(foundWordText, start, "plainText") # None
-
-                                newAstNodes.append(wwNode)
-
-                                inc = max(len(foundWordText), 1)
-                                start += inc
-                                text = text[inc:]
+                            if foundPos > prevEnd:
+                                newAstNodes.append(buildSyntaxNode(
+                                        text[prevEnd:foundPos],
+                                        start + prevEnd, "plainText"))
+
+                            foundWordText = text[foundPos:foundEnd]
+                            wwStart = start + foundPos
+
+                            wwNode = buildSyntaxNode(
+                                    [buildSyntaxNode(foundWordText, wwStart, "word")],
+                                    wwStart, "wikiWord")
+                                    
+                            wwNode.searchFragment = None
+                            wwNode.anchorLink = None
+                            wwNode.wikiWord = foundWord
+                            wwNode.titleNode = buildSyntaxNode(foundWordText, wwStart, "plainText") # None
+
+                            newAstNodes.append(wwNode)
+                            prevEnd = foundEnd
+
+                        if prevEnd < len(text):
+                            newAstNodes.append(buildSyntaxNode(
+                                    text[prevEnd:], start + prevEnd,
+                                    "plainText"))
 
                         continue
 
@@ -1705,6 +1698,12 @@ class WikiLanguageDetails:
         return self.getWikiLanguageName() == details.getWikiLanguageName() and \
                 self.footnotesAsWws == details.footnotesAsWws
 
+    def getEquivalenceKey(self):
+        """
+        Return hashable key which is equal for equivalent details objects
+        """
+        return (self.getWikiLanguageName(), self.footnotesAsWws)
+
 
 class _WikiLinkPath:
     __slots__ = ("upwardCount", "components")
@@ -1937,6 +1936,9 @@ class _WikiLinkPath:
                 (other.upwardCount, other.components))
 
 
+registerAstClass(_WikiLinkPath)
+
+
 _RE_LINE_INDENT = re.compile(r"^[ \t]*")
 
 class _TheHelper:
@@ -2108,44 +2110,29 @@ class _TheHelper:
 
 
     @staticmethod
-    def _createAutoLinkRelaxWordEntryRE(word):
+    def buildAutoLinkRelaxInfo(wikiDocument):
         """
-        Get compiled regular expression for one word in autoLink "relax"
-        mode.
-
-        Not part of public API.
+        Build some cache info needed to process auto-links in "relax" mode.
+        This info will be given back in the formatDetails when calling
+        _TheParser.parse().
+        The implementation for this plugin creates an
+        AutoLinkRelax.AutoLinkRelaxMatcher, but this is not mandatory.
         """
-        # Split into parts of contiguous alphanumeric characters
-        parts = AutoLinkRelaxSplitRE.split(word)
-        # Filter empty parts
-        parts = [p for p in parts if p != ""]
-
-        # Instead of original non-alphanum characters allow arbitrary
-        # non-alphanum characters
-        pat = r"\b" + (AutoLinkRelaxJoinPAT.join(parts)) + r"\b"
-        regex = re.compile(pat, AutoLinkRelaxJoinFlags)
-
-        return regex
+        # Fetch all wiki words, the matcher prefers longest words itself
+        return AutoLinkRelaxMatcher(
+                wikiDocument.getWikiData().getAllProducedWikiLinks())
 
 
     @staticmethod
-    def buildAutoLinkRelaxInfo(wikiDocument):
+    def updateAutoLinkRelaxInfo(wikiDocument, autoLinkRelaxInfo):
         """
-        Build some cache info needed to process auto-links in "relax" mode.
-        This info will be given back in the formatDetails when calling
-        _TheParser.parse().
-        The implementation for this plugin creates a list of regular
-        expressions and the related wiki words, but this is not mandatory.
+        Bring info built by buildAutoLinkRelaxInfo() up to date after
+        wiki words were added, renamed or deleted and return it.
         """
-        # Build up regular expression
-        # First fetch all wiki words
-        words = wikiDocument.getWikiData().getAllProducedWikiLinks()
+        autoLinkRelaxInfo.update(
+                wikiDocument.getWikiData().getAllProducedWikiLinks())
 
-        # Sort longest words first
-        words.sort(key=lambda w: len(w), reverse=True)
-        
-        return [(_TheHelper._createAutoLinkRelaxWordEntryRE(w), w)
-                for w in words if w != ""]
+        return autoLinkRelaxInfo
 
 
     @staticmethod
@@ -23,6 +23,9 @@ sys.stderr = sys.stdout
 Localization.setLocale("")
 
 from pwiki.WikiPyparsing import *
+from pwiki.WikiPyparsing import registerAstClass, findTextChange, \
+        shiftAstPositions, copyAstNodes
+from pwiki.AutoLinkRelax import AutoLinkRelaxMatcher
 
 
 WIKIDPAD_PLUGIN = (("WikiParser", 1),)
@@ -30,6 +33,10 @@ WIKIDPAD_PLUGIN = (("WikiParser", 1),)
 WIKI_LANGUAGE_NAME = "wikidpad_default_2_0"
 WIKI_HR_LANGUAGE_NAME = "WikidPad default 2.0"
 
+# Must be increased whenever the parser creates different page ASTs than
+# before for the same text (invalidates persistently cached ASTs)
+PAGE_AST_VERSION = 1
+
 
 LETTERS = UPPERCASE + LOWERCASE
 
@@ -1231,12 +1238,6 @@ ToDoREWithCapturing = re.compile(r"^([^:\s]+):[ \t]*(.+?)$",
 
 
 
-# For auto-link mode relax
-AutoLinkRelaxSplitRE = re.compile(r"[\W]+", re.IGNORECASE | re.UNICODE)
-
-AutoLinkRelaxJoinPAT = r"[\W]+"
-AutoLinkRelaxJoinFlags = re.IGNORECASE | re.UNICODE
-
 
 
 # For spell checking
@@ -1419,6 +1420,117 @@ def _buildBaseDict(wikiDocument=None, formatDetails=None):
 
 
 
+# Helpers for _TheParser.parseIncremental()
+
+# Characters which may start or end syntax elements reaching over paragraph
+# boundaries (bold, italics, bracketed links with multi-line search
+# fragments, attributes with multi-line values, scripts, ...) or which
+# change the meaning of neighbouring characters (escapes, search fragments,
+# todo keywords, URLs). The change itself and the non-whitespace characters
+# around it must not contain them.
+_INCREMENTAL_UNSAFE_TOKEN_RE = re.compile(r"[*_\[\]|<>%\\#:]")
+
+# Tables, pre blocks and other blocks starting with "<<" or ending with ">>"
+# depend on the whole line, so these characters are not allowed anywhere
+# in changed lines
+_INCREMENTAL_UNSAFE_LINE_RE = re.compile(r"[<>]")
+
+_HEADING_START_RE = re.compile(r"\+*")
+_TOKEN_START_RE = re.compile(r"\S*")
+_TOKEN_END_RE = re.compile(r"\S*$")
+
+
+def _isParagraphStart(content, pos):
+    """
+    True if  pos  is the start of a non-indented line preceded by an
+    empty (or whitespace-only) line, or the start of content.
+    """
+    if pos == 0:
+        return True
+
+    if pos >= len(content) or content[pos] in " \t\n" or \
+            content[pos - 1] != "\n":
+        return False
+
+    prevLineStart = content.rfind("\n", 0, pos - 1) + 1
+    return content[prevLineStart:pos - 1].strip() == ""
+
+
+def _isInsideBrackets(head, tail):
+    """
+    True if the text between  head  and  tail  (the unchanged parts of
+    the changed lines) may be part of a bracketed element.
+    """
+    if head.rfind("[") > head.rfind("]"):
+        return True
+
+    closePos = tail.find("]")
+    if closePos == -1:
+        return False
+
+    openPos = tail.find("[")
+    return openPos == -1 or closePos < openPos
+
+
+def _isIncrementalSafeChange(prevContent, content, lineStart, editRange,
+        oldLineEnd, newLineEnd):
+    """
+    Check if only the paragraphs containing the changed lines must be
+    parsed again after replacing  prevContent[start:oldEnd]  by
+    content[start:newEnd].
+    """
+    start, oldEnd, newEnd = editRange
+
+    oldLines = prevContent[lineStart:oldLineEnd]
+    newLines = content[lineStart:newLineEnd]
+    head = prevContent[lineStart:start]
+    tail = prevContent[oldEnd:oldLineEnd]
+
+    # Changed text together with the rest of the words it touches
+    headToken = _TOKEN_END_RE.search(head).group()
+    tailToken = _TOKEN_START_RE.match(tail).group()
+    for changed in (prevContent[start:oldEnd], content[start:newEnd]):
+        if _INCREMENTAL_UNSAFE_TOKEN_RE.search(headToken + changed +
+                tailToken):
+            return False
+
+    if _INCREMENTAL_UNSAFE_LINE_RE.search(oldLines) or \
+            _INCREMENTAL_UNSAFE_LINE_RE.search(newLines):
+        return False
+
+    if _isInsideBrackets(head, tail):
+        return False
+
+    singleLine = "\n" not in oldLines and "\n" not in newLines
+
+    if singleLine:
+        # Indentation changes may change how lists are built
+        oldIndent = len(oldLines) - len(oldLines.lstrip(" \t"))
+        newIndent = len(newLines) - len(newLines.lstrip(" \t"))
+        if oldLines[:oldIndent] != newLines[:newIndent] or \
+                start < lineStart + oldIndent:
+            return False
+
+        # A heading must stay the same heading
+        headingLen = _HEADING_START_RE.match(oldLines).end()
+        if headingLen > 0 and (start <= lineStart + headingLen or
+                _HEADING_START_RE.match(newLines).end() != headingLen):
+            return False
+
+    for line in oldLines.split("\n") + newLines.split("\n"):
+        if line.strip() == "":
+            # Would change the paragraph structure
+            return False
+
+        # Line structure may only change between non-indented
+        # non-heading lines
+        if not singleLine and line[0] in " \t+":
+            return False
+
+    return True
+
+
+
 # -------------------- API for plugin WikiParser --------------------
 # During beta state of the WikidPad version, this API isn't stable yet, 
 # so changes may occur!
@@ -1442,6 +1554,15 @@ class _TheParser:
         return WIKI_LANGUAGE_NAME
 
 
+    @staticmethod
+    def getAstVersion():
+        """
+        Return a hashable version identifier of the page ASTs created by
+        this parser or None if the ASTs shouldn't be cached persistently.
+        """
+        return PAGE_AST_VERSION
+
+
 
     @staticmethod
     def _postProcessing(intLanguageName, content, formatDetails, pageAst,
@@ -1450,9 +1571,8 @@ class _TheParser:
         Do some cleanup after main parsing.
         Not part of public API.
         """
-        autoLinkRelaxRE = None
         if formatDetails.autoLinkMode == "relax":
-            relaxList = formatDetails.wikiDocument.getAutoLinkRelaxInfo()
+            relaxMatcher = formatDetails.wikiDocument.getAutoLinkRelaxInfo()
 
             def recursAutoLink(ast):
                 newAstNodes = []
@@ -1466,52 +1586,37 @@ class _TheParser:
                         start = node.pos
                         
                         threadstop.testValidThread()
-                        while text != "":
-                            # The foundWordText is the text as typed in the page
-                            # foundWord is the word as entered in database
-                            # These two may differ (esp. in whitespaces)
-                            foundPos = len(text)
-                            foundWord = None
-                            foundWordText = None
-                            
-                            # Search all regexes for the earliest match
-                            for regex, word in relaxList:
-                                match = regex.search(text)
-                                if match:
-                                    pos = match.start(0)
-                                    if pos < foundPos:
-                                        # Match is earlier than previous
-                                        foundPos = pos
-                                        foundWord = word
-                                        foundWordText = match.group(0)
-                                        if pos == 0:
-                                            # Can't find a better match -> stop loop
-                                            break
-
+                        prevEnd = 0
+                        # The foundWordText is the text as typed in the page
+                        # foundWord is the word as entered in database
+                        # These two may differ (esp. in whitespaces)
+                        for foundPos, foundEnd, foundWord in \
+                                relaxMatcher.findMatches(text):
                             # Add token for text before found word (if any)
-                            preText = text[:foundPos]
-                            if preText != "":
-                                newAstNodes.append(buildSyntaxNode(preText,
-                                        start, "plainText"))
-                
-                                start += len(preText)
-                                text = text[len(preText):]
-                            
-                            if foundWord is not None:
-                                wwNode = buildSyntaxNode(
-                                        [buildSyntaxNode(foundWordText, start, "word")],
-                                        start, "wikiWord")
-                                        
-                                wwNode.searchFragment = None
-                                wwNode.anchorLink = None
-                                wwNode.wikiWord = foundWord
-                                wwNode.titleNode = buildSyntaxNode(foundWordText, start, "plainText") # None
-
-                                newAstNodes.append(wwNode)
-
-                                inc = max(len(foundWordText), 1)
-                                start += inc
-                                text = text[inc:]
+                            if foundPos > prevEnd:
+                                newAstNodes.append(buildSyntaxNode(
+                                        text[prevEnd:foundPos],
+                                        start + prevEnd, "plainText"))
+
+                            foundWordText = text[foundPos:foundEnd]
+                            wwStart = start + foundPos
+
+                            wwNode = buildSyntaxNode(
+                                    [buildSyntaxNode(foundWordText, wwStart, "word")],
+                                    wwStart, "wikiWord")
+                                    
+                            wwNode.searchFragment = None
+                            wwNode.anchorLink = None
+                            wwNode.wikiWord = foundWord
+                            wwNode.titleNode = buildSyntaxNode(foundWordText, wwStart, "plainText") # None
+
+                            newAstNodes.append(wwNode)
+                            prevEnd = foundEnd
+
+                        if prevEnd < len(text):
+                            newAstNodes.append(buildSyntaxNode(
+                                    text[prevEnd:], start + prevEnd,
+                                    "plainText"))
 
                         continue
 
@@ -1526,6 +1631,121 @@ class _TheParser:
         
         return pageAst
 
+    @staticmethod
+    def parseIncremental(intLanguageName, content, formatDetails,
+            prevPageAst, threadstop, editRange=None):
+        """
+        Like parse(), but reuse  prevPageAst, the AST of the previous
+        version of the text created by parse() or parseIncremental() with
+        equivalent  formatDetails. Only the paragraphs containing the
+        changed lines are parsed again, the nodes before are reused and
+        those after are copied with shifted positions. The result is the
+        same as from parse(). If the change may affect the structure
+        outside of these paragraphs, a full parse is done.
+
+        editRange -- tuple (start, oldEnd, newEnd) meaning that
+                prevText[start:oldEnd] was replaced by content[start:newEnd]
+                (see WikiPyparsing.findTextChange()) or None to compute it
+        """
+        if prevPageAst is not None and not formatDetails.noFormat and \
+                formatDetails.autoLinkMode != "relax":
+            try:
+                pageAst = _TheParser._parseChangedParagraphs(content,
+                        formatDetails, prevPageAst, threadstop, editRange)
+                if pageAst is not None:
+                    return pageAst
+            except ParseException:
+                # Full parse below will show what's wrong
+                pass
+
+        return _TheParser.parse(intLanguageName, content, formatDetails,
+                threadstop)
+
+
+    @staticmethod
+    def _parseChangedParagraphs(content, formatDetails, prevPageAst,
+            threadstop, editRange):
+        """
+        Do the work for parseIncremental(). Returns None if a full parse
+        is needed.
+        Not part of public API.
+        """
+        prevContent = prevPageAst.getString()
+        if editRange is None:
+            editRange = findTextChange(prevContent, content)
+            if editRange is None:
+                return prevPageAst
+
+        start, oldEnd, newEnd = editRange
+        delta = newEnd - oldEnd
+        if len(prevContent) + delta != len(content) or \
+                prevContent[:start] != content[:start]:
+            return None
+
+        # Whole lines containing the change
+        lineStart = prevContent.rfind("\n", 0, start) + 1
+        oldLineEnd = prevContent.find("\n", oldEnd)
+        if oldLineEnd == -1:
+            oldLineEnd = len(prevContent)
+        newLineEnd = oldLineEnd + delta
+
+        if not _isIncrementalSafeChange(prevContent, content, lineStart,
+                editRange, oldLineEnd, newLineEnd):
+            return None
+
+        threadstop.testValidThread()
+
+        # The top-level nodes of a page are a flat sequence, find the
+        # paragraphs enclosing the changed lines
+        children = prevPageAst.getChildren()
+        if len(children) == 0 or children[-1].name != "stringEnd":
+            return None
+
+        firstIdx = None
+        for i in range(len(children) - 1, -1, -1):
+            pos = children[i].pos
+            if pos <= lineStart and _isParagraphStart(prevContent, pos) and \
+                    _isParagraphStart(content, pos):
+                firstIdx = i
+                break
+
+        if firstIdx is None:
+            return None
+
+        # The empty line before the end paragraph must not be changed
+        afterIdx = len(children) - 1
+        for i in range(firstIdx + 1, len(children) - 1):
+            pos = children[i].pos
+            if pos > oldLineEnd + 1 and _isParagraphStart(prevContent, pos):
+                afterIdx = i
+                break
+
+        segStart = children[firstIdx].pos
+        segEnd = children[afterIdx].pos + delta
+
+        baseDict = _buildBaseDict(formatDetails=formatDetails)
+        t = text.parseString(content[segStart:segEnd], parseAll=True,
+                baseDict=baseDict, threadstop=threadstop)
+        segNodes = list(buildSyntaxNode(t, 0, "text").getChildren())
+
+        # The "stringEnd" node is taken from the previous AST
+        if len(segNodes) == 0 or segNodes[-1].name != "stringEnd":
+            return None
+        del segNodes[-1]
+
+        shiftAstPositions(segNodes, segStart)
+
+        # Previous AST may still be in use, so the nodes after the segment
+        # are copied before changing them
+        afterNodes = copyAstNodes(children[afterIdx:])
+        shiftAstPositions(afterNodes, delta)
+
+        threadstop.testValidThread()
+
+        return buildSyntaxNode(children[:firstIdx] + segNodes + afterNodes,
+                0, "text")
+
+
     @staticmethod
     def parse(intLanguageName, content, formatDetails, threadstop):
         """
@@ -1593,6 +1813,12 @@ class WikiLanguageDetails:
         return self.getWikiLanguageName() == details.getWikiLanguageName() and \
                 self.footnotesAsWws == details.footnotesAsWws
 
+    def getEquivalenceKey(self):
+        """
+        Return hashable key which is equal for equivalent details objects
+        """
+        return (self.getWikiLanguageName(), self.footnotesAsWws)
+
 
 class _WikiLinkPath:
     __slots__ = ("upwardCount", "components")
@@ -1819,6 +2045,9 @@ class _WikiLinkPath:
                 (other.upwardCount, other.components))
 
 
+registerAstClass(_WikiLinkPath)
+
+
 _RE_LINE_INDENT = re.compile(r"^[ \t]*")
 
 class _TheHelper:
@@ -1990,44 +2219,29 @@ class _TheHelper:
 
 
     @staticmethod
-    def _createAutoLinkRelaxWordEntryRE(word):
+    def buildAutoLinkRelaxInfo(wikiDocument):
         """
-        Get compiled regular expression for one word in autoLink "relax"
-        mode.
-
-        Not part of public API.
+        Build some cache info needed to process auto-links in "relax" mode.
+        This info will be given back in the formatDetails when calling
+        _TheParser.parse().
+        The implementation for this plugin creates an
+        AutoLinkRelax.AutoLinkRelaxMatcher, but this is not mandatory.
         """
-        # Split into parts of contiguous alphanumeric characters
-        parts = AutoLinkRelaxSplitRE.split(word)
-        # Filter empty parts
-        parts = [p for p in parts if p != ""]
-
-        # Instead of original non-alphanum characters allow arbitrary
-        # non-alphanum characters
-        pat = r"\b" + (AutoLinkRelaxJoinPAT.join(parts)) + r"\b"
-        regex = re.compile(pat, AutoLinkRelaxJoinFlags)
-
-        return regex
+        # Fetch all wiki words, the matcher prefers longest words itself
+        return AutoLinkRelaxMatcher(
+                wikiDocument.getWikiData().getAllProducedWikiLinks())
 
 
     @staticmethod
-    def buildAutoLinkRelaxInfo(wikiDocument):
+    def updateAutoLinkRelaxInfo(wikiDocument, autoLinkRelaxInfo):
         """
-        Build some cache info needed to process auto-links in "relax" mode.
-        This info will be given back in the formatDetails when calling
-        _TheParser.parse().
-        The implementation for this plugin creates a list of regular
-        expressions and the related wiki words, but this is not mandatory.
+        Bring info built by buildAutoLinkRelaxInfo() up to date after
+        wiki words were added, renamed or deleted and return it.
         """
-        # Build up regular expression
-        # First fetch all wiki words
-        words = wikiDocument.getWikiData().getAllProducedWikiLinks()
+        autoLinkRelaxInfo.update(
+                wikiDocument.getWikiData().getAllProducedWikiLinks())
 
-        # Sort longest words first
-        words.sort(key=lambda w: len(w), reverse=True)
-        
-        return [(_TheHelper._createAutoLinkRelaxWordEntryRE(w), w)
-                for w in words if w != ""]
+        return autoLinkRelaxInfo
 
 
     @staticmethod
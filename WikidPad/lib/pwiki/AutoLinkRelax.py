@@ -0,0 +1,206 @@
+"""
+Matcher to find wiki words in plain text for the autoLink "relax" mode.
+
+A wiki word is found in the text if the sequence of its alphanumeric parts
+equals a sequence of consecutive alphanumeric parts ("tokens") of the text,
+ignoring case. The non-alphanumeric characters between the parts don't
+matter. For a single word this is what the regular expression
+r"\\bpart1[\\W]+part2[\\W]+...\\b" finds, but all words are stored in one
+trie over the normalized tokens so that a text is scanned only once
+regardless of the number of words.
+
+If several words match at the leftmost position, the longest word (in
+characters) wins. Among words of equal length the earlier added one wins.
+
+The module doesn't depend on wx so it can be used by worker processes
+and benchmarks.
+"""
+
+import re, threading
+
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenizeWord(word):
+    """
+    Return tuple of normalized tokens of word as used for matching.
+    """
+    return tuple(t.lower() for t in _TOKEN_RE.findall(word))
+
+
+
+class _TrieNode:
+    __slots__ = ("children", "words", "best")
+
+    def __init__(self):
+        self.children = {}   # {token: _TrieNode}
+        self.words = None    # {word: priority} of words ending here or None
+        self.best = None     # Cached word with highest priority
+
+
+    def getBest(self):
+        if self.best is None and self.words:
+            self.best = max(self.words.items(), key=lambda item: item[1])[0]
+
+        return self.best
+
+
+
+class AutoLinkRelaxMatcher:
+    """
+    Trie of wiki words for autoLink "relax" mode. Can be updated
+    incrementally, all methods are thread-safe.
+    """
+    def __init__(self, words=()):
+        self.lock = threading.Lock()
+        self.root = _TrieNode()
+        self.wordNodes = {}   # {word: _TrieNode where word ends}
+        self.seqNo = 0   # Counter to prefer earlier added words
+
+        for word in words:
+            self._addWord(word)
+
+
+    def __len__(self):
+        return len(self.wordNodes)
+
+
+    def __contains__(self, word):
+        return word in self.wordNodes
+
+
+    def getWords(self):
+        with self.lock:
+            return list(self.wordNodes.keys())
+
+
+    def _addWord(self, word):
+        if word in self.wordNodes:
+            return
+
+        tokens = tokenizeWord(word)
+        if len(tokens) == 0:
+            # Would match the empty string
+            return
+
+        node = self.root
+        for token in tokens:
+            child = node.children.get(token)
+            if child is None:
+                child = _TrieNode()
+                node.children[token] = child
+            node = child
+
+        if node.words is None:
+            node.words = {}
+
+        # Longer words first, then earlier added ones
+        self.seqNo += 1
+        node.words[word] = (len(word), -self.seqNo)
+        node.best = None
+        self.wordNodes[word] = node
+
+
+    def _removeWord(self, word):
+        node = self.wordNodes.pop(word, None)
+        if node is None:
+            return
+
+        del node.words[word]
+        node.best = None
+
+        if node.words:
+            return
+
+        node.words = None
+
+        # Prune nodes which became useless
+        path = [self.root]
+        for token in tokenizeWord(word):
+            path.append(path[-1].children[token])
+
+        for token, parent, child in zip(reversed(tokenizeWord(word)),
+                reversed(path[:-1]), reversed(path[1:])):
+            if child.words or child.children:
+                break
+            del parent.children[token]
+
+
+    def addWords(self, words):
+        with self.lock:
+            for word in words:
+                self._addWord(word)
+
+
+    def removeWords(self, words):
+        with self.lock:
+            for word in words:
+                self._removeWord(word)
+
+
+    def update(self, words):
+        """
+        Make the set of contained words equal to  words  by adding and
+        removing only the differences.
+        Returns True if something changed.
+        """
+        words = set(words)
+        with self.lock:
+            toRemove = [w for w in self.wordNodes if w not in words]
+            toAdd = [w for w in words if w not in self.wordNodes]
+
+            for word in toRemove:
+                self._removeWord(word)
+            for word in toAdd:
+                self._addWord(word)
+
+        return len(toRemove) > 0 or len(toAdd) > 0
+
+
+    def findMatches(self, text):
+        """
+        Return list of non-overlapping matches as tuples
+        (start, afterEnd, word) in order of position. Each match is the
+        leftmost one after the end of the previous match.
+        """
+        tokens = [(m.start(), m.end(), m.group(0).lower())
+                for m in _TOKEN_RE.finditer(text)]
+
+        result = []
+        with self.lock:
+            if not self.wordNodes:
+                return result
+
+            tokenCount = len(tokens)
+            i = 0
+            while i < tokenCount:
+                node = self.root
+                bestWord = None
+                bestPriority = None
+                bestEnd = None
+
+                j = i
+                while j < tokenCount:
+                    node = node.children.get(tokens[j][2])
+                    if node is None:
+                        break
+
+                    if node.words:
+                        word = node.getBest()
+                        priority = node.words[word]
+                        if bestPriority is None or priority > bestPriority:
+                            bestWord = word
+                            bestPriority = priority
+                            bestEnd = j
+                    j += 1
+
+                if bestWord is None:
+                    i += 1
+                    continue
+
+                result.append((tokens[i][0], tokens[bestEnd][1], bestWord))
+                i = bestEnd + 1
+
+        return result
+
@@ -394,6 +394,9 @@ N_("""Options:
                option are opened in preview mode.
     --editor: Same as --preview but opens in text editor mode.
 
+    --headless <options>: rebuild, export or search without GUI, must be
+               the first option. See "--headless --help" for its options.
+
 """)
 
     def showCmdLineUsage(self, pWiki, addRemark=""):
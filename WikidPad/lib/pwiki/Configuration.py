@@ -631,6 +631,8 @@ GLOBALDEFAULTS = {
 
     ("main", "tree_updateGenerator_minDelay"): "0.1",  # Minimum delay (in secs) between calls to
             # the update generator
+    ("main", "tree_childrenBatchSize"): "200",  # Maximum number of children of a node
+            # added to tree at once, more are added when scrolling to them. 0: no limit
 
 #     ("main", "tree_font_pointSize"): u"",  # Data about tree font. If pointSize is empty, default fonts is used
 #     ("main", "tree_font_family"): u"",  # Data about tree font.
@@ -669,6 +671,10 @@ GLOBALDEFAULTS = {
     ("main", "html_toc_title"): "Table of Contents",  # title of table of contents
     ("main", "html_export_singlePage_sepLineCount"): "10",  # How many empty lines to separate
             # two wiki pages in a single HTML page
+    ("main", "html_export_parallel"): "False",  # Export to a set of HTML pages in worker processes
+            # (see "processPool_workers")?
+    ("main", "html_export_incremental"): "False",  # Export to a set of HTML pages writes only
+            # pages which changed since the last export to the same directory?
     ("main", "html_preview_renderer"): "0",  # 0: Internal wxWidgets; 1: IE; 2: Mozilla; 3: Webkit
     ("main", "html_preview_ieShowIframes"): "False",  # Show iframes with external sources inside IE preview?
     ("main", "html_preview_webkitViKeys"): "False",  # Allow shortcut keys of vi editor to move around in Webkit preview
@@ -861,6 +867,9 @@ GLOBALDEFAULTS = {
             # than base and shift level
     ("main", "zombieCheck"): "True", # Check for already running processes? Only active if "single_process" is True
     ("main", "cpu_affinity"): "-1", # Assign process to a single CPU? -1: Use CPU affinity on startup; greater numbers denote a particular CPU
+    ("main", "processPool_workers"): "0", # Number of worker processes for parallel operations like rebuilding the wiki.
+            # 0: One per CPU; 1: No worker processes at all
+    ("main", "pageAstCache_sizeLimit"): "64", # Maximum size in MiB of the cache file of parsed pages next to each wiki. 0: No cache
 
     ("main", "tempHandling_preferMemory"): "False", # Prefer to store temporary data in memory where this is possible?
     ("main", "tempHandling_tempMode"): "system", # Mode for storing of temporary data.
@@ -897,6 +906,12 @@ WIKIDEFAULTS = {
     ("main", "indexSearch_enabled"): "False", # should the index search be enabled?
     ("main", "indexSearch_formatNo"): "1", # internal: Number of format of search index (only valid if index enabled)
             # if it doesn't match format number of this WikidPad version, index rebuild is needed
+    ("main", "indexSearch_backend"): "whoosh", # Backend of the search index: "whoosh" for a separate whoosh index,
+            # "fts5" for an SQLite FTS5 table in the wiki database (falls back to "whoosh" if not available)
+    ("main", "indexSearch_activeBackend"): "whoosh", # internal: Backend the current search index was built with
+    ("main", "search_trigramIndex"): "False", # Maintain a trigram index of the page content in the database
+            # (if supported) to speed up search without index. Created or removed when rebuilding the wiki.
+            # Older WikidPad versions and sqlite libraries without FTS5 trigram tokenizer can't modify pages then
     ("main", "tabs_maxCharacters"): "0", # Maximum number of characters to show on a tab (0: inifinite)
     ("main", "template_pageNamesRE"): "^template/",  # Regular expression pattern for pages which should be seen as templates
             # Especially they will be listed in text editor context menu on new pages
@@ -965,10 +980,19 @@ WIKIDEFAULTS = {
 
     ("main", "versioning_completeSteps"): "10",  # How many versions before next version is saved completely
             # instead of reverse differential? 0: Always revdiff, 1: Always complete, 2: Every second v. is complete ...
+    ("main", "versioning_maxChainCost"): "2000000",  # Store a version completely if reconstructing the oldest version
+            # of a chain of reverse differentials processes more bytes (chain length * page size). 0: No limit
+    ("main", "versioning_contentCacheSize"): "8",  # Number of reconstructed versions to keep in memory for each page
+    ("main", "versioning_diffEngine"): "lines",  # How to compute the differences between versions? "lines": Fast, based
+            # on unique lines; "difflib": Bytewise by Python's difflib, slightly smaller but very slow for large pages
 
     ("main", "tabHistory_maxEntries"): "25",  # Maximum number of entries in the history for each tab
     ("main", "wikiWideHistory_maxEntries"): "100",  # Maximum number of entries in the wiki-wide history
 
+    ("main", "overviews_compactFormat"): "False",  # Store overviews of versions, trashcan and wiki-wide history
+            # in compact binary format instead of XML. Overviews in XML are read either way, but older versions
+            # of WikidPad can't read the compact format, therefore off by default
+
 
     # For file storage (esp. identity check)
     ("main", "fileStorage_identity_modDateMustMatch"): "False",  # Modification date must match for file to be identical
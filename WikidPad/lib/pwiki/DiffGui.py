@@ -21,16 +21,6 @@ from .SearchableScintillaControl import SearchableScintillaControl
 
 
 
-def bytelenSct(us):
-    """
-    us -- unicode string
-    returns: Number of bytes us requires in Scintilla (with UTF-8 encoding=Unicode)
-    """
-    return len(StringOps.utf8Enc(us)[0])
-
-
-
-
 _WORD_DIVIDER = re.compile(r"(\b[\w']+)",
         re.DOTALL | re.UNICODE | re.MULTILINE)
 
@@ -294,8 +284,7 @@ class InlineDiffControl(SearchableScintillaControl):
         }
 
     def _calcViewStylebytes(self, text):
-        stylebytes = StyleCollector(wx.stc.STC_STYLE_DEFAULT, text,
-                bytelenSct)
+        stylebytes = StyleCollector(wx.stc.STC_STYLE_DEFAULT, text)
                 
         _NODENAME_TO_STYLEBYTE = self._NODENAME_TO_STYLEBYTE
         
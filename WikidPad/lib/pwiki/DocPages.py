@@ -499,6 +499,16 @@ class AbstractWikiPage(DataCarryingPage):
         self.livePageBaseFormatDetails = None   # Cached format details on which the
                 # page-ast bases
 
+        # Last built live page AST and its format details. Unlike
+        # self.livePageAst these are kept when the text changes so that the
+        # next AST can be built by parsing only the changed part
+        self.incrementalBaseAst = None
+        self.incrementalBaseFormatDetails = None
+
+        # liveTextPlaceHold object for which the page content was written to
+        # a transactional search index when saving
+        self.searchIndexBasePlaceHold = None
+
         # List of words unknown to spellchecker
         self.liveSpellCheckerUnknownWords = None
 
@@ -923,6 +933,11 @@ class AbstractWikiPage(DataCarryingPage):
                 formatDetails = self.getFormatDetails()
 
                 pageAst = self.getLivePageAstIfAvailable()
+                prevPageAst = self.incrementalBaseAst
+                if prevPageAst is not None and \
+                        not formatDetails.isEquivTo(
+                        self.incrementalBaseFormatDetails):
+                    prevPageAst = None
 
             if pageAst is not None:
                 return pageAst
@@ -940,8 +955,8 @@ class AbstractWikiPage(DataCarryingPage):
             if len(text) == 0:
                 pageAst = buildSyntaxNode([], 0)
             else:
-                pageAst = self.parseTextInContext(text, formatDetails=formatDetails,
-                        threadstop=threadstop)
+                pageAst = self._parseTextInContextCached(text, formatDetails,
+                        threadstop, prevPageAst=prevPageAst)
 
             with self.textOperationLock:
                 threadstop.testValidThread()
@@ -949,6 +964,8 @@ class AbstractWikiPage(DataCarryingPage):
                 self.livePageAst = pageAst
                 self.livePageBasePlaceHold = liveTextPlaceHold
                 self.livePageBaseFormatDetails = formatDetails
+                self.incrementalBaseAst = pageAst
+                self.incrementalBaseFormatDetails = formatDetails
 
 
         if self.isReadOnlyEffect():
@@ -964,6 +981,28 @@ class AbstractWikiPage(DataCarryingPage):
             return pageAst
 
 
+    def installLivePageAst(self, pageAst, liveTextPlaceHold, formatDetails):
+        """
+        Set a page AST which was created elsewhere (e.g. in a worker process
+        during rebuild) as live page AST. The AST must be based on the live
+        text denoted by  liveTextPlaceHold  and on  formatDetails.
+        Returns True iff the live text hasn't changed meanwhile and the AST
+        was installed.
+        """
+        with self.livePageAstBuildLock:
+            with self.textOperationLock:
+                if liveTextPlaceHold is not self.liveTextPlaceHold:
+                    return False
+
+                self.livePageAst = pageAst
+                self.livePageBasePlaceHold = liveTextPlaceHold
+                self.livePageBaseFormatDetails = formatDetails
+                self.incrementalBaseAst = pageAst
+                self.incrementalBaseFormatDetails = formatDetails
+
+                return True
+
+
     def onModifiedSpellCheckerSession(self, miscevt):
         """
         Invalidate spell checker data when e.g. new words are added to
@@ -1086,6 +1125,71 @@ class AbstractWikiPage(DataCarryingPage):
         return pageAst
 
 
+    def parseTextInContextIncremental(self, text, prevPageAst,
+            formatDetails=None, threadstop=DUMBTHREADSTOP):
+        """
+        Like parseTextInContext() but  prevPageAst  is the AST of a previous
+        version of the text parsed with equivalent format details. If the
+        parser supports it, only the changed part is parsed again.
+        """
+        parser = wx.GetApp().createWikiParser(self.getWikiLanguageName())
+
+        if formatDetails is None:
+            formatDetails = self.getFormatDetails()
+
+        try:
+            parseIncremental = getattr(parser, "parseIncremental", None)
+            if parseIncremental is None:
+                pageAst = parser.parse(self.getWikiLanguageName(), text,
+                        formatDetails, threadstop=threadstop)
+            else:
+                pageAst = parseIncremental(self.getWikiLanguageName(), text,
+                        formatDetails, prevPageAst, threadstop=threadstop)
+        finally:
+            wx.GetApp().freeWikiParser(parser)
+
+        threadstop.testValidThread()
+
+        return pageAst
+
+
+    def _parseTextInContextCached(self, text, formatDetails, threadstop,
+            prevPageAst=None):
+        """
+        Like parseTextInContext() but use the persistent page AST cache of
+        the wiki document if available. Only ASTs of text which is saved
+        are stored in the cache. If not in cache and  prevPageAst  is given,
+        the text is parsed incrementally.
+        """
+        astCache = self.wikiDocument.getPageAstCache()
+        key = None
+        if astCache is not None:
+            try:
+                key = astCache.buildKey(self, text, formatDetails)
+                if key is not None:
+                    pageAst = astCache.getAst(key)
+                    if pageAst is not None:
+                        return pageAst
+            except Exception:
+                traceback.print_exc()
+                key = None
+
+        if prevPageAst is None:
+            pageAst = self.parseTextInContext(text,
+                    formatDetails=formatDetails, threadstop=threadstop)
+        else:
+            pageAst = self.parseTextInContextIncremental(text, prevPageAst,
+                    formatDetails=formatDetails, threadstop=threadstop)
+
+        if key is not None and self.saveDirtySince is None:
+            try:
+                astCache.putAst(key, pageAst)
+            except Exception:
+                traceback.print_exc()
+
+        return pageAst
+
+
     _DEFAULT_PRESENTATION = (0, 0, 0, 0, 0, None)
 
     def getPresentation(self):
@@ -1720,6 +1824,40 @@ class WikiPage(AbstractWikiPage):
             addChildRelationship(t.wikiWord, t.pos)
 
         threadstop.testValidThread()
+
+        langHelper = wx.GetApp().createWikiLanguageHelper(
+                self.getWikiLanguageName())
+
+        # Add resolved targets of page insertions and of attributes with
+        # wiki word values, needed to find references when renaming pages
+        from .AttributeHandling import ATTRIBUTES_WITH_WIKIWORD_VALUES
+
+        references = []
+        referenceSet = set()
+
+        def addReference(value):
+            threadstop.testValidThread()
+            if langHelper.checkForInvalidWikiLink(value,
+                    self.getWikiDocument()):
+                return
+            try:
+                target = langHelper.resolveWikiWordLink(value, self)
+            except ValueError:
+                return
+            if target not in referenceSet:
+                references.append(target)
+                referenceSet.add(target)
+
+        for node in pageAst.iterDeepByName("attribute"):
+            for key, value in node.attrs:
+                if key in ATTRIBUTES_WITH_WIKIWORD_VALUES:
+                    addReference(value)
+
+        for node in pageAst.iterDeepByName("insertion"):
+            if node.key == "page":
+                addReference(node.value)
+
+        threadstop.testValidThread()
         
         # Add aliases to match terms
         matchTerms = []
@@ -1728,9 +1866,6 @@ class WikiPage(AbstractWikiPage):
                 Consts.WIKIWORDMATCHTERMS_TYPE_ASLINK | \
                 Consts.WIKIWORDMATCHTERMS_TYPE_FROM_ATTRIBUTES
 
-        langHelper = wx.GetApp().createWikiLanguageHelper(
-                self.getWikiLanguageName())
-
         for w, k, v in self.getWikiDocument().getAttributeTriples(
                 self.wikiPageName, "alias", None):
             threadstop.testValidThread()
@@ -1770,6 +1905,9 @@ class WikiPage(AbstractWikiPage):
             self.getWikiData().updateChildRelations(self.wikiPageName,
                     childRelations)
             threadstop.testValidThread()
+            self.getWikiData().updateReferences(self.wikiPageName,
+                    references)
+            threadstop.testValidThread()
             self.getWikiData().updateWikiWordMatchTerms(self.wikiPageName,
                     matchTerms)
             threadstop.testValidThread()
@@ -1815,7 +1953,9 @@ class WikiPage(AbstractWikiPage):
 
     def putIntoSearchIndex(self, threadstop=DUMBTHREADSTOP):
         """
-        Add or update the index for the given docPage
+        Add or update the index for the given docPage. The update is
+        queued in the search index updater of the wiki document and written
+        together with other updates.
         """
         with self.textOperationLock:
             threadstop.testValidThread()
@@ -1824,41 +1964,20 @@ class WikiPage(AbstractWikiPage):
                 return True  # Or false?
             
             liveTextPlaceHold = self.liveTextPlaceHold
-            content = self.getLiveText()
-
-        writer = None
-        try:
-            searchIdx = self.getWikiDocument().getSearchIndex()
-            writer = searchIdx.writer(timeout=Consts.DEADBLOCKTIMEOUT)
+            if self.searchIndexBasePlaceHold is liveTextPlaceHold:
+                # Index was already updated when saving
+                self.getWikiData().setMetaDataState(self.wikiPageName,
+                        Consts.WIKIWORDMETADATA_STATE_INDEXED)
+                return True
 
-            unifName = self.getUnifiedPageName()
+            content = self.getLiveText()
 
-            writer.delete_by_term("unifName", unifName)
-            
-            assert isinstance(content, str)
-                                    
-            writer.add_document(unifName=unifName,
-                    modTimestamp=self.getTimestamps()[0],
-                    content=content)
-        except:
-            if writer is not None:
-                writer.cancel()
-            raise
+        assert isinstance(content, str)
 
-        # Check within lock if data is current yet
-        with self.textOperationLock:
-            if self.isInvalid(): 
-                writer.cancel()
-                return True  # Or false?
+        self.getWikiDocument().getSearchIndexUpdater().put(self,
+                liveTextPlaceHold, self.getTimestamps()[0], content)
 
-            if not liveTextPlaceHold is self.liveTextPlaceHold:
-                writer.cancel()
-                return False
-            else:
-                writer.commit()
-                self.getWikiData().setMetaDataState(self.wikiPageName,
-                        Consts.WIKIWORDMETADATA_STATE_INDEXED)
-                return True
+        return True
 
 
     def putIntoSearchIndexExtWriter(self, writer, threadstop=DUMBTHREADSTOP):
@@ -1897,21 +2016,8 @@ class WikiPage(AbstractWikiPage):
         if not self.getWikiDocument().isSearchIndexEnabled() or self.isInvalid():
             return
 
-        unifName = self.getUnifiedPageName()
-        
-        writer = None
-        
-        with self.textOperationLock:
-            try:
-                searchIdx = self.getWikiDocument().getSearchIndex()
-                writer = searchIdx.writer(timeout=Consts.DEADBLOCKTIMEOUT)
-                writer.delete_by_term("unifName", unifName)
-            except:
-                if writer is not None:
-                    writer.cancel()
-                raise
-    
-            writer.commit()
+        self.getWikiDocument().getSearchIndexUpdater().remove(
+                self.getUnifiedPageName())
 
 
     def queueRemoveFromSearchIndex(self):
@@ -2035,6 +2141,35 @@ class WikiPage(AbstractWikiPage):
             # Clear timestamp cache
             self.modified = None
 
+            self._saveIntoTransactionalSearchIndex(text)
+
+
+    def _saveIntoTransactionalSearchIndex(self, text):
+        """
+        If the search index is part of the wiki database, update the index
+        entry in the same transaction as the content. Must be called inside
+        textOperationLock.
+        """
+        wikiDoc = self.getWikiDocument()
+        if not wikiDoc.isSearchIndexEnabled() or \
+                not wikiDoc.isSearchIndexTransactional():
+            return
+
+        unifName = self.getUnifiedPageName()
+        try:
+            self.getWikiData().updateFullTextIndex((unifName,),
+                    ((unifName, self.getTimestamps()[0], text),))
+        except DbAccessError:
+            # Index is updated later by the update executor
+            traceback.print_exc()
+            self.searchIndexBasePlaceHold = None
+            return
+
+        if text == self.getLiveText():
+            self.searchIndexBasePlaceHold = self.liveTextPlaceHold
+        else:
+            self.searchIndexBasePlaceHold = None
+
 
     def getPageReadOnly(self):
         if self.pageReadOnly is None:
@@ -4,12 +4,15 @@
 ## _prof = hotshot.Profile("hotshot.prf")
 
 import traceback, codecs
+from array import array
+from itertools import accumulate
 
 import wx, wx.stc
 
 from .wxHelper import GUI_ID, getTextFromClipboard, WindowUpdateLocker
 
 from . import StringOps
+from .StringOps import utf8Enc
 
 from .SystemInfo import isOSX
 
@@ -23,45 +26,113 @@ def bytelenSct(us):
 
 
 
-class StyleCollector(StringOps.SnippetCollector):
+class SctOffsetTable:
+    """
+    Maps character positions of a unicode string to byte positions in
+    Scintilla (UTF-8). The byte offsets of each BLOCK_SIZE-th character
+    are computed once for the whole text, positions in between are
+    computed from the offset of their block.
+    """
+    BLOCK_SIZE = 64
+
+    def __init__(self, text):
+        self.text = text
+
+        if text.isascii():
+            # Byte and char positions are the same
+            self.blockOffsets = None
+            self.byteLength = len(text)
+        else:
+            blockSize = self.BLOCK_SIZE
+            self.blockOffsets = array("l", accumulate(
+                    (len(utf8Enc(text[i:i + blockSize])[0])
+                    for i in range(0, len(text), blockSize)), initial=0))
+            self.byteLength = self.blockOffsets[-1]
+
+
+    def byteOffset(self, charPos):
+        if self.blockOffsets is None:
+            return charPos
+
+        block, rest = divmod(charPos, self.BLOCK_SIZE)
+        blockOffset = self.blockOffsets[block]
+        if rest == 0 or (self.blockOffsets[block + 1] - blockOffset ==
+                self.BLOCK_SIZE and charPos - rest + self.BLOCK_SIZE <=
+                len(self.text)):
+            # Block contains only ASCII characters
+            return blockOffset + rest
+
+        return blockOffset + len(utf8Enc(self.text[charPos - rest:charPos])[0])
+
+
+    def byteLen(self, charPos, charLength):
+        """
+        Return number of bytes of  charLength  characters starting at charPos
+        """
+        return self.byteOffset(charPos + charLength) - self.byteOffset(charPos)
+
+
+
+def orStyleBytes(styleBytes, maskBytes):
+    """
+    Return bytes with the bitwise or of the bytes of styleBytes and
+    maskBytes which must have the same length.
+    """
+    assert len(styleBytes) == len(maskBytes)
+    return (int.from_bytes(styleBytes, "little") |
+            int.from_bytes(maskBytes, "little")).to_bytes(len(styleBytes),
+            "little")
+
+
+
+class StyleCollector:
     """
     Helps to collect the style bytes needed to set the syntax coloring in
     Scintilla editor component
     """
-    def __init__(self, defaultStyleNo, text, bytelenSct, startCharPos=0):   
-        super(StyleCollector, self).__init__(b"")
+    def __init__(self, defaultStyleNo, text, offsetTable=None,
+            startCharPos=0):
+        """
+        offsetTable -- SctOffsetTable of text or None to create it
+        """
+        if offsetTable is None:
+            offsetTable = SctOffsetTable(text)
+
         self.defaultStyleNo = defaultStyleNo
-        self.text = text
-        self.bytelenSct = bytelenSct
+        self.textLength = len(text)
+        self.offsetTable = offsetTable
+        self.startBytePos = offsetTable.byteOffset(startCharPos)
+        self.styleBytes = bytearray((defaultStyleNo,)) * \
+                (offsetTable.byteLength - self.startBytePos)
         self.charPos = startCharPos
 
 
     def bindStyle(self, targetCharPos, targetLength, styleNo):
         if targetCharPos < 0:
             return
-        
+
+        textLength = self.textLength
+        targetCharPos = min(targetCharPos, textLength)
+        endCharPos = min(targetCharPos + targetLength, textLength)
+        byteOffset = self.offsetTable.byteOffset
+        start = byteOffset(targetCharPos) - self.startBytePos
+
         if targetCharPos < self.charPos:
             # Due to some unknown reason we had overlapping styles and
-            # must remove some bytes
-            bytestylelen = self.bytelenSct(self.text[targetCharPos:self.charPos])
-            self.drop(bytestylelen)
-        else:
-            # There is possibly a gap between end of last style and current one
-            # -> fill it with default style
-            bytestylelen = self.bytelenSct(self.text[self.charPos:targetCharPos])
-            self.append(bytes((self.defaultStyleNo,)) * bytestylelen)
+            # must reset some bytes
+            end = byteOffset(self.charPos) - self.startBytePos
+            self.styleBytes[start:end] = bytes((self.defaultStyleNo,)) * \
+                    (end - start)
 
-        self.charPos = targetCharPos + targetLength
-            
-        bytestylelen = self.bytelenSct(self.text[targetCharPos:self.charPos])
-        self.append(bytes((styleNo,)) * bytestylelen)
+        # A gap between end of last style and current one has already
+        # the default style
+        end = byteOffset(endCharPos) - self.startBytePos
+        self.styleBytes[start:end] = bytes((styleNo,)) * (end - start)
+        self.charPos = endCharPos
 
-    def value(self):
-        if self.charPos < len(self.text):
-            bytestylelen = self.bytelenSct(self.text[self.charPos:len(self.text)])
-            self.append(bytes((self.defaultStyleNo,)) * bytestylelen)
 
-        return super(StyleCollector, self).value()
+    def value(self):
+        return bytes(self.styleBytes)
 
 
 
@@ -0,0 +1,177 @@
+"""
+Manifest stored in the destination directory of an export to a set of HTML
+pages so that a later export into the same directory only writes pages whose
+inputs changed.
+
+For each exported page it records the hash of the page text, the equivalence
+key of the format details, the name of the written file, the referenced
+storage files and what else the HTML depends on (see PageDependencies)
+together with a fingerprint of the state of these dependencies. The exporter
+builds hashes and fingerprint, this module only stores them.
+"""
+
+import os, os.path, struct, traceback
+
+from .StringOps import pathEnc
+from .Serialization import SerializeStream
+
+
+MANIFEST_FILENAME = ".wikidpad_export_manifest"
+
+_MAGIC = b"WPEXPMAN"
+
+# Increase if the file layout changes
+MANIFEST_FORMAT_NO = 1
+
+
+
+class PageDependencies:
+    """
+    Collects what the HTML of an exported page depends on beside its own
+    text and format details while the page is formatted.
+    """
+    __slots__ = ("linkTerms", "includedPages", "files", "listsParents",
+            "volatile")
+
+    def __init__(self):
+        # Link terms for which the target page was looked up
+        self.linkTerms = set()
+        # Names of pages inserted into the page
+        self.includedPages = set()
+        # Paths of local files read while formatting, e.g. for image sizes
+        self.files = set()
+        # True if the parents of the page are listed
+        self.listsParents = False
+        # True if the page depends on something which isn't tracked (e.g.
+        # results of a search insertion), it is then exported each time
+        self.volatile = False
+
+
+    def serializeBin(self, stream):
+        self.linkTerms = set(stream.serArrUniUtf8(sorted(self.linkTerms)))
+        self.includedPages = set(stream.serArrUniUtf8(
+                sorted(self.includedPages)))
+        self.files = set(stream.serArrUniUtf8(sorted(self.files)))
+        self.listsParents = stream.serBool(self.listsParents)
+        self.volatile = stream.serBool(self.volatile)
+
+
+
+class ManifestEntry:
+    """
+    Information about one exported page.
+    """
+    __slots__ = ("fileName", "contentHash", "formatKey", "fingerprint",
+            "dependencies", "storageFiles")
+
+    def __init__(self, fileName="", contentHash=b"", formatKey=b"",
+            fingerprint=b"", dependencies=None, storageFiles=()):
+        """
+        fileName -- Name of the written file without ".html" suffix
+        contentHash -- Hash of page text
+        formatKey -- Hash of equivalence key of format details
+        fingerprint -- Hash of the state of the dependencies
+        dependencies -- PageDependencies object
+        storageFiles -- Sequence of referenced files from file storage,
+                relative to wiki directory
+        """
+        self.fileName = fileName
+        self.contentHash = contentHash
+        self.formatKey = formatKey
+        self.fingerprint = fingerprint
+        if dependencies is None:
+            dependencies = PageDependencies()
+        self.dependencies = dependencies
+        self.storageFiles = list(storageFiles)
+
+
+    def serializeBin(self, stream):
+        self.fileName = stream.serUniUtf8(self.fileName)
+        self.contentHash = stream.serByteBlock(self.contentHash)
+        self.formatKey = stream.serByteBlock(self.formatKey)
+        self.fingerprint = stream.serByteBlock(self.fingerprint)
+        self.dependencies.serializeBin(stream)
+        self.storageFiles = stream.serArrUniUtf8(self.storageFiles)
+
+
+
+class ExportManifest:
+    """
+    The manifest of an export directory. If the key of the export options
+    of a new export differs from the stored one, no page can be kept.
+    """
+    def __init__(self, optionsKey=b""):
+        self.optionsKey = optionsKey
+        self.entries = {}   # {wikiWord: ManifestEntry}
+
+
+    def getEntry(self, wikiWord):
+        return self.entries.get(wikiWord)
+
+
+    def setEntry(self, wikiWord, entry):
+        self.entries[wikiWord] = entry
+
+
+    def getFileNames(self):
+        """
+        Return set of names (without suffix) of all written files.
+        """
+        return set(entry.fileName for entry in self.entries.values())
+
+
+    def serializeBin(self, stream):
+        magic = stream.serByteBlock(_MAGIC)
+        formatNo = stream.serUint32(MANIFEST_FORMAT_NO)
+        if magic != _MAGIC or formatNo != MANIFEST_FORMAT_NO:
+            raise ValueError("Unknown export manifest format")
+
+        self.optionsKey = stream.serByteBlock(self.optionsKey)
+        count = stream.serUint32(len(self.entries))
+
+        if stream.isReadMode():
+            self.entries = {}
+            for i in range(count):
+                wikiWord = stream.serUniUtf8("")
+                entry = ManifestEntry()
+                entry.serializeBin(stream)
+                self.entries[wikiWord] = entry
+        else:
+            for wikiWord in sorted(self.entries):
+                stream.serUniUtf8(wikiWord)
+                self.entries[wikiWord].serializeBin(stream)
+
+
+    @staticmethod
+    def readFromDir(exportDest):
+        """
+        Return manifest stored in directory exportDest. An empty manifest is
+        returned if there is none or it is unreadable.
+        """
+        manifest = ExportManifest()
+        path = os.path.join(exportDest, MANIFEST_FILENAME)
+        if not os.path.exists(pathEnc(path)):
+            return manifest
+
+        try:
+            with open(pathEnc(path), "rb") as f:
+                manifest.serializeBin(SerializeStream(fileObj=f,
+                        readMode=True))
+        except (IOError, OSError, struct.error, ValueError):
+            traceback.print_exc()
+            return ExportManifest()
+
+        return manifest
+
+
+    def writeToDir(self, exportDest):
+        """
+        Store manifest in directory exportDest.
+        """
+        path = os.path.join(exportDest, MANIFEST_FILENAME)
+        tempPath = path + ".tmp"
+
+        with open(pathEnc(tempPath), "wb") as f:
+            self.serializeBin(SerializeStream(fileObj=f, readMode=False))
+
+        os.replace(pathEnc(tempPath), pathEnc(path))
@@ -494,7 +494,11 @@ class MultiPageTextWikiPageWriter:
         self.formatVer = formatVer
 
 
-    def _writeHintedDatablock(self, unifName, useB64):
+    def _writeHintedDatablock(self, unifName, useB64, content=None):
+        """
+        content -- If not None, text to write instead of the text content
+                of the datablock (only if useB64 is False)
+        """
         sh = self.wikiDocument.guessDataBlockStoreHint(unifName)
         if sh == Consts.DATABLOCK_STOREHINT_EXTERN:
             shText = "extern"
@@ -509,7 +513,8 @@ class MultiPageTextWikiPageWriter:
                     shText)
             self.exportFile.write(base64BlockEncode(datablock))
         else:
-            content = self.wikiDocument.retrieveDataBlockAsText(unifName)
+            if content is None:
+                content = self.wikiDocument.retrieveDataBlockAsText(unifName)
 
             self.exportFile.write("important/encoding/text  storeHint/%s\n" %
                     shText)
@@ -543,8 +548,10 @@ class MultiPageTextWikiPageWriter:
             if verOvw is not None and not verOvw.isNotInDatabase():
                 unifName = verOvw.getUnifiedName()
 
+                # Overview always as XML, even if stored in compact format
                 self.exportFile.writeSeparator()
-                self._writeHintedDatablock(unifName, False)
+                self._writeHintedDatablock(unifName, False,
+                        verOvw.getOverviewAsXml())
 
                 for unifName in verOvw.getDependentDataBlocks(
                         omitSelf=True):
@@ -680,6 +687,7 @@ class MultiPageTextExporter(AbstractExporter):
             fileVersion = 1
             writeWikiFuncPages = 1
             writeSavedSearches = 1            
+            writeVersionData = 1
         else:
             ctrls = addoptpanel.ctrls
             fileVersion = ctrls.chFileVersion.GetSelection()
@@ -904,7 +912,11 @@ class MultiPageTextExporter(AbstractExporter):
 
             if cl == 0:
                 return
-            
+
+            if Serialization.isCompactOverview(datablock):
+                # Binary even if the XML format would be text
+                cl = (cl & ~3) | 2
+
             if cl & 8 == 8:
                 unifName = "funcpage/" + unifName
             
@@ -0,0 +1,593 @@
+"""
+Headless application to rebuild, export and search a wiki from the command
+line without creating a main window, e.g. for nightly jobs on a build server.
+
+Started by "WikidPad --headless <options>", see HeadlessAction.USAGE.
+"""
+
+import sys, os, os.path, time, getopt, traceback
+
+import wx
+
+import Consts
+from .MiscEvent import MiscEventSourceMixin
+
+from .WikiExceptions import *
+from . import Configuration, Localization, PluginManager
+from .StringOps import mbcsDec
+
+from .MainApp import App
+
+
+
+class HeadlessIconCache:
+    """
+    Icon cache which only knows the paths of the icons. Bitmaps can't be
+    created without GUI.
+    """
+    def __init__(self, iconDir):
+        self.iconDir = iconDir
+        self.iconLookupCache = dict(
+                (fn[:-4], (-1, os.path.join(iconDir, fn), None))
+                for fn in os.listdir(iconDir) if fn.endswith(".gif"))
+
+    def lookupIcon(self, iconname):
+        return None
+
+    def lookupIconIndex(self, iconname):
+        return -1
+
+    def lookupIconPath(self, iconname):
+        try:
+            return self.iconLookupCache[iconname][1]
+        except KeyError:
+            return None
+
+
+
+class HeadlessApp(wx.AppConsole, MiscEventSourceMixin):
+    """
+    Provides the application services needed by WikiDocument, wiki language
+    and exporter plugins. Neither a display nor the main loop is needed.
+    """
+    # Services shared with the GUI application
+    initGlobalConfig = App.initGlobalConfig
+    reloadPlugins = App.reloadPlugins
+    updateCollator = App.updateCollator
+    createDefaultGlobalConfig = App.createDefaultGlobalConfig
+
+    getWikiLanguageDescription = App.getWikiLanguageDescription
+    listWikiLanguageDescriptions = App.listWikiLanguageDescriptions
+    getModifyMenuDispatcher = App.getModifyMenuDispatcher
+    getProvideMenuItemDispatcher = App.getProvideMenuItemDispatcher
+    createWikiParser = App.createWikiParser
+    freeWikiParser = App.freeWikiParser
+    getUserDefaultWikiLanguage = App.getUserDefaultWikiLanguage
+    createWikiLanguageHelper = App.createWikiLanguageHelper
+    freeWikiLanguageHelper = App.freeWikiLanguageHelper
+    pauseBackgroundThreads = App.pauseBackgroundThreads
+    resumeBackgroundThreads = App.resumeBackgroundThreads
+    describeExporters = App.describeExporters
+    describePrints = App.describePrints
+
+    getGlobalConfigSubDir = App.getGlobalConfigSubDir
+    getGlobalConfigDir = App.getGlobalConfigDir
+    getGlobalConfig = App.getGlobalConfig
+    getWikiAppDir = App.getWikiAppDir
+    isInPortableMode = App.isInPortableMode
+    getIconCache = App.getIconCache
+    getCollator = App.getCollator
+    getInsertionPluginManager = App.getInsertionPluginManager
+    getPageSearchHistory = App.getPageSearchHistory
+    setPageSearchHistory = App.setPageSearchHistory
+    getWikiSearchHistory = App.getWikiSearchHistory
+    setWikiSearchHistory = App.setWikiSearchHistory
+    createGlobalConfiguration = App.createGlobalConfiguration
+    createWikiConfiguration = App.createWikiConfiguration
+    createCombinedConfiguration = App.createCombinedConfiguration
+    getDefaultGlobalConfigDict = App.getDefaultGlobalConfigDict
+    getDefaultWikiConfigDict = App.getDefaultWikiConfigDict
+    getWikiConfigFallthroughDict = App.getWikiConfigFallthroughDict
+
+    def __init__(self):
+        MiscEventSourceMixin.__init__(self)
+        wx.AppConsole.__init__(self)
+        self.SetAppName("WikidPad")
+
+        self.sqliteInitFlag = False   # Read and modified only by WikiData classes
+        Localization.setLocale("C")
+        self.initGlobalConfig()
+
+        Localization.loadLangList(self.wikiAppDir)
+        Localization.loadI18nDict(self.wikiAppDir, self.globalConfig.get(
+                "main", "gui_language", ""))
+
+        self.iconCache = HeadlessIconCache(os.path.join(self.wikiAppDir,
+                "icons"))
+        self.reloadPlugins()
+        self.collator = None
+        self.updateCollator()
+
+
+    def getMainFrameSet(self):
+        return frozenset()
+
+    def findFrameByWikiConfigPath(self, wikiConfigPath):
+        return None
+
+    # Plugins may register options panels, but there is no options dialog
+
+    def getOptionsDlgPanelList(self):
+        return []
+
+    def addGlobalPluginOptionsDlgPanel(self, factory, title):
+        pass
+
+    def addOptionsDlgPanel(self, factory, title):
+        pass
+
+    def addWikiWikiLangOptionsDlgPanel(self, factory, title):
+        pass
+
+    def addWikiPluginOptionsDlgPanel(self, factory, title):
+        pass
+
+
+
+class HeadlessConfiguration(Configuration.CombinedConfiguration):
+    """
+    Combined configuration which ignores settings making no sense
+    without GUI.
+    """
+    OVERRIDES = {
+            ("main", "start_browser_after_export"): "False",
+            # Eval insertions get the main control as "pwiki" and expect
+            # the GUI, they also shouldn't run unattended
+            ("main", "insertions_allow_eval"): "False",
+        }
+
+    def __init__(self, globalconfig, wikiconfig, overrides=None):
+        Configuration.CombinedConfiguration.__init__(self, globalconfig,
+                wikiconfig)
+        self.overrides = dict(self.OVERRIDES)
+        if overrides is not None:
+            self.overrides.update(overrides)
+
+    def get(self, section, option, default=None):
+        result = self.overrides.get((section, option))
+        if result is not None:
+            return result
+
+        return Configuration.CombinedConfiguration.get(self, section, option,
+                default)
+
+
+
+class HeadlessMainControl:
+    """
+    Stands in for the PersonalWikiFrame where exporters expect a mainControl.
+    """
+    def __init__(self, app, wikiDocument, jobs=None, incremental=False):
+        """
+        jobs -- Number of worker processes for exporting or None to use
+                the configuration
+        incremental -- Export to a set of HTML pages only writes pages
+                which changed since the last export
+        """
+        self.wikiAppDir = app.getWikiAppDir()
+        self.wikiDocument = wikiDocument
+        self.wikiName = wikiDocument.getWikiName()
+
+        overrides = {}
+        if jobs is not None:
+            overrides[("main", "processPool_workers")] = str(jobs)
+            overrides[("main", "html_export_parallel")] = "True"
+        if incremental:
+            overrides[("main", "html_export_incremental")] = "True"
+
+        self.configuration = HeadlessConfiguration(app.getGlobalConfig(),
+                wikiDocument.getWikiConfig(), overrides)
+
+    def getConfig(self):
+        return self.configuration
+
+    def getWikiConfig(self):
+        return self.wikiDocument.getWikiConfig()
+
+    def getWikiConfigPath(self):
+        return self.wikiDocument.getWikiConfigPath()
+
+    def getWikiDocument(self):
+        return self.wikiDocument
+
+    def getWikiData(self):
+        return self.wikiDocument.getWikiData()
+
+    def getCollator(self):
+        return wx.GetApp().getCollator()
+
+    def isReadOnlyWiki(self):
+        return self.wikiDocument.isReadOnlyEffect()
+
+
+
+class StdoutProgressHandler:
+    """
+    Implementation of a GuiProgressListener writing the progress
+    to stdout. Updates are written at most every  interval  seconds.
+    """
+    def __init__(self, title, out=None, interval=1.0):
+        self.title = title
+        self.msg = ""
+        self.out = out if out is not None else sys.stdout
+        self.interval = interval
+        self.sum = 0
+        self.lastWrite = 0
+
+    def setTitle(self, title):
+        self.title = title
+
+    def setMessage(self, msg):
+        self.msg = msg
+
+    def _write(self, step):
+        self.out.write("%s: %i/%i %s\n" % (self.title, step, self.sum,
+                self.msg))
+        self.out.flush()
+        self.lastWrite = time.time()
+
+    def open(self, sum):
+        self.sum = sum
+        self._write(0)
+
+    def update(self, step, msg):
+        self.msg = msg
+        if step >= self.sum or time.time() - self.lastWrite >= self.interval:
+            self._write(step)
+
+        return True
+
+    def close(self):
+        pass
+
+
+
+class HeadlessAction:
+    """
+    Parses the command line of the headless application and performs
+    the actions on the wiki
+    """
+    SEARCH_TYPES = {
+            "regex": Consts.SEARCHTYPE_REGEX,
+            "boolean": Consts.SEARCHTYPE_BOOLEANREGEX,
+            "asis": Consts.SEARCHTYPE_ASIS,
+            "index": Consts.SEARCHTYPE_INDEX,
+        }
+
+    def __init__(self, sargs):
+        """
+        sargs -- stripped args (without "--headless")
+        """
+        self.wikiToOpen = None
+        self.wikiWordsToOpen = []
+        self.showHelp = False
+        self.cmdLineError = None
+        self.rebuild = False
+        self.updateExt = False
+        self.exportWhat = None
+        self.exportType = None
+        self.exportDest = None
+        self.exportCompFn = False
+        self.exportIncremental = False
+        self.searches = []
+        self.searchType = "boolean"
+        self.caseSensitive = False
+        self.wholeWord = False
+        self.jobs = None   # None means global option "processPool_workers"
+        self.ignoreLock = False
+
+        try:
+            opts, rargs = getopt.getopt(sargs, "hw:p:s:j:",
+                    ["help", "wiki=", "page=", "rebuild", "update-ext",
+                    "export-what=", "export-type=", "export-dest=",
+                    "export-compfn", "export-incremental", "search=",
+                    "search-type=",
+                    "case-sensitive", "whole-word", "jobs=", "ignore-lock"])
+        except getopt.GetoptError as e:
+            self.cmdLineError = str(e)
+            return
+
+        for o, a in opts:
+            a = mbcsDec(a, "replace")[0]
+            if o in ("-h", "--help"):
+                self.showHelp = True
+            elif o in ("-w", "--wiki"):
+                self.wikiToOpen = a
+            elif o in ("-p", "--page"):
+                self.wikiWordsToOpen.append(a)
+            elif o == "--rebuild":
+                self.rebuild = True
+            elif o == "--update-ext":
+                self.updateExt = True
+            elif o == "--export-what":
+                self.exportWhat = a
+            elif o == "--export-type":
+                self.exportType = a
+            elif o == "--export-dest":
+                self.exportDest = a
+            elif o == "--export-compfn":
+                self.exportCompFn = True
+            elif o == "--export-incremental":
+                self.exportIncremental = True
+            elif o in ("-s", "--search"):
+                self.searches.append(a)
+            elif o == "--search-type":
+                self.searchType = a
+            elif o == "--case-sensitive":
+                self.caseSensitive = True
+            elif o == "--whole-word":
+                self.wholeWord = True
+            elif o in ("-j", "--jobs"):
+                try:
+                    self.jobs = int(a)
+                except ValueError:
+                    self.cmdLineError = _("Value for --jobs must be a number.")
+            elif o == "--ignore-lock":
+                self.ignoreLock = True
+
+        if self.cmdLineError or self.showHelp:
+            return
+
+        if rargs:
+            self.cmdLineError = _("Unexpected arguments: %s") % " ".join(rargs)
+        elif not self.wikiToOpen:
+            self.cmdLineError = _("The wiki must be given with --wiki.")
+        elif self.searchType not in self.SEARCH_TYPES:
+            self.cmdLineError = _("Value for --search-type can be 'regex', "
+                    "'boolean', 'asis' or 'index'.")
+        elif (self.exportWhat or self.exportType or self.exportDest) and \
+                not (self.exportWhat and self.exportType and self.exportDest):
+            self.cmdLineError = _("To export, all three export options "
+                    "('what', 'type' and 'dest') must be set.")
+        elif self.exportWhat not in (None, "page", "word", "subtree", "wiki"):
+            self.cmdLineError = _("Value for --export-what can be 'page', "
+                    "'subtree' or 'wiki'.")
+        elif self.exportWhat in ("page", "word", "subtree") and \
+                not self.wikiWordsToOpen:
+            self.cmdLineError = _("Export of pages or subtrees needs "
+                    "--page.")
+
+
+    def openWiki(self, app):
+        """
+        Open and connect the WikiDocument. Returns the document or None
+        if it can't be used
+        """
+        from . import WikiDocument
+
+        ignoreLock = self.ignoreLock or app.getGlobalConfig().getboolean(
+                "main", "wikiLockFile_ignore", False)
+        createLock = app.getGlobalConfig().getboolean("main",
+                "wikiLockFile_create", True)
+
+        try:
+            cfgPath, wikiWord = WikiDocument.splitConfigPathAndWord(
+                    self.wikiToOpen)
+            if cfgPath is None:
+                sys.stderr.write(_("Wiki '%s' not found\n") %
+                        self.wikiToOpen)
+                return None
+
+            wikiDocument = WikiDocument.openWikiDocument(cfgPath, None, None,
+                    ignoreLock, createLock)
+        except LockedWikiException:
+            sys.stderr.write(_("Wiki '%s' is probably in use by different "
+                    "instance of WikidPad, use --ignore-lock to open "
+                    "anyway\n") % cfgPath)
+            return None
+        except (BadConfigurationFileException,
+                MissingConfigurationFileException, UnknownDbHandlerException,
+                DbHandlerNotAvailableException,
+                UnknownWikiLanguageException) as e:
+            sys.stderr.write(_("Error opening wiki '%s': %s\n") %
+                    (self.wikiToOpen, str(e)))
+            return None
+
+        frmcode, frmtext = wikiDocument.checkDatabaseFormat()
+        if frmcode != 0:
+            wikiDocument.release()
+            if frmcode == 1:
+                sys.stderr.write(_("The wiki needs an update to work with "
+                        "this version of WikidPad, open it once in the GUI "
+                        "first\n"))
+            else:
+                sys.stderr.write(_("Error connecting to database in '%s': "
+                        "%s\n") % (cfgPath, frmtext))
+            return None
+
+        wikiDocument.connect()
+        return wikiDocument
+
+
+    def waitForUpdates(self, wikiDocument):
+        """
+        Wait until the update executor has processed all queued jobs
+        (e.g. after updating externally modified files).
+        """
+        executor = wikiDocument.getUpdateExecutor()
+        lastWrite = 0
+        while True:
+            count = executor.getJobCount()
+            if count == 0:
+                break
+            if time.time() - lastWrite >= 1.0:
+                print(_("Updating: %i jobs left") % count)
+                sys.stdout.flush()
+                lastWrite = time.time()
+            time.sleep(0.1)
+
+        executor.end(hardEnd=False)
+
+
+    def searchAction(self, wikiDocument):
+        from .SearchAndReplace import SearchReplaceOperation, \
+                stripSearchString
+
+        searchType = self.SEARCH_TYPES[self.searchType]
+        for searchStr in self.searches:
+            sarOp = SearchReplaceOperation()
+            sarOp.searchStr = stripSearchString(searchStr)
+            sarOp.booleanOp = searchType == Consts.SEARCHTYPE_BOOLEANREGEX
+            sarOp.indexSearch = 'no' if searchType != Consts.SEARCHTYPE_INDEX \
+                    else 'default'
+            sarOp.caseSensitive = self.caseSensitive
+            sarOp.wholeWord = self.wholeWord
+            sarOp.cycleToStart = False
+            sarOp.wildCard = 'regex' if searchType != Consts.SEARCHTYPE_ASIS \
+                    else 'no'
+            sarOp.wikiWide = True
+
+            startTime = time.time()
+            result = wikiDocument.searchWiki(sarOp)
+            print(_("Search '%s': %i pages (%.2f s)") % (searchStr,
+                    len(result), time.time() - startTime))
+            for wikiWord in result:
+                print("    " + wikiWord)
+            sys.stdout.flush()
+
+
+    def exportAction(self, mainControl):
+        wikiDocument = mainControl.getWikiDocument()
+
+        if self.exportWhat in ("page", "word"):
+            wordList = list(self.wikiWordsToOpen)
+        elif self.exportWhat == "subtree":
+            wordList = wikiDocument.getWikiData().getAllSubWords(
+                    list(self.wikiWordsToOpen))
+        else:
+            wordList = wikiDocument.getWikiData().getAllDefinedWikiPageNames()
+
+        exporter = None
+        exportTypes = PluginManager.getSupportedExportTypes(mainControl, None)
+        for obtp in exportTypes.values():
+            if obtp[1] == self.exportType:
+                exporter = obtp[0]
+                break
+
+        if exporter is None:
+            typeList = [obtp[1] for obtp in exportTypes.values()]
+            mainControl.getCollator().sort(typeList)
+            sys.stderr.write(_("Value for --export-type can be one of:\n%s\n")
+                    % ", ".join(typeList))
+            return False
+
+        startTime = time.time()
+        exporter.export(wikiDocument, wordList, self.exportType,
+                self.exportDest, self.exportCompFn, exporter.getAddOpt(None),
+                StdoutProgressHandler(_("Exporting")))
+        print(_("Exported %i pages (%.2f s)") % (len(wordList),
+                time.time() - startTime))
+
+        return True
+
+
+    def run(self, app):
+        """
+        Perform the actions, returns the exit code.
+        """
+        startTime = time.time()
+        wikiDocument = self.openWiki(app)
+        if wikiDocument is None:
+            return 1
+
+        print(_("Opened wiki '%s' (%.2f s)") % (wikiDocument.getWikiName(),
+                time.time() - startTime))
+        sys.stdout.flush()
+
+        try:
+            if (self.rebuild or self.updateExt) and \
+                    wikiDocument.isReadOnlyEffect():
+                sys.stderr.write(_("Wiki is read-only, can't rebuild or "
+                        "update\n"))
+                return 1
+
+            if self.rebuild:
+                startTime = time.time()
+                wikiDocument.rebuildWiki(
+                        StdoutProgressHandler(_("Rebuilding wiki")),
+                        onlyDirty=False, jobs=self.jobs)
+                print(_("Rebuilt wiki (%.2f s)") % (time.time() - startTime))
+            elif self.updateExt:
+                wikiDocument.initiateExtWikiFileUpdate()
+                self.waitForUpdates(wikiDocument)
+                print(_("Updated externally modified files"))
+
+            if self.searches:
+                self.searchAction(wikiDocument)
+
+            if self.exportWhat:
+                if not self.exportAction(HeadlessMainControl(app,
+                        wikiDocument, self.jobs, self.exportIncremental)):
+                    return 2
+
+            self.waitForUpdates(wikiDocument)
+            return 0
+        except (IOError, OSError, DbAccessError, ExportException) as e:
+            traceback.print_exc()
+            sys.stderr.write(str(e) + "\n")
+            return 1
+        finally:
+            wikiDocument.release()
+
+
+    USAGE = \
+N_("""Usage: WikidPad --headless --wiki <wiki path> [options]
+
+Options:
+
+    -h, --help: Show this message
+    -w, --wiki <wiki path>: the wiki to work on
+    -p, --page <page name>: page to export (can be given multiple times)
+    --rebuild: rebuild the Wiki database
+    --update-ext: update externally modified wiki files
+    --export-what <what>: choose if you want to export page, subtree or wiki
+    --export-type <type>: tag of the export type
+    --export-dest <destination path>: path of destination directory for export
+    --export-compfn: Use compatible filenames on export
+    --export-incremental: export to a set of HTML pages writes only pages
+               which changed since the last export to the same destination
+    -s, --search <search string>: print pages matching the search
+               (can be given multiple times)
+    --search-type <type>: 'regex', 'boolean' (default), 'asis' or 'index'
+    --case-sensitive: search case sensitive
+    --whole-word: search whole words only
+    -j, --jobs <number>: number of worker processes for parallel stages,
+               default is the option "processPool_workers". Also switches
+               on parallel export to a set of HTML pages
+    --ignore-lock: open wiki even if it is in use by another instance
+
+""")
+
+    def showCmdLineUsage(self, addRemark=""):
+        sys.stderr.write(addRemark + _(self.USAGE))
+
+
+
+def main(sargs):
+    """
+    Run the headless application, returns the exit code.
+    sargs -- command line arguments after "--headless"
+    """
+    action = HeadlessAction(sargs)
+    if action.showHelp:
+        action.showCmdLineUsage()
+        return 0
+    if action.cmdLineError:
+        action.showCmdLineUsage(action.cmdLineError + "\n\n")
+        return 2
+
+    app = HeadlessApp()
+    try:
+        return action.run(app)
+    finally:
+        app.getInsertionPluginManager().taskEnd()
@@ -7,7 +7,7 @@ from . import urllib_red as urllib
 
 import wx, wx.xrc
 
-from .wxHelper import XrcControls
+from .wxHelper import XrcControls, ProgressHandler
 
 
 import Consts
@@ -224,8 +224,6 @@ class MultiPageTextImporter:
                             _("Bad file format, header not detected"))
 
                 self.separator = line[11:]
-                
-                startPos = self.importFile.tell()
 
                 if self.formatVer == 0:
                     self._doImportVer0()
@@ -240,6 +238,7 @@ class MultiPageTextImporter:
                         self.tempDb.execSql("create table entries("
                                 "unifName text primary key not null, "   # Unified name in import file
                                 "seen integer not null default 0, "   # data really exists
+                                "filePos integer not null default 0, "   # position of tag line in import file
                                 "dontImport integer not null default 0, "   # don't import this (set between pass 1 and 2)
                                 "missingDep integer not null default 0, "  # missing dependency(ies)
                                 "importVersionData integer not null default 0, "  # versioning data present
@@ -290,11 +289,11 @@ class MultiPageTextImporter:
                         self._propagateRenames()
                         # TODO: Remove version data without ver. overview or main data
 
-                        # Back to start of import file and import according to settings 
-                        # in temp db
-                        self.importFile.seek(startPos)
+                        # Import according to settings in temp db, entries are
+                        # read directly from their positions in import file
                         self._doImportVer1Pass2()
-                        
+                        self._updateImportedWikiPages()
+
                         return True
                     finally:
                         self.tempDb.close()
@@ -489,6 +488,7 @@ class MultiPageTextImporter:
 
     def _doImportVer1Pass1(self):
         while True:
+            filePos = self.importFile.tell()
             tag = self.importFile.readline()
             if tag == "":
                 # End of file
@@ -511,8 +511,8 @@ class MultiPageTextImporter:
                 self._skipContent()
                 continue
 
-            self.tempDb.execSql("insert or replace into entries(unifName, seen) "
-                    "values (?, 1)", (tag,))
+            self.tempDb.execSql("insert or replace into entries(unifName, seen, "
+                    "filePos) values (?, 1, ?)", (tag, filePos))
 
 
     def _readHintedDatablockVer1(self):
@@ -573,8 +573,9 @@ class MultiPageTextImporter:
         if content is None:
             return
 
-        # Always encode to UTF-8 no matter what the import file encoding is
-        content = content.encode("utf-8")
+        if isinstance(content, str):
+            # Always encode to UTF-8 no matter what the import file encoding is
+            content = content.encode("utf-8")
 
         try:
             ovw = Versioning.VersionOverview(self.wikiDocument,
@@ -654,28 +655,15 @@ class MultiPageTextImporter:
                 versionOverview.delete()
 
 
-        while True:
-            tag = self.importFile.readline()
-            if tag == "":
-                # End of file
-                break
-            tag = tag[:-1]  # Remove line end
-            
-            try:
-                dontImport, renameImportTo = \
-                        self.tempDb.execSqlQuery(
-                        "select dontImport, renameImportTo from "
-                        "entries where unifName = ?", (tag,))[0]
-            except IndexError:
-                # Maybe dangerous
-                traceback.print_exc()
-                self._skipContent()
-                continue
+        self.importedWikiWords = []
+
+        # Entries not to import are never read again
+        for tag, renameImportTo, filePos in self.tempDb.execSqlQuery(
+                "select unifName, renameImportTo, filePos from entries "
+                "where seen and not dontImport order by filePos"):
+            self.importFile.seek(filePos)
+            self.importFile.readline()  # Skip tag line
 
-            if dontImport:
-                self._skipContent()
-                continue
-            
             if renameImportTo == "":
                 renameImportTo = tag
 
@@ -689,11 +677,9 @@ class MultiPageTextImporter:
                 self._importHintedDatablockVer1Pass2(renameImportTo)
             elif tag.startswith("versioning/"):
                 self._importHintedDatablockVer1Pass2(renameImportTo)
-            else:
-                # Unknown tag -> Ignore until separator
-                self._skipContent()
 
-        
+        self.wikiDocument.getWikiData().commit()
+
         for wikiWord in self.tempDb.execSqlQuerySingleColumn(
                 """
                 select substr(unifName, 10)
@@ -743,14 +729,31 @@ class MultiPageTextImporter:
             return  # TODO Report error
 
         content = self._collectContent()
-        page = self.wikiDocument.getWikiPageNoError(wikiWord)
 
         # TODO How to handle versions here?
-        page.replaceLiveText(content)
-        if page.getTxtEditor() is not None:
-            page.writeToDatabase()
+        self.wikiDocument.writeImportedWikiPage(wikiWord, content, timeStamps)
+
+        self.importedWikiWords.append(wikiWord)
+        if len(self.importedWikiWords) % \
+                Consts.BULKUPDATE_COMMIT_PAGECOUNT == 0:
+            self.wikiDocument.getWikiData().commit()
+
+
+    def _updateImportedWikiPages(self):
+        """
+        Update meta-data of the wiki pages written in pass 2. Larger imports
+        are rebuilt at once in foreground, otherwise the pages are queued
+        for the update thread.
+        """
+        if len(self.importedWikiWords) < Consts.IMPORT_REBUILD_MIN_PAGECOUNT:
+            self.wikiDocument.pushDirtyMetaDataUpdate()
+            return
 
-        page.setTimestamps(timeStamps)
+        progresshandler = ProgressHandler(
+                _("     Updating imported pages     "),
+                _("     Updating imported pages     "), 0, self.mainControl)
+        self.wikiDocument.rebuildWiki(progresshandler, onlyDirty=True,
+                wikiWords=self.importedWikiWords)
 
 
 
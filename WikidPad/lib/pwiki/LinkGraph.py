@@ -0,0 +1,377 @@
+"""
+In-memory graph of the links between wiki pages, used by the WikiData
+implementations to answer structural queries (parents, children, paths,
+parentless and undefined words) without database round trips.
+
+Each name (page name, link target or match term) is mapped to an integer id.
+Children and parents of a node are stored as arrays of ids. The graph
+mirrors the tables "wikirelations" and "wikiwordmatchterms" (only terms
+of type ASLINK) and the set of defined pages, the WikiData keeps it in sync
+when writing these tables.
+"""
+
+from array import array
+from collections import deque
+
+import Consts
+
+
+# Query to load all relations with one row per word which is much faster
+# than one row per relation. Use iterRelations() to split the rows.
+GROUPED_RELATIONS_SQL = ("select word, group_concat(relation, char(0)), "
+        "group_concat(ifnull(firstcharpos, -1)) from wikirelations "
+        "group by word")
+
+
+def iterRelations(groupedRows):
+    """
+    Return iterator of tuples (word, relation, firstcharpos) for the rows
+    returned by GROUPED_RELATIONS_SQL.
+    """
+    for word, relations, positions in groupedRows:
+        for relation, pos in zip(relations.split("\0"), positions.split(",")):
+            yield (word, relation, int(pos))
+
+
+
+class LinkGraph:
+    def __init__(self, relations=(), definedWords=(), matchTerms=()):
+        """
+        relations -- Sequence of tuples (word, relation, firstcharpos)
+        definedWords -- Sequence of the names of all defined pages
+        matchTerms -- Sequence of tuples (matchterm, type, word) of match terms
+                of type ASLINK
+        """
+        self.ids = {}
+        self.names = []
+        self.children = []   # Per id: array of child ids
+        self.childPositions = []  # Per id: array of firstcharpos of children
+        self.parents = []    # Per id: array of parent ids
+        self.defined = set()  # Ids of defined pages
+
+        # Dictionary {(word id, syncUpdate): array of term ids}
+        self.matchTerms = {}
+        # Dictionary {term id: list of ids of words using this term}
+        self.termOwners = {}
+
+        # Incremented on each modification
+        self.version = 0
+        # Dictionary {query name: (version, result)}
+        self.queryCache = {}
+
+        for word in definedWords:
+            self.defined.add(self._getId(word))
+
+        grouped = {}
+        for matchterm, typ, word in matchTerms:
+            grouped.setdefault((word, bool(typ &
+                    Consts.WIKIWORDMATCHTERMS_TYPE_SYNCUPDATE)), []).append(
+                    matchterm)
+
+        for (word, syncUpdate), terms in grouped.items():
+            self.setMatchTerms(word, syncUpdate, terms)
+
+        grouped = {}
+        for word, relation, firstcharpos in relations:
+            grouped.setdefault(word, []).append((relation, firstcharpos))
+
+        for word, childRelations in grouped.items():
+            self.setChildren(word, childRelations)
+
+
+    def _getId(self, name):
+        """
+        Return id for name, create a new one if necessary.
+        """
+        result = self.ids.get(name)
+        if result is None:
+            result = len(self.names)
+            self.ids[name] = result
+            self.names.append(name)
+            self.children.append(array("l"))
+            self.childPositions.append(array("l"))
+            self.parents.append(array("l"))
+
+        return result
+
+
+    def _modified(self):
+        self.version += 1
+
+
+    # ---------- Modification ----------
+
+    def setChildren(self, word, childRelations):
+        """
+        Replace the children of  word.
+        childRelations -- Sequence of tuples (relation, firstcharpos)
+        """
+        wordId = self._getId(word)
+        self._removeChildren(wordId)
+
+        # Like the database a relation is unique, last position wins
+        positions = {}
+        for relation, firstcharpos in childRelations:
+            positions[self._getId(relation)] = firstcharpos
+
+        self.children[wordId] = array("l", positions.keys())
+        self.childPositions[wordId] = array("l", positions.values())
+        for childId in positions:
+            self.parents[childId].append(wordId)
+
+        self._modified()
+
+
+    def _removeChildren(self, wordId):
+        for childId in self.children[wordId]:
+            self.parents[childId].remove(wordId)
+
+        self.children[wordId] = array("l")
+        self.childPositions[wordId] = array("l")
+
+
+    def deleteChildren(self, word):
+        wordId = self.ids.get(word)
+        if wordId is None:
+            return
+
+        self._removeChildren(wordId)
+        self._modified()
+
+
+    def setMatchTerms(self, word, syncUpdate, terms):
+        """
+        Replace the match terms of type ASLINK of  word  for which
+        the SYNCUPDATE flag equals  syncUpdate.
+        """
+        wordId = self._getId(word)
+        key = (wordId, bool(syncUpdate))
+
+        for termId in self.matchTerms.pop(key, ()):
+            owners = self.termOwners[termId]
+            owners.remove(wordId)
+            if len(owners) == 0:
+                del self.termOwners[termId]
+
+        termIds = array("l", (self._getId(t) for t in terms))
+        if len(termIds) > 0:
+            self.matchTerms[key] = termIds
+            for termId in termIds:
+                self.termOwners.setdefault(termId, []).append(wordId)
+
+        self._modified()
+
+
+    def setPageDefined(self, word, defined):
+        if defined:
+            self.defined.add(self._getId(word))
+        else:
+            self.defined.discard(self.ids.get(word))
+
+        self._modified()
+
+
+    def renameWord(self, word, toWord):
+        """
+        Move links from, match terms and definition of page  word  to
+        toWord. Links to  word  are not changed (as in the database).
+        """
+        wordId = self.ids.get(word)
+        if wordId is None:
+            return
+
+        toId = self._getId(toWord)
+        childRelations = list(zip(
+                (self.names[c] for c in self.children[toId]),
+                self.childPositions[toId]))
+        childRelations += zip((self.names[c] for c in self.children[wordId]),
+                self.childPositions[wordId])
+        self._removeChildren(wordId)
+        self.setChildren(toWord, childRelations)
+
+        for syncUpdate in (False, True):
+            terms = self.matchTerms.get((wordId, syncUpdate))
+            if terms is None:
+                continue
+            terms = [self.names[t] for t in terms]
+            self.setMatchTerms(word, syncUpdate, ())
+            self.setMatchTerms(toWord, syncUpdate,
+                    [self.names[t] for t in self.matchTerms.get(
+                    (toId, syncUpdate), ())] + terms)
+
+        if wordId in self.defined:
+            self.defined.discard(wordId)
+            self.defined.add(toId)
+
+        self._modified()
+
+
+    # ---------- Queries ----------
+
+    def _isDefinedTerm(self, termId):
+        return termId in self.defined or termId in self.termOwners
+
+
+    def getChildren(self, word, existingonly=False, selfreference=True,
+            withPositions=False):
+        """
+        Return names of children of  word  or tuples (name, firstcharpos)
+        if  withPositions  is True.
+        existingonly -- List only defined pages and ASLINK match terms
+        selfreference -- List also word if it references itself
+        """
+        wordId = self.ids.get(word)
+        if wordId is None:
+            return []
+
+        names = self.names
+        result = []
+        for childId, pos in zip(self.children[wordId],
+                self.childPositions[wordId]):
+            if not selfreference and childId == wordId:
+                continue
+            if existingonly and not self._isDefinedTerm(childId):
+                continue
+
+            if withPositions:
+                result.append((names[childId], pos))
+            else:
+                result.append(names[childId])
+
+        return result
+
+
+    def getWordsWithChildren(self, words, existingonly=False,
+            excludeSet=frozenset()):
+        """
+        Return set of those  words  which have at least one child which is
+        neither the word itself nor in  excludeSet.
+        existingonly -- Count only defined pages and ASLINK match terms
+        """
+        excludeIds = set()
+        for name in excludeSet:
+            excludeId = self.ids.get(name)
+            if excludeId is not None:
+                excludeIds.add(excludeId)
+
+        result = set()
+        for word in words:
+            wordId = self.ids.get(word)
+            if wordId is None:
+                continue
+
+            for childId in self.children[wordId]:
+                if childId == wordId or childId in excludeIds:
+                    continue
+                if existingonly and not self._isDefinedTerm(childId):
+                    continue
+
+                result.add(word)
+                break
+
+        return result
+
+
+    def _getLinkTermIds(self, wordId):
+        result = []
+        for syncUpdate in (False, True):
+            result += self.matchTerms.get((wordId, syncUpdate), ())
+
+        return result
+
+
+    def getParents(self, word):
+        """
+        Return names of words linking to  word  or one of its ASLINK
+        match terms.
+        """
+        wordId = self.ids.get(word)
+        if wordId is None:
+            return []
+
+        seen = set()
+        result = []
+        for termId in [wordId] + self._getLinkTermIds(wordId):
+            for parentId in self.parents[termId]:
+                if parentId not in seen:
+                    seen.add(parentId)
+                    result.append(self.names[parentId])
+
+        return result
+
+
+    def _getCachedQuery(self, name, function):
+        version, result = self.queryCache.get(name, (-1, None))
+        if version != self.version:
+            result = function()
+            self.queryCache[name] = (self.version, result)
+
+        return list(result)
+
+
+    def getParentlessWords(self):
+        """
+        Return names of defined pages which aren't linked from other pages
+        through one of their ASLINK match terms.
+        """
+        def query():
+            parents = self.parents
+            result = []
+            for wordId in self.defined:
+                if not any(parentId != wordId
+                        for termId in self._getLinkTermIds(wordId)
+                        for parentId in parents[termId]):
+                    result.append(self.names[wordId])
+
+            return result
+
+        return self._getCachedQuery("parentless", query)
+
+
+    def getUndefinedWords(self):
+        """
+        Return link targets which are neither defined pages nor ASLINK
+        match terms.
+        """
+        def query():
+            return [self.names[termId]
+                    for termId, parents in enumerate(self.parents)
+                    if len(parents) > 0 and not self._isDefinedTerm(termId)]
+
+        return self._getCachedQuery("undefined", query)
+
+
+    def findPath(self, word, toWord):
+        """
+        Find shortest path from  word  to  toWord  going through the parents.
+        Returns list of names starting with toWord and ending with word or
+        [] if there is no path.
+        """
+        if word == toWord:
+            return [word]
+
+        wordId = self.ids.get(word)
+        toId = self.ids.get(toWord)
+        if wordId is None or toId is None:
+            return []
+
+        # Dictionary {id: id of child through which it was reached}
+        reachedFrom = {wordId: None}
+        queue = deque((wordId,))
+        while queue:
+            current = queue.popleft()
+            for parentId in self.parents[current]:
+                if parentId in reachedFrom:
+                    continue
+
+                reachedFrom[parentId] = current
+                if parentId == toId:
+                    result = [toWord]
+                    while current is not None:
+                        result.append(self.names[current])
+                        current = reachedFrom[current]
+                    return result
+
+                queue.append(parentId)
+
+        return []
@@ -144,6 +144,32 @@ class App(wx.App, MiscEventSourceMixin):
         
         self.mainFrameSet = set()
 
+        self.initGlobalConfig()
+
+        splash = None
+        
+        cmdLine = CmdLineAction(sys.argv[1:])
+        if not cmdLine.exitFinally and self.globalConfig.getboolean("main",
+                "startup_splashScreen_show", True):
+            bitmap = wx.Bitmap(os.path.join(self.wikiAppDir, "icons/pwiki.ico"))
+            if bitmap:
+                splash = wx.adv.SplashScreen(bitmap,
+                      wx.adv.SPLASH_CENTRE_ON_SCREEN|wx.adv.SPLASH_TIMEOUT, 15000, None,
+                      style=wx.BORDER_NONE|wx.FRAME_NO_TASKBAR)
+                self.Yield()
+
+        try:
+            return self.initStep2(cmdLine)
+        finally:
+            if splash:
+                splash.Destroy()
+
+
+    def initGlobalConfig(self):
+        """
+        Find application and global config directories and load or create
+        the global configuration. Also used by the headless application.
+        """
         wikiAppDir, globalConfigDir = findDirs()
 
         if not globalConfigDir or not os.path.exists(globalConfigDir):
@@ -211,24 +237,6 @@ class App(wx.App, MiscEventSourceMixin):
             else:
                 self.createDefaultGlobalConfig(defaultGlobalConfigLoc)
 
-        splash = None
-        
-        cmdLine = CmdLineAction(sys.argv[1:])
-        if not cmdLine.exitFinally and self.globalConfig.getboolean("main",
-                "startup_splashScreen_show", True):
-            bitmap = wx.Bitmap(os.path.join(self.wikiAppDir, "icons/pwiki.ico"))
-            if bitmap:
-                splash = wx.adv.SplashScreen(bitmap,
-                      wx.adv.SPLASH_CENTRE_ON_SCREEN|wx.adv.SPLASH_TIMEOUT, 15000, None,
-                      style=wx.BORDER_NONE|wx.FRAME_NO_TASKBAR)
-                self.Yield()
-
-        try:
-            return self.initStep2(cmdLine)
-        finally:
-            if splash:
-                splash.Destroy()
-
 
     def initStep2(self, cmdLine):
         # Block of modules to import while splash screen is shown
@@ -642,9 +650,32 @@ class App(wx.App, MiscEventSourceMixin):
         """
         Realize settings from global config which are changeable during session
         """
-        from . import Localization
         from . import OsAbstract
         
+        self.updateCollator()
+
+        if self.globalConfig.getboolean("main", "mouse_scrollUnderPointer"):
+            self.FilterEvent = self._FilterEvent_scrollUnder
+        else:
+            self.FilterEvent = self._FilterEvent_nothing
+
+        # Set CPU affinity
+        
+        if OsAbstract.getCpuCount() > 1:
+            aff = self.globalConfig.getint("main", "cpu_affinity", -1)
+            
+            if aff == -1:
+                OsAbstract.setCpuAffinity(OsAbstract.INITIAL_CPU_AFFINITY)
+            else:
+                OsAbstract.setCpuAffinity((aff,))
+
+
+    def updateCollator(self):
+        """
+        Create collator according to the collation settings of global config
+        """
+        from . import Localization
+
         collationOrder = self.globalConfig.get("main", "collation_order")
         collationUppercaseFirst = self.globalConfig.getboolean("main",
                 "collation_uppercaseFirst")
@@ -665,22 +696,6 @@ class App(wx.App, MiscEventSourceMixin):
                 self.collator = Localization.getCollatorByString("C",
                         collationCaseMode)
 
-        if self.globalConfig.getboolean("main", "mouse_scrollUnderPointer"):
-            self.FilterEvent = self._FilterEvent_scrollUnder
-        else:
-            self.FilterEvent = self._FilterEvent_nothing
-
-        # Set CPU affinity
-        
-        if OsAbstract.getCpuCount() > 1:
-            aff = self.globalConfig.getint("main", "cpu_affinity", -1)
-            
-            if aff == -1:
-                OsAbstract.setCpuAffinity(OsAbstract.INITIAL_CPU_AFFINITY)
-            else:
-                OsAbstract.setCpuAffinity((aff,))
-
-
 
     def OnEndSession(self, evt):
         # Loop over copy of set as original set is modified during loop
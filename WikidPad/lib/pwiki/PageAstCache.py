@@ -0,0 +1,360 @@
+"""
+Persistent cache of page ASTs stored in a small sqlite database next to the
+wiki so that unchanged pages don't have to be parsed again after reopening
+the wiki, during rebuild or export.
+
+An entry is found by a key built from the page text, the wiki word (needed to
+resolve relative links), the equivalence key of the format details, the
+AST version of the parser and the camelcase blacklists. If the total size
+of the entries exceeds the limit, the least recently used ones are removed.
+"""
+
+import os, os.path, hashlib, sqlite3, threading, time, traceback, \
+        urllib.request
+
+import wx
+
+from .ConnectWrapPysqlite import ConnectWrapSyncCommit
+from .WikiPyparsing import serializeAst, deserializeAst
+
+
+# Increase if the table layout or the key building changes
+CACHE_FORMAT_NO = 1
+
+# Pending changes are committed after this number of changes or seconds
+_COMMIT_CHANGE_COUNT = 100
+_COMMIT_DELAY = 5.0
+
+# When evicting, shrink to this fraction of the size limit
+_EVICT_TARGET_RATIO = 0.8
+
+
+
+class PageAstCache:
+    """
+    All methods are thread-safe. Call close() after use.
+    """
+    def __init__(self, path, sizeLimit, readOnly=False):
+        """
+        path -- Path to the cache database file, it is created if necessary
+        sizeLimit -- Maximum total size of stored ASTs in bytes
+        readOnly -- Only look up entries, neither store new ones nor
+                the last use. Used in worker processes, see getReadOnlyCopy()
+        """
+        self.lock = threading.RLock()
+        self.path = path
+        self.sizeLimit = sizeLimit
+        self.readOnly = readOnly
+        self.connWrap = None
+
+        # {langName: AST version of parser or None}
+        self.astVersions = {}
+        # (ccBlacklist, nccBlacklist, digest) of last call to
+        # _getBlacklistDigest()
+        self.blacklistCache = (None, None, None)
+
+        self.pendingChanges = 0
+        self.lastCommitTime = time.time()
+
+        if readOnly:
+            try:
+                self._openReadOnly()
+            except sqlite3.Error:
+                traceback.print_exc()
+                self._closeConnection()
+            return
+
+        try:
+            self._open()
+        except sqlite3.OperationalError:
+            # E.g. locked by another process or I/O error, the file may
+            # be fine, so work without cache
+            traceback.print_exc()
+            self._closeConnection()
+        except sqlite3.DatabaseError:
+            # Broken cache file, start from scratch
+            traceback.print_exc()
+            self._closeConnection()
+            os.unlink(self.path)
+            self._open()
+
+
+    def _open(self):
+        self.connWrap = ConnectWrapSyncCommit(sqlite3.connect(self.path,
+                check_same_thread=False))
+        self.connWrap.execSql("pragma synchronous = off")
+
+        formatNo = self.connWrap.execSqlQuerySingleItem("pragma user_version")
+        if formatNo != CACHE_FORMAT_NO:
+            self.connWrap.execSql("drop table if exists pageAst")
+            self.connWrap.execSql("pragma user_version = %i" % CACHE_FORMAT_NO)
+
+        self.connWrap.execSql("create table if not exists pageAst("
+                "key blob primary key not null, "
+                "data blob not null, "
+                "size integer not null, "
+                "lastUse integer not null)")
+        self.connWrap.execSql("create index if not exists pageAst_lastUse "
+                "on pageAst(lastUse)")
+        self.connWrap.commit()
+
+        self.totalSize = int(self.connWrap.execSqlQuerySingleItem(
+                "select total(size) from pageAst", default=0))
+        self.useCounter = self.connWrap.execSqlQuerySingleItem(
+                "select max(lastUse) from pageAst", default=0) or 0
+
+
+    def _openReadOnly(self):
+        self.connWrap = ConnectWrapSyncCommit(sqlite3.connect("file:%s?mode=ro"
+                % urllib.request.pathname2url(self.path), uri=True,
+                check_same_thread=False))
+
+        formatNo = self.connWrap.execSqlQuerySingleItem("pragma user_version")
+        if formatNo != CACHE_FORMAT_NO:
+            # Treat as empty
+            self._closeConnection()
+            return
+
+        self.totalSize = 0
+        self.useCounter = 0
+
+
+    def getReadOnlyCopy(self):
+        """
+        Return a new read-only cache object for the same file, e.g. for
+        a forked worker process which must not use the connection of this one.
+        Pending changes of this object should be flushed before.
+        """
+        return PageAstCache(self.path, self.sizeLimit, readOnly=True)
+
+
+    def _closeConnection(self):
+        if self.connWrap is not None:
+            self.connWrap.close()
+            self.connWrap = None
+
+
+    def close(self):
+        with self.lock:
+            if self.connWrap is None:
+                return
+            try:
+                self.connWrap.commit()
+            except sqlite3.Error:
+                traceback.print_exc()
+
+            self._closeConnection()
+
+
+    def clear(self):
+        with self.lock:
+            if self.connWrap is None:
+                return
+
+            self.connWrap.execSql("delete from pageAst")
+            self.connWrap.commit()
+            self.totalSize = 0
+            self.pendingChanges = 0
+
+
+    def _getAstVersion(self, langName):
+        try:
+            return self.astVersions[langName]
+        except KeyError:
+            pass
+
+        parser = wx.GetApp().createWikiParser(langName)
+        try:
+            getAstVersion = getattr(parser, "getAstVersion", None)
+            if getAstVersion is None:
+                astVersion = None
+            else:
+                astVersion = getAstVersion()
+        finally:
+            wx.GetApp().freeWikiParser(parser)
+
+        self.astVersions[langName] = astVersion
+        return astVersion
+
+
+    def _getBlacklistDigest(self, wikiDocument):
+        ccBlacklist = wikiDocument.getCcWordBlacklist()
+        nccBlacklist = wikiDocument.getNccWordBlacklist()
+
+        # The blacklist sets are replaced (not modified) on change
+        cachedCc, cachedNcc, digest = self.blacklistCache
+        if cachedCc is ccBlacklist and cachedNcc is nccBlacklist:
+            return digest
+
+        h = hashlib.sha1()
+        for blacklist in (ccBlacklist, nccBlacklist):
+            for word in sorted(blacklist or ()):
+                h.update(word.encode("utf-8", "surrogatepass") + b"\n")
+            h.update(b"\0")
+
+        digest = h.digest()
+        self.blacklistCache = (ccBlacklist, nccBlacklist, digest)
+        return digest
+
+
+    def buildKey(self, page, text, formatDetails):
+        """
+        Return key for the AST of  text  parsed in the context of  page
+        with  formatDetails  or None if such an AST can't be cached.
+        """
+        if not formatDetails.noFormat and formatDetails.autoLinkMode == "relax":
+            # Result depends on all existing wiki words
+            return None
+
+        equivKey = formatDetails.getEquivalenceKey()
+        if equivKey is None:
+            return None
+
+        langName = page.getWikiLanguageName()
+        astVersion = self._getAstVersion(langName)
+        if astVersion is None:
+            return None
+
+        h = hashlib.sha1()
+        h.update(repr((langName, astVersion, equivKey, page.getWikiWord()))
+                .encode("utf-8", "surrogatepass"))
+        h.update(self._getBlacklistDigest(page.getWikiDocument()))
+        h.update(text.encode("utf-8", "surrogatepass"))
+
+        return h.digest()
+
+
+    def _changed(self):
+        self.pendingChanges += 1
+        if self.pendingChanges >= _COMMIT_CHANGE_COUNT or \
+                time.time() - self.lastCommitTime >= _COMMIT_DELAY:
+            self.flush()
+
+
+    def flush(self):
+        """
+        Commit pending changes to the cache file.
+        """
+        with self.lock:
+            if self.connWrap is None or self.pendingChanges == 0:
+                return
+
+            self.connWrap.commit()
+            self.pendingChanges = 0
+            self.lastCommitTime = time.time()
+
+
+    def getAstData(self, key):
+        """
+        Return serialized AST (see WikiPyparsing.serializeAst()) for  key
+        or None if not in cache.
+        """
+        with self.lock:
+            if self.connWrap is None:
+                return None
+
+            data = self.connWrap.execSqlQuerySingleItem(
+                    "select data from pageAst where key = ?",
+                    (sqlite3.Binary(key),))
+
+            if data is None:
+                return None
+
+            if self.readOnly:
+                return bytes(data)
+
+            self.useCounter += 1
+            self.connWrap.execSql("update pageAst set lastUse = ? "
+                    "where key = ?", (self.useCounter, sqlite3.Binary(key)))
+            self._changed()
+
+            return bytes(data)
+
+
+    def getAst(self, key):
+        """
+        Return AST for  key  or None if not in cache.
+        """
+        data = self.getAstData(key)
+        if data is None:
+            return None
+
+        try:
+            return deserializeAst(data)
+        except Exception:
+            # Unreadable entry, maybe from an incompatible parser
+            traceback.print_exc()
+            self.remove(key)
+            return None
+
+
+    def putAstData(self, key, data):
+        """
+        Store serialized AST  data  for  key.
+        """
+        size = len(data)
+        if size > self.sizeLimit or self.readOnly:
+            return
+
+        with self.lock:
+            if self.connWrap is None:
+                return
+
+            oldSize = self.connWrap.execSqlQuerySingleItem(
+                    "select size from pageAst where key = ?",
+                    (sqlite3.Binary(key),), default=0)
+
+            self.useCounter += 1
+            self.connWrap.execSql("insert or replace into pageAst("
+                    "key, data, size, lastUse) values (?, ?, ?, ?)",
+                    (sqlite3.Binary(key), sqlite3.Binary(data), size,
+                    self.useCounter))
+
+            self.totalSize += size - oldSize
+            if self.totalSize > self.sizeLimit:
+                self._evict()
+
+            self._changed()
+
+
+    def putAst(self, key, pageAst):
+        self.putAstData(key, serializeAst(pageAst))
+
+
+    def remove(self, key):
+        with self.lock:
+            if self.connWrap is None or self.readOnly:
+                return
+
+            size = self.connWrap.execSqlQuerySingleItem(
+                    "select size from pageAst where key = ?",
+                    (sqlite3.Binary(key),))
+            if size is None:
+                return
+
+            self.connWrap.execSql("delete from pageAst where key = ?",
+                    (sqlite3.Binary(key),))
+            self.totalSize -= size
+            self._changed()
+
+
+    def _evict(self):
+        """
+        Remove least recently used entries until the total size is
+        sufficiently below the limit. Must be called inside self.lock.
+        """
+        target = self.sizeLimit * _EVICT_TARGET_RATIO
+
+        while self.totalSize > target:
+            rows = self.connWrap.execSqlQuery("select key, size from pageAst "
+                    "order by lastUse limit 50")
+            if len(rows) == 0:
+                self.totalSize = 0
+                break
+
+            for key, size in rows:
+                self.connWrap.execSql("delete from pageAst where key = ?",
+                        (key,))
+                self.totalSize -= size
+                if self.totalSize <= target:
+                    break
@@ -0,0 +1,433 @@
+"""
+Parsing of many wiki pages at once, e.g. for rebuilding the wiki.
+
+Pages are parsed in a pool of worker processes if possible. The workers are
+forked from the main process so they inherit the already loaded wiki language
+plugins. If fork() isn't available (Windows) or only one worker is wanted,
+pages are parsed in the calling thread instead.
+
+Page ASTs are handed back as serialized byte strings (the same format as
+used by the persistent page AST cache), call loadAst() to get the actual AST.
+If the wiki has a page AST cache, cached ASTs are used and newly parsed ones
+are stored.
+"""
+
+import os, os.path, copy, hashlib, tempfile, time, traceback, \
+        multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import wx
+
+from .Utilities import DUMBTHREADSTOP
+from . import ParseUtilities
+from .WikiPyparsing import serializeAst, deserializeAst
+
+
+
+def getWorkerCount(jobs=None):
+    """
+    Return number of worker processes to use.
+    jobs -- Number of workers wanted, None to use global option
+            "processPool_workers". A number below 1 means one worker per CPU.
+    """
+    if jobs is None:
+        jobs = wx.GetApp().getGlobalConfig().getint("main",
+                "processPool_workers", 0)
+
+    if jobs < 1:
+        jobs = os.cpu_count() or 1
+
+    return jobs
+
+
+def createWorkerPool(workers, initializer=None, initargs=()):
+    """
+    Return a ProcessPoolExecutor with  workers  forked processes or None
+    if parallel processing isn't possible or not wanted.
+    The initargs are not pickled, so they may contain arbitrary objects.
+    """
+    if workers < 2 or "fork" not in multiprocessing.get_all_start_methods():
+        return None
+
+    return ProcessPoolExecutor(max_workers=workers,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=initializer, initargs=initargs)
+
+
+def shutdownWorkerPool(pool, futures=()):
+    """
+    Shut down a pool returned by createWorkerPool() and wait for its
+    processes. Jobs of  futures  which didn't start yet are cancelled.
+    """
+    # Argument "cancel_futures" of shutdown() needs Python 3.9
+    for future in futures:
+        future.cancel()
+
+    pool.shutdown(wait=True)
+
+
+def dumpAst(pageAst):
+    return serializeAst(pageAst)
+
+
+def loadAst(astData):
+    return deserializeAst(astData)
+
+
+def getTextDigest(text):
+    """
+    Return digest of page text to check if a spooled AST belongs to it.
+    """
+    return hashlib.sha1(text.encode("utf-8", "surrogatepass")).digest()
+
+
+
+class DetachedWikiDocument:
+    """
+    Stand-in for WikiDocument in a worker process. It provides only the
+    information needed while parsing a page.
+    """
+    def __init__(self, wikiDocument, withAutoLinkRelaxInfo=False):
+        self.ccWordBlacklist = wikiDocument.getCcWordBlacklist()
+        self.nccWordBlacklist = wikiDocument.getNccWordBlacklist()
+        if withAutoLinkRelaxInfo:
+            self.autoLinkRelaxInfo = wikiDocument.getAutoLinkRelaxInfo()
+        else:
+            self.autoLinkRelaxInfo = None
+
+    def getCcWordBlacklist(self):
+        return self.ccWordBlacklist
+
+    def getNccWordBlacklist(self):
+        return self.nccWordBlacklist
+
+    def getAutoLinkRelaxInfo(self):
+        return self.autoLinkRelaxInfo
+
+
+class DetachedWikiPage:
+    """
+    Stand-in for the base page of the format details in a worker process.
+    """
+    __slots__ = ("wikiWord", "wikiDocument")
+
+    def __init__(self, wikiWord, wikiDocument):
+        self.wikiWord = wikiWord
+        self.wikiDocument = wikiDocument
+
+    def getWikiWord(self):
+        return self.wikiWord
+
+    def getWikiDocument(self):
+        return self.wikiDocument
+
+
+
+def _detachFormatDetails(formatDetails):
+    """
+    Return a copy of formatDetails without references to the wiki document
+    or a page so that it can be pickled.
+    """
+    result = copy.copy(formatDetails)
+    result.wikiDocument = None
+    result.basePage = None
+
+    if formatDetails.getUsesDummyWikiLanguageDetails():
+        result.wikiLanguageDetails = None
+    else:
+        langDetails = copy.copy(formatDetails.wikiLanguageDetails)
+        if hasattr(langDetails, "wikiDocument"):
+            langDetails.wikiDocument = None
+        result.wikiLanguageDetails = langDetails
+
+    return result
+
+
+def _attachFormatDetails(formatDetails, wikiWord, wikiDocument):
+    formatDetails.wikiDocument = wikiDocument
+    formatDetails.basePage = DetachedWikiPage(wikiWord, wikiDocument)
+
+    if formatDetails.wikiLanguageDetails is None:
+        formatDetails.wikiLanguageDetails = \
+                ParseUtilities.DUMMY_WIKI_LANGUAGE_DETAILS
+    elif hasattr(formatDetails.wikiLanguageDetails, "wikiDocument"):
+        formatDetails.wikiLanguageDetails.wikiDocument = wikiDocument
+
+
+# Set in worker processes by _initWorker()
+_workerParsers = None
+_workerWikiDocument = None
+
+def _initWorker(parsers, detachedWikiDocument):
+    global _workerParsers, _workerWikiDocument
+
+    _workerParsers = parsers
+    _workerWikiDocument = detachedWikiDocument
+
+
+def _parseInWorker(langName, wikiWord, text, formatDetails):
+    _attachFormatDetails(formatDetails, wikiWord, _workerWikiDocument)
+
+    pageAst = _workerParsers[langName].parse(langName, text, formatDetails,
+            threadstop=DUMBTHREADSTOP)
+
+    return dumpAst(pageAst)
+
+
+
+class PageParser:
+    """
+    Parses a sequence of pages, in worker processes if possible.
+    Call close() after use.
+    """
+    def __init__(self, wikiDocument, jobs=None):
+        self.wikiDocument = wikiDocument
+        self.workerCount = getWorkerCount(jobs)
+        self.langName = wikiDocument.getWikiDefaultWikiLanguage()
+        self.parser = wx.GetApp().createWikiParser(self.langName)
+        self.astCache = wikiDocument.getPageAstCache()
+
+        self.pool = createWorkerPool(self.workerCount, _initWorker,
+                ({self.langName: self.parser},
+                DetachedWikiDocument(wikiDocument)))
+
+
+    def close(self):
+        if self.pool is not None:
+            shutdownWorkerPool(self.pool)
+            self.pool = None
+
+        if self.parser is not None:
+            wx.GetApp().freeWikiParser(self.parser)
+            self.parser = None
+
+        if self.astCache is not None:
+            self.astCache.flush()
+
+
+    def isParallel(self):
+        return self.pool is not None
+
+
+    def getWorkerCount(self):
+        if self.pool is None:
+            return 1
+
+        return self.workerCount
+
+
+    def _canParseInWorker(self, page, formatDetails):
+        # The auto-link info for "relax" mode is built lazily and therefore
+        # not available in the workers
+        return self.pool is not None and \
+                page.getWikiLanguageName() == self.langName and \
+                formatDetails.autoLinkMode != "relax"
+
+
+    @staticmethod
+    def _parseLocally(page, text, formatDetails):
+        return dumpAst(page.parseTextInContext(text,
+                formatDetails=formatDetails))
+
+
+    def _getCached(self, page, text, formatDetails):
+        """
+        Return tuple (cacheKey, astData) where astData is None if page AST
+        isn't in cache and cacheKey is None if it can't be cached at all.
+        """
+        if self.astCache is None:
+            return None, None
+
+        try:
+            cacheKey = self.astCache.buildKey(page, text, formatDetails)
+            if cacheKey is None:
+                return None, None
+
+            return cacheKey, self.astCache.getAstData(cacheKey)
+        except Exception:
+            traceback.print_exc()
+            return None, None
+
+
+    def _putCached(self, cacheKey, astData):
+        if cacheKey is None or astData is None:
+            return
+
+        try:
+            self.astCache.putAstData(cacheKey, astData)
+        except Exception:
+            traceback.print_exc()
+
+
+    def iterParse(self, items, threadstop=DUMBTHREADSTOP):
+        """
+        Parse pages and yield tuples (key, astData) in order of completion
+        where astData is the serialized AST (see loadAst()) or None if parsing
+        failed.
+
+        items -- iterable of tuples (key, page, text, formatDetails). It is
+                consumed lazily so that only a limited number of pages is
+                in work at the same time.
+        """
+        if self.pool is None:
+            for key, page, text, formatDetails in items:
+                threadstop.testValidThread()
+                cacheKey, astData = self._getCached(page, text, formatDetails)
+                if astData is not None:
+                    yield key, astData
+                    continue
+
+                try:
+                    astData = self._parseLocally(page, text, formatDetails)
+                except Exception:
+                    traceback.print_exc()
+                    yield key, None
+                    continue
+
+                self._putCached(cacheKey, astData)
+                yield key, astData
+
+            return
+
+        window = self.workerCount * 4
+        running = {}
+        local = deque()
+        cached = deque()
+        items = iter(items)
+        exhausted = False
+
+        while True:
+            threadstop.testValidThread()
+
+            while not exhausted and \
+                    len(running) + len(local) + len(cached) < window:
+                try:
+                    key, page, text, formatDetails = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+
+                cacheKey, astData = self._getCached(page, text, formatDetails)
+                if astData is not None:
+                    cached.append((key, astData))
+                elif self._canParseInWorker(page, formatDetails):
+                    future = self.pool.submit(_parseInWorker, self.langName,
+                            page.getWikiWord(), text,
+                            _detachFormatDetails(formatDetails))
+                    running[future] = (key, cacheKey)
+                else:
+                    local.append((key, cacheKey, page, text, formatDetails))
+
+            if cached:
+                yield cached.popleft()
+                continue
+
+            if local:
+                # Parse these while the workers are busy
+                key, cacheKey, page, text, formatDetails = local.popleft()
+                try:
+                    astData = self._parseLocally(page, text, formatDetails)
+                except Exception:
+                    traceback.print_exc()
+                    yield key, None
+                    continue
+
+                self._putCached(cacheKey, astData)
+                yield key, astData
+                continue
+
+            if not running:
+                break
+
+            done, notDone = wait(list(running.keys()),
+                    return_when=FIRST_COMPLETED)
+
+            for future in done:
+                key, cacheKey = running.pop(future)
+                try:
+                    astData = future.result()
+                except Exception:
+                    traceback.print_exc()
+                    yield key, None
+                    continue
+
+                self._putCached(cacheKey, astData)
+                yield key, astData
+
+
+
+class AstSpool:
+    """
+    Keeps serialized page ASTs in an anonymous temporary file so that they can
+    be processed again later without holding all of them in memory.
+    Along with each AST some small info object can be stored.
+    """
+    def __init__(self, tempDir=None):
+        self.file = tempfile.TemporaryFile(dir=tempDir)
+        self.index = {}   # {key: (offset, length, info)}
+        self.end = 0
+
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            self.index = {}
+
+
+    def put(self, key, astData, info=None):
+        self.file.seek(self.end)
+        self.file.write(astData)
+        self.index[key] = (self.end, len(astData), info)
+        self.end += len(astData)
+
+
+    def __contains__(self, key):
+        return key in self.index
+
+
+    def getInfo(self, key, default=None):
+        entry = self.index.get(key)
+        if entry is None:
+            return default
+
+        return entry[2]
+
+
+    def getAst(self, key):
+        """
+        Return the deserialized AST for key or None if not present.
+        """
+        entry = self.index.get(key)
+        if entry is None:
+            return None
+
+        offset, length, info = entry
+        self.file.seek(offset)
+        return loadAst(self.file.read(length))
+
+
+
+class ThroughputMeter:
+    """
+    Measures number of processed pages per second for progress messages.
+    """
+    def __init__(self):
+        self.startTime = time.time()
+        self.count = 0
+
+    def restart(self):
+        self.startTime = time.time()
+        self.count = 0
+
+    def inc(self, n=1):
+        self.count += n
+
+    def getRate(self):
+        elapsed = time.time() - self.startTime
+        if elapsed <= 0:
+            return 0.0
+
+        return self.count / elapsed
+
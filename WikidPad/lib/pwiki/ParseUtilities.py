@@ -14,6 +14,9 @@ class _DummmyWikiLanguageDetails:
     def isEquivTo(self, details):
          return self.getWikiLanguageName() == details.getWikiLanguageName()
 
+    def getEquivalenceKey(self):
+        return (self.getWikiLanguageName(),)
+
 
 DUMMY_WIKI_LANGUAGE_DETAILS = _DummmyWikiLanguageDetails()
 
@@ -66,6 +69,27 @@ class WikiPageFormatDetails:
                 self.paragraphMode == details.paragraphMode and \
                 self.wikiLanguageDetails.isEquivTo(details.wikiLanguageDetails)
 
+    def getEquivalenceKey(self):
+        """
+        Return hashable key which is equal for equivalent details objects
+        (see isEquivTo()) or None if the wiki language details don't
+        provide a key.
+        """
+        if self.noFormat:
+            return (True,)
+
+        getLangKey = getattr(self.wikiLanguageDetails, "getEquivalenceKey",
+                None)
+        if getLangKey is None:
+            return None
+
+        langKey = getLangKey()
+        if langKey is None:
+            return None
+
+        return (False, self.withCamelCase, self.autoLinkMode,
+                self.paragraphMode, langKey)
+
 
 
 def getFootnoteAnchorDict(pageAst):
@@ -216,6 +240,17 @@ class BasicLanguageHelper:
         raise InternalError()
 
 
+    @classmethod
+    def updateAutoLinkRelaxInfo(cls, wikiDocument, autoLinkRelaxInfo):
+        """
+        Optional. Bring info built by buildAutoLinkRelaxInfo() up to date
+        after wiki words were added, renamed or deleted and return it
+        (or a new info object). If a helper doesn't provide this method,
+        the info is built again from scratch as done here.
+        """
+        return cls.buildAutoLinkRelaxInfo(wikiDocument)
+
+
     @staticmethod
     def createWikiLinkPathObject(*args, **kwargs):
         raise InternalError()
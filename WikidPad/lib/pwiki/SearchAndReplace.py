@@ -9,6 +9,7 @@ from .Serialization import SerializeStream, findXmlElementFlat, \
         serToXmlBoolean, serFromXmlBoolean, serToXmlInt, serFromXmlInt
 
 from . import SearchAndReplaceBoolLang
+from . import TrigramIndex
 
 
 
@@ -60,6 +61,14 @@ class AbstractSearchNode:
         Should return True in case of doubt.
         """
         return True
+
+    def getTextFilter(self):
+        """
+        Returns a text filter (see TrigramIndex) which every page text
+        for which testWikiPage() returns True must fulfill or None if
+        there is no such restriction.
+        """
+        return None
         
 
 #     def testText(self, text):
@@ -767,6 +776,10 @@ class AndSearchNode(AbstractAndOrSearchNode):
             
         return Unknown
 
+    def getTextFilter(self):
+        return TrigramIndex.andFilter((self.left.getTextFilter(),
+                self.right.getTextFilter()))
+
 
 class OrSearchNode(AbstractAndOrSearchNode):
     """
@@ -790,6 +803,10 @@ class OrSearchNode(AbstractAndOrSearchNode):
 
         return Unknown
 
+    def getTextFilter(self):
+        return TrigramIndex.orFilter((self.left.getTextFilter(),
+                self.right.getTextFilter()))
+
 
 
 class RegexTextNode(AbstractContentSearchNode):
@@ -825,6 +842,9 @@ class RegexTextNode(AbstractContentSearchNode):
     def testWikiPage(self, word, text):
         return bool(self.rePattern.search(text))
 
+    def getTextFilter(self):
+        return TrigramIndex.regexFilter(self.rePattern)
+
 #     def testText(self, text):
 #         return bool(self.rePattern.search(text))
 
@@ -878,6 +898,9 @@ class SimpleStrNode(AbstractContentSearchNode):
     def testWikiPage(self, word, text):
         return text.find(self.subStr) != -1
 
+    def getTextFilter(self):
+        return TrigramIndex.literalFilter(self.subStr)
+
 
 #     def testText(self, text):
 #         return text.find(self.subStr) != -1
@@ -1338,6 +1361,16 @@ class ListWikiPagesOperation:
 
         return self.searchOpTree.isTextNeededForTest()
 
+    def getTextFilter(self):
+        """
+        Returns text filter for pages which can match or None
+        (see AbstractSearchNode.getTextFilter()).
+        """
+        if self.searchOpTree is None:
+            return None
+
+        return self.searchOpTree.getTextFilter()
+
 
     def testWikiPageByDocPage(self, docPage):
         return self.testWikiPage(docPage.getWikiWord(), docPage.getLiveText())
@@ -1476,6 +1509,9 @@ class SearchReplaceOperation:
 #         self.ordering = "no"    # How to order the pages
 
         self.searchOpTree = None # Cache information
+        # Cache for highlightWhooshIndexFound(), tuple
+        # (wikiDocument, searchStr, terms, analyzer) or None
+        self.whooshHighlightCache = None
         self.wikiDocument = None
         self.listWikiPagesOp = ListWikiPagesOperation()
 
@@ -1499,6 +1535,7 @@ class SearchReplaceOperation:
         Call this after making changes to reset any cached data
         """
         self.searchOpTree = None
+        self.whooshHighlightCache = None
         
     def getTitle(self):
         if self.title is None:
@@ -1813,15 +1850,24 @@ class SearchReplaceOperation:
         
         from whoosh import highlight
 
-        # TODO: Loop invariant, move out?
-        q = self.getWhooshIndexQuery(docPage.getWikiDocument())
-        
-        # Extract the terms the user mentioned
-        terms = [text for fieldname, text in q.all_terms()
-                if fieldname == "content"]
-        
-        analyzer = docPage.getWikiDocument().getWhooshIndexContentAnalyzer()
-        
+        wikiDocument = docPage.getWikiDocument()
+        cache = self.whooshHighlightCache
+
+        if cache is not None and cache[0] is wikiDocument and \
+                cache[1] == self.searchStr:
+            terms, analyzer = cache[2:]
+        else:
+            # Query is parsed once for all pages of a result list
+            q = self.getWhooshIndexQuery(wikiDocument)
+            
+            # Extract the terms the user mentioned
+            terms = [text for fieldname, text in q.all_terms()
+                    if fieldname == "content"]
+            
+            analyzer = wikiDocument.getWhooshIndexContentAnalyzer()
+            self.whooshHighlightCache = (wikiDocument, self.searchStr, terms,
+                    analyzer)
+
         # TODO: Length of before and after from config
         fragmenter = highlight.ContextFragmenter(maxchars, surround)
 
@@ -1934,6 +1980,18 @@ class SearchReplaceOperation:
                 self.searchOpTree.isTextNeededForTest()
 
 
+    def getTextFilter(self):
+        """
+        Returns text filter for pages which can match or None
+        (see AbstractSearchNode.getTextFilter()).
+        """
+        if self.searchOpTree is None:
+            self.rebuildSearchOpTree()
+
+        return TrigramIndex.andFilter((self.listWikiPagesOp.getTextFilter(),
+                self.searchOpTree.getTextFilter()))
+
+
     def testWikiPageByDocPage(self, docPage):
         return self.testWikiPage(docPage.getWikiWord(), docPage.getLiveText())
 
@@ -1,7 +1,8 @@
 # import profilehooks
 # profile = profilehooks.profile(filename="profile.prf", immediate=False)
 
-import sys, traceback, re, time
+import sys, traceback, re, time, threading
+from collections import OrderedDict, deque
 
 import wx, wx.html, wx.xrc
 
@@ -128,7 +129,250 @@ class _SearchResultItemInfo:
 
 
 
+class _SearchResultSnippetBuilder:
+    """
+    Builds the occurrence contexts and counts shown in the rows of a
+    SearchResultListBox. Requested rows are built on a background thread,
+    rows which are shown before rows which are read ahead. The thread ends
+    when it was idle for IDLE_TIMEOUT seconds and is restarted on demand.
+    """
+    IDLE_TIMEOUT = 10.0
+    # Maximum number of queued requests of each kind, older ones are dropped
+    MAX_QUEUED = 200
+
+    def __init__(self, sarOp, wikiDocument, config, found, builtCallback):
+        """
+        sarOp -- Search operation which found the pages
+        found -- list of found wiki words
+        builtCallback -- Called in main thread as
+                builtCallback(builder, index, info) for each built row
+        """
+        self.sarOp = sarOp.clone()
+        # Search operation for rows built synchronously in main thread
+        self.mainSarOp = sarOp.clone()
+        self.wikiDocument = wikiDocument
+        self.found = found
+        self.builtCallback = builtCallback
+
+        self.before = config.getint("main", "search_wiki_context_before")
+        self.after = config.getint("main", "search_wiki_context_after")
+        self.countOccurrences = config.getboolean("main",
+                "search_wiki_count_occurrences")
+        self.maxCountOccurrences = config.getint("main",
+                "search_wiki_max_count_occurrences", 100)
+
+        if sarOp.hasParticularTextPosition():
+            # "As is" or regex search
+            self.mode = "position"
+        elif sarOp.hasWhooshHighlighting():
+            # Index search
+            self.mode = "index"
+        else:
+            # No specific position to show as context, so show beginning
+            # of page. Also, no occurrence counting possible
+            self.mode = "start"
+
+        self.condition = threading.Condition()
+        self.visibleRequests = deque()
+        self.readAheadRequests = deque()
+        # Dictionary {index: <True if requested as visible>} of queued rows
+        self.pending = {}
+        self.thread = None
+        self.stopped = False
+
+
+    def isNeeded(self):
+        """
+        Return False if rows show only the wiki word so nothing must be
+        built.
+        """
+        if self.before + self.after > 0:
+            return True
+
+        return self.mode == "position" and self.countOccurrences
+
+
+    def request(self, index, readAheadIndices=()):
+        """
+        Queue row index to build as shown row and the rows in
+        readAheadIndices to build afterwards. Called in main thread.
+        """
+        with self.condition:
+            if self.stopped:
+                return
+
+            if not self.pending.get(index, False):
+                self.pending[index] = True
+                self._appendRequest(self.visibleRequests, index)
+
+            for raIndex in readAheadIndices:
+                if raIndex not in self.pending:
+                    self.pending[raIndex] = False
+                    self._appendRequest(self.readAheadRequests, raIndex)
+
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._runThread,
+                        daemon=True)
+                self.thread.start()
+            else:
+                self.condition.notify()
+
+
+    def _appendRequest(self, requests, index):
+        requests.append(index)
+        if len(requests) > self.MAX_QUEUED:
+            # Drop oldest request, the row will be requested again when
+            # it is shown
+            dropped = requests.popleft()
+            if self.pending.get(dropped) == (requests is self.visibleRequests):
+                del self.pending[dropped]
+
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+
+
+    def _popRequest(self):
+        """
+        Return index of next row to build or None. Newest requests come
+        first. Must be called with self.condition acquired.
+        """
+        for requests in (self.visibleRequests, self.readAheadRequests):
+            while requests:
+                index = requests.pop()
+                if self.pending.pop(index, None) is not None:
+                    return index
+
+        return None
+
+
+    def _waitForRequest(self):
+        with self.condition:
+            while not self.stopped:
+                index = self._popRequest()
+                if index is not None:
+                    return index
+
+                if not self.condition.wait(self.IDLE_TIMEOUT):
+                    index = self._popRequest()
+                    if index is not None:
+                        return index
+                    break
+
+            self.thread = None
+            return None
+
+
+    def _runThread(self):
+        # Each thread needs its own clone as an ending thread may still
+        # be in endWikiSearch() when the next one is started
+        sarOp = self.sarOp.clone()
+        try:
+            sarOp.beginWikiSearch(self.wikiDocument)
+            try:
+                while True:
+                    index = self._waitForRequest()
+                    if index is None:
+                        return
+
+                    try:
+                        info = self._buildInfo(sarOp, self.found[index])
+                    except Exception:
+                        traceback.print_exc()
+                        info = _SearchResultItemInfo(self.found[index])
+
+                    callInMainThreadAsync(self.builtCallback, self, index, info)
+            finally:
+                sarOp.endWikiSearch()
+        except Exception:
+            traceback.print_exc()
+            with self.condition:
+                if self.thread is threading.current_thread():
+                    self.thread = None
+
+
+    def buildNow(self, index):
+        """
+        Build row index synchronously and return _SearchResultItemInfo.
+        Called in main thread.
+        """
+        self.mainSarOp.beginWikiSearch(self.wikiDocument)
+        try:
+            return self._buildInfo(self.mainSarOp, self.found[index])
+        finally:
+            self.mainSarOp.endWikiSearch()
+
+
+    def _buildInfo(self, sarOp, wikiWord):
+        before = self.before
+        after = self.after
+        context = before + after
+        maxCountOccurrences = self.maxCountOccurrences
+
+        docPage = self.wikiDocument.getWikiPageNoError(wikiWord)
+        text = docPage.getLiveTextNoTemplate()
+        if text is None:
+            return _SearchResultItemInfo(wikiWord)
+
+        if self.mode == "position":
+            pos = sarOp.searchDocPageAndText(docPage, text)
+            if pos[0] is None:
+                # This can happen e.g. for boolean searches like
+                # 'foo or not bar' on a page which has neither 'foo'
+                # nor 'bar'.
+                
+                # Similar as if no particular text position available
+                if context == 0:
+                    return _SearchResultItemInfo(wikiWord)
+
+                return _SearchResultItemInfo(wikiWord).buildOccurrence(
+                        text, before, after, (-1, -1), -1, 100)
+
+            firstpos = pos
+            
+            info = _SearchResultItemInfo(wikiWord, occPos=pos,
+                    maxOccCount=maxCountOccurrences)
+
+            if self.countOccurrences:
+                occ = 1
+                while True:
+                    pos = sarOp.searchDocPageAndText(docPage, text, pos[1])
+                    if pos[0] is None or pos[0] == pos[1]:
+                        break
+                    occ += 1
+                    if occ > maxCountOccurrences:
+                        occ = -2
+                        break
+
+                info.occCount = occ
+
+            return info.buildOccurrence(text, before, after, firstpos, 1,
+                    maxCountOccurrences)
+
+        elif self.mode == "index":
+            html, firstPos = sarOp.highlightWhooshIndexFound(
+                    text, docPage, context * 2 + 30, context // 2)
+            
+            info = _SearchResultItemInfo(wikiWord, occPos=(firstPos, firstPos))
+            info.setHtmlDirectly(html)
+            return info
+
+        else:
+            return _SearchResultItemInfo(wikiWord).buildOccurrence(
+                    text, before, after, (-1, -1), -1, 100)
+
+
+
 class SearchResultListBox(wx.html.HtmlListBox, MiscEventSourceMixin):
+    # Maximum number of rows for which occurrence contexts are held
+    SNIPPET_CACHE_SIZE = 500
+    # Number of rows after a shown row which are built in advance
+    SNIPPET_READ_AHEAD = 20
+    # Number of hits of an index search fetched at once
+    RANKED_PAGE_LENGTH = 200
+
     def __init__(self, parent, pWiki, ID):
         wx.html.HtmlListBox.__init__(self, parent, ID, style = wx.SUNKEN_BORDER)
 
@@ -137,6 +381,15 @@ class SearchResultListBox(wx.html.HtmlListBox, MiscEventSourceMixin):
         self.found = []
         self.foundinfo = []
         self.searchOp = None # last search operation set by showFound
+        # _SearchResultSnippetBuilder for the rows or None if rows show
+        # only the wiki word
+        self.snippetBuilder = None
+        # Ordered dictionary {index: None} of rows in foundinfo which were
+        # built by snippetBuilder, least recently used first
+        self.builtRows = OrderedDict()
+        # SearchIndex.RankedResults of an index search while further
+        # pages of it are appended to the list
+        self.rankedResults = None
         self.SetItemCount(0)
         self.isShowingSearching = False  # Show a visual feedback only while searching
         self.contextMenuSelection = -2
@@ -161,10 +414,61 @@ class SearchResultListBox(wx.html.HtmlListBox, MiscEventSourceMixin):
             return "<b>" + _("Not found") + "</b>"
 
         try:
-            return self.foundinfo[i].getHtml()
+            info = self.foundinfo[i]
         except IndexError:
             return ""
 
+        if self.snippetBuilder is not None:
+            if i in self.builtRows:
+                self.builtRows.move_to_end(i)
+            else:
+                # Show the wiki word until the row is built
+                end = min(len(self.foundinfo), i + 1 + self.SNIPPET_READ_AHEAD)
+                self.snippetBuilder.request(i, [j for j in range(i + 1, end)
+                        if j not in self.builtRows])
+
+        return info.getHtml()
+
+
+    def _storeBuiltInfo(self, index, info):
+        self.foundinfo[index] = info
+        self.builtRows[index] = None
+        self.builtRows.move_to_end(index)
+
+        while len(self.builtRows) > self.SNIPPET_CACHE_SIZE:
+            dropped = self.builtRows.popitem(last=False)[0]
+            self.foundinfo[dropped] = _SearchResultItemInfo(self.found[dropped])
+
+
+    def _snippetBuilt(self, builder, index, info):
+        """
+        Called in main thread by snippetBuilder when a row was built.
+        """
+        if builder is not self.snippetBuilder or index in self.builtRows:
+            return
+
+        self._storeBuiltInfo(index, info)
+        self.RefreshRow(index)
+
+
+    def _getBuiltInfo(self, index):
+        """
+        Return _SearchResultItemInfo of row index, build it first if needed.
+        """
+        if self.snippetBuilder is not None and index not in self.builtRows:
+            self._storeBuiltInfo(index, self.snippetBuilder.buildNow(index))
+            self.RefreshRow(index)
+
+        return self.foundinfo[index]
+
+
+    def _stopSnippetBuilder(self):
+        if self.snippetBuilder is not None:
+            self.snippetBuilder.stop()
+            self.snippetBuilder = None
+
+        self.builtRows = OrderedDict()
+
     def showSearching(self):
         """
         Shows a "Searching..." as visual feedback while search runs
@@ -201,6 +505,9 @@ class SearchResultListBox(wx.html.HtmlListBox, MiscEventSourceMixin):
         found -- list of matching wiki words
         wikiDocument -- WikiDocument object
         """
+        self._stopSnippetBuilder()
+        self._closeRankedResults()
+
         if found is None or len(found) == 0:
             self.found = []
             self.foundinfo = []
@@ -215,118 +522,14 @@ class SearchResultListBox(wx.html.HtmlListBox, MiscEventSourceMixin):
                 self.searchOp.cycleToStart = True
     
                 self.found = found
-                self.foundinfo = []
-                # Load context settings
-                before = self.pWiki.configuration.getint("main",
-                        "search_wiki_context_before")
-                after = self.pWiki.configuration.getint("main",
-                        "search_wiki_context_after")
-                        
-                countOccurrences = self.pWiki.getConfig().getboolean("main",
-                        "search_wiki_count_occurrences")
-                maxCountOccurrences = self.pWiki.getConfig().getint("main",
-                        "search_wiki_max_count_occurrences", 100)
-
-                context = before + after
-
-                if sarOp.hasParticularTextPosition():
-                    if context == 0 and not countOccurrences:
-                        # No context, no occurrence counting
-                        # -> just a list of found pages
-                        self.foundinfo = [_SearchResultItemInfo(w) for w in found]
-                    else:
-                        # "As is" or regex search
-                        sarOp.beginWikiSearch(self.pWiki.getWikiDocument())
-                        try:
-                            for w in found:
-                                threadstop.testValidThread()
-                                docPage = wikiDocument.getWikiPageNoError(w)
-                                text = docPage.getLiveTextNoTemplate()
-                                if text is None:
-                                    continue
-    
-    #                             pos = sarOp.searchText(text)
-                                pos = sarOp.searchDocPageAndText(docPage, text)
-                                if pos[0] is None:
-                                    # This can happen e.g. for boolean searches like
-                                    # 'foo or not bar' on a page which has neither 'foo'
-                                    # nor 'bar'.
-                                    
-                                    # Similar as if no particular text position available
-                                    if context == 0:
-                                        self.foundinfo.append(
-                                                _SearchResultItemInfo(w))
-                                    else:
-                                        self.foundinfo.append(
-                                                _SearchResultItemInfo(w).buildOccurrence(
-                                                text, before, after, (-1, -1), -1,
-                                                100))
-                                    continue
-                                firstpos = pos
-                                
-                                info = _SearchResultItemInfo(w, occPos=pos,
-                                        maxOccCount=maxCountOccurrences)
-    
-                                if countOccurrences:
-                                    occ = 1
-                                    while True:
-                                        pos = sarOp.searchDocPageAndText(
-                                                docPage, text, pos[1])
-                                        if pos[0] is None or pos[0] == pos[1]:
-                                            break
-                                        occ += 1
-                                        if occ > maxCountOccurrences:
-                                            occ = -2
-                                            break
-    
-                                    info.occCount = occ
-    
-                                self.foundinfo.append(info.buildOccurrence(
-                                        text, before, after, firstpos, 1,
-                                        maxCountOccurrences))
-                        finally:
-                            sarOp.endWikiSearch()
-                elif sarOp.hasWhooshHighlighting():
-                    # Index search
-                    if context == 0:
-                        # No context, occurrence counting doesn't matter
-                        # -> just a list of found pages
-                        self.foundinfo = [_SearchResultItemInfo(w) for w in found]
-                    else:
-                        sarOp.beginWikiSearch(self.pWiki.getWikiDocument())
-                        try:
-                            for w in found:
-                                threadstop.testValidThread()
-                                docPage = wikiDocument.getWikiPageNoError(w)
-                                text = docPage.getLiveTextNoTemplate()
-                                if text is None:
-                                    continue
-    
-                                html, firstPos = sarOp.highlightWhooshIndexFound(
-                                        text, docPage, context * 2 + 30,
-                                        context // 2)
-                                
-                                info = _SearchResultItemInfo(w, occPos=(firstPos, firstPos))
-                                info.setHtmlDirectly(html)
-    
-                                self.foundinfo.append(info)
-                        finally:
-                            sarOp.endWikiSearch()
-                else:  # not sarOp.hasParticularTextPosition():
-                    # No specific position to show as context, so show beginning of page
-                    # Also, no occurrence counting possible
-                    if context == 0:
-                        self.foundinfo = [_SearchResultItemInfo(w) for w in found]
-                    else:
-                        for w in found:
-                            text = wikiDocument.getWikiPageNoError(w).\
-                                    getLiveTextNoTemplate()
-                            if text is None:
-                                continue
-                            self.foundinfo.append(
-                                    _SearchResultItemInfo(w).buildOccurrence(
-                                    text, before, after, (-1, -1), -1, 100))
-                    threadstop.testValidThread()
+                # Rows show only the wiki word at first, contexts and
+                # occurrence counts are built when rows are shown
+                self.foundinfo = [_SearchResultItemInfo(w) for w in found]
+
+                builder = _SearchResultSnippetBuilder(sarOp, wikiDocument,
+                        self.pWiki.getConfig(), found, self._snippetBuilt)
+                if builder.isNeeded():
+                    self.snippetBuilder = builder
                 
                 threadstop.testValidThread()
                 self.isShowingSearching = False
@@ -335,6 +538,7 @@ class SearchResultListBox(wx.html.HtmlListBox, MiscEventSourceMixin):
                         threadstop)
 
             except NotCurrentThreadException:
+                self._stopSnippetBuilder()
                 self.found = []
                 self.foundinfo = []
                 self.isShowingSearching = False
@@ -343,6 +547,70 @@ class SearchResultListBox(wx.html.HtmlListBox, MiscEventSourceMixin):
                 raise
 
 
+    def showFoundRanked(self, sarOp, rankedResults, wikiDocument,
+            threadstop=DUMBTHREADSTOP):
+        """
+        Shows the results of index search operation sarOp in order of rank.
+        Only the first page of the SearchIndex.RankedResults rankedResults
+        is fetched here, further pages are appended when the GUI is idle.
+        Returns the list of found wiki words, it is extended while pages
+        are appended.
+        """
+        try:
+            found = [wikiWord for wikiWord, score in
+                    rankedResults.getPage(0, self.RANKED_PAGE_LENGTH)]
+            self.showFound(sarOp, found, wikiDocument, threadstop=threadstop)
+        except:
+            rankedResults.close()
+            raise
+
+        if len(found) < self.RANKED_PAGE_LENGTH:
+            rankedResults.close()
+        else:
+            self.rankedResults = rankedResults
+            wx.CallAfter(self._appendRankedPage, rankedResults)
+
+        return found
+
+
+    def _appendRankedPage(self, rankedResults):
+        if rankedResults is not self.rankedResults:
+            # Replaced by another search meanwhile
+            return
+
+        try:
+            page = rankedResults.getPage(len(self.found),
+                    self.RANKED_PAGE_LENGTH)
+        except Exception:
+            traceback.print_exc()
+            page = []
+
+        self.found.extend(wikiWord for wikiWord, score in page)
+        self.foundinfo.extend(_SearchResultItemInfo(wikiWord)
+                for wikiWord, score in page)
+        self.SetItemCount(len(self.foundinfo))
+
+        if len(page) < self.RANKED_PAGE_LENGTH:
+            self._closeRankedResults()
+        else:
+            wx.CallAfter(self._appendRankedPage, rankedResults)
+
+
+    def completeRankedFound(self):
+        """
+        Append all pages of a running index search at once, so the found
+        list is complete afterwards.
+        """
+        while self.rankedResults is not None:
+            self._appendRankedPage(self.rankedResults)
+
+
+    def _closeRankedResults(self):
+        if self.rankedResults is not None:
+            self.rankedResults.close()
+            self.rankedResults = None
+
+
     def GetSelectedWord(self):
         sel = self.GetSelection()
         if sel == -1 or self.GetCount() == 0:
@@ -366,7 +634,7 @@ class SearchResultListBox(wx.html.HtmlListBox, MiscEventSourceMixin):
         if sel == -1:
             return
         
-        info = self.foundinfo[sel]
+        info = self._getBuiltInfo(sel)
         if info.occPos[0] == -1 or info.occPos[1] is None:
             return
         if info.occNumber == -1:
@@ -423,7 +691,7 @@ class SearchResultListBox(wx.html.HtmlListBox, MiscEventSourceMixin):
         if sel == -1 or self.GetCount() == 0:
             return
 
-        info = self.foundinfo[sel]
+        info = self._getBuiltInfo(sel)
 
         self.pWiki.openWikiPage(info.wikiWord)
 
@@ -484,7 +752,7 @@ class SearchResultListBox(wx.html.HtmlListBox, MiscEventSourceMixin):
             self._pageListFindNext()
             return
         
-        info = self.foundinfo[hitsel]
+        info = self._getBuiltInfo(hitsel)
 
         if evt.ControlDown():
             configCode = self.pWiki.getConfig().getint("main",
@@ -559,7 +827,7 @@ class SearchResultListBox(wx.html.HtmlListBox, MiscEventSourceMixin):
 
     def OnActivateThis(self, evt):
         if self.contextMenuSelection > -1:
-            info = self.foundinfo[self.contextMenuSelection]
+            info = self._getBuiltInfo(self.contextMenuSelection)
 
 #             presenter = self.pWiki.activateWikiWord(info.wikiWord, 0)
             presenter = self.pWiki.activatePageByUnifiedName(
@@ -582,7 +850,7 @@ class SearchResultListBox(wx.html.HtmlListBox, MiscEventSourceMixin):
 
     def OnActivateNewTabThis(self, evt):
         if self.contextMenuSelection > -1:
-            info = self.foundinfo[self.contextMenuSelection]
+            info = self._getBuiltInfo(self.contextMenuSelection)
 
 #             presenter = self.pWiki.activateWikiWord(info.wikiWord, 2)
             presenter = self.pWiki.activatePageByUnifiedName(
@@ -605,7 +873,7 @@ class SearchResultListBox(wx.html.HtmlListBox, MiscEventSourceMixin):
 
     def OnActivateNewTabBackgroundThis(self, evt):
         if self.contextMenuSelection > -1:
-            info = self.foundinfo[self.contextMenuSelection]
+            info = self._getBuiltInfo(self.contextMenuSelection)
 
 #             presenter = self.pWiki.activateWikiWord(info.wikiWord, 3)
             presenter = self.pWiki.activatePageByUnifiedName(
@@ -1394,15 +1662,25 @@ class SearchWikiDialog(wx.Dialog, MiscEventSourceMixin):
         for win in disableSet:
             win.Disable()
         try:
-            self.foundPages = self.mainControl.getWikiDocument().searchWiki(
-                    sarOp, self.allowOrdering, threadstop=threadstop)
-            if not self.allowOrdering:
-                # Use default alphabetical ordering
-                self.mainControl.getCollator().sort(self.foundPages)
-
-            self.ctrls.htmllbPages.showFound(sarOp, self.foundPages,
-                    self.mainControl.getWikiDocument(),
-                    threadstop=threadstop)
+            if sarOp.indexSearch != "no":
+                # Show hits in order of rank, first ones at once
+                rankedResults = self.mainControl.getWikiDocument()\
+                        .searchWikiRanked(sarOp, threadstop=threadstop)
+                self.foundPages = self.ctrls.htmllbPages.showFoundRanked(
+                        sarOp, rankedResults,
+                        self.mainControl.getWikiDocument(),
+                        threadstop=threadstop)
+            else:
+                self.foundPages = self.mainControl.getWikiDocument()\
+                        .searchWiki(sarOp, self.allowOrdering,
+                        threadstop=threadstop)
+                if not self.allowOrdering:
+                    # Use default alphabetical ordering
+                    self.mainControl.getCollator().sort(self.foundPages)
+    
+                self.ctrls.htmllbPages.showFound(sarOp, self.foundPages,
+                        self.mainControl.getWikiDocument(),
+                        threadstop=threadstop)
 
             self.listNeedsRefresh = False
 
@@ -1904,6 +2182,8 @@ class SearchWikiDialog(wx.Dialog, MiscEventSourceMixin):
         langHelper = wx.GetApp().createWikiLanguageHelper(
                 self.mainControl.getWikiDefaultWikiLanguage())
 
+        self.ctrls.htmllbPages.completeRankedFound()
+
         wordsText = "".join([
                 langHelper.createAbsoluteLinksFromWikiWords((w,)) + "\n"
                 for w in self.foundPages])
@@ -2590,12 +2870,20 @@ class FastSearchPopup(wx.Frame):
         for win in disableSet:
             win.Disable()
         try:
-            self.foundPages = self.mainControl.getWikiDocument().searchWiki(
-                    self.sarOp, threadstop=threadstop)
-            self.mainControl.getCollator().sort(self.foundPages)
-            self.resultBox.showFound(self.sarOp, self.foundPages,
-                    self.mainControl.getWikiDocument(),
-                    threadstop=threadstop)
+            if self.sarOp.indexSearch != "no":
+                # Show hits in order of rank, first ones at once
+                rankedResults = self.mainControl.getWikiDocument()\
+                        .searchWikiRanked(self.sarOp, threadstop=threadstop)
+                self.foundPages = self.resultBox.showFoundRanked(self.sarOp,
+                        rankedResults, self.mainControl.getWikiDocument(),
+                        threadstop=threadstop)
+            else:
+                self.foundPages = self.mainControl.getWikiDocument()\
+                        .searchWiki(self.sarOp, threadstop=threadstop)
+                self.mainControl.getCollator().sort(self.foundPages)
+                self.resultBox.showFound(self.sarOp, self.foundPages,
+                        self.mainControl.getWikiDocument(),
+                        threadstop=threadstop)
 
             self.listNeedsRefresh = False
 
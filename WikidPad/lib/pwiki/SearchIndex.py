@@ -0,0 +1,806 @@
+"""
+Backends for the index search.
+
+The index maps the unified names of pages (e.g. "wikipage/WikiWord") to their
+content. Two backends are available:
+
+"whoosh" -- The bundled whoosh library, the index is stored in the
+        "indexsearch" directory of the wiki.
+
+"fts5" -- An SQLite FTS5 table inside the wiki database. Updates are part of
+        the normal database transactions, so the index entry of a page can be
+        written in the same transaction as the page content.
+
+Both backends provide the subset of the whoosh index API used by WikidPad:
+writer() returns an object with delete_by_term(), add_document(), commit()
+and cancel(), search() takes a whoosh query as returned by
+SearchReplaceOperation.getWhooshIndexQuery() and returns the unified names
+of the found pages. For FTS5 the whoosh query is translated to an FTS5 query.
+
+rankedSearch() returns a RankedResults object instead which delivers the
+hits ordered by score in pages on demand.
+
+Updates done in the background by the update executor are collected by a
+SearchIndexUpdater and written in batches.
+"""
+
+import os, os.path, threading, time
+
+import Consts
+
+
+# Names of the tables in the wiki database used by the FTS5 backend.
+# The FTS table holds the content, its rowid is the id in the names table
+FTS5_TABLE = "fulltextindex"
+FTS5_VOCAB_TABLE = "fulltextindex_vocab"
+FTS5_NAMES_TABLE = "fulltextindexnames"
+
+# Tokenizing similar to whoosh' StandardAnalyzer: no removal of diacritics,
+# underscore is part of words
+FTS5_TOKENIZE = "unicode61 remove_diacritics 0 tokenchars '_'"
+
+# Maximum number of terms a wildcard or range query may be expanded to
+FTS5_MAX_EXPANDED_TERMS = 1024
+
+
+# ---------- Low level functions working on a connection wrapper ----------
+# They are called by the WikiData implementations
+
+def fts5IsAvailable(connWrap):
+    """
+    Return True if the sqlite library supports FTS5.
+    """
+    try:
+        if fts5TablesExist(connWrap):
+            return True
+
+        connWrap.execSql("create virtual table temp.fts5probe using fts5(x)")
+        connWrap.execSql("drop table temp.fts5probe")
+        return True
+    except Exception:
+        return False
+
+
+def fts5TablesExist(connWrap):
+    return connWrap.execSqlQuerySingleItem("select count(*) from "
+            "sqlite_master where name = ?", (FTS5_NAMES_TABLE,)) > 0
+
+
+def fts5CreateTables(connWrap):
+    connWrap.execSql("create table if not exists %s ("
+            "id integer primary key, "
+            "unifName text not null unique, "
+            "modTimestamp real not null default 0)" % FTS5_NAMES_TABLE)
+    connWrap.execSql("create virtual table if not exists %s using "
+            "fts5(content, tokenize = \"%s\")" % (FTS5_TABLE, FTS5_TOKENIZE))
+    connWrap.execSql("create virtual table if not exists %s using "
+            "fts5vocab(%s, 'row')" % (FTS5_VOCAB_TABLE, FTS5_TABLE))
+
+
+def fts5DropTables(connWrap):
+    connWrap.execSql("drop table if exists %s" % FTS5_VOCAB_TABLE)
+    connWrap.execSql("drop table if exists %s" % FTS5_TABLE)
+    connWrap.execSql("drop table if exists %s" % FTS5_NAMES_TABLE)
+
+
+def fts5Update(connWrap, removeNames, documents):
+    """
+    Remove documents with unified names in  removeNames, then add
+    documents, a sequence of tuples (unifName, modTimestamp, content).
+    An existing document with the same name is replaced.
+    """
+    fts5CreateTables(connWrap)
+
+    for unifName in list(removeNames) + [doc[0] for doc in documents]:
+        docId = connWrap.execSqlQuerySingleItem("select id from %s "
+                "where unifName = ?" % FTS5_NAMES_TABLE, (unifName,))
+        if docId is None:
+            continue
+
+        connWrap.execSql("delete from %s where rowid = ?" % FTS5_TABLE,
+                (docId,))
+        connWrap.execSql("delete from %s where id = ?" % FTS5_NAMES_TABLE,
+                (docId,))
+
+    for unifName, modTimestamp, content in documents:
+        connWrap.execSql("insert into %s(unifName, modTimestamp) "
+                "values (?, ?)" % FTS5_NAMES_TABLE, (unifName, modTimestamp))
+        docId = connWrap.execSqlQuerySingleItem("select id from %s "
+                "where unifName = ?" % FTS5_NAMES_TABLE, (unifName,))
+        connWrap.execSql("insert into %s(rowid, content) values (?, ?)" %
+                FTS5_TABLE, (docId, content))
+
+
+def fts5Clear(connWrap):
+    fts5CreateTables(connWrap)
+    connWrap.execSql("delete from %s" % FTS5_TABLE)
+    connWrap.execSql("delete from %s" % FTS5_NAMES_TABLE)
+
+
+
+# ---------- Translation of whoosh queries to FTS5 ----------
+
+class UnsupportedQueryError(Exception):
+    """
+    Raised if a whoosh query can't be translated to FTS5.
+    """
+
+
+# Query plans: a string is an FTS5 match expression, the other forms are
+# evaluated by SQL set operations
+_PLAN_ALL = ("all",)
+_PLAN_NONE = ("none",)
+
+
+def _quoteFts5(text):
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _wildcardToGlob(text):
+    # "*" and "?" have the same meaning, "[" is special only for GLOB
+    return text.replace("[", "[[]")
+
+
+class Fts5QueryTranslator:
+    """
+    Translates whoosh query objects to a plan which can be executed by
+    buildSql(). Terms of wildcard and range queries are looked up in the
+    index vocabulary by calling  termQuery(sql, params).
+    """
+    def __init__(self, termQuery, fieldName="content"):
+        self.termQuery = termQuery
+        self.fieldName = fieldName
+
+
+    def translate(self, q):
+        from whoosh import query
+
+        if q is query.NullQuery:
+            return _PLAN_NONE
+
+        if isinstance(q, query.Every):
+            return _PLAN_ALL
+
+        if isinstance(q, query.Not):
+            return ("not", self.translate(q.query))
+
+        if isinstance(q, query.AndNot):
+            return self._and([self.translate(q.a),
+                    ("not", self.translate(q.b))])
+
+        if isinstance(q, query.AndMaybe):
+            # The optional part only changes the scoring
+            return self.translate(q.a)
+
+        if isinstance(q, query.Require):
+            return self._and([self.translate(q.a), self.translate(q.b)])
+
+        if isinstance(q, query.And):
+            return self._and([self.translate(sq) for sq in q.subqueries])
+
+        if isinstance(q, (query.Or, query.DisjunctionMax)):
+            return self._or([self.translate(sq) for sq in q.subqueries])
+
+        fieldName = getattr(q, "fieldname", None)
+        if fieldName == "unifName" and type(q) is query.Term:
+            return ("unifName", q.text)
+
+        if fieldName != self.fieldName:
+            # Other fields aren't indexed by content
+            return _PLAN_NONE
+
+        if type(q) is query.Term:
+            return _quoteFts5(q.text)
+
+        if isinstance(q, query.Phrase):
+            if len(q.words) == 0:
+                return _PLAN_NONE
+            if q.slop <= 1 or len(q.words) == 1:
+                return _quoteFts5(" ".join(q.words))
+
+            # FTS5 has no ordered phrases with gaps, NEAR is the
+            # nearest (unordered) equivalent
+            return "NEAR(%s, %i)" % (" ".join(_quoteFts5(w) for w in q.words),
+                    (q.slop - 1) * (len(q.words) - 1))
+
+        if isinstance(q, query.Prefix):
+            return _quoteFts5(q.text) + " *"
+
+        if isinstance(q, query.Wildcard):
+            text = q.text
+            if text.endswith("*") and "*" not in text[:-1] and \
+                    "?" not in text:
+                return _quoteFts5(text[:-1]) + " *"
+
+            return self._terms("term glob ?", (_wildcardToGlob(text),))
+
+        if isinstance(q, query.TermRange):
+            conds = []
+            params = []
+            if q.start is not None:
+                conds.append("term >= ?" if not q.startexcl else "term > ?")
+                params.append(q.start)
+            if q.end is not None:
+                conds.append("term <= ?" if not q.endexcl else "term < ?")
+                params.append(q.end)
+            if not conds:
+                return _PLAN_ALL
+
+            return self._terms(" and ".join(conds), params)
+
+        raise UnsupportedQueryError(repr(q))
+
+
+    def _terms(self, condition, params):
+        terms = self.termQuery("select term from %s where %s limit %i" %
+                (FTS5_VOCAB_TABLE, condition, FTS5_MAX_EXPANDED_TERMS + 1),
+                tuple(params))
+
+        if len(terms) > FTS5_MAX_EXPANDED_TERMS:
+            raise UnsupportedQueryError(_("Too many matching terms"))
+
+        if len(terms) == 0:
+            return _PLAN_NONE
+
+        return " OR ".join(_quoteFts5(t) for t in terms)
+
+
+    @staticmethod
+    def _and(plans):
+        plans = [p for p in plans if p != _PLAN_ALL]
+        if _PLAN_NONE in plans:
+            return _PLAN_NONE
+        if len(plans) == 0:
+            return _PLAN_ALL
+        if len(plans) == 1:
+            return plans[0]
+
+        positives = [p for p in plans if isinstance(p, str)]
+        negatives = [p[1] for p in plans
+                if isinstance(p, tuple) and p[0] == "not" and
+                isinstance(p[1], str)]
+
+        if len(positives) + len(negatives) < len(plans) or \
+                len(positives) == 0:
+            return ("and", plans)
+
+        expr = " AND ".join("(%s)" % p for p in positives)
+        for n in negatives:
+            expr = "(%s) NOT (%s)" % (expr, n)
+
+        return expr
+
+
+    @staticmethod
+    def _or(plans):
+        plans = [p for p in plans if p != _PLAN_NONE]
+        if _PLAN_ALL in plans:
+            return _PLAN_ALL
+        if len(plans) == 0:
+            return _PLAN_NONE
+        if len(plans) == 1:
+            return plans[0]
+
+        if all(isinstance(p, str) for p in plans):
+            return " OR ".join("(%s)" % p for p in plans)
+
+        return ("or", plans)
+
+
+    @staticmethod
+    def buildSql(plan):
+        """
+        Return tuple (sql, params) for a query returning the unified names
+        of all documents matching the plan.
+        """
+        params = []
+
+        def buildIds(plan):
+            # Returns select statement with single column "id"
+            if isinstance(plan, str):
+                params.append(plan)
+                return "select rowid as id from %s where %s match ?" % \
+                        (FTS5_TABLE, FTS5_TABLE)
+            if plan == _PLAN_ALL:
+                return "select id from %s" % FTS5_NAMES_TABLE
+            if plan == _PLAN_NONE:
+                return "select id from %s where 0" % FTS5_NAMES_TABLE
+            if plan[0] == "unifName":
+                params.append(plan[1])
+                return "select id from %s where unifName = ?" % \
+                        FTS5_NAMES_TABLE
+            if plan[0] == "not":
+                return "select id from %s except select id from (%s)" % \
+                        (FTS5_NAMES_TABLE, buildIds(plan[1]))
+
+            op = " intersect " if plan[0] == "and" else " union "
+            return op.join("select id from (%s)" % buildIds(p)
+                    for p in plan[1])
+
+        sql = "select unifName from %s where id in (%s)" % \
+                (FTS5_NAMES_TABLE, buildIds(plan))
+
+        return sql, tuple(params)
+
+
+
+# ---------- Ranked results ----------
+
+class RankedResults:
+    """
+    Hits of a search ordered by descending score. Only documents whose
+    unified name starts with a prefix are hits. A hit is a tuple
+    (name, score) where name is the unified name without the prefix.
+
+    This base class holds a fixed list of hits, the backends derive
+    from it to collect the hits on demand.
+    """
+    def __init__(self, hits=()):
+        self.hits = list(hits)
+
+
+    def getLength(self):
+        """
+        Return total number of hits.
+        """
+        return len(self.hits)
+
+
+    def getPage(self, offset, count):
+        """
+        Return list of at most count hits starting at hit number offset.
+        """
+        return self.hits[offset:offset + count]
+
+
+    def iterPages(self, pageLength):
+        """
+        Iterator over the hits as lists of pageLength hits (the last one
+        may be shorter). Stopping the iteration early avoids collecting
+        the remaining hits.
+        """
+        offset = 0
+        while True:
+            page = self.getPage(offset, pageLength)
+            if len(page) > 0:
+                yield page
+            if len(page) < pageLength:
+                return
+
+            offset += len(page)
+
+
+    def close(self):
+        """
+        Free resources held for fetching further pages.
+        """
+        pass
+
+
+
+class WhooshRankedResults(RankedResults):
+    """
+    Hits are collected by the top-N collector of whoosh for as many hits
+    as pages were requested so far. If the index changes meanwhile, new
+    hits are appended after the ones collected before, so the order isn't
+    exactly the ranking then. A searcher is only open while
+    collecting, so results which are neither read to the end nor closed
+    (e.g. the children of a search node in the tree) don't keep files of
+    the index open.
+    """
+    def __init__(self, index, q, prefix):
+        from whoosh.query import Prefix
+
+        RankedResults.__init__(self)
+        self.lock = threading.RLock()
+        self.index = index
+        self.q = q
+        self.prefix = prefix
+        self.filterQuery = Prefix("unifName", prefix)
+        self.length = None
+        # Names in self.hits
+        self.hitNames = set()
+        # True if self.hits contains all hits
+        self.complete = False
+        self.closed = False
+
+
+    def _collect(self, count):
+        # Collect at least twice as many hits as before, so reading all
+        # hits page by page doesn't take quadratic time
+        limit = max(count, len(self.hits) * 2, 1)
+        prefixLen = len(self.prefix)
+
+        with self.index.searcher() as searcher:
+            results = searcher.search(self.q, limit=limit,
+                    filter=self.filterQuery)
+
+            # The index may have changed since the last collection. Hits
+            # collected before keep their position, so pages already
+            # returned aren't repeated or skipped
+            newHits = []
+            hitCount = 0
+            for hit in results:
+                hitCount += 1
+                name = hit["unifName"][prefixLen:]
+                if name not in self.hitNames:
+                    self.hitNames.add(name)
+                    newHits.append((name, hit.score))
+
+            self.hits += newHits
+            self.length = max(len(results), len(self.hits))
+            if hitCount < limit:
+                self.complete = True
+                self.length = len(self.hits)
+
+
+    def getLength(self):
+        with self.lock:
+            if self.length is None:
+                self._collect(1)
+
+            return self.length
+
+
+    def getPage(self, offset, count):
+        with self.lock:
+            if not self.complete and offset + count > len(self.hits):
+                if self.closed:
+                    raise ValueError("Ranked results are closed")
+
+                self._collect(offset + count)
+
+            return self.hits[offset:offset + count]
+
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+
+
+
+class Fts5RankedResults(RankedResults):
+    """
+    Each requested page is read by a query ordered by the bm25() rank of
+    FTS5. Queries which can't be expressed as a single FTS5 match (e.g.
+    pure negations) have no rank, all their hits have score 0 and are
+    ordered by name.
+    """
+    def __init__(self, wikiData, q, prefix):
+        RankedResults.__init__(self)
+        self.wikiData = wikiData
+        self.prefixLen = len(prefix)
+        self.length = None
+
+        translator = Fts5QueryTranslator(wikiData.queryFullTextIndex)
+        plan = translator.translate(q)
+
+        if isinstance(plan, str):
+            self.fromSql = ("from {0} join {1} on {1}.id = {0}.rowid "
+                    "where {0} match ? and substr({1}.unifName, 1, ?) = ?")\
+                    .format(FTS5_TABLE, FTS5_NAMES_TABLE)
+            self.params = (plan, len(prefix), prefix)
+            self.pageSql = ("select {1}.unifName, -{0}.rank " +
+                    self.fromSql + " order by {0}.rank limit ? offset ?")\
+                    .format(FTS5_TABLE, FTS5_NAMES_TABLE)
+        else:
+            sql, params = translator.buildSql(plan)
+            self.fromSql = "from (%s) where substr(unifName, 1, ?) = ?" % sql
+            self.params = params + (len(prefix), prefix)
+            self.pageSql = "select unifName, 0.0 " + self.fromSql + \
+                    " order by unifName limit ? offset ?"
+
+
+    def getLength(self):
+        if self.length is None:
+            self.length = self.wikiData.queryFullTextIndex(
+                    "select count(*) " + self.fromSql, self.params)[0]
+
+        return self.length
+
+
+    def getPage(self, offset, count):
+        return [(unifName[self.prefixLen:], score) for unifName, score in
+                self.wikiData.queryFullTextIndexRows(self.pageSql,
+                self.params + (count, offset))]
+
+
+
+# ---------- Backends ----------
+
+class WhooshSearchIndex:
+    """
+    Search index stored by whoosh in directory  indexPath.
+    """
+    def __init__(self, indexPath, schema, clear=False):
+        import whoosh.index, whoosh.writing
+
+        whoosh.writing.DOCLENGTH_TYPE = "l"
+        whoosh.writing.DOCLENGTH_LIMIT = 2 ** 31 - 1
+
+        if not os.path.exists(indexPath):
+            os.mkdir(indexPath)
+
+        if clear or not whoosh.index.exists_in(indexPath):
+            whoosh.index.create_in(indexPath, schema)
+
+        self.index = whoosh.index.open_dir(indexPath)
+
+
+    @staticmethod
+    def getBackendName():
+        return "whoosh"
+
+    @staticmethod
+    def isTransactional():
+        """
+        True if updates become part of the wiki database transaction.
+        """
+        return False
+
+    @staticmethod
+    def exists(indexPath):
+        import whoosh.index
+
+        return os.path.exists(indexPath) and whoosh.index.exists_in(indexPath)
+
+
+    def refresh(self):
+        self.index = self.index.refresh()
+
+
+    def close(self):
+        if self.index is not None:
+            self.index.close()
+            self.index = None
+
+
+    def writer(self, timeout=0.0):
+        return self.index.writer(timeout=timeout)
+
+
+    def searcher(self):
+        return self.index.searcher()
+
+
+    def search(self, q):
+        """
+        Return list of unified names of documents matching whoosh query q.
+        """
+        with self.index.searcher() as s:
+            return [rd["unifName"] for rd in s.search(q, limit=None)]
+
+
+    def rankedSearch(self, q, prefix):
+        """
+        Return RankedResults of documents matching whoosh query q whose
+        unified name starts with prefix.
+        """
+        return WhooshRankedResults(self.index, q, prefix)
+
+
+
+class Fts5IndexWriter:
+    """
+    Collects changes and writes them to the database (after a number of
+    added documents and on commit()). To update the index as part of another
+    transaction, call WikiData.updateFullTextIndex() directly instead.
+    """
+    # Write to database after this number of added documents
+    _FLUSH_COUNT = 100
+
+    def __init__(self, searchIndex):
+        self.searchIndex = searchIndex
+        self.removeNames = []
+        self.documents = []
+
+
+    def delete_by_term(self, fieldName, text):
+        if fieldName != "unifName":
+            raise UnsupportedQueryError(fieldName)
+
+        self.removeNames.append(text)
+
+
+    def add_document(self, unifName, modTimestamp=0, content=""):
+        self.documents.append((unifName, modTimestamp, content))
+        if len(self.documents) >= self._FLUSH_COUNT:
+            self._flush()
+
+
+    def update_document(self, unifName, modTimestamp=0, content=""):
+        self.delete_by_term("unifName", unifName)
+        self.add_document(unifName, modTimestamp, content)
+
+
+    def _flush(self):
+        if self.removeNames or self.documents:
+            self.searchIndex.wikiData.updateFullTextIndex(self.removeNames,
+                    self.documents)
+        self.removeNames = []
+        self.documents = []
+
+
+    def commit(self):
+        self._flush()
+        self.searchIndex.wikiData.commit()
+
+
+    def cancel(self):
+        self.removeNames = []
+        self.documents = []
+
+
+
+class Fts5SearchIndex:
+    """
+    Search index stored in an FTS5 table of the wiki database, accessed
+    through the WikiData object  wikiData.
+    """
+    def __init__(self, wikiData, clear=False):
+        self.wikiData = wikiData
+        if clear:
+            self.wikiData.clearFullTextIndex()
+
+
+    @staticmethod
+    def getBackendName():
+        return "fts5"
+
+    @staticmethod
+    def isTransactional():
+        return True
+
+
+    def refresh(self):
+        pass
+
+
+    def close(self):
+        self.wikiData = None
+
+
+    def writer(self, timeout=0.0):
+        return Fts5IndexWriter(self)
+
+
+    def search(self, q):
+        """
+        Return list of unified names of documents matching whoosh query q.
+        """
+        translator = Fts5QueryTranslator(self.wikiData.queryFullTextIndex)
+        sql, params = translator.buildSql(translator.translate(q))
+
+        return self.wikiData.queryFullTextIndex(sql, params)
+
+
+    def rankedSearch(self, q, prefix):
+        """
+        Return RankedResults of documents matching whoosh query q whose
+        unified name starts with prefix.
+        """
+        return Fts5RankedResults(self.wikiData, q, prefix)
+
+
+
+# ---------- Batched updates from the update executor ----------
+
+# Pending index updates are written after this number of pages or seconds
+# or when the index queue of the update executor runs empty
+UPDATER_MAX_PENDING = 500
+UPDATER_MAX_DELAY = 10.0
+
+
+class SearchIndexUpdater:
+    """
+    Collects the index updates of pages done by the update executor and
+    writes them with one writer. Repeated updates of the same page are
+    coalesced, the last one wins.
+    """
+    def __init__(self, wikiDocument):
+        self.wikiDocument = wikiDocument
+        self.lock = threading.RLock()
+        # {unifName: (page, liveTextPlaceHold, modTimestamp, content) or
+        # None to remove document}
+        self.pending = {}
+        self.firstPendingTime = None
+        self.flushQueued = False
+
+
+    def getPendingCount(self):
+        return len(self.pending)
+
+
+    def put(self, page, liveTextPlaceHold, modTimestamp, content):
+        """
+        Queue the update of the index for  page. It is only written if
+        liveTextPlaceHold is still current at that time.
+        """
+        with self.lock:
+            self.pending[page.getUnifiedPageName()] = (page, liveTextPlaceHold,
+                    modTimestamp, content)
+            self._changed()
+
+
+    def remove(self, unifName):
+        with self.lock:
+            self.pending[unifName] = None
+            self._changed()
+
+
+    def _changed(self):
+        if self.firstPendingTime is None:
+            self.firstPendingTime = time.time()
+
+        wikiDoc = self.wikiDocument
+        if len(self.pending) >= UPDATER_MAX_PENDING or \
+                time.time() - self.firstPendingTime >= UPDATER_MAX_DELAY or \
+                wikiDoc.getUpdateExecutor().getJobCount(wikiDoc.UEQUEUE_INDEX,
+                wikiDoc.UEQUEUE_INDEX + 1) == 0:
+            self.flush()
+        elif not self.flushQueued:
+            # The last job in the index queue may not put anything, so
+            # write the rest when the executor has no more jobs
+            self.flushQueued = True
+            wikiDoc.getUpdateExecutor().executeAsync(
+                    wikiDoc.UEQUEUE_INDEX + 1, self.flush)
+
+
+    def discard(self):
+        with self.lock:
+            self.pending = {}
+            self.firstPendingTime = None
+            # A queued flush job may be dropped with the executor queues
+            self.flushQueued = False
+
+
+    def flush(self):
+        """
+        Write and commit pending updates.
+        """
+        with self.lock:
+            pending = self.pending
+            self.pending = {}
+            self.firstPendingTime = None
+            self.flushQueued = False
+
+            if len(pending) == 0:
+                return
+
+            searchIdx = self.wikiDocument.getSearchIndex()
+            if searchIdx is None:
+                return
+
+            written = []
+            writer = searchIdx.writer(timeout=Consts.DEADBLOCKTIMEOUT)
+            try:
+                for unifName, entry in pending.items():
+                    if entry is None:
+                        writer.delete_by_term("unifName", unifName)
+                        continue
+
+                    page, liveTextPlaceHold, modTimestamp, content = entry
+                    # Check within lock if data is current yet. If not, page
+                    # is processed again later
+                    with page.getTextOperationLock():
+                        if page.isInvalid() or \
+                                liveTextPlaceHold is not page.liveTextPlaceHold:
+                            continue
+
+                    writer.delete_by_term("unifName", unifName)
+                    writer.add_document(unifName=unifName,
+                            modTimestamp=modTimestamp, content=content)
+                    written.append(entry)
+            except:
+                writer.cancel()
+                raise
+
+            writer.commit()
+
+            wikiData = self.wikiDocument.getWikiData()
+            for page, liveTextPlaceHold, modTimestamp, content in written:
+                with page.getTextOperationLock():
+                    if not page.isInvalid() and \
+                            liveTextPlaceHold is page.liveTextPlaceHold:
+                        wikiData.setMetaDataState(page.getWikiWord(),
+                                Consts.WIKIWORDMETADATA_STATE_INDEXED)
@@ -1,3 +1,4 @@
+import struct
 from struct import pack, unpack
 import io
 
@@ -108,6 +109,19 @@ class SerializeStream:
             return val
 
 
+    def serFloat64(self, val):
+        """
+        Serialize 64bit floating point value val. This means: if stream is in
+        read mode, val is ignored and the float read from stream is returned,
+        if in write mode, val is written and returned
+        """
+        if self.isReadMode():
+            return unpack(">d", self.readBytes(8))[0]
+        else:
+            self.writeBytes(pack(">d", val))
+            return val
+
+
     def serByteBlock(self, s):
         """
         Serialize byte block s, including length. This means: if stream is in read
@@ -134,6 +148,16 @@ class SerializeStream:
             return us
 
 
+    def serOptUniUtf8(self, us):
+        """
+        Serialize unicode string or None
+        """
+        if self.serBool(us is not None):
+            return self.serUniUtf8(us)
+        else:
+            return None
+
+
     def serBool(self, tv):
         """
         Serialize boolean truth value
@@ -215,6 +239,101 @@ class SerializeStream:
 
 
 
+# ---------- Compact binary format for overviews ----------
+# Used by version overview, trashcan and wiki-wide history instead of XML.
+# The header is followed by one length-prefixed record per entry, so
+# an entry can be appended without touching the records before it.
+
+COMPACT_OVERVIEW_MAGIC = b"WdOvw"
+
+COMPACT_OVERVIEW_FORMAT_VERSION = 0
+
+
+def isCompactOverview(content):
+    """
+    Return True iff bytestring content is an overview in compact format
+    (instead of legacy XML).
+    """
+    return isinstance(content, Consts.BYTETYPES) and \
+            content.startswith(COMPACT_OVERVIEW_MAGIC)
+
+
+def buildCompactRecord(serFunc):
+    """
+    Call serFunc with a SerializeStream in write mode and return the written
+    bytes as length-prefixed record.
+    """
+    stream = SerializeStream(byteBuf=b"", readMode=False)
+    serFunc(stream)
+    data = stream.getBytes()
+
+    return pack(">I", len(data)) + data
+
+
+def buildCompactOverview(kind, records):
+    """
+    Return compact overview bytestring of type kind (e.g. "versionOverview")
+    containing the records created by buildCompactRecord().
+    """
+    stream = SerializeStream(byteBuf=b"", readMode=False)
+    stream.writeBytes(COMPACT_OVERVIEW_MAGIC)
+    stream.serUint8(COMPACT_OVERVIEW_FORMAT_VERSION)
+    # Read compatibility version
+    stream.serUint8(COMPACT_OVERVIEW_FORMAT_VERSION)
+    stream.serUniUtf8(kind)
+
+    return stream.getBytes() + b"".join(records)
+
+
+def iterCompactOverviewRecords(content, kind):
+    """
+    Check header of compact overview bytestring content and return iterator
+    of tuples (record, stream) for each record. stream is a SerializeStream
+    in read mode to read the record data. Raises SerializationException
+    if content is damaged, of wrong kind or of an unsupported version.
+    """
+    stream = SerializeStream(byteBuf=content)
+
+    if stream.readBytes(len(COMPACT_OVERVIEW_MAGIC)) != COMPACT_OVERVIEW_MAGIC:
+        raise SerializationException("Not a compact overview")
+
+    try:
+        stream.serUint8(0)  # Format version
+        readCompatVersion = stream.serUint8(0)
+        if readCompatVersion > COMPACT_OVERVIEW_FORMAT_VERSION:
+            raise SerializationException(
+                    "Wrong version no. %s for compact overview" %
+                    readCompatVersion)
+
+        contentKind = stream.serUniUtf8("")
+    except (struct.error, UnicodeDecodeError):
+        raise SerializationException("Compact overview damaged")
+
+    if contentKind != kind:
+        raise SerializationException("Compact overview of kind %s instead of %s"
+                % (contentKind, kind))
+
+    return _iterCompactRecords(stream)
+
+
+def _iterCompactRecords(stream):
+    while True:
+        lengthBytes = stream.readBytes(4)
+        if len(lengthBytes) == 0:
+            return
+
+        if len(lengthBytes) < 4:
+            raise SerializationException("Compact overview damaged")
+
+        length = unpack(">I", lengthBytes)[0]
+        data = stream.readBytes(length)
+        if len(data) < length:
+            raise SerializationException("Compact overview damaged")
+
+        yield lengthBytes + data, SerializeStream(byteBuf=data)
+
+
+
 def findXmlElementFlat(xmlNode, tag, excOnFail=True):
     """
     Search children of xmlNode until finding an element with tag  tag  and
@@ -206,7 +206,8 @@ def bind_text(stmt, parno, data):
     """
     See bind_blob for description.
     """
-    stmt.errhandler(_dll.sqlite3_bind_text(stmt._stmtpointer, parno, c_char_p(utf8Enc(data)), len(data), SQLITE_TRANSIENT))
+    data = utf8Enc(data)
+    stmt.errhandler(_dll.sqlite3_bind_text(stmt._stmtpointer, parno, c_char_p(data), len(data), SQLITE_TRANSIENT))
 
 
 def bind_null(stmt, parno, data=None):
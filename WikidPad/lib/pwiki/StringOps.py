@@ -7,10 +7,10 @@ creating diff information for plain byte sequences
 
 import os, traceback
 
-from struct import pack, unpack
+from struct import pack, unpack, unpack_from
 
 import difflib, codecs, os.path, random, base64, locale, hashlib, tempfile, \
-        math, time
+        math, time, bisect
 
 # import urllib_red as urllib
 import urllib.request, urllib.parse, urllib.error, urllib.parse, cgi
@@ -1925,7 +1925,8 @@ def compactToBinCompact(cops):
 
 def binCompactToCompact(bops):
     """
-    Uncompress the ops from the binary format
+    Uncompress the ops from the binary format. If bops is a memoryview
+    the strings in the ops are memoryview slices of it.
     """
     pos = 0
     result = []
@@ -1933,19 +1934,19 @@ def binCompactToCompact(bops):
         t = bops[pos]
         pos += 1
         if t == 0:
-            d = unpack("<iii", bops[pos:pos+12])
+            d = unpack_from("<iii", bops, pos)
             pos += 12
             s = bops[pos:pos+d[2]]
             pos += d[2]
 
             result.append( (0, d[0], d[1], s) )
         elif t == 1:
-            d = unpack("<ii", bops[pos:pos+8])
+            d = unpack_from("<ii", bops, pos)
             pos += 8
 
             result.append( (1, d[0], d[1]) )
         elif t == 2:
-            d = unpack("<ii", bops[pos:pos+8])
+            d = unpack_from("<ii", bops, pos)
             pos += 8
             s = bops[pos:pos+d[1]]
             pos += d[1]
@@ -1957,8 +1958,11 @@ def binCompactToCompact(bops):
 
 def applyCompact(a, cops):
     """
-    Apply compact ops to bytes a to create and return bytes b
+    Apply compact ops to bytes a to create and return bytes b.
+    The strings in cops may also be memoryviews.
     """
+    # Slices of a memoryview don't copy the data, only the final join does
+    a = memoryview(a)
     result = []
     apos = 0
     for op in cops:
@@ -1984,19 +1988,183 @@ def applyBinCompact(a, bops):
     """
     Apply binary diff operations bops to a to create and return b
     """
-    return applyCompact(a, binCompactToCompact(bops))
+    return applyCompact(a, binCompactToCompact(memoryview(bops)))
 
 
-def getBinCompactForDiff(a, b):
+def getCompactForDiffDifflib(a, b):
+    """
+    Return compact ops to change bytes a to b, found by a bytewise
+    difflib.SequenceMatcher. Gives small packets but needs quadratic time
+    for large pages.
+    """
+    sm = difflib.SequenceMatcher(None, a, b, autojunk=False)
+    return difflibToCompact(sm.get_opcodes(), b)
+
+
+# Changed regions of the line diff up to this size (in bytes on each side)
+# are refined by a bytewise difflib comparison
+DIFF_LINES_REFINE_SIZE = 2048
+
+
+def _lineOffsets(lines):
+    """
+    Return list of start offsets of the lines and the total length at the end
+    """
+    result = [0]
+    pos = 0
+    for line in lines:
+        pos += len(line)
+        result.append(pos)
+
+    return result
+
+
+def _uniqueLineAnchors(aIds, bIds, a1, a2, b1, b2):
+    """
+    Return list of index pairs (ia, ib) of lines which occur exactly once
+    in aIds[a1:a2] and in bIds[b1:b2]. The list is the longest sequence of
+    such pairs which is increasing in both indices.
+    """
+    aPos = {}
+    for i in range(a1, a2):
+        lineId = aIds[i]
+        aPos[lineId] = -1 if lineId in aPos else i
+
+    bPos = {}
+    for i in range(b1, b2):
+        lineId = bIds[i]
+        if lineId in aPos:
+            bPos[lineId] = -1 if lineId in bPos else i
+
+    pairs = [(aPos[lineId], ib) for lineId, ib in bPos.items()
+            if ib != -1 and aPos[lineId] != -1]
+    if len(pairs) == 0:
+        return pairs
+
+    # Longest increasing subsequence of b indices ordered by a index
+    # (patience sorting)
+    pairs.sort()
+    tails = []  # Smallest b index ending a sequence of length n+1
+    tailIdx = []  # Index into pairs for tails
+    prev = [-1] * len(pairs)
+    for i, (ia, ib) in enumerate(pairs):
+        n = bisect.bisect_left(tails, ib)
+        if n > 0:
+            prev[i] = tailIdx[n - 1]
+        if n == len(tails):
+            tails.append(ib)
+            tailIdx.append(i)
+        else:
+            tails[n] = ib
+            tailIdx[n] = i
+
+    result = []
+    i = tailIdx[-1]
+    while i != -1:
+        result.append(pairs[i])
+        i = prev[i]
+
+    result.reverse()
+    return result
+
+
+def getCompactForDiffLines(a, b):
+    """
+    Return compact ops to change bytes a to b. Lines occurring only once
+    in both are used as anchors ("patience diff"), the common lines around
+    them are matched and the remaining changed regions are refined bytewise
+    if they are small. Much faster than getCompactForDiffDifflib() for
+    large pages, packets are a bit larger if many lines are changed.
+    """
+    aLines = a.splitlines(True)
+    bLines = b.splitlines(True)
+    aOffsets = _lineOffsets(aLines)
+    bOffsets = _lineOffsets(bLines)
+
+    # Compare lines by integer ids
+    lineIds = {}
+    aIds = [lineIds.setdefault(line, len(lineIds)) for line in aLines]
+    bIds = [lineIds.setdefault(line, len(lineIds)) for line in bLines]
+    del lineIds
+
+    # Find changed regions as tuples (a1, a2, b1, b2) of line indices, ordered
+    # by position
+    regions = []
+    stack = [(0, len(aIds), 0, len(bIds))]
+    while stack:
+        a1, a2, b1, b2 = stack.pop()
+        while a1 < a2 and b1 < b2 and aIds[a1] == bIds[b1]:
+            a1 += 1
+            b1 += 1
+        while a1 < a2 and b1 < b2 and aIds[a2 - 1] == bIds[b2 - 1]:
+            a2 -= 1
+            b2 -= 1
+
+        if a1 == a2 and b1 == b2:
+            continue
+
+        anchors = []
+        if a1 < a2 and b1 < b2:
+            anchors = _uniqueLineAnchors(aIds, bIds, a1, a2, b1, b2)
+
+        if len(anchors) == 0:
+            regions.append((a1, a2, b1, b2))
+            continue
+
+        subRegions = []
+        for ia, ib in anchors:
+            subRegions.append((a1, ia, b1, ib))
+            a1 = ia + 1
+            b1 = ib + 1
+        subRegions.append((a1, a2, b1, b2))
+        stack += reversed(subRegions)
+
+    result = []
+    for a1, a2, b1, b2 in regions:
+        i1 = aOffsets[a1]
+        i2 = aOffsets[a2]
+        j1 = bOffsets[b1]
+        j2 = bOffsets[b2]
+
+        if i1 == i2:
+            result.append((2, i1, b[j1:j2]))
+        elif j1 == j2:
+            result.append((1, i1, i2))
+        elif i2 - i1 <= DIFF_LINES_REFINE_SIZE and \
+                j2 - j1 <= DIFF_LINES_REFINE_SIZE:
+            bPart = b[j1:j2]
+            sm = difflib.SequenceMatcher(None, a[i1:i2], bPart,
+                    autojunk=False)
+            for op in difflibToCompact(sm.get_opcodes(), bPart):
+                if op[0] == 2:
+                    result.append((2, op[1] + i1, op[2]))
+                else:
+                    result.append((op[0], op[1] + i1, op[2] + i1) + op[3:])
+        else:
+            result.append((0, i1, i2, b[j1:j2]))
+
+    return result
+
+
+# Dictionary {name: function} of available diff engines. A function takes
+# bytes a and b and returns compact ops to change a to b.
+DIFF_ENGINES = {
+        "difflib": getCompactForDiffDifflib,
+        "lines": getCompactForDiffLines,
+    }
+
+
+def getBinCompactForDiff(a, b, engine="lines"):
     """
     Return the binary compact codes to change bytes a to b.
     For bytes a and b (NOT strings) it is always true that
         applyBinCompact(a, getBinCompactForDiff(a, b)) == b
-    """
 
-    sm = difflib.SequenceMatcher(None, a, b, autojunk=False)
-    ops = sm.get_opcodes()
-    return compactToBinCompact(difflibToCompact(ops, b))
+    engine -- Name of the diff engine in DIFF_ENGINES. All engines create
+            the same format, so the engine can be changed for existing data.
+    """
+    getCompact = DIFF_ENGINES.get(engine, getCompactForDiffLines)
+    return compactToBinCompact(getCompact(a, b))
 
 
 # ---------- Unicode constants ----------
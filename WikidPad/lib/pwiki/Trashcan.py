@@ -1,7 +1,7 @@
 """
 """
 
-import time, zlib, re
+import time, zlib, re, struct
 from calendar import timegm
 
 from .rtlibRepl import minidom
@@ -34,7 +34,7 @@ class TrashBag:
     of WikiData API to allow read-only access to the items in the bag.
     """
     __slots__ = ("trashcan", "trashTimeStamp", "bagId",
-            "contentStorageMode", "originalUnifiedName", "xmlNode")
+            "contentStorageMode", "originalUnifiedName", "xmlNode", "binRecord")
 
     def __init__(self, trashcan):   # , contentStorageMode = u"single"
         self.trashcan = trashcan
@@ -49,6 +49,8 @@ class TrashBag:
         self.originalUnifiedName = None
 
         self.xmlNode = None
+        # Tuple (overview state, record) for compact format
+        self.binRecord = None
 
 
     def getTrashcan(self):
@@ -109,6 +111,42 @@ class TrashBag:
                 "%Y-%m-%d/%H:%M:%S"))
 
 
+    def serializeOverviewBin(self, stream):
+        """
+        Read or write overview information (not content) of this object
+        to or from a serialize stream
+        """
+        self.bagId = stream.serUint32(self.bagId)
+        self.originalUnifiedName = stream.serUniUtf8(self.originalUnifiedName)
+        self.trashTimeStamp = stream.serFloat64(self.trashTimeStamp)
+
+
+    def _getOverviewState(self):
+        return (self.bagId, self.originalUnifiedName, self.trashTimeStamp)
+
+
+    def getOverviewBinRecord(self):
+        """
+        Return overview information as record for the compact format. The
+        record is cached as long as the information doesn't change.
+        """
+        state = self._getOverviewState()
+        if self.binRecord is None or self.binRecord[0] != state:
+            self.binRecord = (state, Serialization.buildCompactRecord(
+                    self.serializeOverviewBin))
+
+        return self.binRecord[1]
+
+
+    def readOverviewBinRecord(self, record, stream):
+        """
+        Set object state from a record of the compact format. stream
+        reads the record data.
+        """
+        self.serializeOverviewBin(stream)
+        self.binRecord = (self._getOverviewState(), record)
+
+
     def getPacketUnifiedName(self):
         if self.bagId == 0:
             return None
@@ -255,13 +293,22 @@ class Trashcan(MiscEventSourceMixin):
 
         content = self.wikiDocument.retrieveDataBlock(unifName, default=DAMAGED)
         if content is DAMAGED:
-            raise Exception(_("Trashcan data damaged"))   # TODO: Specific exception
+            raise TrashcanDataDamagedException(_("Trashcan data damaged"))
         elif content is None:
             self.trashBags = []
             self.trashBagIds = set()
             self.xmlNode = None
             return
 
+        if Serialization.isCompactOverview(content):
+            try:
+                self.serializeFromCompact(content)
+            except (SerializationException, struct.error,
+                    UnicodeDecodeError) as e:
+                raise TrashcanDataDamagedException(
+                        _("Trashcan data damaged")) from e
+            return
+
         xmlDoc = minidom.parseString(content)
         xmlNode = xmlDoc.firstChild
         self.serializeFromXml(xmlNode)
@@ -303,11 +350,16 @@ class Trashcan(MiscEventSourceMixin):
             self.wikiDocument.deleteDataBlock(unifName)
             return
 
-        xmlDoc = minidom.getDOMImplementation().createDocument(None, None, None)
-        xmlNode = self.serializeToXmlProd(xmlDoc)
+        if self.wikiDocument.getWikiConfig().getboolean("main",
+                "overviews_compactFormat", False):
+            content = self.serializeToCompact()
+        else:
+            xmlDoc = minidom.getDOMImplementation().createDocument(None, None,
+                    None)
+            xmlNode = self.serializeToXmlProd(xmlDoc)
 
-        xmlDoc.appendChild(xmlNode)
-        content = xmlDoc.toxml("utf-8")
+            xmlDoc.appendChild(xmlNode)
+            content = xmlDoc.toxml("utf-8")
 
         self.wikiDocument.storeDataBlock(unifName, content,
                 storeHint=self.getStorageHint())
@@ -411,6 +463,37 @@ class Trashcan(MiscEventSourceMixin):
         self.trashBagIds = trashBagIds
 
 
+    def serializeToCompact(self):
+        """
+        Return all information about this object in compact format.
+        """
+        return Serialization.buildCompactOverview("trashcanOverview",
+                [bag.getOverviewBinRecord() for bag in self.trashBags])
+
+
+    def serializeFromCompact(self, content):
+        """
+        Set object state from data in compact format.
+        """
+        trashBags = []
+        trashBagIds = set()
+
+        for record, stream in Serialization.iterCompactOverviewRecords(
+                content, "trashcanOverview"):
+            entry = TrashBag(self)
+            entry.readOverviewBinRecord(record, stream)
+
+            trashBags.append(entry)
+            trashBagIds.add(entry.bagId)
+
+        # Bags are written in trash date order, but sort for safety
+        trashBags.sort(key=lambda entry: entry.trashTimeStamp)
+
+        self.xmlNode = None
+        self.trashBags = trashBags
+        self.trashBagIds = trashBagIds
+
+
 #     def getVersionContentRaw(self, versionNumber):
 #         if len(self.trashBags) == 0:
 #             raise InternalError(u"Tried to retrieve non-existing "
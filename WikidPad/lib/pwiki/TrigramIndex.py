@@ -0,0 +1,323 @@
+"""
+Trigram index of the page content to find candidate pages for searches
+which don't use the search index (plain string and regular expression
+search).
+
+The index is an SQLite FTS5 table with the "trigram" tokenizer using the
+content table of the wiki database as external content. Triggers keep it
+up to date when pages are saved, renamed or deleted.
+
+A search node describes what it needs to match by a text filter:
+
+None -- No restriction, all pages are candidates
+str -- The text must contain this string
+("and", [filters]), ("or", [filters]) -- Combinations of filters
+
+The filter is translated to an FTS5 query which returns a superset of the
+matching pages, the exact test is done afterwards on the candidates only.
+"""
+
+import re
+
+try:
+    from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:
+    import sre_parse, sre_constants
+
+
+TRIGRAM_TABLE = "wikiwordtrigrams"
+
+# The index is case-insensitive so it can be used for both kinds of search
+TRIGRAM_TOKENIZE = "trigram case_sensitive 0"
+
+_TRIGGER_SUFFIXES = ("_insert", "_delete", "_update")
+
+# A literal contributes at most this number of trigrams to the query
+MAX_TRIGRAMS_PER_LITERAL = 32
+
+
+
+# ---------- Functions working on a connection wrapper ----------
+
+def isAvailable(connWrap):
+    """
+    Return True if the sqlite library supports FTS5 with trigram tokenizer.
+    """
+    try:
+        connWrap.execSql("create virtual table temp.trigramprobe using "
+                "fts5(x, tokenize = \"%s\", detail = none)" % TRIGRAM_TOKENIZE)
+        connWrap.execSql("drop table temp.trigramprobe")
+        return True
+    except Exception:
+        return False
+
+
+def isIndexPresent(connWrap):
+    """
+    Return True if index table and all triggers to maintain it exist.
+    """
+    names = (TRIGRAM_TABLE,) + tuple(TRIGRAM_TABLE + suffix
+            for suffix in _TRIGGER_SUFFIXES)
+    return connWrap.execSqlQuerySingleItem("select count(*) from "
+            "sqlite_master where name in (?, ?, ?, ?)", names, 0) == 4
+
+
+def checkIndex(connWrap):
+    """
+    Return True if the index is present and usable. It is removed if only
+    parts of it exist (e.g. after the content table was recreated, which
+    removes the triggers) or if the sqlite library doesn't support it
+    (then the triggers would let each write to the content table fail).
+    """
+    if isIndexPresent(connWrap) and isAvailable(connWrap):
+        return True
+
+    if connWrap.execSqlQuerySingleItem("select count(*) from sqlite_master "
+            "where name glob ?", (TRIGRAM_TABLE + "*",), 0) > 0:
+        dropIndex(connWrap)
+        connWrap.commit()
+
+    return False
+
+
+def dropIndex(connWrap):
+    for suffix in _TRIGGER_SUFFIXES:
+        connWrap.execSql("drop trigger if exists %s%s" %
+                (TRIGRAM_TABLE, suffix))
+    try:
+        connWrap.execSql("drop table if exists %s" % TRIGRAM_TABLE)
+    except Exception:
+        # Without FTS5 or the tokenizer the table can't be dropped, but
+        # without the triggers it isn't touched anymore
+        pass
+
+
+def rebuildIndex(connWrap, contentTable, contentColumn):
+    """
+    Create index and triggers for  contentColumn  of  contentTable  if
+    necessary and fill it with the current content.
+    """
+    dropIndex(connWrap)
+
+    connWrap.execSql("create virtual table %s using fts5(%s, "
+            "content = '%s', tokenize = \"%s\", detail = none)" %
+            (TRIGRAM_TABLE, contentColumn, contentTable, TRIGRAM_TOKENIZE))
+
+    values = {"idx": TRIGRAM_TABLE, "table": contentTable,
+            "col": contentColumn}
+
+    connWrap.execSql("create trigger %(idx)s_insert after insert on "
+            "%(table)s begin "
+            "insert into %(idx)s(rowid, %(col)s) values "
+            "(new.rowid, new.%(col)s); end" % values)
+    connWrap.execSql("create trigger %(idx)s_delete after delete on "
+            "%(table)s begin "
+            "insert into %(idx)s(%(idx)s, rowid, %(col)s) values "
+            "('delete', old.rowid, old.%(col)s); end" % values)
+    connWrap.execSql("create trigger %(idx)s_update after update of "
+            "%(col)s on %(table)s begin "
+            "insert into %(idx)s(%(idx)s, rowid, %(col)s) values "
+            "('delete', old.rowid, old.%(col)s); "
+            "insert into %(idx)s(rowid, %(col)s) values "
+            "(new.rowid, new.%(col)s); end" % values)
+
+    connWrap.execSql("insert into %s(%s) values ('rebuild')" %
+            (TRIGRAM_TABLE, TRIGRAM_TABLE))
+
+
+def buildCandidateRowidSql():
+    """
+    Return SQL select statement returning rowids of the content table
+    for a match expression given as parameter.
+    """
+    return "select rowid from %s where %s match ?" % (TRIGRAM_TABLE,
+            TRIGRAM_TABLE)
+
+
+
+# ---------- Text filters ----------
+
+def andFilter(filters):
+    filters = [f for f in filters if f is not None]
+    if len(filters) == 0:
+        return None
+    if len(filters) == 1:
+        return filters[0]
+
+    return ("and", filters)
+
+
+def orFilter(filters):
+    filters = list(filters)
+    if len(filters) == 0 or None in filters:
+        return None
+    if len(filters) == 1:
+        return filters[0]
+
+    return ("or", filters)
+
+
+def literalFilter(text):
+    """
+    Filter for a plain string which must be contained in the text.
+    """
+    if len(text) < 3:
+        return None
+
+    return text
+
+
+_REPEAT_OPS = tuple(getattr(sre_constants, name) for name in
+        ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT")
+        if hasattr(sre_constants, name))
+
+_ZERO_WIDTH_OPS = (sre_constants.AT, sre_constants.ASSERT,
+        sre_constants.ASSERT_NOT)
+
+
+# With re.IGNORECASE, Python matches each of these characters with all
+# others while the trigram tokenizer folds only "I" to "i"
+_I_CHARS = "iI\u0131\u0130"
+
+# Variants of "i" searched in the index for an "i" in a literal
+_I_VARIANTS = ("i", "\u0131", "\u0130")
+
+
+def _literalChar(c, ignoreCase):
+    """
+    Return character to use in a literal for regex literal  c  or None
+    if the tokenizer may not fold it like Python does.
+    """
+    if not ignoreCase:
+        return c
+    if c in _I_CHARS:
+        return "i"
+    if c.isascii():
+        return c
+
+    return None
+
+
+def _sequenceFilter(items, ignoreCase):
+    """
+    Filter for a sequence of parsed regex items.
+    """
+    filters = []
+    run = []
+
+    def endRun():
+        if len(run) >= 3:
+            filters.append("".join(run))
+        del run[:]
+
+    for op, av in items:
+        if op is sre_constants.LITERAL:
+            c = _literalChar(chr(av), ignoreCase)
+            if c is not None:
+                run.append(c)
+            else:
+                endRun()
+            continue
+
+        if op in _ZERO_WIDTH_OPS:
+            # Doesn't consume text, so literals before and after are adjacent
+            if op is not sre_constants.AT:
+                endRun()
+            continue
+
+        endRun()
+
+        if op is sre_constants.SUBPATTERN:
+            addFlags, delFlags, sub = av[1], av[2], av[3]
+            subIgnoreCase = (ignoreCase or bool(addFlags & re.IGNORECASE)) \
+                    and not (delFlags & re.IGNORECASE)
+            filters.append(_sequenceFilter(sub, subIgnoreCase))
+        elif op is sre_constants.BRANCH:
+            filters.append(orFilter([_sequenceFilter(branch, ignoreCase)
+                    for branch in av[1]]))
+        elif op in _REPEAT_OPS:
+            minCount, maxCount, sub = av
+            if minCount >= 1:
+                filters.append(_sequenceFilter(sub, ignoreCase))
+        elif op is getattr(sre_constants, "ATOMIC_GROUP", None):
+            filters.append(_sequenceFilter(av, ignoreCase))
+        # Everything else (character classes, back references ...)
+        # doesn't give a required literal
+
+    endRun()
+    return andFilter(filters)
+
+
+def regexFilter(compiledRe):
+    """
+    Filter with the literals required by a match of compiled regular
+    expression  compiledRe. Returns None if the pattern can't be analysed.
+    """
+    pattern = compiledRe.pattern
+    if not isinstance(pattern, str):
+        return None
+
+    try:
+        parsed = sre_parse.parse(pattern, compiledRe.flags)
+    except Exception:
+        return None
+
+    return _sequenceFilter(parsed,
+            bool(compiledRe.flags & re.IGNORECASE))
+
+
+def _quote(text):
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _trigramExpression(trigram):
+    variants = [""]
+    for c in trigram:
+        if c == "i":
+            variants = [v + iv for v in variants for iv in _I_VARIANTS]
+        else:
+            variants = [v + c for v in variants]
+
+    if len(variants) == 1:
+        return _quote(trigram)
+
+    return "(%s)" % " OR ".join(_quote(v) for v in variants)
+
+
+def buildMatchExpression(textFilter):
+    """
+    Return FTS5 match expression for the index or None if all pages are
+    candidates for  textFilter.
+    """
+    if textFilter is None:
+        return None
+
+    if isinstance(textFilter, str):
+        trigrams = []
+        seen = set()
+        for i in range(len(textFilter) - 2):
+            trigram = textFilter[i:i + 3]
+            if trigram in seen:
+                continue
+            seen.add(trigram)
+            trigrams.append(_trigramExpression(trigram))
+
+        if len(trigrams) > MAX_TRIGRAMS_PER_LITERAL:
+            # Take them evenly spread over the literal
+            step = len(trigrams) / MAX_TRIGRAMS_PER_LITERAL
+            trigrams = [trigrams[int(i * step)]
+                    for i in range(MAX_TRIGRAMS_PER_LITERAL)]
+
+        return " AND ".join(trigrams)
+
+    op, filters = textFilter
+    exprs = [buildMatchExpression(f) for f in filters]
+    if op == "and":
+        exprs = [e for e in exprs if e is not None]
+        if len(exprs) == 0:
+            return None
+        return " AND ".join("(%s)" % e for e in exprs)
+    else:
+        if None in exprs:
+            return None
+        return " OR ".join("(%s)" % e for e in exprs)
@@ -21,6 +21,7 @@ from .Utilities import TimeoutRLock, SingleThreadExecutor, DUMBTHREADSTOP
 from .MiscEvent import MiscEventSourceMixin
 
 from . import ParseUtilities
+from . import ParallelParsing
 from . import StringOps
 from .StringOps import mbcsDec, re_sub_escape, pathEnc, pathDec, \
         unescapeWithRe, strToBool, pathnameFromUrl, urlFromPathname, \
@@ -37,6 +38,8 @@ from .SearchAndReplace import SearchReplaceOperation
 
 from . import SpellChecker
 from . import Trashcan
+from . import PageAstCache
+from . import SearchIndex
 
 from .wikidata import DbBackendUtils, FileStorage
 
@@ -405,6 +408,9 @@ class WikiDocument(MiscEventSourceMixin):
 
         self.baseWikiData = wikiData
         self.autoLinkRelaxInfo = None
+        # True if wiki words were added, renamed or deleted since
+        # autoLinkRelaxInfo was built or updated
+        self.autoLinkRelaxInfoOutdated = False
 
         # Set of camelcase words not to see as wiki words
         self.ccWordBlacklist = None
@@ -435,7 +441,9 @@ class WikiDocument(MiscEventSourceMixin):
         self.dataDir = dataDir
         self.dbtype = wikidhName
 
-        self.whooshIndex = None
+        self.searchIndex = None
+        self.searchIndexUpdater = SearchIndex.SearchIndexUpdater(self)
+        self.pageAstCache = None
 
         self.refCount = 1
 
@@ -520,9 +528,15 @@ class WikiDocument(MiscEventSourceMixin):
                 except:
                     traceback.print_exc() # TODO: Notify user?
 
+        if not self.recoveryMode and not self.isReadOnlyEffect():
+            self._openPageAstCache()
+
         if not self.recoveryMode:
-            if self.isSearchIndexEnabled() and self.getWikiConfig().getint(
-                    "main", "indexSearch_formatNo", 1) != Consts.SEARCHINDEX_FORMAT_NO:
+            if self.isSearchIndexEnabled() and (self.getWikiConfig().getint(
+                    "main", "indexSearch_formatNo", 1) != Consts.SEARCHINDEX_FORMAT_NO
+                    or self.getWikiConfig().get("main",
+                    "indexSearch_activeBackend", "whoosh") !=
+                    self._getWantedSearchIndexBackend()):
                 # Search index rebuild needed
                 # Remove old search index and lower meta data state.
                 # The following pushDirtyMetaDataUpdate() will start rebuilding
@@ -610,6 +624,11 @@ class WikiDocument(MiscEventSourceMixin):
             self.refCount = 0
             self.updateExecutor.end(hardEnd=True)  # TODO Inform user as this may take some time
 
+            try:
+                self.searchIndexUpdater.flush()
+            except:
+                traceback.print_exc()
+
             if self.trashcan is not None:
                 self.trashcan.writeOverview()
                 self.trashcan.close()
@@ -618,6 +637,10 @@ class WikiDocument(MiscEventSourceMixin):
             self.wikiWideHistory.writeOverview()
             self.wikiWideHistory.close()
 
+            if self.pageAstCache is not None:
+                self.pageAstCache.close()
+                self.pageAstCache = None
+
             # Invalidate all cached pages to prevent yet running threads from
             # using them
             for page in list(self.wikiPageDict.values()):
@@ -632,9 +655,9 @@ class WikiDocument(MiscEventSourceMixin):
                 self.wikiData = None
                 self.baseWikiData = None
             
-            if self.whooshIndex is not None:
-                self.whooshIndex.close()
-                self.whooshIndex = None
+            if self.searchIndex is not None:
+                self.searchIndex.close()
+                self.searchIndex = None
 
             GetApp().getMiscEvent().removeListener(self)
 
@@ -649,6 +672,35 @@ class WikiDocument(MiscEventSourceMixin):
         return self.refCount
 
 
+    def prepareForWorkerProcess(self):
+        """
+        Must be called in a worker process forked from the process which
+        opened this document before the document is used there.
+        Reopens the database connection and replaces the locks which might
+        have been held by another thread of the parent at fork time.
+        The document becomes read-only for the worker, background updates
+        and storing into the page AST cache are left to the parent process.
+
+        Don't call release() in the worker process.
+        """
+        # Objects holding connections of the parent must neither be used
+        # nor closed (by garbage collection) here
+        self.inheritedResources = (self.pageAstCache, self.searchIndex)
+
+        self.baseWikiData.reopenConnection()
+        self.wikiData = WikiDataSynchronizedProxy(self.baseWikiData)
+        self.pageRetrievingLock = TimeoutRLock(Consts.DEADBLOCKTIMEOUT)
+
+        # Not started, so pushed updates are silently dropped
+        self.updateExecutor = SingleThreadExecutor(4)
+        self.wikiPageDict = WeakValueDictionary()
+        self.funcPageDict = WeakValueDictionary()
+        if self.pageAstCache is not None:
+            self.pageAstCache = self.pageAstCache.getReadOnlyCopy()
+        self.searchIndex = None
+        self.writeAccessDenied = True
+
+
     def getDbtype(self):
         return self.dbtype
 
@@ -1344,6 +1396,7 @@ class WikiDocument(MiscEventSourceMixin):
 
     def initiateFullUpdate(self, progresshandler):
         self.updateExecutor.end(hardEnd=True)
+        self.searchIndexUpdater.flush()
         self.getWikiData().refreshWikiPageLinkTerms()
 
         # get all of the wikiWords
@@ -1403,17 +1456,123 @@ class WikiDocument(MiscEventSourceMixin):
             self.updateExecutor.start()
 
 
-    def rebuildWiki(self, progresshandler, onlyDirty):
+    def _getNonAliasWikiPageNoCache(self, wikiWord):
+        """
+        Like _getWikiPageNoErrorNoCache() but never returns an alias page.
+        """
+        wikiPage = self._getWikiPageNoErrorNoCache(wikiWord)
+        if isinstance(wikiPage, AliasWikiPage):
+            # This should never be an alias page, so fetch the
+            # real underlying page
+            # This can only happen if there is a real page with
+            # the same name as an alias
+            wikiPage = WikiPage(self, wikiWord)
+
+        return wikiPage
+
+
+    def writeImportedWikiPage(self, wikiWord, text, timestamps):
+        """
+        Write text and timestamps of an imported wiki page directly to the
+        database. Meta-data isn't updated, the page is only marked dirty.
+        The caller must commit and, after all pages are written, call
+        rebuildWiki() with the imported words or pushDirtyMetaDataUpdate().
+
+        Pages which are currently in use (e.g. shown in an editor) or
+        aliases are saved the usual way instead.
+        """
+        if self.isReadOnlyEffect():
+            return
+
+        with self.pageRetrievingLock:
+            wikiPage = self.wikiPageDict.get(wikiWord)
+
+        if wikiPage is not None or \
+                self.getWikiPageNameForLinkTermOrAsIs(wikiWord) != wikiWord:
+            wikiPage = self.getWikiPageNoError(wikiWord)
+            wikiPage.replaceLiveText(text)
+            if wikiPage.getTxtEditor() is not None:
+                wikiPage.writeToDatabase()
+
+            wikiPage.setTimestamps(timestamps)
+            return
+
+        wikiData = self.getWikiData()
+        if not wikiData.isDefinedWikiPageName(wikiWord):
+            # Same as on "saving new wiki page" event
+            self.autoLinkRelaxInfoOutdated = True
+
+        wikiData.setContent(wikiWord, text)
+        wikiData.setTimestamps(wikiWord, timestamps)
+        wikiData.setMetaDataState(wikiWord,
+                Consts.WIKIWORDMETADATA_STATE_DIRTY)
+        WikiPage(self, wikiWord).refreshSyncUpdateMatchTerms()
+
+
+    def _commitBulkUpdate(self, count):
+        """
+        Called after each page processed by a bulk update, commits
+        every Consts.BULKUPDATE_COMMIT_PAGECOUNT pages.
+        """
+        if count % Consts.BULKUPDATE_COMMIT_PAGECOUNT == 0:
+            self.getWikiData().commit()
+
+
+    def _isTrigramIndexUpToDate(self):
+        """
+        Return True if presence of the trigram index of the database matches
+        wiki option "search_trigramIndex".
+        """
+        wikiData = self.getWikiData()
+        if wikiData.checkCapability("trigram index") is None:
+            return True
+
+        return wikiData.isTrigramIndexPresent() == \
+                self.getWikiConfig().getboolean("main", "search_trigramIndex",
+                False)
+
+
+    def _rebuildTrigramIndex(self):
+        """
+        Create (or remove) the trigram index of the database according to
+        wiki option "search_trigramIndex".
+        """
+        wikiData = self.getWikiData()
+        if wikiData.checkCapability("trigram index") is None:
+            return
+
+        if self.getWikiConfig().getboolean("main", "search_trigramIndex",
+                False):
+            wikiData.rebuildTrigramIndex()
+        else:
+            wikiData.dropTrigramIndex()
+
+
+    def rebuildWiki(self, progresshandler, onlyDirty, jobs=None,
+            wikiWords=None):
         """
         Rebuild  the wiki
 
+        Each page is parsed only once (in worker processes if possible),
+        the ASTs are spooled to a temporary file between the attribute
+        and the syntax step.
+
         progresshandler -- Object, fulfilling the
             PersonalWikiFrame.GuiProgressHandler protocol
+        jobs -- Number of worker processes for parsing or None to use
+            global option "processPool_workers"
+        wikiWords -- Sequence of wiki words to rebuild or None for all
+            (or all dirty) pages. If given, onlyDirty is ignored
         """
         self.updateExecutor.end(hardEnd=True)
+        self.searchIndexUpdater.flush()
         self.getWikiData().refreshWikiPageLinkTerms()
 
-        if onlyDirty:
+        if wikiWords is not None:
+            onlyDirty = True
+            wikiWords = [wikiWord for wikiWord in dict.fromkeys(wikiWords)
+                    if self.isDefinedWikiPageName(wikiWord)]
+        elif onlyDirty:
 #             wikiWords = self.getWikiData().getWikiPageNamesForMetaDataState(
 #                     Consts.WIKIWORDMETADATA_STATE_DIRTY) + \
 #                     self.getWikiData().getWikiPageNamesForMetaDataState(
@@ -1424,16 +1583,14 @@ class WikiDocument(MiscEventSourceMixin):
             # get all of the wikiWords
             wikiWords = self.getWikiData().getAllDefinedWikiPageNames()
 
-
-        if self.isSearchIndexEnabled():
-            progresshandler.open(len(wikiWords) * 4 + 1)
-        else:
-            progresshandler.open(len(wikiWords) * 3 + 1)
+        progresshandler.open(len(wikiWords) * 3 + 1)
 #         progresshandler.update(0, _("Waiting for update thread to end"))
 
 
         self.fireMiscEventKeys(("begin foreground update", "begin update"))
 
+        spool = None
+        writer = None
         # re-save all of the pages
         try:
             step = 1
@@ -1448,97 +1605,113 @@ class WikiDocument(MiscEventSourceMixin):
             #   links.
             for wikiWord in wikiWords:
                 progresshandler.update(step, _("Update basic link info"))
-                wikiPage = self._getWikiPageNoErrorNoCache(wikiWord)
-                if isinstance(wikiPage, AliasWikiPage):
-                    # This should never be an alias page, so fetch the
-                    # real underlying page
-                    # This can only happen if there is a real page with
-                    # the same name as an alias
-                    wikiPage = WikiPage(self, wikiWord)
-
+                wikiPage = self._getNonAliasWikiPageNoCache(wikiWord)
                 wikiPage.refreshSyncUpdateMatchTerms()
                 
                 step += 1
+                self._commitBulkUpdate(step)
 
             self.getWikiData().setDbSettingsValue(
                     "syncWikiWordMatchtermsUpToDate", "1")
+            self.getWikiData().commit()
 
-            # Step two: update attributes. There may be attributes which
-            #   define how the rest has to be interpreted, therefore they
-            #   must be processed first.
-            for wikiWord in wikiWords:
-                progresshandler.update(step, _("Update attributes of %s") %
-                        wikiWord)
-                try:
-                    wikiPage = self._getWikiPageNoErrorNoCache(wikiWord)
-                    if isinstance(wikiPage, AliasWikiPage):
-                        # This should never be an alias page, so fetch the
-                        # real underlying page
-                        # This can only happen if there is a real page with
-                        # the same name as an alias
-                        wikiPage = WikiPage(self, wikiWord)
+            # Step two: parse pages and update attributes. There may be
+            #   attributes which define how the rest has to be interpreted,
+            #   therefore they must be processed for all pages before
+            #   step three starts.
+            spool = ParallelParsing.AstSpool(self.getWikiTempDir())
+            pending = {}
 
-                    wikiPage.refreshSyncUpdateMatchTerms()
-                    pageAst = wikiPage.getLivePageAst()
+            def iterParseItems():
+                for wikiWord in wikiWords:
+                    try:
+                        wikiPage = self._getNonAliasWikiPageNoCache(wikiWord)
+                        with wikiPage.getTextOperationLock():
+                            text = wikiPage.getLiveText()
+                            liveTextPlaceHold = wikiPage.liveTextPlaceHold
+                            formatDetails = wikiPage.getFormatDetails()
+                    except:
+                        traceback.print_exc()
+                        continue
 
-                    self.getWikiData().refreshFileSignatureForWikiPageName(
-                            wikiWord)
-                    wikiPage.refreshAttributesFromPageAst(pageAst)
-                except:
-                    traceback.print_exc()
+                    pending[wikiWord] = (wikiPage, liveTextPlaceHold,
+                            formatDetails, ParallelParsing.getTextDigest(text))
+                    yield wikiWord, wikiPage, text, formatDetails
 
-                step += 1
+            pageParser = ParallelParsing.PageParser(self, jobs)
+            meter = ParallelParsing.ThroughputMeter()
+            try:
+                for wikiWord, astData in pageParser.iterParse(
+                        iterParseItems()):
+                    meter.inc()
+                    progresshandler.update(step,
+                            _("Update attributes of %s (%.0f pages/s)") %
+                            (wikiWord, meter.getRate()))
+                    wikiPage, liveTextPlaceHold, formatDetails, textDigest = \
+                            pending.pop(wikiWord)
+                    try:
+                        if astData is not None:
+                            pageAst = ParallelParsing.loadAst(astData)
+                            spool.put(wikiWord, astData,
+                                    (textDigest, formatDetails))
+                            wikiPage.installLivePageAst(pageAst,
+                                    liveTextPlaceHold, formatDetails)
+    
+                            self.getWikiData()\
+                                    .refreshFileSignatureForWikiPageName(wikiWord)
+                            wikiPage.refreshAttributesFromPageAst(pageAst)
+                    except:
+                        traceback.print_exc()
+
+                    step += 1
+                    self._commitBulkUpdate(step)
+            finally:
+                pageParser.close()
+
+            # Pages which couldn't be retrieved at all
+            step += len(wikiWords) - meter.count
+            self.getWikiData().commit()
 
             # Step three: update the rest of the syntax (todos, relations)
+            #   and the index
+            if self.isSearchIndexEnabled():
+                writer = self.getSearchIndex().writer(
+                        timeout=Consts.DEADBLOCKTIMEOUT)
+
+            meter.restart()
             for wikiWord in wikiWords:
-                progresshandler.update(step, _("Update syntax of %s") % wikiWord)
+                meter.inc()
+                progresshandler.update(step,
+                        _("Update syntax of %s (%.0f pages/s)") %
+                        (wikiWord, meter.getRate()))
+                wikiPage = None
                 try:
-                    wikiPage = self._getWikiPageNoErrorNoCache(wikiWord)
-                    if isinstance(wikiPage, AliasWikiPage):
-                        # This should never be an alias page, so fetch the
-                        # real underlying page
-                        # This can only happen if there is a real page with
-                        # the same name as an alias
-                        wikiPage = WikiPage(self, wikiWord)
-
-                    pageAst = wikiPage.getLivePageAst()
+                    wikiPage = self._getNonAliasWikiPageNoCache(wikiWord)
+                    pageAst = self._getSpooledLivePageAst(wikiPage, spool)
 
                     wikiPage.refreshMainDbCacheFromPageAst(pageAst)
                 except:
                     traceback.print_exc()
 
-                step += 1
-            
-            if self.isSearchIndexEnabled():
-                # Step four: update index
-                
-                writer = self.getSearchIndex().writer(
-                        timeout=Consts.DEADBLOCKTIMEOUT)
-
-                for wikiWord in wikiWords:
-                    progresshandler.update(step, _("Update index of %s") % wikiWord)
+                if writer is not None and wikiPage is not None:
                     try:
-                        wikiPage = self._getWikiPageNoErrorNoCache(wikiWord)
-                        if isinstance(wikiPage, AliasWikiPage):
-                            # This should never be an alias page, so fetch the
-                            # real underlying page
-                            # This can only happen if there is a real page with
-                            # the same name as an alias
-                            wikiPage = WikiPage(self, wikiWord)
-
                         wikiPage.putIntoSearchIndexExtWriter(writer)
-
-#                         writer.add_document(unifName="wikipage/"+wikiWord,
-#                                 modTimestamp=wikiPage.getTimestamps()[0],
-#                                 content=content)
                     except:
                         traceback.print_exc()
- 
-                    step += 1
-                
+
+                step += 1
+                self._commitBulkUpdate(step)
+
+            if writer is not None:
                 writer.commit()
                 writer = None
 
+            self.getWikiData().commit()
+
+            if not onlyDirty or not self._isTrigramIndexUpToDate():
+                progresshandler.update(step - 1, _("Rebuild trigram index"))
+                self._rebuildTrigramIndex()
+
             progresshandler.update(step - 1, _("Final cleanup"))
             # Give possibility to do further reorganisation
             # specific to database backend
@@ -1547,11 +1720,39 @@ class WikiDocument(MiscEventSourceMixin):
             self.pushDirtyMetaDataUpdate()
 
         finally:
+            if writer is not None:
+                writer.cancel()
+            if spool is not None:
+                spool.close()
             progresshandler.close()
             self.fireMiscEventKeys(("end foreground update",))
             self.updateExecutor.start()
 
 
+    def _getSpooledLivePageAst(self, wikiPage, spool):
+        """
+        Return live page AST of  wikiPage  as parsed in the attribute step of
+        rebuildWiki(). The page is parsed again if its text or
+        its format details (which may depend on attributes) have changed.
+        """
+        wikiWord = wikiPage.getWikiWord()
+        with wikiPage.getTextOperationLock():
+            text = wikiPage.getLiveText()
+            liveTextPlaceHold = wikiPage.liveTextPlaceHold
+            formatDetails = wikiPage.getFormatDetails()
+
+        info = spool.getInfo(wikiWord)
+        if info is not None:
+            textDigest, baseFormatDetails = info
+            if textDigest == ParallelParsing.getTextDigest(text) and \
+                    formatDetails.isEquivTo(baseFormatDetails):
+                pageAst = spool.getAst(wikiWord)
+                if wikiPage.installLivePageAst(pageAst, liveTextPlaceHold,
+                        formatDetails):
+                    return pageAst
+
+        return wikiPage.getLivePageAst()
+
 
     def getWikiWordSubpages(self, wikiWord):
         return self.getWikiData().getDefinedWikiPageNamesStartingWith(
@@ -1651,10 +1852,32 @@ class WikiDocument(MiscEventSourceMixin):
                                              absolute)
             - generate_text(ast, page) -- interface to the text generator
         """
-        wikidoc = page.getWikiDocument()
-        pageName = page.getNonAliasPage().getWikiWord()  # real name, not alias
+        ast = page.getLivePageAst().cloneDeep()  # is always AST of the real page
+        WikiDocument._updateAstWikiWordReferences(ast, page,
+                page.getNonAliasPage().getWikiWord(),  # real name, not alias
+                renameDict, langHelper)
 
-#         print u"Updating references on %r" % pageName
+        text = langHelper.generate_text(ast, page)  # text with updated links
+        return text
+
+
+    @staticmethod
+    def _updateAstWikiWordReferences(ast, page, pageName, renameDict,
+            langHelper):
+        """Change the nodes of `ast` (an AST of `page`) in place so that
+        all references to old page names refer to the new page names.
+        Return the number of changed references.
+
+        `pageName` is the name of the page after renaming, links are
+        resolved and created relative to it.
+        See _updateWikiWordReferences for the requirements.
+        """
+        wikidoc = page.getWikiDocument()
+        if pageName == page.getWikiWord():
+            basePage = page
+        else:
+            basePage = ParallelParsing.DetachedWikiPage(pageName, wikidoc)
+        editCount = 0
 
         def update(value):
             """If value points to an old page name, return linkCore that
@@ -1663,7 +1886,7 @@ class WikiDocument(MiscEventSourceMixin):
             if langHelper.checkForInvalidWikiLink(value, wikidoc):
                 return value  # invalid link, keep old value
             try:
-                valuePageName = langHelper.resolveWikiWordLink(value, page)
+                valuePageName = langHelper.resolveWikiWordLink(value, basePage)
             except ValueError:  # invalid link
                 return value
             try:
@@ -1671,21 +1894,23 @@ class WikiDocument(MiscEventSourceMixin):
             except KeyError:  # value is name of a page that was not renamed
                 return value
             else:
+                nonlocal editCount
+                editCount += 1
                 oldLinkPath = langHelper.WikiLinkPath(linkCore=value)
                 newLinkPath = langHelper.createWikiLinkPathFromPageName(
                     newPageName, pageName, oldLinkPath.isAbsolute())
-                newLinkCore = newLinkPath.getLinkCore()
-
-#                 print u'    - pos %r: %r -> %r' % (node.pos, value,
-#                                                    newLinkCore)
-                return newLinkCore
+                return newLinkPath.getLinkCore()
 
         # transform AST by changing nodes in place
-        ast = page.getLivePageAst().cloneDeep()  # is always AST of the real page
         for node in ast.iterDeep():
             if node.name == "wikiWord":
+                if basePage is page:
+                    targetPageName = node.wikiWord
+                else:
+                    targetPageName = langHelper.resolveWikiWordLink(
+                            node.linkPath.getLinkCore(), basePage)
                 try:
-                    newPageName = renameDict[node.wikiWord]
+                    newPageName = renameDict[targetPageName]
                 except KeyError:  # wikiword of page that was not renamed
                     continue
                 else:
@@ -1695,10 +1920,7 @@ class WikiDocument(MiscEventSourceMixin):
                     newLinkPath = langHelper.createWikiLinkPathFromPageName(
                         newPageName, pageName, oldLinkPath.isAbsolute())
                     node.linkPath = newLinkPath
-
-                    print('    - pos %r: %r -> %r' % (
-                        node.pos,
-                        oldLinkPath.getLinkCore(), newLinkPath.getLinkCore()))
+                    editCount += 1
 
             elif node.name == "attribute":
                 if node.key in ATTRIBUTES_WITH_WIKIWORD_VALUES:
@@ -1709,8 +1931,7 @@ class WikiDocument(MiscEventSourceMixin):
                 if node.key == 'page':
                     node.value = update(node.value)
 
-        text = langHelper.generate_text(ast, page)  # text with updated links
-        return text
+        return editCount
 
 
     @staticmethod
@@ -1726,6 +1947,15 @@ class WikiDocument(MiscEventSourceMixin):
         if text is None:
             return None
 
+        return WikiDocument._searchAndReplaceInText(text, word, toWord)[0]
+
+
+    @staticmethod
+    def _searchAndReplaceInText(text, word, toWord):
+        """Return tuple (text, replaceCount) with all occurrences of `word`
+        in `text` replaced by `toWord`.
+        """
+        replaceCount = 0
         sarOp = SearchReplaceOperation()
         sarOp.wikiWide = True
         sarOp.wildCard = 'regex'
@@ -1743,8 +1973,9 @@ class WikiDocument(MiscEventSourceMixin):
             repl = sarOp.replace(text, found)
             text = text[:start] + repl + text[end:]  # TODO Faster?
             charStartPos = start + len(repl)
+            replaceCount += 1
 
-        return text
+        return text, replaceCount
 
 
     def renameWikiWord(self, word, toWord):
@@ -1779,46 +2010,9 @@ class WikiDocument(MiscEventSourceMixin):
 
         wikiData = self.getWikiData()
 
-        # TODO: Replace always?
-        # Check if replacing previous title of page with new one
-        wordTitle = self.getWikiPageTitle(word)
-        if wordTitle is not None:
-            wordTitle = self.formatPageTitle(wordTitle) + "\n"
-
         # if the root was renamed we have a little more to do
         if word == self.getWikiName():
-            wikiConfig = self.getWikiConfig()
-            wikiConfig.set("main", "wiki_name", toWord)
-            wikiConfig.set("main", "last_wiki_word", toWord)
-            wikiConfig.save()
-
-            wikiConfigPath = wikiConfig.getConfigPath()
-            # Unload wiki configuration file
-            wikiConfig.loadConfig(None)
-
-            # Rename config file
-            renamedConfigPath = os.path.join(os.path.dirname(wikiConfigPath),
-                                             "%s.wiki" % toWord)
-            os.rename(wikiConfigPath, renamedConfigPath)
-
-            # Load it again
-            wikiConfig.loadConfig(renamedConfigPath)
-            self.wikiName = toWord
-
-            # todo (pvh): ?! race condition here
-            #
-            # When renaming root, sometimes (and sometimes not) config.get()
-            # raises UnknownOptionException.
-            #
-            # It looks like unloading and loading the configuration again
-            # like this is not thread safe: another thread (e.g., refreshing
-            # of meta data) might try to read when config is unloaded, but not
-            # yet loaded again?!
-
-            # Update dict of open documents (= wiki data managers)
-            global _openDocuments
-            del _openDocuments[wikiConfigPath]
-            _openDocuments[renamedConfigPath] = self
+            self._renameWikiConfig(toWord)
 
         # rename page
         if wordPage.getDirty()[0]:
@@ -1843,16 +2037,71 @@ class WikiDocument(MiscEventSourceMixin):
         # But first update the match terms which need synchronous updating
         toWordPage.refreshSyncUpdateMatchTerms()
         wikiData.setMetaDataState(toWord, Consts.WIKIWORDMETADATA_STATE_DIRTY)
-        content = toWordPage.getLiveText()
-        if wordTitle is not None and content.startswith(wordTitle):
-            # Replace previous title with new one
-            toWikiWordTitle = self.formatPageTitle(self.getWikiPageTitle(toWord))
-            content = toWikiWordTitle + "\n" + content[len(wordTitle):]
+        content = self._replacePageTitle(word, toWord,
+                toWordPage.getLiveText())
+        if content is not None:
             toWordPage.replaceLiveText(content)
         toWordPage.initiateUpdate()
 
 
-    def renameWikiWords(self, renameDict, modifyText=ModifyText.advanced):
+    def _replacePageTitle(self, word, toWord, text):
+        """Return `text` with the title of page `word` at its beginning
+        replaced by the title of `toWord` or None if `text` doesn't start
+        with the title.
+        """
+        # TODO: Replace always?
+        wordTitle = self.getWikiPageTitle(word)
+        if wordTitle is None:
+            return None
+
+        wordTitle = self.formatPageTitle(wordTitle) + "\n"
+        if not text.startswith(wordTitle):
+            return None
+
+        toWikiWordTitle = self.formatPageTitle(self.getWikiPageTitle(toWord))
+        return toWikiWordTitle + "\n" + text[len(wordTitle):]
+
+
+    def _renameWikiConfig(self, toWord):
+        """Rename the wiki configuration file when renaming the root
+        page to `toWord`.
+        """
+        wikiConfig = self.getWikiConfig()
+        wikiConfig.set("main", "wiki_name", toWord)
+        wikiConfig.set("main", "last_wiki_word", toWord)
+        wikiConfig.save()
+
+        wikiConfigPath = wikiConfig.getConfigPath()
+        # Unload wiki configuration file
+        wikiConfig.loadConfig(None)
+
+        # Rename config file
+        renamedConfigPath = os.path.join(os.path.dirname(wikiConfigPath),
+                                         "%s.wiki" % toWord)
+        os.rename(wikiConfigPath, renamedConfigPath)
+
+        # Load it again
+        wikiConfig.loadConfig(renamedConfigPath)
+        self.wikiName = toWord
+
+        # todo (pvh): ?! race condition here
+        #
+        # When renaming root, sometimes (and sometimes not) config.get()
+        # raises UnknownOptionException.
+        #
+        # It looks like unloading and loading the configuration again
+        # like this is not thread safe: another thread (e.g., refreshing
+        # of meta data) might try to read when config is unloaded, but not
+        # yet loaded again?!
+
+        # Update dict of open documents (= wiki data managers)
+        global _openDocuments
+        del _openDocuments[wikiConfigPath]
+        _openDocuments[renamedConfigPath] = self
+
+
+    def renameWikiWords(self, renameDict, modifyText=ModifyText.advanced,
+            dryRun=False, jobs=None):
         """Rename pages.
 
         renameDict -- Dictionary which maps old page names to new page
@@ -1886,35 +2135,62 @@ class WikiDocument(MiscEventSourceMixin):
                 references and should only be used if you can not use
                 `ModifyText.advanced`.
 
-        Note: renaming requires the pages to be already saved, so save
-        pages before renaming.
-        """
-#         print u'WikiDataManager.renameWikiWords renameDict = %r' % renameDict
+        dryRun -- If True, only compute which pages would be changed,
+                do not modify anything.
 
-        # 1. rename all pages
-        for oldPageName, newPageName in renameDict.items():
-            self.renameWikiWord(oldPageName, newPageName)
+        jobs -- Number of worker processes used to parse the pages with
+                references, None to use the global option
+                "processPool_workers".
 
-        if modifyText == ModifyText.off:
-            return
+        All new page texts are computed first, then the renames and the
+        changed pages are written to the database in one transaction and
+        one update of the meta-data of all changed pages is queued.
 
-        # 2. update text of all affected pages, i.e., all pages with
-        #    references to the old page names
+        Returns dictionary {pageName: editCount} of the pages which are
+        (or would be) renamed or changed. The keys are the page names after
+        renaming, editCount is the number of changed references including
+        a changed page title.
 
-#         print u"(Candidate) pages with text to update = %r" % to_update
+        Note: pages in an editor should be saved before renaming.
+        """
+        renameSeq = list(renameDict.items())
+        langHelper = GetApp().createWikiLanguageHelper(
+            self.getWikiDefaultWikiLanguage())
+        self._checkRenameSeq(renameSeq, langHelper)
 
-        if modifyText == ModifyText.advanced:
-            to_update = set()
-            for oldPageName in renameDict:
-                to_update |= self._findPagesThatReferenceWord(oldPageName)
+        pages = {}  # {oldPageName: page}
+        texts = {}  # {oldPageName: new text}
+        edits = {}  # {oldPageName: editCount}
 
-            langHelper = GetApp().createWikiLanguageHelper(
-                self.getWikiDefaultWikiLanguage())
-            for wikiword in to_update:
-                page = self.getWikiPage(wikiword)
-                text = self._updateWikiWordReferences(page, renameDict,
-                                                      langHelper)
-                page.replaceLiveText(text)
+        # 1. get renamed pages, replace their titles
+        for oldPageName, newPageName in renameSeq:
+            try:
+                page = self.getWikiPage(oldPageName)
+            except WikiWordNotFoundException:
+                edits[oldPageName] = 0
+                if dryRun:
+                    continue
+                # create page first
+                page = self.createWikiPage(oldPageName)
+                page.writeToDatabase()
+            else:
+                if not dryRun and page.getDirty()[0]:
+                    page.writeToDatabase()
+
+            pages[oldPageName] = page
+            edits[oldPageName] = 0
+            text = self._replacePageTitle(oldPageName, newPageName,
+                    page.getLiveText())
+            if text is not None:
+                texts[oldPageName] = text
+                edits[oldPageName] = 1
+
+        # 2. compute text of all affected pages, i.e., all pages with
+        #    references to the old page names
+        if modifyText == ModifyText.advanced:
+            self._updateReferencesInTexts(
+                    self._findPagesThatReferenceWords(list(renameDict)),
+                    renameDict, langHelper, pages, texts, edits, jobs)
 
         elif modifyText == ModifyText.simple:
             # We have to search the wiki files and replace the old words with the new
@@ -1924,65 +2200,168 @@ class WikiDocument(MiscEventSourceMixin):
             sarOp.caseSensitive = True
             sarOp.searchStr = "|".join(r"\b" + re.escape(ww) + r"\b"
                     for ww in renameDict)
-            
-            for wikiword in self.searchWiki(sarOp):
-                page = self.getWikiPage(wikiword)
-                for oldPageName, newPageName in renameDict.items():
-                    text = self._searchAndReplaceWikiWordReferences(
-                        page, oldPageName, newPageName)
-                    if text is not None:
-                        page.replaceLiveText(text)
 
+            for wikiword in self.searchWiki(sarOp, applyOrdering=False):
+                page = pages.get(wikiword)
+                if page is None:
+                    page = self.getWikiPage(wikiword).getNonAliasPage()
+                    wikiword = page.getWikiWord()
+                text = texts.get(wikiword)
+                if text is None:
+                    text = page.getLiveTextNoTemplate()
+                    if text is None:
+                        continue
 
-    def _findPagesThatReferenceWord(self, word):
+                editCount = 0
+                for oldPageName, newPageName in renameSeq:
+                    text, count = self._searchAndReplaceInText(text,
+                            oldPageName, newPageName)
+                    editCount += count
+
+                if editCount > 0:
+                    pages[wikiword] = page
+                    texts[wikiword] = text
+                    edits[wikiword] = edits.get(wikiword, 0) + editCount
+
+        if dryRun:
+            return dict((renameDict.get(pageName, pageName), editCount)
+                    for pageName, editCount in edits.items())
+
+        # 3. write everything in one transaction
+        self.getWikiData().renameWords(renameSeq,
+                dict((renameDict.get(pageName, pageName), text)
+                for pageName, text in texts.items()))
+
+        # 4. inform and update renamed pages
+        for oldPageName, newPageName in renameSeq:
+            if oldPageName == self.getWikiName():
+                self._renameWikiConfig(newPageName)
+
+            page = pages[oldPageName]
+            page.renameVersionData(newPageName)
+            page.queueRemoveFromSearchIndex()
+            # If the page is opened in an editor the event causes the
+            # docPagePresenter to unload it and to load `newPageName`
+            page.informRenamedWikiPage(newPageName)
+            self.wikiPageDict.pop(oldPageName, None)
+
+        for oldPageName, newPageName in renameSeq:
+            self.getWikiPage(newPageName).refreshSyncUpdateMatchTerms()
+
+        # Cached page objects of changed pages must drop their old text
+        for pageName, text in texts.items():
+            if pageName in renameDict:
+                continue
+            page = self.wikiPageDict.get(pageName)
+            if page is None:
+                continue
+            if page.getTxtEditor() is not None:
+                page.replaceLiveText(text)
+            else:
+                page.markTextChanged()
+
+        # 5. one update of the meta-data of all changed pages
+        self.pushDirtyMetaDataUpdate()
+
+        return dict((renameDict.get(pageName, pageName), editCount)
+                for pageName, editCount in edits.items())
+
+
+    def _checkRenameSeq(self, renameSeq, langHelper):
+        """Raise WikiDataException if one of the renames in `renameSeq`,
+        a sequence of tuples (word, toWord), isn't possible when processed
+        in order.
+        """
+        freed = set()
+        taken = set()
+        for word, toWord in renameSeq:
+            errMsg = langHelper.checkForInvalidWikiWord(toWord, self)
+            if errMsg:
+                raise WikiDataException(
+                    _("%r is an invalid wiki word. %s") % (toWord, errMsg))
+            if toWord in taken or (toWord not in freed and
+                    self.isDefinedWikiLinkTerm(toWord)):
+                raise WikiDataException(
+                        _("Cannot rename %r to %r, %r already exists.") %
+                        (word, toWord, toWord))
+            freed.add(word)
+            freed.discard(toWord)
+            taken.discard(word)
+            taken.add(toWord)
+
+
+    def _updateReferencesInTexts(self, pageNames, renameDict, langHelper,
+            pages, texts, edits, jobs):
+        """Update references to renamed pages in the texts of `pageNames`.
+        The pages are parsed by worker processes if possible.
+
+        pages, texts, edits -- Dictionaries keyed by old page name with the
+                page objects, new texts and edit counts. They are updated
+                for the changed pages.
+        """
+        items = []
+        itemPages = {}
+        for pageName in pageNames:
+            page = pages.get(pageName)
+            if page is None:
+                try:
+                    page = self.getWikiPage(pageName).getNonAliasPage()
+                except WikiWordNotFoundException:
+                    continue
+                pageName = page.getWikiWord()
+            text = texts.get(pageName)
+            if text is None:
+                text = page.getLiveText()
+            itemPages[pageName] = page
+            items.append((pageName, page, text, page.getFormatDetails()))
+
+        if len(items) < 20:
+            # Starting worker processes doesn't pay off for a few pages
+            jobs = 1
+
+        pageParser = ParallelParsing.PageParser(self, jobs)
+        try:
+            for pageName, astData in pageParser.iterParse(items):
+                if astData is None:
+                    continue
+
+                ast = ParallelParsing.loadAst(astData)
+                page = itemPages[pageName]
+                editCount = self._updateAstWikiWordReferences(ast, page,
+                        renameDict.get(pageName, pageName), renameDict,
+                        langHelper)
+                if editCount == 0:
+                    continue
+
+                pages[pageName] = page
+                texts[pageName] = langHelper.generate_text(ast, page)
+                edits[pageName] = edits.get(pageName, 0) + editCount
+        finally:
+            pageParser.close()
+
+
+    def _findPagesThatReferenceWords(self, words):
         """Return set of page names of pages that have (or might have)
-        references to `word`. References include wiki words, links,
+        references to one of `words`. References include wiki words, links,
         attribute and insertion values.
         """
-        # -- parents of word
         wikiData = self.getWikiData()
-        wordParents = set(wikiData.getParentRelationships(word))
 
-        # -- insertions ~ [:page: ..] (*possible* reference to word)
-        sarOp = SearchReplaceOperation()
-        sarOp.wikiWide = True
-        sarOp.wildCard = 'regex'
-        sarOp.caseSensitive = True
-        sarOp.searchStr = r'\[\s*:\s*page\s*[=:][^\]]*\]'
-        # Note: searching for [:page: word] is not enough because we need
-        # to resolve the insertion value using langHelper to handle subpage
-        # links, e.g., [:page: ../toppage]. We thus need to check all page
-        # insertions, which can be slow. To speed this up, we could cache
-        # resolved page insertion values in the database.
-        wordsWithInsertions = set(self.searchWiki(sarOp))
-        # todo (pvh): ? resolve values and return only pages to word
-
-        # -- attributes with wiki word values ~ [key: ..] (*possible* reference)
-        wordsWithAttributes = set()
-        for key in ATTRIBUTES_WITH_WIKIWORD_VALUES:
-            for wikiword, attr, value in self.getAttributeTriples(
-                    word=None, key=key, value=None):
-                # Note: value=None: we can not use value=word, because
-                # the attribute value needs to be resolved using langHelper,
-                # to handle subpage links (value=word does a literal
-                # comparison). We thus need to check all attributes that
-                # can have wiki word values, which can be slow. To speed
-                # this up, we could cache resolved attribute values in
-                # the database.
-                wordsWithAttributes.add(wikiword)
-        # todo (pvh): ? resolve values and return only pages to word
-
-        # (too) simple alternative for finding pages: do wiki wide text search:
-        #
-        # sarOp = SearchReplaceOperation()
-        # sarOp.wikiWide = True
-        # sarOp.wildCard = 'regex'
-        # sarOp.caseSensitive = True
-        # sarOp.searchStr = r"\b" + re.escape(word) + r"\b"
-        # words = self.searchWiki(sarOp):
+        # -- parents of words
+        result = set()
+        for word in words:
+            result.update(wikiData.getParentRelationships(word))
+
+        # -- insertions ~ [:page: ..] and attributes with wiki word
+        #    values ~ [key: ..] whose resolved values are stored in the
+        #    database when updating the page's meta-data
+        result.update(wikiData.getReferencingWikiWords(words))
+
+        # -- pages whose meta-data wasn't updated yet (*possible* reference)
+        result.update(wikiData.getWikiPageNamesForMetaDataState(
+                Consts.WIKIWORDMETADATA_STATE_SYNTAXPROCESSED, ">"))
 
-        ans = wordParents | wordsWithInsertions | wordsWithAttributes
-        return ans
+        return result
 
 
     # TODO threadstop?
@@ -1991,11 +2370,20 @@ class WikiDocument(MiscEventSourceMixin):
         Get regular expressions and words used to operate autoLink function in 
         "relax" mode
         """
-        if self.autoLinkRelaxInfo is None:
+        if self.autoLinkRelaxInfo is None or self.autoLinkRelaxInfoOutdated:
             langHelper = GetApp().createWikiLanguageHelper(
                     self.getWikiDefaultWikiLanguage())
 
-            self.autoLinkRelaxInfo = langHelper.buildAutoLinkRelaxInfo(self)
+            self.autoLinkRelaxInfoOutdated = False
+
+            if self.autoLinkRelaxInfo is not None and \
+                    hasattr(langHelper, "updateAutoLinkRelaxInfo"):
+                # Update incrementally instead of building from scratch
+                self.autoLinkRelaxInfo = langHelper.updateAutoLinkRelaxInfo(
+                        self, self.autoLinkRelaxInfo)
+            else:
+                self.autoLinkRelaxInfo = langHelper.buildAutoLinkRelaxInfo(
+                        self)
 
         return self.autoLinkRelaxInfo
 
@@ -2088,17 +2476,33 @@ class WikiDocument(MiscEventSourceMixin):
                 return []
 
             q = sarOp.getWhooshIndexQuery(self)
-            s = self.getSearchIndex().searcher()
             threadstop.testValidThread()
-            resultList = s.search(q, limit=None)
+            resultList = self.getSearchIndex().search(q)
             
-            result = [rd["unifName"][9:] for rd in resultList
-                    if rd["unifName"].startswith("wikipage/")]
+            result = [unifName[9:] for unifName in resultList
+                    if unifName.startswith("wikipage/")]
             
             threadstop.testValidThread()
             return result
 
 
+    def searchWikiRanked(self, sarOp, threadstop=DUMBTHREADSTOP):
+        """
+        Index search of all wiki pages using the SearchAndReplaceOperation
+        sarOp. Returns a SearchIndex.RankedResults object which delivers
+        tuples (wikiWord, score) ordered by descending score in pages on
+        demand. Call its close() method if no further pages are needed.
+        """
+        threadstop.testValidThread()
+        if not self.isSearchIndexEnabled():
+            return SearchIndex.RankedResults()
+
+        q = sarOp.getWhooshIndexQuery(self)
+        threadstop.testValidThread()
+
+        return self.getSearchIndex().rankedSearch(q, "wikipage/")
+
+
     @staticmethod
     def getWhooshIndexContentAnalyzer():
         from whoosh.analysis import StandardAnalyzer        
@@ -2134,10 +2538,37 @@ class WikiDocument(MiscEventSourceMixin):
                 False)
 
     def isSearchIndexPresent(self):
-        import whoosh.index
+        if self.getWikiConfig().get("main", "indexSearch_activeBackend",
+                "whoosh") == "fts5":
+            return self.getWikiConfig().getint("main", "indexSearch_formatNo",
+                    1) == Consts.SEARCHINDEX_FORMAT_NO
 
         indexPath = os.path.join(self.getWikiPath(), "indexsearch")
-        return os.path.exists(indexPath) and whoosh.index.exists_in(indexPath)
+        return SearchIndex.WhooshSearchIndex.exists(indexPath)
+
+    def isSearchIndexTransactional(self):
+        """
+        Return True if the search index is updated as part of the
+        transactions of the wiki database.
+        """
+        searchIdx = self.getSearchIndex()
+        return searchIdx is not None and searchIdx.isTransactional()
+
+    def _getWantedSearchIndexBackend(self):
+        """
+        Return name of the search index backend to use according to
+        wiki option "indexSearch_backend" and capabilities of the database.
+        """
+        backend = self.getWikiConfig().get("main", "indexSearch_backend",
+                "whoosh")
+
+        if backend == "fts5":
+            isAvailable = getattr(self.getWikiData(),
+                    "isFullTextIndexAvailable", None)
+            if isAvailable is not None and isAvailable():
+                return "fts5"
+
+        return "whoosh"
 
     def removeSearchIndex(self):
 #         if self.isSearchIndexEnabled():
@@ -2145,11 +2576,12 @@ class WikiDocument(MiscEventSourceMixin):
         
         p = self.updateExecutor.pause(wait=True)
         self.updateExecutor.clearDeque(self.UEQUEUE_INDEX)
+        self.searchIndexUpdater.discard()
         self.updateExecutor.start()
 
-        if self.whooshIndex is not None:
-            self.whooshIndex.close()
-            self.whooshIndex = None
+        if self.searchIndex is not None:
+            self.searchIndex.close()
+            self.searchIndex = None
         
 
         indexPath = os.path.join(self.getWikiPath(), "indexsearch")
@@ -2157,39 +2589,78 @@ class WikiDocument(MiscEventSourceMixin):
             # Warning!!! rmtree() is very dangerous, don't make a mistake here!
             shutil.rmtree(indexPath, ignore_errors=True)
 
+        if getattr(self.getWikiData(), "isFullTextIndexAvailable",
+                lambda: False)():
+            try:
+                self.getWikiData().clearFullTextIndex(drop=True)
+            except DbAccessError:
+                traceback.print_exc()
+
         self.getWikiConfig().set("main", "indexSearch_formatNo", "0")
 
 
+    def _openPageAstCache(self):
+        """
+        Open the persistent cache of page ASTs if enabled by the global
+        option "pageAstCache_sizeLimit" (in MiB).
+        """
+        sizeLimit = GetApp().getGlobalConfig().getint("main",
+                "pageAstCache_sizeLimit", 64)
+        if sizeLimit <= 0:
+            return
+
+        try:
+            self.pageAstCache = PageAstCache.PageAstCache(
+                    os.path.join(self.getWikiPath(), "pageastcache.sli"),
+                    sizeLimit * 1024 * 1024)
+        except:
+            traceback.print_exc()
+            self.pageAstCache = None
+
+
+    def getPageAstCache(self):
+        """
+        Return PageAstCache object or None if not available.
+        """
+        return self.pageAstCache
+
+
+    def getSearchIndexUpdater(self):
+        """
+        Return the SearchIndex.SearchIndexUpdater which collects index updates
+        done by the update executor.
+        """
+        return self.searchIndexUpdater
+
+
     def getSearchIndex(self, clear=False):
         """
-        Opens (or creates if necessary) the whoosh search index and returns it.
+        Opens (or creates if necessary) the search index and returns it
+        (see SearchIndex module). The backend is chosen by wiki option
+        "indexSearch_backend".
         It also automatically refreshes the index to the latest version if needed.
         """
         if not self.isSearchIndexEnabled():
             return None
-        
-        import whoosh.index, whoosh.writing
-
-        whoosh.writing.DOCLENGTH_TYPE = "l"
-        whoosh.writing.DOCLENGTH_LIMIT = 2 ** 31 - 1
 
-        if self.whooshIndex is None:
-            indexPath = os.path.join(self.getWikiPath(), "indexsearch")
-            if not os.path.exists(indexPath):
-                os.mkdir(indexPath)
-
-            if clear or not whoosh.index.exists_in(indexPath):
-                schema = self.getWhooshIndexSchema()
-                whoosh.index.create_in(indexPath, schema)
+        if self.searchIndex is None:
+            backend = self._getWantedSearchIndexBackend()
+            if backend == "fts5":
+                self.searchIndex = SearchIndex.Fts5SearchIndex(
+                        self.getWikiData(), clear=clear)
+            else:
+                self.searchIndex = SearchIndex.WhooshSearchIndex(
+                        os.path.join(self.getWikiPath(), "indexsearch"),
+                        self.getWhooshIndexSchema(), clear=clear)
 
-            self.whooshIndex = whoosh.index.open_dir(indexPath)
-            
             self.getWikiConfig().set("main", "indexSearch_formatNo",
                     str(Consts.SEARCHINDEX_FORMAT_NO))
+            self.getWikiConfig().set("main", "indexSearch_activeBackend",
+                    backend)
 
-        self.whooshIndex = self.whooshIndex.refresh()
+        self.searchIndex.refresh()
 
-        return self.whooshIndex
+        return self.searchIndex
 
 
 #     def rebuildSearchIndex(self, progresshandler, onlyDirty=False):
@@ -2517,6 +2988,20 @@ class WikiDocument(MiscEventSourceMixin):
         
         if wikiConfig.getboolean("main",
                 "indexSearch_enabled", False):
+            if self.searchIndex is not None and \
+                    self.searchIndex.getBackendName() != \
+                    self._getWantedSearchIndexBackend():
+                # Backend was switched, index must be built again
+                wikiData.commit()
+                finalState = Consts.WIKIWORDMETADATA_STATE_SYNTAXPROCESSED
+
+                for wikiWord in wikiData.getWikiPageNamesForMetaDataState(
+                        finalState, "<"):
+                    wikiData.setMetaDataState(wikiWord, finalState)
+                wikiData.commit()
+
+                self.removeSearchIndex()
+
             self.pushDirtyMetaDataUpdate()
         else:
             if strToBool(miscevt.get("old config settings")
@@ -2537,6 +3022,11 @@ class WikiDocument(MiscEventSourceMixin):
                 # Remove index
                 self.removeSearchIndex()
 
+        if wikiData.checkCapability("trigram index") is not None and \
+                wikiData.isTrigramIndexPresent() and \
+                not wikiConfig.getboolean("main", "search_trigramIndex", False):
+            wikiData.dropTrigramIndex()
+
         if wikiData.checkCapability("filePerPage") is not None:
             wikiData.setEditorTextMode(wikiConfig.getboolean("main",
                     "editor_text_mode", False))
@@ -2598,20 +3088,20 @@ class WikiDocument(MiscEventSourceMixin):
 
             if miscevt.has_key_in(("deleted wiki page", "renamed wiki page",
                     "pseudo-deleted wiki page")):
-                self.autoLinkRelaxInfo = None
+                self.autoLinkRelaxInfoOutdated = True
                 attrs = miscevt.getProps().copy()
                 attrs["wikiPage"] = miscevt.getSource()
                 self.fireMiscEventProps(attrs)
                 miscevt.getSource().queueRemoveFromSearchIndex()  # TODO: Check for possible failure!!!
                 # TODO: Add new on rename
             elif "updated wiki page" in miscevt:
-                self.autoLinkRelaxInfo = None
+                self.autoLinkRelaxInfoOutdated = True
                 attrs = miscevt.getProps().copy()
                 attrs["wikiPage"] = miscevt.getSource()
                 self.fireMiscEventProps(attrs)
 #                 miscevt.getSource().putIntoSearchIndex()
             elif "saving new wiki page" in miscevt:            
-                self.autoLinkRelaxInfo = None
+                self.autoLinkRelaxInfoOutdated = True
 #                 miscevt.getSource().putIntoSearchIndex()
             elif "reread cc blacklist needed" in miscevt:
                 self._updateCcWordBlacklist()
@@ -101,6 +101,7 @@ class ImportException(AppBaseException): pass
 # See Serialization.py
 class SerializationException(AppBaseException): pass
 class VersioningException(AppBaseException): pass
+class TrashcanDataDamagedException(AppBaseException): pass
 
 # See WikiDocument.py. Thrown if requested handler for db backend isn't
 #     available
@@ -78,6 +78,7 @@ from weakref import ref as wkref
 import copy, time
 import sys
 import warnings
+import io, pickle, zlib
 import re
 import sre_constants
 import traceback
@@ -646,6 +647,19 @@ class NonTerminalNode(SyntaxNode):
         return ret
 
 
+    def __reduce__(self):
+        # The "strLength" property shadows the slot of SyntaxNode, so the
+        # default pickling of slots would fail. The cached length isn't
+        # stored, it is recalculated on demand.
+        state = self.__dict__
+        if "_calcedStrLength" in state:
+            state = state.copy()
+            del state["_calcedStrLength"]
+
+        return (NonTerminalNode, (self.sub, self.pos, self.name),
+                state or None)
+
+
     def _pprintRecurs(self, ind, inc, result):
         if self.__dict__:
             result.append(" " * ind + "NtNode(%s, %s, %s, %s, " %
@@ -784,6 +798,11 @@ class TerminalNode(SyntaxNode):
         return TerminalNode(self.text, self.pos, self.name)
 
 
+    def __reduce__(self):
+        return (TerminalNode, (self.text, self.pos, self.name),
+                self.__dict__ or None)
+
+
 
 
 class ParsingState:
@@ -820,6 +839,132 @@ def buildSyntaxNode(sub, pos=-1, name=None):
 
 
 
+# Classes (besides the node classes) which may appear as attribute values
+# in serialized page ASTs. Other classes are refused by deserializeAst().
+_AST_CLASSES = {}
+
+def registerAstClass(cls):
+    """
+    Allow instances of  cls  as attribute values of syntax nodes in
+    serialized page ASTs. Parser plugins must register all such classes
+    they use.
+    """
+    _AST_CLASSES[(cls.__module__, cls.__qualname__)] = cls
+    return cls
+
+
+class _AstUnpickler(pickle.Unpickler):
+    def find_class(self, module, name):
+        cls = _AST_CLASSES.get((module, name))
+        if cls is None:
+            raise pickle.UnpicklingError("Class %s.%s not allowed in AST" %
+                    (module, name))
+        return cls
+
+
+def serializeAst(pageAst):
+    """
+    Return a compact byte string representation of a page AST which can
+    be restored by deserializeAst().
+    """
+    return zlib.compress(pickle.dumps(pageAst, pickle.HIGHEST_PROTOCOL), 1)
+
+
+def deserializeAst(data):
+    """
+    Restore a page AST from  data  created by serializeAst(). Only syntax
+    nodes and registered classes are created so that data from an
+    untrusted source (e.g. a cache file) can't execute arbitrary code.
+    Raises pickle.UnpicklingError or zlib.error for invalid data.
+    """
+    return _AstUnpickler(io.BytesIO(zlib.decompress(data))).load()
+
+
+registerAstClass(NonTerminalNode)
+registerAstClass(TerminalNode)
+
+
+
+# Helpers for incremental reparsing of a page
+
+def findTextChange(oldText, newText):
+    """
+    Return tuple (start, oldEnd, newEnd) so that  oldText[start:oldEnd]
+    was replaced by  newText[start:newEnd]  and the rest is equal.
+    Returns None if both texts are equal.
+    """
+    if oldText == newText:
+        return None
+
+    maxCommon = min(len(oldText), len(newText))
+
+    # Compare in chunks first, it is much faster than char by char
+    start = 0
+    chunk = 4096
+    while chunk > 0:
+        while start + chunk <= maxCommon and \
+                oldText[start:start + chunk] == newText[start:start + chunk]:
+            start += chunk
+        chunk //= 8
+
+    maxSuffix = maxCommon - start
+    suffix = 0
+    chunk = 4096
+    while chunk > 0:
+        while suffix + chunk <= maxSuffix and \
+                oldText[len(oldText) - suffix - chunk:len(oldText) - suffix] == \
+                newText[len(newText) - suffix - chunk:len(newText) - suffix]:
+            suffix += chunk
+        chunk //= 8
+
+    return (start, len(oldText) - suffix, len(newText) - suffix)
+
+
+def _iterNodeRefs(value):
+    if isinstance(value, SyntaxNode):
+        yield value
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            for node in _iterNodeRefs(item):
+                yield node
+
+
+def shiftAstPositions(nodes, delta):
+    """
+    Add  delta  to the pos of all  nodes, their subnodes and nodes
+    referenced by their attributes (e.g. "titleNode"). The nodes are
+    modified in place.
+    """
+    if delta == 0:
+        return
+
+    seen = set()
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+
+        if node.pos != -1:
+            node.pos += delta
+
+        if not node.isTerminal():
+            stack.extend(node.sub)
+
+        for value in node.__dict__.values():
+            stack.extend(_iterNodeRefs(value))
+
+
+def copyAstNodes(nodes):
+    """
+    Return deep copy of list of  nodes. Nodes referenced multiple times
+    (as subnode and as attribute) are referenced the same way in the copy.
+    """
+    return pickle.loads(pickle.dumps(nodes, pickle.HIGHEST_PROTOCOL))
+
+
+
 def col (loc,strg):
     """Returns current column within a string, counting newlines as line separators.
    The first column is number 1.
@@ -128,6 +128,8 @@ class AbstractNode:
         Returns a sequence of Nodes for the children of this node.
         This is called before expanding the node. This should be called mainly
         in background threads.
+        The sequence must support len() and slicing, the tree creates items
+        only for slices of it if there are many children.
         """
         return ()
         
@@ -193,6 +195,181 @@ class AbstractNode:
 
 
 
+class NodePresentationCache:
+    """
+    Per wiki cache of the attribute dependent presentation of wiki word
+    nodes. The "global.*" attributes are compiled into one dictionary per
+    presentation attribute, the results are stored per wiki word until
+    the page is updated.
+    """
+    def __init__(self):
+        self.globalAttrs = None
+        # Dictionary {presentation attribute: value of "global.<attr>"}
+        self.globalDefaults = {}
+        # Dictionary {presentation attribute: {"<key>" or "<key>.<value>":
+        #         value of "global.<key>[.<value>].<attr>"}}
+        self.globalRules = {}
+        # Dictionary {presentation attribute: set of first parts of keys
+        #         in globalRules}
+        self.globalRulePrefixes = {}
+
+        # Dictionary {real wiki word: (label suffix,
+        #         tuple of (presentation attribute, value))}
+        self.styles = {}
+        # Incremented on each invalidation so that results calculated
+        # meanwhile in the background aren't stored
+        self.invalidations = 0
+
+
+    def clear(self):
+        self.styles = {}
+        self.invalidations += 1
+
+
+    def invalidateWikiWord(self, wikiWord):
+        self.styles.pop(wikiWord, None)
+        self.invalidations += 1
+
+
+    def _setGlobalAttributes(self, globalAttrs):
+        if globalAttrs is self.globalAttrs:
+            return
+
+        if self.globalAttrs is not None and globalAttrs == self.globalAttrs:
+            self.globalAttrs = globalAttrs
+            return
+
+        defaults = {}
+        rules = dict((p, {}) for p in _SETTABLE_ATTRS)
+        for key, value in globalAttrs.items():
+            parts = key.split(".")
+            p = parts[-1]
+            if len(parts) < 2 or parts[0] != "global" or p not in rules:
+                continue
+
+            if len(parts) == 2:
+                defaults[p] = value
+            else:
+                rules[p][".".join(parts[1:-1])] = value
+
+        self.globalDefaults = defaults
+        self.globalRules = rules
+        self.globalRulePrefixes = dict((p, set(rk.split(".", 1)[0]
+                for rk in pRules)) for p, pRules in rules.items())
+        self.globalAttrs = globalAttrs
+        self.clear()
+
+
+    def _findGlobalValue(self, p, attrsItems):
+        """
+        Find value of the most specific global attribute for presentation
+        attribute p matching the attributes of a page.
+        """
+        pRules = self.globalRules[p]
+        prefixes = self.globalRulePrefixes[p]
+
+        gPropVal = self.globalDefaults.get(p)
+        dots = -1
+
+        for (key, values) in attrsItems:
+            if key.split(".", 1)[0] not in prefixes:
+                # No global attribute can match key
+                continue
+
+            newGPropVal = None
+            newDots = key.count(".") + 1 # key dots plus one for value
+            if newDots > dots:
+                for val in values:
+                    newGPropVal = pRules.get("%s.%s" % (key, val))
+                    if newGPropVal is not None:
+                        gPropVal = newGPropVal
+                        dots = newDots
+                        break
+
+                # Now check without value
+                newDots -= 1
+                while newDots > dots:
+                    newGPropVal = pRules.get(key)
+                    if newGPropVal is not None:
+                        break
+
+                    dotpos = key.rfind(".")
+                    if dotpos == -1:
+                        break
+                    key = key[:dotpos]
+                    newDots -= 1
+
+                if newGPropVal is not None:
+                    gPropVal = newGPropVal
+                    dots = newDots
+
+        return gPropVal
+
+
+    def getAttributeStyle(self, wikiDocument, wikiWord):
+        """
+        Return tuple (label suffix, tuple of (presentation attribute, value))
+        for wikiWord.
+        """
+        self._setGlobalAttributes(wikiDocument.getWikiData()
+                .getGlobalAttributes())
+
+        realWord = wikiDocument.getWikiPageNameForLinkTermOrAsIs(wikiWord)
+        result = self.styles.get(realWord)
+        if result is not None:
+            return result
+
+        invalidations = self.invalidations
+        wikiPage = wikiDocument.getWikiPageNoError(wikiWord)\
+                .getNonAliasPage() # Ensure we don't have an alias
+
+        # get the wikiPage attributes
+        attrs = wikiPage.getAttributes()
+
+        labelSuffix = ""
+        # priority
+        priority = attrs.get("priority", (None,))[-1]
+
+        # priority is special. it can create an "importance" and it changes
+        # the text of the node            
+        if priority:
+            labelSuffix = " (%s)" % priority
+            # set default importance based on priority
+            if 'importance' not in attrs:
+                try:
+                    priorNum = int(priority)    # TODO Error check
+                    if (priorNum < 3):
+                        attrs['importance'] = ['high']
+                    elif (priorNum > 3):
+                        attrs['importance'] = ['low']
+                except ValueError:
+                    pass
+
+        attrsItems = list(attrs.items())
+        attrStyle = []
+
+        # apply the global attrs based on the attrs of this node
+        for p in _SETTABLE_ATTRS:
+            # Check per page attrs first
+            if p in attrs:
+                attrStyle.append((p, attrs[p][-1]))
+                continue
+
+            # Check attrs on page against global presentation attrs.
+            # The dots in the key matter. The more dots the more specific
+            # is the global prop and wins over less specific attrs
+            gPropVal = self._findGlobalValue(p, attrsItems)
+            if gPropVal is not None:
+                attrStyle.append((p, gPropVal))
+
+        result = (labelSuffix, tuple(attrStyle))
+        if invalidations == self.invalidations:
+            self.styles[realWord] = result
+
+        return result
+
+
+
 class WikiWordNode(AbstractNode):
     """
     Represents a wiki word
@@ -205,6 +382,7 @@ class WikiWordNode(AbstractNode):
         self.unifiedName = "wikipage/" + self.wikiWord
 
         self.flagRoot = False
+        self.flagChildren = None
         self.ancestors = None
         
         # Calculate label
@@ -301,8 +479,6 @@ class WikiWordNode(AbstractNode):
         assert isinstance(baselabel, str)
 
         wikiDocument = self.treeCtrl.pWiki.getWikiDocument()
-        wikiData = wikiDocument.getWikiData()
-        wikiPage = wikiDocument.getWikiPageNoError(self.wikiWord)
 
         style = NodeStyle()
         
@@ -311,95 +487,28 @@ class WikiWordNode(AbstractNode):
         # Has children?
         if self.flagRoot:
             style.hasChildren = True # Has at least Views
+        elif fast:
+            style.hasChildren = True
+        elif self.flagChildren is not None:
+            # Computed by listChildren() of parent node, use it only once
+            style.hasChildren = self.flagChildren
+            self.flagChildren = None
         else:
-            style.hasChildren = fast or self._hasValidChildren(wikiPage)
-
-        # apply custom attributes to nodes
-        wikiPage = wikiPage.getNonAliasPage() # Ensure we don't have an alias
+            style.hasChildren = self._hasValidChildren(
+                    wikiDocument.getWikiPageNoError(self.wikiWord))
 
         # if this is the scratch pad set the icon and return
         if (self.wikiWord == "ScratchPad"):
             style.icon = "note"
             return style # ?
 
+        # apply custom attributes to nodes
+        labelSuffix, attrStyle = self.treeCtrl.getPresentationCache()\
+                .getAttributeStyle(wikiDocument, self.wikiWord)
 
-        # fetch the global attributes
-        globalAttrs = self.treeCtrl.pWiki.getWikiData().getGlobalAttributes() # TODO More elegant
-        # get the wikiPage attributes
-        attrs = wikiPage.getAttributes()
-
-        # priority
-        priority = attrs.get("priority", (None,))[-1]
-
-        # priority is special. it can create an "importance" and it changes
-        # the text of the node            
-        if priority:
-            style.label += " (%s)" % priority
-            # set default importance based on priority
-            if 'importance' not in attrs:
-                try:
-                    priorNum = int(priority)    # TODO Error check
-                    if (priorNum < 3):
-                        attrs['importance'] = ['high']
-                    elif (priorNum > 3):
-                        attrs['importance'] = ['low']
-                except ValueError:
-                    pass
-
-        attrsItems = list(attrs.items())
-
-        # apply the global attrs based on the attrs of this node
-        for p in _SETTABLE_ATTRS:
-            # Check per page attrs first
-            if p in attrs:
-                setattr(style, p, attrs[p][-1])
-                continue
-
-            # Check attrs on page against global presentation attrs.
-            # The dots in the key matter. The more dots the more specific
-            # is the global prop and wins over less specific attrs
-
-            gPropVal = None
-            dots = -1
-
-            # Preset if something like e.g. [global.color: green] is available
-            newGPropVal = globalAttrs.get(u"global.%s" % p)
-            if newGPropVal is not None:
-                gPropVal = newGPropVal
-
-            for (key, values) in attrsItems:
-                newGPropVal = None
-                newDots = key.count(".") + 1 # key dots plus one for value
-                if newDots > dots:
-                    for val in values:
-                        newGPropVal = globalAttrs.get("global.%s.%s.%s" % (key, val, p))
-                        if newGPropVal is not None:
-                            gPropVal = newGPropVal
-                            dots = newDots
-                            break
-
-                    # Now check without value
-                    newDots -= 1
-                    while newDots > dots:
-                        newGPropVal = globalAttrs.get("global.%s.%s" % (key, p))
-                        if newGPropVal is not None:
-                            break
-    
-                        dotpos = key.rfind(".")
-                        if dotpos == -1:
-                            break
-                        key = key[:dotpos]
-                        newDots -= 1
-    
-                    if newGPropVal is not None:
-                        gPropVal = newGPropVal
-                        dots = newDots
-
-            # If a value is found, we stop searching for this presentation
-            # attribute here
-            if gPropVal is not None:
-                setattr(style, p, gPropVal)
-                continue
+        style.label += labelSuffix
+        for p, value in attrStyle:
+            setattr(style, p, value)
 
         return style
 
@@ -438,14 +547,43 @@ class WikiWordNode(AbstractNode):
                 existingonly=self.treeCtrl.getHideUndefined(),
                 excludeSet=ancestors, includeSet=includeSet)
 
-        result = [WikiWordNode(self.treeCtrl, self, c)
-                for c in children]
-
         if self.flagRoot:
-            result.append(MainViewNode(self.treeCtrl, self))
+            extraNodes = (MainViewNode(self.treeCtrl, self),)
+        else:
+            extraNodes = ()
 
 ##         _prof.stop()
 
+        return WikiWordChildList(self, children, extraNodes)
+
+
+    def createChildNodes(self, words):
+        """
+        Create WikiWordNode objects for the children words. Called by
+        WikiWordChildList.
+        """
+        wikiDocument = self.treeCtrl.pWiki.getWikiDocument()
+
+        if self.treeCtrl.pWiki.getConfig().getboolean("main", "tree_no_cycles"):
+            # Filter out cycles
+            ancestors = self.getAncestors().union((self.getWikiWord(),))
+        else:
+            ancestors = frozenset()  # Empty
+
+        # Find all children having children themselves at once. Ancestors
+        # of the children are the ancestors of this node and the node itself
+        realWords = [wikiDocument.getWikiPageNameForLinkTermOrAsIs(w)
+                for w in words]
+        withChildren = wikiDocument.getWikiData().getWikiWordsWithChildren(
+                realWords, existingonly=self.treeCtrl.getHideUndefined(),
+                excludeSet=ancestors)
+
+        result = []
+        for w, realWord in zip(words, realWords):
+            node = WikiWordNode(self.treeCtrl, self, w)
+            node.flagChildren = realWord in withChildren
+            result.append(node)
+
         return result
 
 
@@ -468,6 +606,127 @@ class WikiWordNode(AbstractNode):
                 self.wikiWord == other.wikiWord
 
 
+class WikiWordChildList:
+    """
+    Sequence of the child nodes of a WikiWordNode as returned by
+    WikiWordNode.listChildren(). The nodes are created when accessed, so
+    the cost for a page with thousands of children depends on the part
+    shown in the tree.
+    """
+    __slots__ = ("parentNode", "words", "extraNodes")
+
+    def __init__(self, parentNode, words, extraNodes=()):
+        """
+        words -- Sorted list of children wiki words
+        extraNodes -- Sequence of further nodes following the word nodes
+        """
+        self.parentNode = parentNode
+        self.words = words
+        self.extraNodes = extraNodes
+
+    def __len__(self):
+        return len(self.words) + len(self.extraNodes)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return list(self)[index]
+
+            wordCount = len(self.words)
+            return self.parentNode.createChildNodes(
+                    self.words[start:stop]) + list(self.extraNodes[
+                    max(0, start - wordCount):max(0, stop - wordCount)])
+
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError("WikiWordChildList index out of range")
+
+        return self[index:index + 1][0]
+
+    def __iter__(self):
+        return iter(self[:])
+
+
+
+class RankedSearchChildList:
+    """
+    Sequence of the child nodes of a SearchNode for an index search as
+    returned by SearchNode.listChildren(). The hits are fetched from the
+    ranked results in the slices the tree takes, so the first children
+    are shown without collecting all hits.
+    """
+    __slots__ = ("parentNode", "rankedResults", "searchOp")
+
+    def __init__(self, parentNode, rankedResults, searchOp):
+        """
+        rankedResults -- SearchIndex.RankedResults of the search
+        """
+        self.parentNode = parentNode
+        self.rankedResults = rankedResults
+        self.searchOp = searchOp
+
+    def __len__(self):
+        return self.rankedResults.getLength()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return list(self)[index]
+
+            treeCtrl = self.parentNode.treeCtrl
+            return [WikiWordSearchNode(treeCtrl, self.parentNode, wikiWord,
+                    searchOp=self.searchOp) for wikiWord, score in
+                    self.rankedResults.getPage(start, max(0, stop - start))]
+
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError("RankedSearchChildList index out of range")
+
+        return self[index:index + 1][0]
+
+    def __iter__(self):
+        return iter(self[:])
+
+
+
+class MoreChildrenNode(AbstractNode):
+    """
+    Placeholder following the last created child node if a node has more
+    children than the tree creates at once. The tree replaces it by the
+    next batch of children when it gets visible or selected.
+    """
+    def __init__(self, tree, parentNode, children, start):
+        """
+        children -- Sequence of all children nodes as returned by
+                parentNode.listChildren()
+        start -- Index of first child in children not yet in tree
+        """
+        AbstractNode.__init__(self, tree, parentNode)
+        self.children = children
+        self.start = start
+        self.unifiedName = "helpernode/morechildren"
+
+    def getNodePresentation(self):
+        style = NodeStyle()
+        style.label = _("... %i more") % (len(self.children) - self.start)
+        style.icon = "pin"
+        return style
+
+    def onSelected(self):
+        wx.CallAfter(self.treeCtrl.loadMoreChildren, self.wxItemId)
+
+    def nodeEquality(self, other):
+        """
+        Placeholders are never equal so a refresh replaces them
+        """
+        return False
+
+
+
 class WikiWordRelabelNode(WikiWordNode):
     """
     Derived from WikiWordNode with ability to set label differently from
@@ -1057,6 +1316,13 @@ class SearchNode(AbstractNode):
         searchOp.setPackedSettings(datablock)
         searchOp.setTitle(self.searchTitle)
         searchOp.replaceOp = False
+
+        if searchOp.indexSearch != "no":
+            # Children in order of rank, fetched when the tree needs them
+            return RankedSearchChildList(self,
+                    pWiki.getWikiDocument().searchWikiRanked(searchOp),
+                    searchOp)
+
         words = pWiki.getWikiDocument().searchWiki(searchOp)
         self.treeCtrl.pWiki.getCollator().sort(words)
 
@@ -1327,6 +1593,12 @@ class WikiTreeCtrl(customtreectrl.CustomTreeCtrl):          # wxTreeCtrl):
         # Descriptor pathes of all expanded nodes to remember or None
         # if functionality was switched off by user
         self.expandedNodePathes = StringPathSet()
+        # Cached presentation of wiki word nodes for current wiki
+        self.presentationCache = NodePresentationCache()
+        # Maximum number of children items to create at once, 0 for no limit
+        self.childrenBatchSize = 200
+        # Set of the tree items of MoreChildrenNode placeholders
+        self.moreChildrenItems = set()
         self.mainTreeMode = True  # Is this the main tree?
         
         self.onOptionsChanged(None)
@@ -1343,6 +1615,8 @@ class WikiTreeCtrl(customtreectrl.CustomTreeCtrl):          # wxTreeCtrl):
         self.Bind(wx.EVT_TREE_ITEM_EXPANDING, self.OnTreeItemExpand, id=ID)
         self.Bind(wx.EVT_TREE_ITEM_COLLAPSED, self.OnTreeItemCollapse, id=ID)
         self.Bind(wx.EVT_TREE_BEGIN_DRAG, self.OnTreeBeginDrag, id=ID)
+        self.Bind(wx.EVT_TREE_DELETE_ITEM, self.OnTreeDeleteItem, id=ID)
+        self.Bind(wx.EVT_SCROLLWIN, self.OnScrollWin)
 
 #        EVT_LEFT_DOWN(self, self.OnLeftDown)
 
@@ -1637,8 +1911,7 @@ class WikiTreeCtrl(customtreectrl.CustomTreeCtrl):          # wxTreeCtrl):
         """
         nodeUnifiedName = nodePath[0]
 
-        nodeId, cookie = self.GetFirstChild(parentNodeId)
-        while nodeId is not None and nodeId.IsOk():
+        for nodeId in self._iterChildItems(parentNodeId, loadMore=True):
             node = self.GetItemData(nodeId)
             if node.getUnifiedName() == nodeUnifiedName:
                 if len(nodePath) == 1:
@@ -1648,14 +1921,146 @@ class WikiTreeCtrl(customtreectrl.CustomTreeCtrl):          # wxTreeCtrl):
                 else:
                     return self._selectNodeByNodePathRecurs(nodeId, nodePath[1:])
 
-            nodeId, cookie = self.GetNextChild(parentNodeId, cookie)
-
         return False
 
 
     def joinItemIdToNode(self, treeItemId, nodeObj):
         self.SetItemData(treeItemId, nodeObj)
         nodeObj.setWxItemId(treeItemId)
+        if isinstance(nodeObj, MoreChildrenNode):
+            self.moreChildrenItems.add(treeItemId)
+
+
+    def _iterChildItems(self, parentNodeId, loadMore=False):
+        """
+        Iterate over the tree items of the children of parentNodeId. If
+        loadMore is True, the children not yet in tree are loaded when
+        the iteration reaches their MoreChildrenNode.
+        """
+        nodeId, cookie = self.GetFirstChild(parentNodeId)
+        while nodeId is not None and nodeId.IsOk():
+            if loadMore and isinstance(self.GetItemData(nodeId),
+                    MoreChildrenNode):
+                # Next batch is inserted at the position of the placeholder
+                self.loadMoreChildren(nodeId)
+                nodeId, cookie = self.GetNextChild(parentNodeId, cookie - 1)
+                continue
+
+            yield nodeId
+            nodeId, cookie = self.GetNextChild(parentNodeId, cookie)
+
+
+    def _addChildItems(self, parentNodeId, childnodes, before=None):
+        """
+        Create tree items for the nodes in childnodes and append them to
+        parentNodeId or insert them before index  before.
+        Returns True if a background refresh is needed.
+        """
+        refreshNeeded = False
+        for ch in childnodes:
+            if before is None:
+                newit = self.AppendItem(parentNodeId, "")
+            else:
+                newit = self.InsertItemBefore(parentNodeId, before, "")
+                before += 1
+
+            self.joinItemIdToNode(newit, ch)
+            
+            nodeStyle = ch.getNodePresentationFast()
+            if nodeStyle is None:
+                nodeStyle = ch.getNodePresentation()
+            else:
+                refreshNeeded = True
+
+            self.setNodePresentation(newit, nodeStyle)
+            
+            if self.expandedNodePathes is not None:
+                if nodeStyle.hasChildren:
+                    if tuple(ch.getNodePath()) in self.expandedNodePathes:
+                        self.Expand(newit)
+#                 else:
+#                     self.expandedNodePathes.discardStartsWith(
+#                             tuple(ch.getNodePath()))
+
+        return refreshNeeded
+
+
+    def _getChildrenWindow(self, parentNode, children, count):
+        """
+        Return list of the first  count  nodes (at least a batch) of the
+        children sequence of parentNode followed by a MoreChildrenNode if
+        there are more.
+        """
+        if self.childrenBatchSize <= 0 or \
+                len(children) <= max(count, self.childrenBatchSize):
+            return list(children[:])
+
+        count = max(count, self.childrenBatchSize)
+        return children[:count] + [MoreChildrenNode(self, parentNode,
+                children, count)]
+
+
+    def _listChildrenWindow(self, nodeObj, count):
+        """
+        Called in refresh thread to list the children nodes to refresh.
+        """
+        return self._getChildrenWindow(nodeObj, nodeObj.listChildren(), count)
+
+
+    def loadMoreChildren(self, moreNodeId):
+        """
+        Insert next batch of children before the MoreChildrenNode item
+        moreNodeId and remove the item if all children are in tree then.
+        """
+        if moreNodeId not in self.moreChildrenItems:
+            return   # Deleted meanwhile
+
+        moreNode = self.GetItemData(moreNodeId)
+        parentNodeId = self.GetItemParent(moreNodeId)
+        stop = moreNode.start + max(self.childrenBatchSize, 1)
+
+        self.Freeze()
+        try:
+            refreshNeeded = self._addChildItems(parentNodeId,
+                    moreNode.children[moreNode.start:stop],
+                    self.GetChildrenCount(parentNodeId, False) - 1)
+
+            moreNode.start = stop
+            if stop < len(moreNode.children):
+                self.setNodePresentation(moreNodeId,
+                        moreNode.getNodePresentation())
+            else:
+                if self.GetSelection() is moreNodeId:
+                    # Don't let the tree select (and open) the parent
+                    self.SelectItem(self.GetPrevSibling(moreNodeId),
+                            send_events=False)
+                self.Delete(moreNodeId)
+        finally:
+            self.Thaw()
+
+        if refreshNeeded:
+            self._startBackgroundRefresh()
+
+
+    def _loadVisibleChildren(self):
+        """
+        Load next batch of children for each visible MoreChildrenNode.
+        """
+        # With a small batch size a placeholder may still be visible after
+        # loading, so repeat a few times
+        for i in range(10):
+            if not self.moreChildrenItems:
+                return
+
+            self.CalculatePositions()
+            visibleIds = [moreNodeId for moreNodeId in self.moreChildrenItems
+                    if self.IsVisible(moreNodeId)]
+            if not visibleIds:
+                return
+
+            for moreNodeId in visibleIds:
+                self.loadMoreChildren(moreNodeId)
+
 
     def _startBackgroundRefresh(self):
         if self.refreshStartLock:
@@ -1681,7 +2086,14 @@ class WikiTreeCtrl(customtreectrl.CustomTreeCtrl):          # wxTreeCtrl):
 
 
 
+    def getPresentationCache(self):
+        return self.presentationCache
+
+
     def onWikiPageUpdated(self, miscevt):
+        self.presentationCache.invalidateWikiWord(
+                miscevt.get("wikiPage").getWikiWord())
+
         if not self.pWiki.getConfig().getboolean("main", "tree_update_after_save"):
             return
 
@@ -1691,6 +2103,9 @@ class WikiTreeCtrl(customtreectrl.CustomTreeCtrl):          # wxTreeCtrl):
 
     def onDeletedWikiPage(self, miscevt):  # TODO May be called multiple times if
                                            # multiple pages are deleted at once
+        self.presentationCache.invalidateWikiWord(
+                miscevt.get("wikiPage").getWikiWord())
+
         if not self.pWiki.getConfig().getboolean("main", "tree_update_after_save"):
             return
 
@@ -1738,12 +2153,16 @@ class WikiTreeCtrl(customtreectrl.CustomTreeCtrl):          # wxTreeCtrl):
         
         self.refreshGeneratorLastCallMinDelay = config.getfloat("main",
                 "tree_updateGenerator_minDelay", 0.1)
+        self.childrenBatchSize = config.getint("main",
+                "tree_childrenBatchSize", 200)
 
         self._startBackgroundRefresh()
 
 
 
     def onChangedWikiConfiguration(self, miscevt):
+        self.presentationCache.clear()
+
         config = self.pWiki.getConfig()
         durat = config.getint(
                 "main", "tree_expandedNodes_rememberDuration", 2)
@@ -1804,8 +2223,15 @@ class WikiTreeCtrl(customtreectrl.CustomTreeCtrl):          # wxTreeCtrl):
             # We have to recreate the children of this node
             
 
+            # Refresh only as many children as are in tree yet
+            loadedCount = self.GetChildrenCount(parentnodeid, False)
+            if loadedCount > 0 and isinstance(self.GetItemData(
+                    self.GetLastChild(parentnodeid)), MoreChildrenNode):
+                loadedCount -= 1
+
             # This is time consuming
-            retObj = self.refreshExecutor.executeAsync(0, nodeObj.listChildren)
+            retObj = self.refreshExecutor.executeAsync(0,
+                    self._listChildrenWindow, nodeObj, loadedCount)
             while retObj.state == 0:
                 yield None
             children = retObj.getReturn() 
@@ -1840,8 +2266,10 @@ class WikiTreeCtrl(customtreectrl.CustomTreeCtrl):          # wxTreeCtrl):
                             for sg in self._generatorRefreshNodeAndChildren(nodeid):
                                 yield sg
                         else:
+                            # The new node  c  knows already if it has
+                            # children
                             retObj = self.refreshExecutor.executeAsync(0,
-                                    nodeObj.getNodePresentation)
+                                    c.getNodePresentation)
                             while retObj.state == 0:
                                 yield None
                             nodeStyle = retObj.getReturn()
@@ -1936,6 +2364,10 @@ class WikiTreeCtrl(customtreectrl.CustomTreeCtrl):          # wxTreeCtrl):
 
 
     def onRenamedWikiPage(self, miscevt):
+        self.presentationCache.invalidateWikiWord(
+                miscevt.get("wikiPage").getWikiWord())
+        self.presentationCache.invalidateWikiWord(miscevt.get("newWord"))
+
         rootItem = self.GetItemData(self.GetRootItem())
         if isinstance(rootItem, WikiWordNode) and \
                 miscevt.get("wikiPage").getWikiWord() == \
@@ -1982,6 +2414,7 @@ class WikiTreeCtrl(customtreectrl.CustomTreeCtrl):          # wxTreeCtrl):
     def onClosedCurrentWiki(self, miscevt):
 #         self.refreshExecutor.end(hardEnd=True)
         self._stopBackgroundRefresh()
+        self.presentationCache = NodePresentationCache()
         if self.expandedNodePathes is not None:
             self.expandedNodePathes = StringPathSet()
 
@@ -2222,8 +2655,7 @@ class WikiTreeCtrl(customtreectrl.CustomTreeCtrl):          # wxTreeCtrl):
         return False    
 
     def findChildTreeNodeByWikiWord(self, fromNode, findWord):
-        (child, cookie) = self.GetFirstChild(fromNode)    # , 0
-        while child:
+        for child in self._iterChildItems(fromNode, loadMore=True):
             nodeobj = self.GetItemData(child)
 #             if nodeobj.representsFamilyWikiWord() and nodeobj.getWikiWord() == findWord:
             if nodeobj.representsFamilyWikiWord() and \
@@ -2231,7 +2663,6 @@ class WikiTreeCtrl(customtreectrl.CustomTreeCtrl):          # wxTreeCtrl):
                     nodeobj.getWikiWord()) == findWord:
                 return child
             
-            (child, cookie) = self.GetNextChild(fromNode, cookie)
         return None
 
 
@@ -2251,6 +2682,7 @@ class WikiTreeCtrl(customtreectrl.CustomTreeCtrl):          # wxTreeCtrl):
         Clear the tree and use a node described by unifName as root of the tree.
         """
         self.DeleteAllItems()
+        self.moreChildrenItems = set()
         # add the root node to the tree
         nodeobj = self.createNodeObjectByUnifiedName(unifName)
         nodeobj.setRoot(True)
@@ -2425,33 +2857,21 @@ class WikiTreeCtrl(customtreectrl.CustomTreeCtrl):          # wxTreeCtrl):
         else:
             refreshNeeded = True
 
+        childnodes = self._getChildrenWindow(itemobj, childnodes, 0)
+
         self.Freeze()
         try:
-            for ch in childnodes:
-                newit = self.AppendItem(item, "")
-                self.joinItemIdToNode(newit, ch)
-                
-                nodeStyle = ch.getNodePresentationFast()
-                if nodeStyle is None:
-                    nodeStyle = ch.getNodePresentation()
-                else:
-                    refreshNeeded = True
-
-                self.setNodePresentation(newit, nodeStyle)
-                
-                if self.expandedNodePathes is not None:
-                    if nodeStyle.hasChildren:
-                        if tuple(ch.getNodePath()) in self.expandedNodePathes:
-                            self.Expand(newit)
-#                     else:
-#                         self.expandedNodePathes.discardStartsWith(
-#                                 tuple(ch.getNodePath()))
+            if self._addChildItems(item, childnodes):
+                refreshNeeded = True
         finally:
             self.Thaw()
         
         if refreshNeeded:
             self._startBackgroundRefresh()
 
+        if self.moreChildrenItems:
+            wx.CallAfter(self._loadVisibleChildren)
+
         ## _prof.stop()
 
 
@@ -2465,6 +2885,16 @@ class WikiTreeCtrl(customtreectrl.CustomTreeCtrl):          # wxTreeCtrl):
         self.Refresh()
 
 
+    def OnTreeDeleteItem(self, event):
+        self.moreChildrenItems.discard(event.GetItem())
+
+
+    def OnScrollWin(self, event):
+        event.Skip()
+        if self.moreChildrenItems:
+            wx.CallAfter(self._loadVisibleChildren)
+
+
     def OnTreeBeginDrag(self, event):
         item = event.GetItem()   
         if item is None or not item.IsOk():
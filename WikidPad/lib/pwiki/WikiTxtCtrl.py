@@ -35,7 +35,8 @@ from .SystemInfo import isOSX, isLinux, isWindows
 
 from .ParseUtilities import getFootnoteAnchorDict
 
-from .EnhancedScintillaControl import StyleCollector
+from .EnhancedScintillaControl import StyleCollector, SctOffsetTable, \
+        orStyleBytes
 
 from .SearchableScintillaControl import SearchableScintillaControl
 
@@ -236,6 +237,14 @@ class WikiTxtCtrl(SearchableScintillaControl):
                 ("changed configuration", self.onChangedConfiguration),
         ), wx.GetApp().getGlobalConfig().getMiscEvent(), self)
 
+        self.__sinkWikiDoc = wxKeyFunctionSink((
+                ("updated wiki page", self.onWikiPageChangedInWiki),
+                ("renamed wiki page", self.onWikiPageChangedInWiki),
+                ("deleted wiki page", self.onWikiPageChangedInWiki),
+                ("pseudo-deleted wiki page", self.onWikiPageChangedInWiki),
+        ), self.presenter.getMainControl().getCurrentWikiDocumentProxyEvent(),
+                self)
+
 #         if not self.presenter.getMainControl().isMainWindowConstructed():
 #             # Install event handler to wait for construction
 #             self.__sinkMainFrame = wxKeyFunctionSink((
@@ -289,6 +298,11 @@ class WikiTxtCtrl(SearchableScintillaControl):
         self.optionColorizeSearchFragments = self.presenter.getConfig()\
                 .getboolean("main", "editor_colorizeSearchFragments", False)
 
+        # Results of _findFragmentSearch. Dictionary with unaliased target
+        # page name as key and tuple (liveTextPlaceHold, resultDict) as value.
+        # resultDict has tuples (searchfrag, forbiddenSearchfragHit) as keys.
+        self.searchFragmentCache = {}
+
         self.onOptionsChanged(None)
 
         # when was a key pressed last. used to check idle time.
@@ -414,6 +428,8 @@ class WikiTxtCtrl(SearchableScintillaControl):
 
         self.unloadCurrentDocPage({})   # ?
         self.presenterListener.disconnect()
+        self.__sinkWikiDoc.disconnect()
+        self.searchFragmentCache = {}
 #         self.presenter.getMiscEvent().removeListener(self.presenterListener)
 
 
@@ -1347,6 +1363,7 @@ class WikiTxtCtrl(SearchableScintillaControl):
 
         if newSetting != self.optionColorizeSearchFragments:
             self.optionColorizeSearchFragments = newSetting
+            self.searchFragmentCache = {}
             restyle = True
 
         if restyle:
@@ -1378,6 +1395,18 @@ class WikiTxtCtrl(SearchableScintillaControl):
                 ["normal"])[-1]
 
 
+    def onWikiPageChangedInWiki(self, miscevt):
+        """
+        Some page of the wiki was updated, renamed or deleted. Forget
+        the cached search fragment results for it.
+        """
+        wikiPage = miscevt.get("wikiPage")
+        if wikiPage is None:
+            return
+
+        self.searchFragmentCache.pop(wikiPage.getWikiWord(), None)
+
+
     def handleInvalidFileSignature(self, docPage):
         """
         Called directly from a doc page to repair the editor state if an
@@ -1410,12 +1439,14 @@ class WikiTxtCtrl(SearchableScintillaControl):
 
     def onClosingCurrentWiki(self, miscevt):
         self.unloadCurrentDocPage()
+        self.searchFragmentCache = {}
 
     def onDroppingCurrentWiki(self, miscevt):
         """
         An access error occurred. Get rid of any data without trying to save
         it.
         """
+        self.searchFragmentCache = {}
         if self.getLoadedDocPage() is not None:
             self.wikiPageSink.disconnect()
 
@@ -1806,7 +1837,10 @@ class WikiTxtCtrl(SearchableScintillaControl):
                 else:
                     break
 
-            stylebytes = self.processTokens(text, pageAst, threadstop)
+            # Byte offsets are needed for syntax and spell check styling
+            offsetTable = SctOffsetTable(text)
+            stylebytes = self.processTokens(text, pageAst, threadstop,
+                    offsetTable)
 
             threadstop.testValidThread()
 
@@ -1831,14 +1865,11 @@ class WikiTxtCtrl(SearchableScintillaControl):
 
                 if scTokens.getChildrenCount() > 0:
                     spellStyleBytes = self.processSpellCheckTokens(text, scTokens,
-                            threadstop)
+                            threadstop, offsetTable)
 
                     threadstop.testValidThread()
 
-                    # TODO: Faster? How?
-                    stylebytes = "".join([chr(a | b)
-                            for a, b in zip(stylebytes, spellStyleBytes)]
-                            ).encode("raw_unicode_escape")
+                    stylebytes = orStyleBytes(stylebytes, spellStyleBytes)
 
                     self.storeStylingAndAst(stylebytes, None, styleMask=0xff)
                 else:
@@ -1894,34 +1925,47 @@ class WikiTxtCtrl(SearchableScintillaControl):
         if searchfrag is None:
             return (-1, -1)
 
+        targetPage = self.presenter.getWikiDocument().getWikiPage(
+                linkNode.wikiWord)
+
+        # Take the placeholder before reading the text so a result for a
+        # text changed meanwhile is stored under an outdated placeholder
+        textPlaceHold = targetPage.liveTextPlaceHold
+        cacheKey = (searchfrag, forbiddenSearchfragHit)
+
+        cached = self.searchFragmentCache.get(unaliasedTarget)
+        if cached is not None and cached[0] is textPlaceHold:
+            results = cached[1]
+            found = results.get(cacheKey)
+            if found is not None:
+                return found
+        else:
+            results = {}
+            self.searchFragmentCache[unaliasedTarget] = (textPlaceHold,
+                    results)
+
         searchOp = SearchReplaceOperation()
         searchOp.wildCard = "no"
         searchOp.searchStr = searchfrag
 
-        targetPage = self.presenter.getWikiDocument().getWikiPage(
-                linkNode.wikiWord)
+        text = targetPage.getLiveText()
+        found = searchOp.searchDocPageAndText(targetPage, text, 0)
 
-        found = searchOp.searchDocPageAndText(targetPage,
-                targetPage.getLiveText(), 0)
-        
         # Python 2.6, None and int were comparable, in Py 3.4 no more
-        if found[0] is None:
-            return found
-
-        if found[0] >= forbiddenSearchfragHit[0] and \
+        if found[0] is not None and found[0] >= forbiddenSearchfragHit[0] and \
                 found[0] < forbiddenSearchfragHit[1]:
             # Searchfrag found its own link -> search after link
-            found = searchOp.searchDocPageAndText(targetPage,
-                    targetPage.getLiveText(), forbiddenSearchfragHit[1])
+            found = searchOp.searchDocPageAndText(targetPage, text,
+                    forbiddenSearchfragHit[1])
 
+        results[cacheKey] = found
         return found
 
 
 
-    def processTokens(self, text, pageAst, threadstop):
+    def processTokens(self, text, pageAst, threadstop, offsetTable=None):
         wikiDoc = self.presenter.getWikiDocument()
-        stylebytes = StyleCollector(FormatTypes.Default,
-                text, self.bytelenSct)
+        stylebytes = StyleCollector(FormatTypes.Default, text, offsetTable)
 
         def process(pageAst, stack):
             for node in pageAst.iterFlatNamed():
@@ -1987,8 +2031,9 @@ class WikiTxtCtrl(SearchableScintillaControl):
         return stylebytes.value()
 
 
-    def processSpellCheckTokens(self, text, scTokens, threadstop):
-        stylebytes = StyleCollector(0, text, self.bytelenSct)
+    def processSpellCheckTokens(self, text, scTokens, threadstop,
+            offsetTable=None):
+        stylebytes = StyleCollector(0, text, offsetTable)
         for node in scTokens:
             threadstop.testValidThread()
             stylebytes.bindStyle(node.pos, node.strLength,
@@ -163,6 +163,7 @@ class CalendarPanel(wx.Window, TimePresentationBase):
 
 
     def onUpdateNeeded(self, miscevt):
+        self.wikiWordFilter.invalidateDayHistogram()
         self.updateContent()
 
 
@@ -467,7 +468,7 @@ class CalendarPanel(wx.Window, TimePresentationBase):
         dateKey = (date.GetDay(), date.GetMonth(), date.GetYear())
         result = self.dayToWordCountCache.get(dateKey)
         if result is None:
-            result = len(self.wikiWordFilter.getWikiWordsForDay(date))
+            result = self.wikiWordFilter.getWikiWordCountForDay(date)
             self.dayToWordCountCache[dateKey] = result
 
         return result
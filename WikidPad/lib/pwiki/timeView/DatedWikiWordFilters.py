@@ -1,10 +1,12 @@
 # import hotshot
 # _prof = hotshot.Profile("hotshot.prf")
 
-import os, traceback, abc
+import os, traceback, abc, datetime
 
 import wx
 
+from .DayHistogram import DayHistogram
+
 
 
 class DatedWikiWordFilterBase(metaclass=abc.ABCMeta):
@@ -16,8 +18,12 @@ class DatedWikiWordFilterBase(metaclass=abc.ABCMeta):
     def __init__(self):
         self.wikiDocument = None
         self.dayResolution = 1
+        self.dayHistogram = None
 
     def setWikiDocument(self, wikiDoc):
+        if wikiDoc is not self.wikiDocument:
+            self.dayHistogram = None
+
         self.wikiDocument = wikiDoc
 
     def getWikiDocument(self):
@@ -44,6 +50,40 @@ class DatedWikiWordFilterBase(metaclass=abc.ABCMeta):
         """
         raise NotImplementedError
         
+    def _createDayHistogram(self):
+        """
+        Return a DayHistogram for the wiki words of the current wiki
+        document or None if the subclass can't provide one. In the latter
+        case counts are calculated by getWikiWordsForDay().
+        """
+        return None
+
+    def getDayHistogram(self):
+        """
+        Return the cached DayHistogram (or None), see invalidateDayHistogram().
+        """
+        if self.dayHistogram is None and self.wikiDocument is not None:
+            self.dayHistogram = self._createDayHistogram()
+
+        return self.dayHistogram
+
+    def invalidateDayHistogram(self):
+        """
+        Must be called after wiki pages were modified or deleted.
+        """
+        self.dayHistogram = None
+
+    def getWikiWordCountForDay(self, day):
+        """
+        Returns the same as len(self.getWikiWordsForDay(day)).
+        """
+        dayHistogram = self.getDayHistogram()
+        if dayHistogram is None:
+            return len(self.getWikiWordsForDay(day))
+
+        return dayHistogram.getCount(self._getOrdinalFromDay(day),
+                self.dayResolution)
+
     def getMassWikiWordCountForDays(self, startDay, count):
         """
         Returns a list dayWordCounts where dayWordCounts[i] is the same as
@@ -52,6 +92,11 @@ class DatedWikiWordFilterBase(metaclass=abc.ABCMeta):
         
         This base class contains a default implementation
         """
+        dayHistogram = self.getDayHistogram()
+        if dayHistogram is not None:
+            return dayHistogram.getCounts(self._getOrdinalFromDay(startDay),
+                    count, self.dayResolution)
+
         day = startDay
         step = wx.TimeSpan.Days(self.dayResolution)
 
@@ -90,23 +135,21 @@ class DatedWikiWordFilterBase(metaclass=abc.ABCMeta):
                 self._getNextDayFromTimeT(timeMinMax[1]))
 
 
-    # TODO The following things are not very efficient
-
-    def _getDayListFromTimeList(self, wtList):
-        if len(wtList) == 0:
-            return []
-
-        days = [self._getDayFromTimeT(wt[1]) for wt in wtList]
-
-        result = [days[0]]
-        lastDay = days[0]        
-        
-        for d in days[1:]:
-            if lastDay != d:
-                result.append(d)
-                lastDay = d
+    @staticmethod
+    def _getOrdinalFromDay(day):
+        """
+        Convert wx.DateTime to day ordinal as used by DayHistogram.
+        """
+        return datetime.date(day.GetYear(), day.GetMonth() + 1,
+                day.GetDay()).toordinal()
 
-        return result
+    @staticmethod
+    def _getDayFromOrdinal(ordinal):
+        """
+        Convert day ordinal as used by DayHistogram to wx.DateTime.
+        """
+        date = datetime.date.fromordinal(ordinal)
+        return wx.DateTime.FromDMY(date.day, date.month - 1, date.year)
 
 
     def getMinMaxDay(self):
@@ -138,27 +181,35 @@ class DatedWikiWordFilterModified(DatedWikiWordFilterBase):
         if wikiDocument is None:
             return []
         
-        startTime = day.GetTicks()
-        endTime = float(startTime + 86400 * self.getDayResolution())
+        # Calendar days, so days with a daylight saving time switch
+        # are handled the same way as by the day histogram
+        startTime = float(day.GetTicks())
+        endTime = float((day + wx.DateSpan.Days(self.getDayResolution()))
+                .GetTicks())
 
         return wikiDocument.getWikiPageNamesModifiedWithin(startTime,
                 endTime)
 
+    def _createDayHistogram(self):
+        return DayHistogram(
+                self.getWikiDocument().getWikiData().getTimeDayHistogram(0))
+
     def getMinMaxDay(self):
-        return self._getMinMaxDaysFromTimeT(
-                self.getWikiDocument().getWikiData().getTimeMinMax(0))
+        minDay, maxDay = self.getDayHistogram().getMinMaxDay()
+        if minDay is None:
+            return (None, None)
 
+        return (self._getDayFromOrdinal(minDay),
+                self._getDayFromOrdinal(maxDay))
 
-    def getDaysBefore(self, day, limit=None):
-        wtList = self.getWikiDocument().getWikiData().getWikiPageNamesBefore(
-                0, day.GetTicks(), limit)
-        wtList.reverse()
 
-        return self._getDayListFromTimeList(wtList)
+    def getDaysBefore(self, day, limit=None):
+        return [self._getDayFromOrdinal(o) for o in
+                self.getDayHistogram().getDaysBefore(
+                self._getOrdinalFromDay(day), limit)]
 
 
     def getDaysAfter(self, day, limit=None):
-        wtList = self.getWikiDocument().getWikiData().getWikiPageNamesAfter(
-                0, (day + wx.TimeSpan.Day()).GetTicks(), limit)
-
-        return self._getDayListFromTimeList(wtList)
+        return [self._getDayFromOrdinal(o) for o in
+                self.getDayHistogram().getDaysAfter(
+                self._getOrdinalFromDay(day), limit)]
@@ -0,0 +1,101 @@
+"""
+Number of wiki words per local calendar day. The calendar and timeline
+panels take their per-day counts from a DayHistogram instead of running
+one query per day.
+
+Days are identified by their proleptic Gregorian ordinal as returned by
+datetime.date.toordinal().
+"""
+
+import bisect, datetime
+
+
+def queryDayHistogram(connWrap, table, field, startTime=None, endTime=None):
+    """
+    Return list of tuples (dayOrdinal, count) ordered by day. count is the
+    number of rows in table whose timestamp column field falls on that day
+    in local time. Timestamps of 0 are not taken into account.
+
+    startTime and endTime are optional floating values as returned by
+    time.time(), startTime is inclusive, endTime is exclusive.
+    """
+    sql = ("select date(%s, 'unixepoch', 'localtime') as day, count(*) "
+            "from %s where %s > 0") % (field, table, field)
+    params = []
+
+    if startTime is not None:
+        sql += " and %s >= ?" % field
+        params.append(float(startTime))
+    if endTime is not None:
+        sql += " and %s < ?" % field
+        params.append(float(endTime))
+
+    sql += " group by day order by day"
+
+    return [(datetime.date.fromisoformat(day).toordinal(), count)
+            for day, count in connWrap.execSqlQuery(sql, params)
+            if day is not None]
+
+
+
+class DayHistogram:
+    """
+    Day index built from the result of queryDayHistogram().
+    """
+    def __init__(self, dayCounts=()):
+        self.days = []
+        # self.sums[i] is the sum of counts of all days before self.days[i]
+        self.sums = [0]
+
+        for day, count in dayCounts:
+            self.days.append(day)
+            self.sums.append(self.sums[-1] + count)
+
+    def getCount(self, day, dayResolution=1):
+        """
+        Return number of wiki words related to day up to so many days as
+        given by dayResolution.
+        """
+        return self.sums[bisect.bisect_left(self.days, day + dayResolution)] - \
+                self.sums[bisect.bisect_left(self.days, day)]
+
+    def getCounts(self, startDay, count, dayResolution=1):
+        """
+        Return list of count numbers, the i-th is
+        getCount(startDay + i * dayResolution, dayResolution).
+        """
+        return [self.getCount(startDay + i * dayResolution, dayResolution)
+                for i in range(count)]
+
+    def getDaysBefore(self, day, limit=None):
+        """
+        Return ascending list of the last limit days before day with at
+        least one wiki word.
+        """
+        end = bisect.bisect_left(self.days, day)
+        if limit is None:
+            return self.days[:end]
+
+        return self.days[max(0, end - limit):end]
+
+    def getDaysAfter(self, day, limit=None):
+        """
+        Return ascending list of the first limit days after day with at
+        least one wiki word.
+        """
+        start = bisect.bisect_right(self.days, day)
+        if limit is None:
+            return self.days[start:]
+
+        return self.days[start:start + limit]
+
+    def getMinMaxDay(self):
+        """
+        Return tuple (minDay, maxDay) with the first day with wiki words and
+        the day AFTER the last one. If there are no days, (None, None) is
+        returned.
+        """
+        if len(self.days) == 0:
+            return (None, None)
+
+        return (self.days[0], self.days[-1] + 1)
@@ -197,6 +197,7 @@ class TimelinePanel(EnhancedListControl, TimePresentationBase):
 
 
     def onUpdateNeeded(self, miscevt):
+        self.wikiWordFilter.invalidateDayHistogram()
         self.clearCache()
         self.updateContent()
 
@@ -320,7 +321,7 @@ class TimelinePanel(EnhancedListControl, TimePresentationBase):
 #             return
 
         # Test if fixed item day is allowed (word count > 0)
-        fixedCount = len(wwf.getWikiWordsForDay(self.fixedItemDay))
+        fixedCount = wwf.getWikiWordCountForDay(self.fixedItemDay)
 
         if fixedCount == 0:
             # Not allowed -> adjust to next allowed day
@@ -339,7 +340,7 @@ class TimelinePanel(EnhancedListControl, TimePresentationBase):
                     self.listContent = []
                     return
 
-            fixedCount = len(wwf.getWikiWordsForDay(self.fixedItemDay))
+            fixedCount = wwf.getWikiWordCountForDay(self.fixedItemDay)
 
 
         minDay, maxDay = wwf.getMinMaxDay()
@@ -373,7 +374,7 @@ class TimelinePanel(EnhancedListControl, TimePresentationBase):
             beforeDayList = beforeDayList[:self.visibleItemCount]
             
         for day in beforeDayList:
-            wordCount = len(wwf.getWikiWordsForDay(day))
+            wordCount = wwf.getWikiWordCountForDay(day)
             maxWordCount = max(maxWordCount, wordCount)
             content.append((day, wordCount))
             
@@ -382,7 +383,7 @@ class TimelinePanel(EnhancedListControl, TimePresentationBase):
             content.append((self.fixedItemDay, fixedCount))
         
         for day in afterDayList:
-            wordCount = len(wwf.getWikiWordsForDay(day))
+            wordCount = wwf.getWikiWordCountForDay(day)
             maxWordCount = max(maxWordCount, wordCount)
             content.append((day, wordCount))
             
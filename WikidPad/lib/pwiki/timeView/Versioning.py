@@ -2,8 +2,9 @@
 Processes versions of wiki pages.
 """
 
-import time, zlib, re
+import time, zlib, re, struct
 from calendar import timegm
+from collections import OrderedDict
 
 from ..rtlibRepl import minidom
 
@@ -18,7 +19,8 @@ from ..StringOps import applyBinCompact, getBinCompactForDiff, \
         fileContentToUnicode, BOM_UTF8, formatTimeT
 
 from ..Serialization import serToXmlUnicode, serFromXmlUnicode, serToXmlInt, \
-        serFromXmlInt, iterXmlElementFlat
+        serFromXmlInt, iterXmlElementFlat, isCompactOverview, \
+        buildCompactRecord, buildCompactOverview, iterCompactOverviewRecords
 
 from ..DocPages import AbstractWikiPage
 
@@ -30,7 +32,7 @@ DAMAGED = object()
 class VersionEntry:
     __slots__ = ("creationTimeStamp", "unifiedBasePageName", "description",
             "versionNumber", "contentDifferencing", "contentEncoding",
-            "xmlNode")
+            "xmlNode", "binRecord")
 
     def __init__(self, unifiedBasePageName, description=None,
             contentDifferencing="revdiff", contentEncoding = None):
@@ -45,6 +47,8 @@ class VersionEntry:
         self.contentEncoding = contentEncoding
         
         self.xmlNode = None
+        # Tuple (overview state, record) for compact format
+        self.binRecord = None
 
 
     def getFormattedCreationDate(self, formatStr):
@@ -111,6 +115,46 @@ class VersionEntry:
         self.contentEncoding = serFromXmlUnicode(xmlNode, "contentEncoding", None)
 
 
+    def serializeOverviewBin(self, stream):
+        """
+        Read or write overview information (not content) of this object
+        to or from a serialize stream
+        """
+        self.creationTimeStamp = stream.serFloat64(self.creationTimeStamp)
+        self.versionNumber = stream.serUint32(self.versionNumber)
+        self.contentDifferencing = stream.serUniUtf8(self.contentDifferencing)
+        self.description = stream.serOptUniUtf8(self.description)
+        self.contentEncoding = stream.serOptUniUtf8(self.contentEncoding)
+
+
+    def _getOverviewState(self):
+        return (self.creationTimeStamp, self.versionNumber,
+                self.contentDifferencing, self.description,
+                self.contentEncoding)
+
+
+    def getOverviewBinRecord(self):
+        """
+        Return overview information as record for the compact format. The
+        record is cached as long as the information doesn't change.
+        """
+        state = self._getOverviewState()
+        if self.binRecord is None or self.binRecord[0] != state:
+            self.binRecord = (state,
+                    buildCompactRecord(self.serializeOverviewBin))
+
+        return self.binRecord[1]
+
+
+    def readOverviewBinRecord(self, record, stream):
+        """
+        Set object state from a record of the compact format. stream
+        reads the record data.
+        """
+        self.serializeOverviewBin(stream)
+        self.binRecord = (self._getOverviewState(), record)
+
+
     def getUnifiedPageName(self):
         return "versioning/packet/versionNo/%s/%s" % (self.versionNumber,
                 self.unifiedBasePageName)
@@ -132,6 +176,9 @@ class VersionOverview(MiscEventSourceMixin):
         
         self.xmlNode = None
 
+        # LRU cache {versionNumber: content} of recently reconstructed versions
+        self.contentCache = OrderedDict()
+
 
     def getUnifiedName(self):
         return "versioning/overview/" + self.unifiedBasePageName
@@ -155,6 +202,14 @@ class VersionOverview(MiscEventSourceMixin):
             self.versionEntries = []
             self.maxVersionNumber = 0
             self.xmlNode = None
+            self.contentCache.clear()
+            return
+
+        if isCompactOverview(content):
+            try:
+                self.serializeFromCompact(content)
+            except (SerializationException, struct.error, UnicodeDecodeError):
+                raise VersioningException(_("Versioning data damaged"))
             return
 
         xmlDoc = minidom.parseString(content)
@@ -300,16 +355,32 @@ class VersionOverview(MiscEventSourceMixin):
             self.wikiDocument.deleteDataBlock(unifName)
             return
 
-        xmlDoc = minidom.getDOMImplementation().createDocument(None, None, None)
-        xmlNode = self.serializeToXmlProd(xmlDoc)
+        if self.wikiDocument.getWikiConfig().getboolean("main",
+                "overviews_compactFormat", False):
+            content = self.serializeToCompact()
+        else:
+            xmlDoc = minidom.getDOMImplementation().createDocument(None, None,
+                    None)
+            xmlNode = self.serializeToXmlProd(xmlDoc)
 
-        xmlDoc.appendChild(xmlNode)
-        content = xmlDoc.toxml("utf-8")
+            xmlDoc.appendChild(xmlNode)
+            content = xmlDoc.toxml("utf-8")
 
         self.wikiDocument.storeDataBlock(unifName, content,
                 storeHint=self.getStorageHint())
 
 
+    def getOverviewAsXml(self):
+        """
+        Return overview as XML unistring independent of the storage format,
+        e.g. for multi-page text export.
+        """
+        xmlDoc = minidom.getDOMImplementation().createDocument(None, None, None)
+        xmlDoc.appendChild(self.serializeToXmlProd(xmlDoc))
+
+        return xmlDoc.toxml()
+
+
     def invalidate(self):
         if self.basePage is not None:
             # Inform base page about invalidation
@@ -318,6 +389,7 @@ class VersionOverview(MiscEventSourceMixin):
         self.basePage = None
         self.wikiDocument = None
         self.versionEntries = []
+        self.contentCache.clear()
 
 
     def isInvalid(self):
@@ -404,6 +476,52 @@ class VersionOverview(MiscEventSourceMixin):
 
         self.versionEntries = versionEntries
         self.maxVersionNumber = maxVersionNumber
+        # Version numbers may be reused with the new entries
+        self.contentCache.clear()
+
+
+    def serializeToCompact(self):
+        """
+        Return all information about this object in compact format.
+        """
+        return buildCompactOverview("versionOverview",
+                [entry.getOverviewBinRecord() for entry in self.versionEntries])
+
+
+    def serializeFromCompact(self, content):
+        """
+        Set object state from data in compact format.
+        """
+        versionEntries = []
+        maxVersionNumber = 0
+
+        for record, stream in iterCompactOverviewRecords(content,
+                "versionOverview"):
+            entry = VersionEntry(self.unifiedBasePageName)
+            entry.readOverviewBinRecord(record, stream)
+
+            versionEntries.append(entry)
+            maxVersionNumber = max(maxVersionNumber, entry.versionNumber)
+
+        self.xmlNode = None
+        self.versionEntries = versionEntries
+        self.maxVersionNumber = maxVersionNumber
+        # Version numbers may be reused with the new entries
+        self.contentCache.clear()
+
+
+    def _cacheContent(self, versionNumber, content):
+        """
+        Put content of version into the LRU cache of reconstructed versions.
+        """
+        cache = self.contentCache
+        cache[versionNumber] = content
+        cache.move_to_end(versionNumber)
+
+        maxSize = max(self.wikiDocument.getWikiConfig().getint("main",
+                "versioning_contentCacheSize", 8), 0)
+        while len(cache) > maxSize:
+            cache.popitem(last=False)
 
 
     def getVersionContentRaw(self, versionNumber):
@@ -414,13 +532,22 @@ class VersionOverview(MiscEventSourceMixin):
         if versionNumber == -1:
             versionNumber = self.versionEntries[-1].versionNumber
 
+        # Start from the nearest newer version which is either stored
+        # completely or cached
         base = None
+        content = None
         workList = []
         for i in range(len(self.versionEntries) - 1, -1, -1):
             entry = self.versionEntries[i]
-            if entry.contentDifferencing == "complete":
+            cachedContent = self.contentCache.get(entry.versionNumber)
+            if cachedContent is not None:
+                workList = []
+                base = entry
+                content = cachedContent
+            elif entry.contentDifferencing == "complete":
                 workList = []
                 base = entry
+                content = None
             else:
                 workList.append(entry)
 
@@ -434,31 +561,34 @@ class VersionOverview(MiscEventSourceMixin):
             raise InternalError("No base version found for getVersionContent(%s)" %
                     versionNumber)
 
-        unifName = "versioning/packet/versionNo/%s/%s" % (base.versionNumber,
-                self.unifiedBasePageName)
+        if content is None:
+            unifName = "versioning/packet/versionNo/%s/%s" % (base.versionNumber,
+                    self.unifiedBasePageName)
 
-        content = self.wikiDocument.retrieveDataBlock(unifName, default=DAMAGED)
-        if content is DAMAGED:
-            raise VersioningException(_("Versioning data damaged"))
-        elif content is None:
-            raise InternalError("Tried to retrieve non-existing "
-                    "packet for version number %s" % versionNumber)
+            content = self.wikiDocument.retrieveDataBlock(unifName, default=DAMAGED)
+            if content is DAMAGED:
+                raise VersioningException(_("Versioning data damaged"))
+            elif content is None:
+                raise InternalError("Tried to retrieve non-existing "
+                        "packet for version number %s" % versionNumber)
 
-        content = self.decodeContent(content, entry.contentEncoding)
+            content = self.decodeContent(content, base.contentEncoding)
 
         for entry in workList:
             unifName = "versioning/packet/versionNo/%s/%s" % (entry.versionNumber,
                     self.unifiedBasePageName)
-            packet = self.wikiDocument.retrieveDataBlock(unifName, default=None)
-            if content is DAMAGED:
+            packet = self.wikiDocument.retrieveDataBlock(unifName, default=DAMAGED)
+            if packet is DAMAGED:
                 raise VersioningException(_("Versioning data damaged"))
-            elif content is None:
+            elif packet is None:
                 raise InternalError("Tried to retrieve non-existing "
                         "packet for version number %s" % versionNumber)
 
 
             content = applyBinCompact(content, packet)
 
+        self._cacheContent(versionNumber, content)
+
         return content
 
 
@@ -489,6 +619,22 @@ class VersionOverview(MiscEventSourceMixin):
                         asRevDiff = True
                         break
 
+        if asRevDiff:
+            # Each reverse diff in the chain up to the next complete version
+            # is applied to the whole content to reconstruct the oldest one.
+            # Keep the previous head complete if this becomes too expensive.
+            maxChainCost = self.wikiDocument.getWikiConfig().getint("main",
+                    "versioning_maxChainCost", 2000000)
+            if maxChainCost > 0:
+                chainLength = 1
+                for e in reversed(self.versionEntries[:-1]):
+                    if e.contentDifferencing == "complete":
+                        break
+                    chainLength += 1
+
+                if chainLength * len(content) > maxChainCost:
+                    asRevDiff = False
+
         self.maxVersionNumber += 1
         newHeadVerNo = self.maxVersionNumber
 
@@ -503,6 +649,7 @@ class VersionOverview(MiscEventSourceMixin):
         entry.contentDifferencing = "complete"
         entry.contentEncoding = None
         self.versionEntries.append(entry)
+        self._cacheContent(newHeadVerNo, content)
 
         if len(self.versionEntries) > 1:
             if asRevDiff:
@@ -511,7 +658,9 @@ class VersionOverview(MiscEventSourceMixin):
 
                 unifName = "versioning/packet/versionNo/%s/%s" % (prevHeadEntry.versionNumber,
                         self.unifiedBasePageName)
-                diffPacket = getBinCompactForDiff(content, prevHeadContent)
+                diffPacket = getBinCompactForDiff(content, prevHeadContent,
+                        self.wikiDocument.getWikiConfig().get("main",
+                        "versioning_diffEngine", "lines"))
 
                 if len(diffPacket) < len(prevHeadContent):
                     prevHeadEntry.contentDifferencing = "revdiff"
@@ -537,6 +686,7 @@ class VersionOverview(MiscEventSourceMixin):
 
             self.wikiDocument.deleteDataBlock(unifName)
             del self.versionEntries[0]
+            self.contentCache.pop(versionNumber, None)
             self.fireMiscEventKeys(("deleted version", "changed version overview"))
 
             return
@@ -560,6 +710,7 @@ class VersionOverview(MiscEventSourceMixin):
                     self.unifiedBasePageName)
             self.wikiDocument.deleteDataBlock(unifName)
             del self.versionEntries[-1]
+            self.contentCache.pop(versionNumber, None)
             self.fireMiscEventKeys(("deleted version", "changed version overview"))
 
             return
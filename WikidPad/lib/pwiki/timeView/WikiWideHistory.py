@@ -12,7 +12,8 @@ from ..MiscEvent import KeyFunctionSink, MiscEventSourceMixin
 from ..StringOps import formatTimeT
 
 from ..Serialization import serToXmlUnicode, serFromXmlUnicode, serToXmlInt, \
-        serFromXmlInt, iterXmlElementFlat
+        serFromXmlInt, iterXmlElementFlat, isCompactOverview, \
+        buildCompactRecord, buildCompactOverview, iterCompactOverviewRecords
 
 from .. import DocPages
 
@@ -21,13 +22,15 @@ DAMAGED = object()
 
 class HistoryEntry:
     __slots__ = ("visitedTimeStamp", "unifiedPageName",
-            "xmlNode")
+            "xmlNode", "binRecord")
 
     def __init__(self, unifiedPageName=None):
 
         self.unifiedPageName = unifiedPageName
         self.visitedTimeStamp = time.time()
         self.xmlNode = None
+        # Tuple (state, record) for compact format
+        self.binRecord = None
 
 
     def getFormattedVisitedDate(self, formatStr):
@@ -74,6 +77,36 @@ class HistoryEntry:
                 "%Y-%m-%d/%H:%M:%S"))
 
 
+    def serializeBin(self, stream):
+        """
+        Read or write content of this object to or from a serialize stream
+        """
+        self.unifiedPageName = stream.serUniUtf8(self.unifiedPageName)
+        self.visitedTimeStamp = stream.serFloat64(self.visitedTimeStamp)
+
+
+    def getBinRecord(self):
+        """
+        Return content as record for the compact format. The record is
+        cached as long as the content doesn't change.
+        """
+        state = (self.unifiedPageName, self.visitedTimeStamp)
+        if self.binRecord is None or self.binRecord[0] != state:
+            self.binRecord = (state, buildCompactRecord(self.serializeBin))
+
+        return self.binRecord[1]
+
+
+    def readBinRecord(self, record, stream):
+        """
+        Set object state from a record of the compact format. stream
+        reads the record data.
+        """
+        self.serializeBin(stream)
+        self.binRecord = ((self.unifiedPageName, self.visitedTimeStamp),
+                record)
+
+
     def getUnifiedPageName(self):
         return self.unifiedPageName
 
@@ -220,7 +253,11 @@ class WikiWideHistory(MiscEventSourceMixin):
                 self.historyEntries = []
                 self.xmlNode = None
                 return
-    
+
+            if isCompactOverview(content):
+                self.serializeFromCompact(content)
+                return
+
             xmlDoc = minidom.parseString(content)
             xmlNode = xmlDoc.firstChild
             self.serializeFromXml(xmlNode)
@@ -256,11 +293,16 @@ class WikiWideHistory(MiscEventSourceMixin):
             self.wikiDocument.deleteDataBlock(unifName)
             return
 
-        xmlDoc = minidom.getDOMImplementation().createDocument(None, None, None)
-        xmlNode = self.serializeToXmlProd(xmlDoc)
+        if self.wikiDocument.getWikiConfig().getboolean("main",
+                "overviews_compactFormat", False):
+            content = self.serializeToCompact()
+        else:
+            xmlDoc = minidom.getDOMImplementation().createDocument(None, None,
+                    None)
+            xmlNode = self.serializeToXmlProd(xmlDoc)
 
-        xmlDoc.appendChild(xmlNode)
-        content = xmlDoc.toxml("utf-8")
+            xmlDoc.appendChild(xmlNode)
+            content = xmlDoc.toxml("utf-8")
 
         self.wikiDocument.storeDataBlock(unifName, content,
                 storeHint=Consts.DATABLOCK_STOREHINT_INTERN)
@@ -321,4 +363,26 @@ class WikiWideHistory(MiscEventSourceMixin):
         self.historyEntries = historyEntries
 
 
+    def serializeToCompact(self):
+        """
+        Return all information about this object in compact format.
+        """
+        return buildCompactOverview("wikiWideHistory",
+                [entry.getBinRecord() for entry in self.historyEntries])
+
 
+    def serializeFromCompact(self, content):
+        """
+        Set object state from data in compact format.
+        """
+        historyEntries = []
+
+        for record, stream in iterCompactOverviewRecords(content,
+                "wikiWideHistory"):
+            entry = HistoryEntry()
+            entry.readBinRecord(record, stream)
+
+            historyEntries.append(entry)
+
+        self.xmlNode = None
+        self.historyEntries = historyEntries
@@ -407,6 +407,13 @@ TABLE_DEFINITIONS = {
         ),
 
 
+    "wikireferences": (     # Cache
+        ("word", t.t),
+        ("target", t.t)  # Resolved page name of a page insertion or an
+                # attribute value in ATTRIBUTES_WITH_WIKIWORD_VALUES
+        ),
+
+
     "todos_PRE2_1alpha01": (     # Obsolete
         ("word", t.t),
         ("todo", t.t),
@@ -467,6 +474,7 @@ MAIN_TABLES = (
     "wikiwords",
     "wikirelations",
     "wikiwordattrs",
+    "wikireferences",
     "todos",
 #     "search_views",
     "settings",
@@ -494,6 +502,8 @@ def rebuildIndices(connwrap):
     connwrap.execSqlNoError("drop index wikirelations_relation")    
     connwrap.execSqlNoError("drop index wikiwordattrs_word")
     connwrap.execSqlNoError("drop index wikiwordattrs_keyvalue")
+    connwrap.execSqlNoError("drop index wikireferences_word")
+    connwrap.execSqlNoError("drop index wikireferences_target")
     connwrap.execSqlNoError("drop index datablocks_unifiedname")
     connwrap.execSqlNoError("drop index datablocksexternal_unifiedname")
 
@@ -507,6 +517,8 @@ def rebuildIndices(connwrap):
     connwrap.execSqlNoError("create index wikirelations_relation on wikirelations(relation)")
     connwrap.execSqlNoError("create index wikiwordattrs_word on wikiwordattrs(word)")
     connwrap.execSqlNoError("create index wikiwordattrs_keyvalue on wikiwordattrs(key, value)")
+    connwrap.execSqlNoError("create index wikireferences_word on wikireferences(word)")
+    connwrap.execSqlNoError("create index wikireferences_target on wikireferences(target)")
     connwrap.execSqlNoError("create unique index datablocks_unifiedname on datablocks(unifiedname)")
     connwrap.execSqlNoError("create unique index datablocksexternal_unifiedname on datablocksexternal(unifiedname)")
 
@@ -517,8 +529,8 @@ def recreateCacheTables(connwrap):
     Delete and create again all tables with cache information and
     associated indices
     """
-    CACHE_TABLES = ("wikirelations", "wikiwordattrs", "todos",
-            "wikiwordmatchterms")
+    CACHE_TABLES = ("wikirelations", "wikiwordattrs", "wikireferences",
+            "todos", "wikiwordmatchterms")
     
     for tn in CACHE_TABLES:
         connwrap.execSqlNoError("drop table %s" % tn)
@@ -1001,6 +1013,22 @@ def updateDatabase2(connwrap):
                 "values ('lastwriteprogver.sub', '"+str(Consts.VERSION_TUPLE[3])+"')")
         connwrap.execSql("insert or replace into settings(key, value) "
                 "values ('lastwriteprogver.patch', '"+str(Consts.VERSION_TUPLE[4])+"')")
+
+        # Cache table added without format change. Pages must be processed
+        # again to fill it
+        if connwrap.execSqlQuerySingleItem("select name from sqlite_master "
+                "where name='wikireferences'", default=None) is None:
+            changeTableSchema(connwrap, "wikireferences",
+                    TABLE_DEFINITIONS["wikireferences"])
+            connwrap.execSql("create index wikireferences_word on "
+                    "wikireferences(word)")
+            connwrap.execSql("create index wikireferences_target on "
+                    "wikireferences(target)")
+            connwrap.execSql("update wikiwords set metadataprocessed = ? "
+                    "where metadataprocessed > ?",
+                    (Consts.WIKIWORDMETADATA_STATE_ATTRSPROCESSED,
+                    Consts.WIKIWORDMETADATA_STATE_ATTRSPROCESSED))
+            connwrap.syncCommit()
     except sqlite.ReadOnlyDbError:
         pass
 
@@ -1166,4 +1194,12 @@ invalid data.
         charlength: Integer. Length of the selection whose position is given in
             respective firstcharpos. Invalid if firstcharpos is -1.
 
+
+++ Without change of format version (created by updateDatabase2()):
+
+    Table "wikireferences" added (cache):
+        word: Page containing the reference
+        target: Resolved page name of a page insertion or the value of an
+            attribute in ATTRIBUTES_WITH_WIKIWORD_VALUES
+
 """
@@ -23,7 +23,8 @@ import glob, traceback
 from wx import GetApp
 
 from pwiki.WikiExceptions import *   # TODO make normal import
-from pwiki import SearchAndReplace
+from pwiki import SearchAndReplace, SearchIndex, LinkGraph
+from pwiki.timeView import DayHistogram
 
 try:
     import pwiki.sqlite3api as sqlite
@@ -53,6 +54,8 @@ class WikiData:
         self.dataDir = dataDir
         self.resolveCaseNormed = False
         self.cachedWikiPageLinkTermDict = None
+        self.cachedLinkGraph = None
+        self.fullTextIndexAvailable = None
         
         dbPath = self.wikiDocument.getWikiConfig().get("wiki_db", "db_filename",
                 "").strip()
@@ -71,6 +74,9 @@ class WikiData:
             raise DbWriteAccessError(e)
 
         dbfile = longPathDec(dbfile)
+        self.dbFilename = dbfile
+        # Connection inherited from parent process, see reopenConnection()
+        self.inheritedConnWrap = None
 
         try:
             self.connWrap = DbStructure.ConnectWrapSyncCommit(
@@ -188,10 +194,9 @@ class WikiData:
         self.contentUniInputToDb = contentUniInputToDb
 
         try:
-            self._createTempTables()
-
             # reset cache
             self.cachedWikiPageLinkTermDict = None
+            self.cachedLinkGraph = None
             self.cachedGlobalAttrs = None
             self.getGlobalAttributes()
         except (IOError, OSError, sqlite.Error) as e:
@@ -214,19 +219,6 @@ class WikiData:
         pass        
 
 
-    def _createTempTables(self):
-        # Temporary table for findBestPathFromWordToWord
-        # TODO: Possible for read-only dbs?
-
-        # These schema changes are only on a temporary table so they are not
-        # in DbStructure.py
-        self.connWrap.execSql("create temp table temppathfindparents "
-                "(word text primary key, child text, steps integer)")
-
-        self.connWrap.execSql("create index temppathfindparents_steps "
-                "on temppathfindparents(steps)")
-
-
     # ---------- Direct handling of page data ----------
     
     def getContent(self, word):
@@ -279,6 +271,9 @@ class WikiData:
                         "values (?, ?, ?, ?, ?)",
                         (word, creadate, moddate, fileName,
                         fileName.lower()))
+
+                if self.cachedLinkGraph is not None:
+                    self.cachedLinkGraph.setPageDefined(word, True)
             else:
                 self.connWrap.execSql("update wikiwords set modified = ? "
                         "where word = ?", (moddate, word))
@@ -370,6 +365,8 @@ class WikiData:
             self.connWrap.execSql("delete from wikiwords where word = ?",
                     (word,))
             self.cachedWikiPageLinkTermDict = None
+            if self.cachedLinkGraph is not None:
+                self.cachedLinkGraph.setPageDefined(word, False)
             if fileName is not None and os.path.exists(fileName):
                 os.unlink(fileName)
         except (IOError, OSError, sqlite.Error) as e:
@@ -527,18 +524,67 @@ class WikiData:
 
     # ---------- Renaming/deleting pages with cache update or invalidation ----------
 
+    def _renameWordNoCommit(self, word, toWord):
+        self.connWrap.execSql("update wikirelations set word = ? where word = ?", (toWord, word))
+        self.connWrap.execSql("update wikiwordattrs set word = ? where word = ?", (toWord, word))
+        self.connWrap.execSql("update todos set word = ? where word = ?", (toWord, word))
+        self.connWrap.execSql("update wikireferences set word = ? where word = ?", (toWord, word))
+        self.connWrap.execSql("update wikiwordmatchterms set word = ? where word = ?", (toWord, word))
+        self._renameContent(word, toWord)
+
+
     def renameWord(self, word, toWord):
         try:
             # commit anything pending so we can rollback on error
             self.connWrap.syncCommit()
 
             try:
-                self.connWrap.execSql("update wikirelations set word = ? where word = ?", (toWord, word))
-                self.connWrap.execSql("update wikiwordattrs set word = ? where word = ?", (toWord, word))
-                self.connWrap.execSql("update todos set word = ? where word = ?", (toWord, word))
-                self.connWrap.execSql("update wikiwordmatchterms set word = ? where word = ?", (toWord, word))
-                self._renameContent(word, toWord)
+                self._renameWordNoCommit(word, toWord)
                 self.connWrap.commit()
+
+                if self.cachedLinkGraph is not None:
+                    self.cachedLinkGraph.renameWord(word, toWord)
+            except:
+                self.connWrap.rollback()
+                raise
+        except (IOError, OSError, sqlite.Error) as e:
+            traceback.print_exc()
+            raise DbWriteAccessError(e)
+
+
+    def renameWords(self, renameSeq, contents):
+        """
+        Rename several words and store new contents for pages in one
+        transaction. Meta-data of renamed pages and pages with new content
+        is set dirty.
+
+        renameSeq -- Sequence of tuples (word, toWord), renamed in this order
+        contents -- Dictionary {word: content} with the contents to store
+                after renaming, keys are the new names of renamed pages
+
+        Only the database is rolled back on error, not the renamed or
+        written page files.
+        """
+        try:
+            # commit anything pending so we can rollback on error
+            self.connWrap.syncCommit()
+
+            try:
+                for word, toWord in renameSeq:
+                    self._renameWordNoCommit(word, toWord)
+                    self.setMetaDataState(toWord,
+                            Consts.WIKIWORDMETADATA_STATE_DIRTY)
+
+                for word, content in contents.items():
+                    self.setContent(word, content)
+                    self.setMetaDataState(word,
+                            Consts.WIKIWORDMETADATA_STATE_DIRTY)
+
+                self.connWrap.commit()
+
+                if self.cachedLinkGraph is not None:
+                    for word, toWord in renameSeq:
+                        self.cachedLinkGraph.renameWord(word, toWord)
             except:
                 self.connWrap.rollback()
                 raise
@@ -566,6 +612,7 @@ class WikiData:
                     self.deleteChildRelationships(word)
                     self.deleteAttributes(word)
                     self.deleteTodos(word)
+                    self.deleteReferences(word)
                     if delContent:
                         self._deleteContent(word)
                     self.deleteWikiWordMatchTerms(word, syncUpdate=False)
@@ -573,6 +620,7 @@ class WikiData:
                     self.connWrap.commit()
                 except:
                     self.connWrap.rollback()
+                    self.cachedLinkGraph = None
                     raise
             except (IOError, OSError, sqlite.Error) as e:
                 traceback.print_exc()
@@ -702,6 +750,28 @@ class WikiData:
 
     # ---------- Handling of relationships cache ----------
 
+    def _getLinkGraph(self):
+        """
+        Return the in-memory graph of relations, load it if necessary.
+        Function must work for read-only wiki.
+        """
+        if self.cachedLinkGraph is None:
+            try:
+                self.cachedLinkGraph = LinkGraph.LinkGraph(
+                        LinkGraph.iterRelations(self.connWrap.execSqlQuery(
+                            LinkGraph.GROUPED_RELATIONS_SQL)),
+                        self.connWrap.execSqlQuerySingleColumn(
+                            "select word from wikiwords"),
+                        self.connWrap.execSqlQuery("select matchterm, type, "
+                            "word from wikiwordmatchterms where (type & 2) != 0"))
+                # Consts.WIKIWORDMATCHTERMS_TYPE_ASLINK == 2
+            except (IOError, OSError, sqlite.Error) as e:
+                traceback.print_exc()
+                raise DbReadAccessError(e)
+
+        return self.cachedLinkGraph
+
+
     def getChildRelationships(self, wikiWord, existingonly=False,
             selfreference=True, withFields=()):
         """
@@ -722,6 +792,10 @@ class WikiData:
         if withFields is None:
             withFields = ()
 
+        if tuple(withFields) in ((), ("firstcharpos",)):
+            return self._getLinkGraph().getChildren(wikiWord, existingonly,
+                    selfreference, withPositions=len(withFields) > 0)
+
         addFields = ""
         converters = [lambda s: s]
         for field in withFields:
@@ -831,6 +905,18 @@ class WikiData:
 #         return self.connWrap.execSqlQuery(outersql, (wikiWord,))
 
 
+    def getWikiWordsWithChildren(self, wikiWords, existingonly=False,
+            excludeSet=frozenset()):
+        """
+        Return set of those wikiWords which have children except themselves
+        and the words in excludeSet. Aliases in wikiWords are not resolved.
+        Function must work for read-only wiki.
+        existingonly -- Count only existing wiki words
+        """
+        return self._getLinkGraph().getWordsWithChildren(wikiWords,
+                existingonly, excludeSet)
+
+
     def getParentRelationships(self, wikiWord):
         """
         get the parent relations to this word
@@ -843,27 +929,8 @@ class WikiData:
         realWord = self.getWikiPageNameForLinkTerm(wikiWord)
         if realWord is None:
             realWord = wikiWord
-        try:
-            return self.connWrap.execSqlQuerySingleColumn(
-                    "select word from wikirelations where relation = ? or "
-                    "relation in (select matchterm from wikiwordmatchterms "
-                    "where word = ? and "
-                    "(wikiwordmatchterms.type & 2) != 0)", (realWord, realWord))
-            # Consts.WIKIWORDMATCHTERMS_TYPE_ASLINK == 2
 
-
-#             # Plus parents of aliases
-#             aliases = [v for k, v in self.getAttributesForWord(wikiWord)
-#                     if k == u"alias"]
-#     
-#             for al in aliases:
-#                 parents.update(self.connWrap.execSqlQuerySingleColumn(
-#                     "select word from wikirelations where relation = ?", (al,)))
-#     
-#             return list(parents)
-        except (IOError, OSError, sqlite.Error) as e:
-            traceback.print_exc()
-            raise DbReadAccessError(e)
+        return self._getLinkGraph().getParents(realWord)
 
 
 
@@ -875,28 +942,7 @@ class WikiData:
         NO LONGER VALID: (((also returns nodes that have files but
         no entries in the wikiwords table.)))
         """
-        try:
-            # Also working but slower:
-#             return self.connWrap.execSqlQuerySingleColumn(
-#                     "select word from wikiwords except "
-#                     "select wikiwordmatchterms.word "
-#                     "from wikiwordmatchterms inner join wikirelations "
-#                     "on matchterm == relation where "
-#                     "wikirelations.word != wikiwordmatchterms.word and "
-#                     "(type & 2) != 0")
-
-
-            return self.connWrap.execSqlQuerySingleColumn(
-                    "select word from wikiwords except "
-                    "select wikiwordmatchterms.word from wikiwordmatchterms "
-                    "where exists (select 1 from wikirelations where "
-                    "wikiwordmatchterms.matchterm == wikirelations.relation and "
-                    "wikirelations.word != wikiwordmatchterms.word) and "
-                    "(type & 2) != 0")
-
-        except (IOError, OSError, sqlite.Error) as e:
-            traceback.print_exc()
-            raise DbReadAccessError(e)
+        return self._getLinkGraph().getParentlessWords()
 
 
 
@@ -906,22 +952,7 @@ class WikiData:
         directly nor as alias.
         Function must work for read-only wiki.
         """
-        try:
-#             return self.connWrap.execSqlQuerySingleColumn(
-#                     "select relation from wikirelations "
-#                     "except select word from wikiwords "
-#                     "except select value from wikiwordattrs where key='alias'")
-            return self.connWrap.execSqlQuerySingleColumn(
-                    "select relation from wikirelations "
-                    "except select word from wikiwords "
-                    "except select matchterm from wikiwordmatchterms "
-                    "where (type & 2) != 0")
-            # Consts.WIKIWORDMATCHTERMS_TYPE_ASLINK == 2
-
-
-        except (IOError, OSError, sqlite.Error) as e:
-            traceback.print_exc()
-            raise DbReadAccessError(e)
+        return self._getLinkGraph().getUndefinedWords()
 
 
     def _addRelationship(self, word, rel):
@@ -943,16 +974,20 @@ class WikiData:
         for r in childRelations:
             self._addRelationship(word, r)
 
+        if self.cachedLinkGraph is not None:
+            self.cachedLinkGraph.setChildren(word, childRelations)
+
     def deleteChildRelationships(self, fromWord):
         try:
             self.connWrap.execSql("delete from wikirelations where word = ?",
                     (fromWord,))
+            if self.cachedLinkGraph is not None:
+                self.cachedLinkGraph.deleteChildren(fromWord)
         except (IOError, OSError, sqlite.Error) as e:
             traceback.print_exc()
             raise DbWriteAccessError(e)
 
 
-    # TODO Maybe optimize
     def getAllSubWords(self, words, level=-1):
         """
         Return all words which are children, grandchildren, etc.
@@ -996,61 +1031,10 @@ class WikiData:
         word and toWord are included as first/last element. If word == toWord,
         it is included only once as the single element of the list.
         If there is no path from word to toWord, [] is returned
-        Function must work for read-only wiki (should hold although function
-        writes to temporary table.
+        Function must work for read-only wiki.
         """
         # TODO Aliases supported?
-        
-        if word == toWord:
-            return [word]
-        try:
-            # Clear temporary table
-            self.connWrap.execSql("delete from temppathfindparents")
-    
-            self.connWrap.execSql("insert into temppathfindparents "+
-                    "(word, child, steps) select word, relation, 1 from wikirelations "+
-                    "where relation = ?", (word,))
-
-            step = 1
-            while True:
-                changes = self.connWrap.rowcount
-    
-                if changes == 0:
-                    # No more (grand-)parents
-                    return []
-
-                if self.connWrap.execSqlQuerySingleItem("select word from "+
-                        "temppathfindparents where word=?", (toWord,)) is not None:
-                    # Path found
-                    result = [toWord]
-                    crumb = toWord
-    
-                    while crumb != word:
-                        crumb = self.connWrap.execSqlQuerySingleItem(
-                                "select child from temppathfindparents where "+
-                                "word=?", (crumb,))
-                        result.append(crumb)
-
-                    # print "findBestPathFromWordToWord result", word, toWord, repr(result)
-    
-                    # Clear temporary table
-                    self.connWrap.execSql("delete from temppathfindparents")
-
-                    return result
-    
-                self.connWrap.execSql("""
-                    insert or ignore into temppathfindparents (word, child, steps)
-                    select wikirelations.word, temppathfindparents.word, ? from
-                        temppathfindparents inner join wikirelations on
-                        temppathfindparents.word == wikirelations.relation where
-                        temppathfindparents.steps == ?
-                    """, (step+1, step))
-    
-                step += 1
-        
-        except (IOError, OSError, sqlite.Error) as e:
-            traceback.print_exc()
-            raise DbReadAccessError(e)
+        return self._getLinkGraph().findPath(word, toWord)
 
 
     def _findNewWordForFile(self, path):
@@ -1132,7 +1116,8 @@ class WikiData:
         so it must not rely on the presence of other cache
         information (e.g. relations).
 
-        The self.cachedWikiPageLinkTermDict is invalidated.
+        The self.cachedWikiPageLinkTermDict and self.cachedLinkGraph are
+        invalidated.
         
         deleteFully -- if true, all cache information related to a no
             longer existing word is also deleted
@@ -1141,6 +1126,7 @@ class WikiData:
         dbFiles = frozenset(self._getAllWikiFileNamesFromDb())
         
         self.cachedWikiPageLinkTermDict = None
+        self.cachedLinkGraph = None
         try:
             # Delete words for which no file is present anymore
             for path in self.connWrap.execSqlQuerySingleColumn(
@@ -1586,6 +1572,36 @@ class WikiData:
             return tuple(result[0])
 
 
+    _DAY_HISTOGRAM_STAMP_FIELDS = {
+            0: "modified",
+            1: "created",
+            2: "visited"
+        }
+
+    def getTimeDayHistogram(self, stampType, startTime=None, endTime=None):
+        """
+        Function must work for read-only wiki.
+        Return list of tuples (dayOrdinal, count) ordered by day with the
+        number of wiki words whose timestamp falls on that day in local
+        time (see timeView.DayHistogram). A time value of 0.0 is not taken
+        into account.
+
+        stampType -- 0: Modification time, 1: Creation, 2: Last visit
+        startTime, endTime -- Optional range, startTime is inclusive,
+                endTime is exclusive
+        """
+        field = self._DAY_HISTOGRAM_STAMP_FIELDS.get(stampType)
+        if field is None:
+            return []
+
+        try:
+            return DayHistogram.queryDayHistogram(self.connWrap, "wikiwords",
+                    field, startTime, endTime)
+        except (IOError, OSError, sqlite.Error) as e:
+            traceback.print_exc()
+            raise DbReadAccessError(e)
+
+
     def getWikiPageNamesBefore(self, stampType, stamp, limit=None):
         """
         Get a list of tuples of wiki words and dates related to a particular
@@ -1973,6 +1989,58 @@ class WikiData:
             raise DbWriteAccessError(e)
 
 
+    # ---------- Reference cache handling ----------
+
+    def getReferencingWikiWords(self, targets):
+        """
+        Return list of words which reference one of the page names in
+        targets by a page insertion or an attribute value (see
+        updateReferences()).
+        Function must work for read-only wiki.
+        """
+        targets = list(targets)
+        result = set()
+        try:
+            # Stay below the limit of sqlite for variables in a statement
+            for i in range(0, len(targets), 500):
+                part = targets[i:i + 500]
+                result.update(self.connWrap.execSqlQuerySingleColumn(
+                        "select word from wikireferences where target in (" +
+                        ", ".join(["?"] * len(part)) + ")", part))
+
+            return list(result)
+        except (IOError, OSError, sqlite.Error) as e:
+            traceback.print_exc()
+            raise DbReadAccessError(e)
+
+
+    def updateReferences(self, word, targets):
+        """
+        Replace the references of word.
+        targets -- Sequence of resolved page names referenced by page
+                insertions and by values of attributes in
+                ATTRIBUTES_WITH_WIKIWORD_VALUES
+        """
+        self.deleteReferences(word)
+        self.getExistingWikiWordInfo(word)
+        try:
+            for target in targets:
+                self.connWrap.execSql("insert into wikireferences(word, target) "
+                        "values (?, ?)", (word, target))
+        except (IOError, OSError, sqlite.Error) as e:
+            traceback.print_exc()
+            raise DbWriteAccessError(e)
+
+
+    def deleteReferences(self, word):
+        try:
+            self.connWrap.execSql("delete from wikireferences where word = ?",
+                    (word,))
+        except (IOError, OSError, sqlite.Error) as e:
+            traceback.print_exc()
+            raise DbWriteAccessError(e)
+
+
     # ---------- Wikiword matchterm cache handling ----------
 
     def getWikiWordMatchTermsWith(self, thisStr, orderBy=None, descend=False):
@@ -2039,6 +2107,11 @@ class WikiData:
             assert t[2] == word
             self._addWikiWordMatchTerm(t)
 
+        if self.cachedLinkGraph is not None:
+            self.cachedLinkGraph.setMatchTerms(word, syncUpdate,
+                    [t[0] for t in wwmTerms
+                    if t[1] & Consts.WIKIWORDMATCHTERMS_TYPE_ASLINK])
+
 
     def _addWikiWordMatchTerm(self, wwmTerm):
         matchterm, typ, word, firstcharpos, charlength = wwmTerm
@@ -2065,6 +2138,8 @@ class WikiData:
             self.connWrap.execSql("delete from wikiwordmatchterms where "
                     "word = ?" + addSql, (word,))
             self.cachedWikiPageLinkTermDict = None
+            if self.cachedLinkGraph is not None:
+                self.cachedLinkGraph.setMatchTerms(word, syncUpdate, ())
         except (IOError, OSError, sqlite.Error) as e:
             traceback.print_exc()
             raise DbWriteAccessError(e)
@@ -2362,6 +2437,72 @@ class WikiData:
         return result
         
 
+    # ---------- Full text index (FTS5 backend of index search) ----------
+
+    def isFullTextIndexAvailable(self):
+        """
+        Return True if the sqlite library supports the FTS5 full text index.
+        """
+        if self.fullTextIndexAvailable is None:
+            self.fullTextIndexAvailable = SearchIndex.fts5IsAvailable(
+                    self.connWrap)
+
+        return self.fullTextIndexAvailable
+
+
+    def updateFullTextIndex(self, removeNames, documents):
+        """
+        Remove entries with unified names in  removeNames  from the full text
+        index, then add  documents, a sequence of tuples
+        (unifName, modTimestamp, content). The change isn't committed.
+        """
+        try:
+            SearchIndex.fts5Update(self.connWrap, removeNames, documents)
+        except (IOError, OSError, sqlite.Error) as e:
+            traceback.print_exc()
+            raise DbWriteAccessError(e)
+
+
+    def clearFullTextIndex(self, drop=False):
+        """
+        Remove all entries from the full text index. If  drop  is True, the
+        tables are removed completely.
+        """
+        try:
+            if drop:
+                SearchIndex.fts5DropTables(self.connWrap)
+            else:
+                SearchIndex.fts5Clear(self.connWrap)
+            self.connWrap.commit()
+        except (IOError, OSError, sqlite.Error) as e:
+            traceback.print_exc()
+            raise DbWriteAccessError(e)
+
+
+    def queryFullTextIndex(self, sql, params=()):
+        """
+        Run a query on the full text index tables and return the first column
+        of the result as list.
+        """
+        try:
+            return self.connWrap.execSqlQuerySingleColumn(sql, params)
+        except (IOError, OSError, sqlite.Error) as e:
+            traceback.print_exc()
+            raise DbReadAccessError(e)
+
+
+    def queryFullTextIndexRows(self, sql, params=()):
+        """
+        Run a query on the full text index tables and return the result
+        as list of tuples.
+        """
+        try:
+            return self.connWrap.execSqlQuery(sql, params)
+        except (IOError, OSError, sqlite.Error) as e:
+            traceback.print_exc()
+            raise DbReadAccessError(e)
+
+
     # ---------- Miscellaneous ----------
 
     _CAPABILITIES = {
@@ -2406,6 +2547,7 @@ class WikiData:
             self.connWrap.syncCommit()
 
             self.cachedWikiPageLinkTermDict = None
+            self.cachedLinkGraph = None
             self.cachedGlobalAttrs = None
 
             self.fullyResetMetaDataState()
@@ -2484,6 +2626,28 @@ class WikiData:
             raise DbWriteAccessError(e)
 
 
+    def reopenConnection(self):
+        """
+        Open a new connection to the database for use in a forked worker
+        process. A sqlite connection must not be used across fork() so the
+        inherited one is kept (unused and unclosed) as it still belongs to
+        the parent process.
+        Function must work for read-only wiki.
+        """
+        if self.inheritedConnWrap is None:
+            self.inheritedConnWrap = self.connWrap
+
+        try:
+            self.connWrap = DbStructure.ConnectWrapSyncCommit(
+                    sqlite.connect(self.dbFilename))
+        except (IOError, OSError, sqlite.Error) as e:
+            traceback.print_exc()
+            raise DbReadAccessError(e)
+
+        DbStructure.registerSqliteFunctions(self.connWrap)
+        DbStructure.registerUtf8Support(self.connWrap)
+
+
 
     # ---------- Other optional functionality ----------
 
@@ -2565,6 +2729,7 @@ class WikiData:
         """
         Do not call from this class, only from outside to handle errors.
         """
+        self.cachedLinkGraph = None
         try:
             self.connWrap.rollback()
         except (IOError, OSError, sqlite.Error) as e:
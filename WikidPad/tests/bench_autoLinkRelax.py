@@ -0,0 +1,79 @@
+# coding: utf-8
+"""Benchmark autoLink "relax" mode matching.
+
+Compares the former list of one regular expression per wiki word with
+AutoLinkRelaxMatcher for a synthetic wiki. Run from the WikidPad directory:
+
+   python tests/bench_autoLinkRelax.py [WORDCOUNT]
+
+"""
+import os
+import random
+import sys
+import time
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+from pwiki.AutoLinkRelax import AutoLinkRelaxMatcher
+from tests.test_AutoLinkRelax import build_regex_list, find_with_regex_list
+
+
+def make_words(count, rnd):
+    syllables = ["ka", "lo", "mi", "ne", "ru", "sa", "to", "vi", "xe", "zu"]
+    words = set()
+    while len(words) < count:
+        parts = ["".join(rnd.choice(syllables)
+                for j in range(rnd.randint(2, 4))).capitalize()
+                for i in range(rnd.randint(1, 3))]
+        words.add(" ".join(parts))
+    return list(words)
+
+
+def make_text(words, size, rnd):
+    fill = ["the", "and", "of", "page", "with", "some", "text", "more"]
+    result = []
+    length = 0
+    while length < size:
+        if rnd.random() < 0.1:
+            word = rnd.choice(words)
+        else:
+            word = rnd.choice(fill)
+        result.append(word)
+        length += len(word) + 1
+    return " ".join(result)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    wordCount = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    rnd = random.Random(1)
+    words = make_words(wordCount, rnd)
+    text = make_text(words, 2000, rnd)
+
+    buildOld, relaxList = timed(build_regex_list, words)
+    buildNew, matcher = timed(AutoLinkRelaxMatcher, words)
+    matchOld, resultOld = timed(find_with_regex_list, relaxList, text)
+    matchNew, resultNew = timed(matcher.findMatches, text)
+
+    assert resultOld == resultNew
+
+    changed = words[:len(words) // 100] + make_words(len(words) // 100, rnd)
+    updateNew, _ = timed(matcher.update, words[len(words) // 100:] + changed)
+
+    print("%i words, %i chars of text, %i matches" %
+            (wordCount, len(text), len(resultNew)))
+    print("build:  regex list %8.3f s   matcher %8.3f s" % (buildOld, buildNew))
+    print("match:  regex list %8.3f s   matcher %8.3f s" % (matchOld, matchNew))
+    print("update 1%% of words:            matcher %8.3f s" % updateNew)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+# coding: utf-8
+"""Benchmark the in-memory link graph.
+
+Creates the link tables of a wiki with a synthetic link structure and
+compares the SQL queries formerly used by the WikiData implementations with
+LinkGraph for breadcrumbs (path finding), sub-tree export, tree children and
+parentless/undefined words. Run from the WikidPad directory:
+
+   python tests/bench_linkGraph.py [EDGECOUNT]
+
+"""
+import os
+import random
+import sys
+import time
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+from tests.test_LinkGraph import SqlLinks, WORD_TYPE, ALIAS_TYPE
+
+
+def sql_find_path(connWrap, word, toWord):
+    """Former findBestPathFromWordToWord with temporary table"""
+    if word == toWord:
+        return [word]
+
+    connWrap.execSql("delete from temppathfindparents")
+    connWrap.execSql("insert into temppathfindparents "
+            "(word, child, steps) select word, relation, 1 from wikirelations "
+            "where relation = ?", (word,))
+
+    step = 1
+    while True:
+        if connWrap.rowcount == 0:
+            return []
+
+        if connWrap.execSqlQuerySingleItem("select word from "
+                "temppathfindparents where word=?", (toWord,)) is not None:
+            result = [toWord]
+            crumb = toWord
+            while crumb != word:
+                crumb = connWrap.execSqlQuerySingleItem(
+                        "select child from temppathfindparents where "
+                        "word=?", (crumb,))
+                result.append(crumb)
+
+            connWrap.execSql("delete from temppathfindparents")
+            return result
+
+        connWrap.execSql("""
+            insert or ignore into temppathfindparents (word, child, steps)
+            select wikirelations.word, temppathfindparents.word, ? from
+                temppathfindparents inner join wikirelations on
+                temppathfindparents.word == wikirelations.relation where
+                temppathfindparents.steps == ?
+            """, (step+1, step))
+        step += 1
+
+
+def sub_words(getChildren, word):
+    """getAllSubWords without aliases"""
+    checkList = [word]
+    resultSet = set()
+    result = []
+    while checkList:
+        toCheck = checkList.pop()
+        if toCheck in resultSet:
+            continue
+        result.append(toCheck)
+        resultSet.add(toCheck)
+        children = getChildren(toCheck, True, False)
+        children.reverse()
+        checkList += children
+
+    return result
+
+
+def build_wiki(sqlLinks, edgeCount, rnd):
+    pageCount = edgeCount // 10
+    names = ["Page%i" % i for i in range(pageCount)]
+    for i, name in enumerate(names):
+        sqlLinks.setPageDefined(name, True)
+        sqlLinks.setMatchTerms(name, True, [(name, WORD_TYPE)])
+        if i % 20 == 0:
+            sqlLinks.setMatchTerms(name, False, [("Alias%i" % i, ALIAS_TYPE)])
+
+    # Pages link mostly to pages "near" in a hierarchy, some to undefined
+    # pages and some randomly
+    for i, name in enumerate(names):
+        children = []
+        for j in range(10):
+            r = rnd.random()
+            if r < 0.8:
+                target = names[min(pageCount - 1, i * 3 + rnd.randint(1, 30))]
+            elif r < 0.9:
+                target = "Undefined%i" % rnd.randint(0, pageCount)
+            else:
+                target = rnd.choice(names)
+            children.append((target, j))
+        sqlLinks.setChildren(name, children)
+
+    sqlLinks.connWrap.commit()
+    return names
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    edgeCount = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rnd = random.Random(1)
+    sqlLinks = SqlLinks()
+    names = build_wiki(sqlLinks, edgeCount, rnd)
+    connWrap = sqlLinks.connWrap
+    connWrap.execSql("create index wikirelations_relation on "
+            "wikirelations(relation)")
+    connWrap.execSql("create index wikiwordmatchterms_matchterm on "
+            "wikiwordmatchterms(matchterm)")
+    connWrap.execSql("create index wikiwordmatchterms_word on "
+            "wikiwordmatchterms(word)")
+    connWrap.execSql("create temp table temppathfindparents "
+            "(word text primary key, child text, steps integer)")
+    connWrap.execSql("create index temppathfindparents_steps "
+            "on temppathfindparents(steps)")
+
+    loadTime, graph = timed(sqlLinks.createGraph)
+    print("%i pages, %i edges, graph loaded in %.3f s" % (len(names),
+            edgeCount, loadTime))
+
+    pathPairs = [(rnd.choice(names[len(names) // 2:]),
+            rnd.choice(names[:10])) for i in range(20)]
+
+    def sqlPaths():
+        return [len(sql_find_path(connWrap, w, t)) for w, t in pathPairs]
+
+    def graphPaths():
+        return [len(graph.findPath(w, t)) for w, t in pathPairs]
+
+    subTreeRoot = names[len(names) // 20]
+    sampleWords = rnd.sample(names, 200)
+
+    def sqlChildren():
+        return [sqlLinks.getChildren(w, True, False) for w in sampleWords]
+
+    def graphChildren():
+        return [graph.getChildren(w, True, False) for w in sampleWords]
+
+    def sqlParents():
+        return [sqlLinks.getParents(w) for w in sampleWords]
+
+    def graphParents():
+        return [graph.getParents(w) for w in sampleWords]
+
+    benchmarks = [
+            ("20 breadcrumb paths", sqlPaths, graphPaths, None),
+            ("sub-tree of %s" % subTreeRoot,
+                lambda: sub_words(sqlLinks.getChildren, subTreeRoot),
+                lambda: sub_words(graph.getChildren, subTreeRoot), len),
+            ("200 x children", sqlChildren, graphChildren, None),
+            ("200 x parents", sqlParents, graphParents, None),
+            ("parentless words", sqlLinks.getParentlessWords,
+                graph.getParentlessWords, len),
+            ("parentless again", sqlLinks.getParentlessWords,
+                graph.getParentlessWords, len),
+            ("undefined words", sqlLinks.getUndefinedWords,
+                graph.getUndefinedWords, len)]
+
+    for title, sqlFunc, graphFunc, resultInfo in benchmarks:
+        timeSql, resultSql = timed(sqlFunc)
+        timeGraph, resultGraph = timed(graphFunc)
+        if resultInfo is not None:
+            resultSql = resultInfo(resultSql)
+            resultGraph = resultInfo(resultGraph)
+        else:
+            resultSql = resultGraph = ""
+
+        print("%-24s  sql %9.5f s   graph %9.6f s   %s" % (title, timeSql,
+                timeGraph, resultGraph if resultSql == resultGraph else
+                "DIFFERENT: %s %s" % (resultSql, resultGraph)))
+
+    connWrap.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# coding: utf-8
+"""Benchmark XML and compact format of overviews.
+
+Writes and reads version overview, trashcan and wiki-wide history with
+many entries in both formats and measures adding one entry to an existing
+overview as done on each new version, trashed page or page visit. Run from
+the WikidPad directory:
+
+   python tests/bench_overviews.py [ENTRYCOUNT]
+
+"""
+import builtins
+import gc
+import os
+import sys
+import time
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+if not hasattr(builtins, "_"):
+    builtins._ = lambda s: s
+if not hasattr(builtins, "N_"):
+    builtins.N_ = lambda s: s
+
+from pwiki.timeView.Versioning import VersionOverview, VersionEntry
+from pwiki.timeView.WikiWideHistory import WikiWideHistory, HistoryEntry
+from pwiki.Trashcan import Trashcan, TrashBag
+
+
+class StubConfig(object):
+    def __init__(self):
+        self.options = {}
+
+    def getint(self, section, option, default=None):
+        return int(self.options.get(option, default))
+
+    def getboolean(self, section, option, default=None):
+        return bool(self.options.get(option, default))
+
+
+class StubMiscEvent(object):
+    def addListener(self, listener):
+        pass
+
+    def removeListener(self, listener):
+        pass
+
+
+class StubWikiDocument(object):
+    """The parts of WikiDocument used by the overviews."""
+    def __init__(self):
+        self.config = StubConfig()
+        self.miscEvent = StubMiscEvent()
+        self.dataBlocks = {}
+
+    def getWikiConfig(self):
+        return self.config
+
+    def getMiscEvent(self):
+        return self.miscEvent
+
+    def storeDataBlock(self, unifName, data, storeHint=None):
+        self.dataBlocks[unifName] = bytes(data)
+
+    def retrieveDataBlock(self, unifName, default=""):
+        return self.dataBlocks.get(unifName, default)
+
+    def deleteDataBlock(self, unifName):
+        self.dataBlocks.pop(unifName, None)
+
+
+def fill_version_overview(wikiDocument, count):
+    overview = VersionOverview(wikiDocument,
+            unifiedBasePageName="wikipage/BenchPage")
+    for i in range(count):
+        entry = VersionEntry("wikipage/BenchPage",
+                description="Version %i" % i if i % 3 == 0 else None)
+        entry.versionNumber = i + 1
+        entry.contentDifferencing = "complete" if i % 10 == 0 else "revdiff"
+        overview.versionEntries.append(entry)
+    overview.maxVersionNumber = count
+
+    def add():
+        entry = VersionEntry("wikipage/BenchPage")
+        overview.maxVersionNumber += 1
+        entry.versionNumber = overview.maxVersionNumber
+        overview.versionEntries.append(entry)
+
+    return overview, add
+
+
+def fill_history(wikiDocument, count):
+    wikiDocument.config.options["wikiWideHistory_maxEntries"] = count
+    history = WikiWideHistory(wikiDocument)
+    for i in range(count):
+        history.historyEntries.append(HistoryEntry("wikipage/Page%i" % i))
+
+    def add():
+        history.historyEntries.append(HistoryEntry("wikipage/NewPage"))
+        history.limitEntries()
+
+    return history, add
+
+
+def fill_trashcan(wikiDocument, count):
+    wikiDocument.config.options["trashcan_maxNoOfBags"] = count
+    trashcan = Trashcan(wikiDocument)
+    for i in range(count):
+        bag = TrashBag(trashcan)
+        bag.bagId = i + 1
+        bag.originalUnifiedName = "wikipage/Page%i" % i
+        trashcan.trashBags.append(bag)
+        trashcan.trashBagIds.add(bag.bagId)
+
+    def add():
+        bag = TrashBag(trashcan)
+        bag.bagId = count + 1 + len(trashcan.trashBags)
+        bag.originalUnifiedName = "wikipage/NewPage"
+        trashcan.trashBags.append(bag)
+        trashcan._removeOldest()
+
+    return trashcan, add
+
+
+def timed(func, repeat=1):
+    gc.collect()
+    start = time.time()
+    for i in range(repeat):
+        func()
+    return (time.time() - start) / repeat
+
+
+def bench(name, fill, count):
+    for compact in (False, True):
+        wikiDocument = StubWikiDocument()
+        wikiDocument.config.options["overviews_compactFormat"] = compact
+        overview, add = fill(wikiDocument, count)
+
+        writeTime = timed(overview.writeOverview)
+        size = sum(len(b) for b in wikiDocument.dataBlocks.values())
+        readTime = timed(overview.readOverview)
+
+        def addAndWrite():
+            add()
+            overview.writeOverview()
+
+        addTime = timed(addAndWrite, 5)
+        # Including reading back, e.g. after another process changed it
+        addReadTime = timed(lambda: (addAndWrite(), overview.readOverview()),
+                5)
+
+        print("%-18s %-7s %8i bytes  write %7.1f ms  read %7.1f ms  "
+                "add+write %7.1f ms  add+write+read %7.1f ms" % (name,
+                "compact" if compact else "XML", size, writeTime * 1000,
+                readTime * 1000, addTime * 1000, addReadTime * 1000))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    print("Entries: %i" % count)
+    bench("version overview", fill_version_overview, count)
+    bench("wiki-wide history", fill_history, count)
+    bench("trashcan", fill_trashcan, count)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# coding: utf-8
+"""Benchmark the index search backends.
+
+Builds a whoosh index and an FTS5 index (in an sqlite database like the one
+of a "compact_sqlite" wiki) for a synthetic wiki, then measures saving single
+pages (one transaction each) and some queries. Run from the WikidPad
+directory:
+
+   python tests/bench_searchIndex.py [PAGECOUNT]
+
+"""
+import builtins
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+if not hasattr(builtins, "_"):
+    builtins._ = lambda s: s
+
+import pwiki.sqlite3api as sqlite
+from pwiki.wikidata.compact_sqlite import DbStructure
+from pwiki import SearchIndex
+
+from whoosh.qparser import QueryParser
+
+from tests.test_SearchIndex import FullTextWikiData, make_schema, \
+        add_documents
+
+
+QUERIES = ["kalo", "kalo mine", "kalo OR mine", "kalo NOT mine",
+        '"kalo mine"', "ka*", "k?lo", "[ka TO ko]"]
+
+
+def make_pages(count, rnd):
+    syllables = ["ka", "lo", "mi", "ne", "ru", "sa", "to", "vi", "xe", "zu"]
+    vocabulary = ["".join(rnd.choice(syllables)
+            for j in range(rnd.randint(2, 3))) for i in range(5000)]
+    return [("wikipage/Page%i" % i, float(i), " ".join(rnd.choice(vocabulary)
+            for j in range(rnd.randint(50, 500)))) for i in range(count)]
+
+
+def save_pages(searchIdx, pages):
+    # Each page is saved separately like when editing
+    for unifName, modTimestamp, content in pages:
+        writer = searchIdx.writer()
+        writer.delete_by_term("unifName", unifName)
+        writer.add_document(unifName=unifName, modTimestamp=modTimestamp,
+                content=content)
+        writer.commit()
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    pageCount = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rnd = random.Random(1)
+    pages = make_pages(pageCount, rnd)
+    changed = [(unifName, modTimestamp + 1, content[::-1])
+            for unifName, modTimestamp, content in rnd.sample(pages, 50)]
+
+    tempDir = tempfile.mkdtemp()
+    try:
+        schema = make_schema()
+        whooshIdx = SearchIndex.WhooshSearchIndex(
+                os.path.join(tempDir, "indexsearch"), schema, clear=True)
+
+        connWrap = DbStructure.ConnectWrapSyncCommit(
+                sqlite.connect(os.path.join(tempDir, "wiki.sli")))
+        fts5Idx = SearchIndex.Fts5SearchIndex(FullTextWikiData(connWrap),
+                clear=True)
+
+        buildWhoosh, _ = timed(add_documents, whooshIdx, pages)
+        buildFts5, _ = timed(add_documents, fts5Idx, pages)
+        saveWhoosh, _ = timed(save_pages, whooshIdx, changed)
+        saveFts5, _ = timed(save_pages, fts5Idx, changed)
+        whooshIdx.refresh()
+
+        print("%i pages" % pageCount)
+        print("build:              whoosh %8.3f s   fts5 %8.3f s" %
+                (buildWhoosh, buildFts5))
+        print("save %i pages:      whoosh %8.3f s   fts5 %8.3f s" %
+                (len(changed), saveWhoosh, saveFts5))
+
+        parser = QueryParser("content", schema)
+        for queryStr in QUERIES:
+            q = parser.parse(queryStr)
+            timeWhoosh, resultWhoosh = timed(whooshIdx.search, q)
+            timeFts5, resultFts5 = timed(fts5Idx.search, q)
+            print("%-18s  whoosh %8.4f s   fts5 %8.4f s   %6i hits%s" %
+                    (queryStr, timeWhoosh, timeFts5, len(resultFts5),
+                    "" if set(resultWhoosh) == set(resultFts5) else
+                    " (whoosh: %i)" % len(resultWhoosh)))
+
+        whooshIdx.close()
+        connWrap.close()
+    finally:
+        shutil.rmtree(tempDir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
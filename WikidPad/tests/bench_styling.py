@@ -0,0 +1,112 @@
+# coding: utf-8
+"""Benchmark building the style bytes for the editor.
+
+Compares the former StyleCollector, which encoded each gap and styled part
+separately, and the per-character merge of spell check styles with the
+offset table based StyleCollector and orStyleBytes on pages of about 1 MB
+with ASCII and with non-ASCII text. Run from the WikidPad directory:
+
+   python tests/bench_styling.py [SIZE]
+
+"""
+import os
+import random
+import sys
+import time
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+from pwiki.EnhancedScintillaControl import StyleCollector, SctOffsetTable, \
+        orStyleBytes
+from tests.test_StyleCollector import SliceStyleCollector
+
+
+SPELL_MASK = 0x80
+
+
+def build_page(rnd, size, words):
+    """
+    Return tuple (text, styles, misspelled) where styles and misspelled
+    are lists of tuples (pos, length, styleNo).
+    """
+    parts = []
+    styles = []
+    misspelled = []
+    pos = 0
+    while pos < size:
+        word = rnd.choice(words)
+        r = rnd.random()
+        if r < 0.2:
+            styles.append((pos, len(word), rnd.randint(1, 10)))
+        elif r < 0.22:
+            misspelled.append((pos, len(word), SPELL_MASK))
+        sep = "\n" if rnd.random() < 0.1 else " "
+        parts.append(word + sep)
+        pos += len(word) + 1
+
+    return "".join(parts), styles, misspelled
+
+
+def former_styling(text, styles, misspelled):
+    collector = SliceStyleCollector(0, text)
+    for pos, length, styleNo in styles:
+        collector.bindStyle(pos, length, styleNo)
+    stylebytes = collector.value()
+
+    collector = SliceStyleCollector(0, text)
+    for pos, length, styleNo in misspelled:
+        collector.bindStyle(pos, length, styleNo)
+    spellStyleBytes = collector.value()
+
+    return "".join([chr(a | b) for a, b in zip(stylebytes, spellStyleBytes)]
+            ).encode("raw_unicode_escape")
+
+
+def table_styling(text, styles, misspelled):
+    offsetTable = SctOffsetTable(text)
+    collector = StyleCollector(0, text, offsetTable)
+    for pos, length, styleNo in styles:
+        collector.bindStyle(pos, length, styleNo)
+    stylebytes = collector.value()
+
+    collector = StyleCollector(0, text, offsetTable)
+    for pos, length, styleNo in misspelled:
+        collector.bindStyle(pos, length, styleNo)
+
+    return orStyleBytes(stylebytes, collector.value())
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    rnd = random.Random(1)
+    wordSets = [
+            ("ASCII", ["WikiWord", "text", "styling", "editor", "page",
+                "a"]),
+            ("non-ASCII", ["WikiWord", "Größe", "naïve", "€uro", "текст",
+                "页面", "\U0001f600"])]
+
+    for title, words in wordSets:
+        text, styles, misspelled = build_page(rnd, size, words)
+        print("%s page, %i chars, %i styled parts, %i misspelled" % (title,
+                len(text), len(styles), len(misspelled)))
+
+        timeFormer, resultFormer = timed(former_styling, text, styles,
+                misspelled)
+        timeTable, resultTable = timed(table_styling, text, styles,
+                misspelled)
+        print("   former %9.4f s   offset table %9.4f s   %s" % (timeFormer,
+                timeTable, "same" if resultFormer == resultTable else
+                "DIFFERENT"))
+
+
+if __name__ == "__main__":
+    main()
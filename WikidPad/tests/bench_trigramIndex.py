@@ -0,0 +1,150 @@
+# coding: utf-8
+"""Benchmark the trigram index for plain string and regex search.
+
+Creates an sqlite database with the content table of a "compact_sqlite" wiki
+for a synthetic wiki and runs some searches once with a full scan of all
+pages and once on the candidates found by the trigram index. Run from the
+WikidPad directory:
+
+   python tests/bench_trigramIndex.py [PAGECOUNT]
+
+"""
+import builtins
+import itertools
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+if not hasattr(builtins, "_"):
+    builtins._ = lambda s: s
+
+import pwiki.sqlite3api as sqlite
+from pwiki.wikidata.compact_sqlite import DbStructure
+from pwiki.StringOps import utf8Enc
+from pwiki import SearchAndReplace, TrigramIndex
+
+
+# (search string, wildCard, caseSensitive, booleanOp), {0}, {1} ... are
+# replaced by words of the vocabulary from frequent to rare ones
+SEARCHES = [("{2}", "no", False, False),
+        ("{3}", "no", True, False),
+        ("{1} {3}", "no", False, False),
+        (r"\b{2}\w*", "regex", False, False),
+        (r"({2}|{3})\s+\w+", "regex", False, False),
+        (r"[0-9]{{4}}-[0-9]{{2}}", "regex", False, False),
+        ("{0} and not {1}", "no", False, True)]
+
+# Ranks of the words in the vocabulary for {0}, {1} ...
+SEARCH_WORD_RANKS = (10, 100, 1000, 10000)
+
+
+class BenchWikiDocument(object):
+    """The parts of WikiDocument used by the search operation."""
+    def getWikiName(self):
+        return "BenchWiki"
+
+
+def make_vocabulary(rnd):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rnd.choice(letters) for j in range(rnd.randint(3, 10)))
+            for i in range(50000)]
+
+
+def make_pages(count, vocabulary, rnd):
+    # Word frequencies follow Zipf's law like in natural language
+    cumWeights = list(itertools.accumulate(1.0 / rank
+            for rank in range(1, len(vocabulary) + 1)))
+    return [("Page%i" % i, " ".join(rnd.choices(vocabulary,
+            cum_weights=cumWeights, k=rnd.randint(50, 300))))
+            for i in range(count)]
+
+
+def make_sar_op(searchStr, wildCard, caseSensitive, booleanOp):
+    sarOp = SearchAndReplace.SearchReplaceOperation()
+    sarOp.searchStr = searchStr
+    sarOp.wildCard = wildCard
+    sarOp.caseSensitive = caseSensitive
+    sarOp.booleanOp = booleanOp
+    sarOp.wikiWide = True
+    sarOp.rebuildSearchOpTree()
+    return sarOp
+
+
+def search(connWrap, sarOp, matchExpr):
+    try:
+        if matchExpr is None:
+            return connWrap.execSqlQuerySingleColumn(
+                    "select word from wikiwordcontent where "
+                    "testMatch(word, content, ?)",
+                    (sqlite.addTransObject(sarOp),))
+        else:
+            return connWrap.execSqlQuerySingleColumn(
+                    "select word from wikiwordcontent where rowid in (" +
+                    TrigramIndex.buildCandidateRowidSql() +
+                    ") and testMatch(word, content, ?)",
+                    (matchExpr, sqlite.addTransObject(sarOp)))
+    finally:
+        sqlite.delTransObject(sarOp)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    pageCount = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    rnd = random.Random(1)
+    vocabulary = make_vocabulary(rnd)
+    pages = make_pages(pageCount, vocabulary, rnd)
+    searchWords = [vocabulary[rank] for rank in SEARCH_WORD_RANKS]
+
+    tempDir = tempfile.mkdtemp()
+    try:
+        connWrap = DbStructure.ConnectWrapSyncCommit(
+                sqlite.connect(os.path.join(tempDir, "wiki.sli")))
+        DbStructure.registerSqliteFunctions(connWrap)
+        connWrap.execSql("create table wikiwordcontent "
+                "(word text primary key, content blob)")
+        for word, content in pages:
+            connWrap.execSql("insert into wikiwordcontent(word, content) "
+                    "values (?, ?)", (word, sqlite.Binary(utf8Enc(content)[0])))
+        connWrap.commit()
+
+        buildTime, _ = timed(TrigramIndex.rebuildIndex, connWrap,
+                "wikiwordcontent", "content")
+        connWrap.commit()
+
+        print("%i pages, index build %.3f s" % (pageCount, buildTime))
+
+        for searchStr, wildCard, caseSensitive, booleanOp in SEARCHES:
+            searchStr = searchStr.format(*searchWords)
+            sarOp = make_sar_op(searchStr, wildCard, caseSensitive, booleanOp)
+            matchExpr = TrigramIndex.buildMatchExpression(sarOp.getTextFilter())
+
+            sarOp.beginWikiSearch(BenchWikiDocument())
+            timeScan, resultScan = timed(search, connWrap, sarOp, None)
+            timeIndex, resultIndex = timed(search, connWrap, sarOp, matchExpr)
+            sarOp.endWikiSearch()
+
+            print("%-22s  scan %8.4f s   index %8.4f s   %6i hits%s" %
+                    (searchStr, timeScan, timeIndex, len(resultIndex),
+                    "" if set(resultScan) == set(resultIndex) else
+                    " (scan: %i)" % len(resultScan)))
+
+        connWrap.close()
+    finally:
+        shutil.rmtree(tempDir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# coding: utf-8
+"""Benchmark the diff engines used for page versioning.
+
+Creates synthetic page histories (pages of different sizes edited in typical
+ways: typing in a paragraph, adding lines, moving and deleting blocks) and
+compares time and packet size of the reverse diffs created by each engine
+as Versioning.addVersion does. Run from the WikidPad directory:
+
+   python tests/bench_versionDiff.py [VERSIONCOUNT]
+
+"""
+import os
+import random
+import sys
+import time
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+from pwiki import StringOps
+
+
+# Page sizes in lines
+PAGE_SIZES = (20, 50, 500, 5000)
+
+# difflib needs minutes for larger pages, skip it
+DIFFLIB_MAX_SIZE = 10000
+
+
+def make_line(rnd, words):
+    return (" ".join(rnd.choice(words) for i in range(rnd.randint(0, 15))) +
+            "\n").encode("utf-8")
+
+
+def edit(rnd, words, lines):
+    lines = list(lines)
+    op = rnd.random()
+    pos = rnd.randint(0, max(0, len(lines) - 1))
+    if op < 0.5:
+        # Typing in a paragraph
+        for i in range(rnd.randint(1, 3)):
+            if pos < len(lines):
+                line = lines[pos]
+                cut = rnd.randint(0, len(line))
+                lines[pos] = line[:cut] + make_line(rnd, words)[:-1] + \
+                        line[cut:]
+            pos += 1
+    elif op < 0.7:
+        lines[pos:pos] = [make_line(rnd, words)
+                for i in range(rnd.randint(1, 20))]
+    elif op < 0.85:
+        del lines[pos:pos + rnd.randint(1, 10)]
+    else:
+        block = lines[pos:pos + rnd.randint(1, 30)]
+        del lines[pos:pos + len(block)]
+        target = rnd.randint(0, len(lines))
+        lines[target:target] = block
+
+    return lines
+
+
+def make_history(rnd, words, lineCount, versionCount):
+    lines = [make_line(rnd, words) for i in range(lineCount)]
+    # Wiki pages often contain empty and repeated lines
+    for i in range(0, lineCount, 7):
+        lines[i] = b"\n"
+    for i in range(3, lineCount, 31):
+        lines[i] = b"----\n"
+
+    result = [b"".join(lines)]
+    for i in range(versionCount - 1):
+        lines = edit(rnd, words, lines)
+        result.append(b"".join(lines))
+
+    return result
+
+
+def main():
+    versionCount = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    rnd = random.Random(1)
+    words = ["".join(rnd.choice("abcdefghijklmnopqrstuvwxyz")
+            for j in range(rnd.randint(2, 9))) for i in range(2000)]
+
+    for lineCount in PAGE_SIZES:
+        history = make_history(rnd, words, lineCount, versionCount)
+        print("%i lines (%i bytes), %i versions" % (lineCount,
+                len(history[-1]), versionCount))
+
+        for engine in sorted(StringOps.DIFF_ENGINES):
+            if engine == "difflib" and len(history[-1]) > DIFFLIB_MAX_SIZE:
+                print("   %-8s  skipped" % engine)
+                continue
+
+            start = time.perf_counter()
+            packetSize = 0
+            for prev, current in zip(history, history[1:]):
+                # Reverse diff from the new head to the previous version
+                packet = StringOps.getBinCompactForDiff(current, prev, engine)
+                packetSize += len(packet)
+                assert StringOps.applyBinCompact(current, packet) == prev
+            duration = time.perf_counter() - start
+
+            print("   %-8s  %9.4f s   %9i bytes packets" % (engine, duration,
+                    packetSize))
+
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,7 @@ from itertools import chain
 import os
 import re
 import sys
+import tempfile
 import imp
 import wx
 
@@ -434,6 +435,90 @@ class MockWikiPage(object):
         return self
 
 
+_headlessApp = None  # created on demand by getHeadlessApp
+
+
+def getHeadlessApp():
+    """Return the headless application needed by real WikiDocuments.
+
+    The global configuration is created in a temporary directory
+    instead of the home directory of the user.
+    """
+    global _headlessApp
+    if _headlessApp is None:
+        import ExceptionLogger
+        from pwiki.HeadlessApp import HeadlessApp
+        if ExceptionLogger.EL is None:
+            # Set up without startLogger which redirects stdout and stderr
+            ExceptionLogger.EL = ExceptionLogger
+        oldHome = os.environ.get('HOME')
+        os.environ['HOME'] = tempfile.mkdtemp(prefix='wikidpad_home_')
+        try:
+            _headlessApp = HeadlessApp()
+        finally:
+            if oldHome is None:
+                del os.environ['HOME']
+            else:
+                os.environ['HOME'] = oldHome
+    return _headlessApp
+
+
+def createTestWiki(dirPath, wiki_content, wikiName='TestWiki',
+                   dbType='compact_sqlite',
+                   wiki_language_name=DEFAULT_WIKI_LANGUAGE):
+    """Create a wiki in directory dirPath like PersonalWikiFrame.newWiki,
+    store the pages of wiki_content {pageName: content} and return the
+    connected WikiDocument. Call its release() method when done.
+    """
+    from pwiki import WikiDocument as WikiDocumentModule
+
+    app = getHeadlessApp()
+    if not os.path.exists(dirPath):
+        os.makedirs(dirPath)
+    dataDir = os.path.join(dirPath, 'data')
+    WikiDocumentModule.createWikiDb(None, dbType, wikiName, dataDir, False)
+
+    configFileLoc = os.path.join(dirPath, '%s.wiki' % wikiName)
+    wikiConfig = app.createWikiConfiguration()
+    wikiConfig.createEmptyConfig(configFileLoc)
+    wikiConfig.fillWithDefaults()
+    wikiConfig.set('main', 'wiki_name', wikiName)
+    wikiConfig.set('main', 'last_wiki_word', wikiName)
+    wikiConfig.set('main', 'wiki_database_type', dbType)
+    wikiConfig.set('main', 'wiki_wikiLanguage', wiki_language_name)
+    wikiConfig.set('main', 'wikiPageFiles_asciiOnly', 'False')
+    wikiConfig.set('main', 'wikiPageTitle_headingLevel', '2')
+    wikiConfig.set('wiki_db', 'data_dir', 'data')
+    wikiConfig.save()
+
+    wikiDocument = WikiDocumentModule.openWikiDocument(configFileLoc,
+            ignoreLock=True, createLock=False)
+    frmcode, frmtext = wikiDocument.checkDatabaseFormat()
+    assert frmcode == 0, frmtext
+    wikiDocument.connect()
+
+    for pageName, content in wiki_content.items():
+        page = wikiDocument.getWikiPageNoError(pageName)
+        page.replaceLiveText(content, False)
+        page.writeToDatabase()
+    wikiDocument.getWikiData().commit()
+    waitForUpdates(wikiDocument)
+
+    return wikiDocument
+
+
+def waitForUpdates(wikiDocument):
+    """Wait until the update executor of wikiDocument has run all jobs,
+    including those queued by other jobs.
+    """
+    executor = wikiDocument.getUpdateExecutor()
+    while True:
+        # Lowest priority, so it runs after all jobs queued before
+        executor.execute(executor.dequeCount - 1, lambda: None)
+        if executor.getJobCount() == 0:
+            break
+
+
 _rank = {1: '1st', 2: '2nd', 3: '3rd'}
 
 
@@ -0,0 +1,122 @@
+# coding: utf-8
+"""Test AutoLinkRelax.
+
+* Compare AutoLinkRelaxMatcher with the former implementation of the
+  autoLink "relax" mode which searched one regular expression per wiki word.
+* Test incremental updates of the matcher.
+
+"""
+import os
+import random
+import re
+import sys
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+from pwiki.AutoLinkRelax import AutoLinkRelaxMatcher
+
+
+def build_regex_list(words):
+    """Former WikidPadParser._TheHelper.buildAutoLinkRelaxInfo"""
+    words = sorted(words, key=lambda w: len(w), reverse=True)
+    result = []
+    for word in words:
+        parts = [p for p in re.split(r"[\W]+", word) if p != ""]
+        if not parts:
+            continue
+        pat = r"\b" + r"[\W]+".join(parts) + r"\b"
+        result.append((re.compile(pat, re.IGNORECASE | re.UNICODE), word))
+    return result
+
+
+def find_with_regex_list(relaxList, text):
+    """Former matching loop in _TheParser._postProcessing"""
+    result = []
+    start = 0
+    while text != "":
+        foundPos = len(text)
+        foundWord = None
+        foundWordText = None
+        for regex, word in relaxList:
+            match = regex.search(text)
+            if match and match.start(0) < foundPos:
+                foundPos = match.start(0)
+                foundWord = word
+                foundWordText = match.group(0)
+                if foundPos == 0:
+                    break
+
+        if foundWord is None:
+            break
+
+        result.append((start + foundPos,
+                start + foundPos + len(foundWordText), foundWord))
+        inc = foundPos + max(len(foundWordText), 1)
+        start += inc
+        text = text[inc:]
+
+    return result
+
+
+WORDS = ["WikiWord", "Wiki Word", "wiki-word Test", "Test", "TestPage",
+        "Another Page", "Page", "a", "A b c", "b c", "über Grüße", "x_y"]
+
+TEXTS = [
+    "",
+    "nothing to find here",
+    "This is a WikiWord and a wiki  word test.",
+    "Wiki-Word-Test, testpage; another   page!",
+    "a b c d b c a",
+    "ÜBER grüße and über-grüße",
+    "x_y x y x_yz",
+]
+
+
+def test_same_as_regex():
+    matcher = AutoLinkRelaxMatcher(WORDS)
+    relaxList = build_regex_list(WORDS)
+    for text in TEXTS:
+        assert matcher.findMatches(text) == \
+                find_with_regex_list(relaxList, text), text
+
+
+def test_random_same_as_regex():
+    rnd = random.Random(42)
+    vocabulary = ["alpha", "Beta", "gamma", "delta", "eps", "ZETA", "eta"]
+    separators = [" ", "  ", "-", ", ", "_", "\n", ". "]
+
+    def phrase(count):
+        return "".join(rnd.choice(vocabulary) + rnd.choice(separators)
+                for i in range(count)).rstrip(" ,.\n-")
+
+    words = list({phrase(rnd.randint(1, 3)) for i in range(40)})
+    matcher = AutoLinkRelaxMatcher(words)
+    relaxList = build_regex_list(words)
+    for i in range(200):
+        text = phrase(rnd.randint(0, 30))
+        assert matcher.findMatches(text) == \
+                find_with_regex_list(relaxList, text), text
+
+
+def test_update():
+    matcher = AutoLinkRelaxMatcher(["Foo", "Foo Bar", "Baz"])
+    assert len(matcher) == 3
+
+    assert matcher.update(["Foo", "Baz", "Foo Bar Baz"])
+    assert "Foo Bar" not in matcher
+    assert "Foo Bar Baz" in matcher
+    assert matcher.findMatches("foo bar baz") == [(0, 11, "Foo Bar Baz")]
+    assert matcher.findMatches("foo bar") == [(0, 3, "Foo")]
+
+    assert not matcher.update(["Foo", "Baz", "Foo Bar Baz"])
+
+    matcher.removeWords(["Foo Bar Baz", "Foo", "Baz"])
+    assert len(matcher) == 0
+    assert matcher.root.children == {}
+    assert matcher.findMatches("foo bar baz") == []
+
+    matcher.addWords(["", "--"])
+    assert len(matcher) == 0
@@ -0,0 +1,118 @@
+# coding: utf-8
+"""Test DayHistogram.
+
+* Counts per day of the GROUP BY query must match the local calendar days
+  of the timestamps, also around daylight saving time switches.
+* Day ranges, days before/after and min/max day are the same as
+  calculated from the full list of timestamps.
+
+"""
+import datetime
+import os
+import random
+import sys
+import time
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+import pwiki.sqlite3api as sqlite
+from pwiki.wikidata.compact_sqlite import DbStructure
+from pwiki.timeView.DayHistogram import DayHistogram, queryDayHistogram
+
+
+def local_day(timeT):
+    return datetime.date(*time.localtime(timeT)[:3]).toordinal()
+
+
+def make_stamps(rnd, count):
+    # Spread over some years and cluster some around midnight
+    start = time.mktime((2014, 1, 1, 0, 0, 0, 0, 0, -1))
+    stamps = []
+    for i in range(count):
+        t = start + rnd.uniform(0, 5 * 365 * 86400)
+        if rnd.random() < 0.3:
+            t = t - t % 3600 + rnd.choice((-1, 0, 1))
+        stamps.append(t)
+
+    return stamps + [0.0] * 5
+
+
+def create_histogram(stamps, startTime=None, endTime=None):
+    connWrap = DbStructure.ConnectWrapSyncCommit(sqlite.connect(":memory:"))
+    connWrap.execSql("create table wikiwordcontent (word text primary key, "
+            "modified real)")
+    for i, t in enumerate(stamps):
+        connWrap.execSql("insert into wikiwordcontent(word, modified) "
+                "values (?, ?)", ("Word%i" % i, t))
+
+    return DayHistogram(queryDayHistogram(connWrap, "wikiwordcontent",
+            "modified", startTime, endTime))
+
+
+def check_histogram(rnd):
+    stamps = make_stamps(rnd, 2000)
+    days = [local_day(t) for t in stamps if t > 0]
+    hist = create_histogram(stamps)
+
+    dayCounts = {}
+    for day in days:
+        dayCounts[day] = dayCounts.get(day, 0) + 1
+    allDays = sorted(dayCounts)
+
+    assert hist.getMinMaxDay() == (allDays[0], allDays[-1] + 1)
+
+    for i in range(200):
+        day = rnd.randint(allDays[0] - 10, allDays[-1] + 10)
+        resolution = rnd.choice((1, 1, 3, 7))
+        assert hist.getCount(day, resolution) == \
+                sum(1 for d in days if day <= d < day + resolution)
+
+        limit = rnd.choice((None, 1, 40))
+        before = [d for d in allDays if d < day]
+        after = [d for d in allDays if d > day]
+        if limit is not None:
+            before = before[-limit:]
+            after = after[:limit]
+        assert hist.getDaysBefore(day, limit) == before
+        assert hist.getDaysAfter(day, limit) == after
+
+    assert hist.getCounts(allDays[0], 30, 2) == \
+            [hist.getCount(allDays[0] + i * 2, 2) for i in range(30)]
+
+    startTime = stamps[0]
+    endTime = startTime + 40 * 86400
+    hist = create_histogram(stamps, startTime, endTime)
+    assert sum(hist.getCounts(allDays[0], allDays[-1] - allDays[0] + 1)) == \
+            sum(1 for t in stamps if startTime <= t < endTime)
+
+
+def test_day_histogram():
+    check_histogram(random.Random(1))
+
+
+def test_day_histogram_dst():
+    if not hasattr(time, "tzset"):
+        return
+
+    oldTz = os.environ.get("TZ")
+    os.environ["TZ"] = "CET-1CEST,M3.5.0,M10.5.0/3"
+    time.tzset()
+    try:
+        check_histogram(random.Random(2))
+    finally:
+        if oldTz is None:
+            del os.environ["TZ"]
+        else:
+            os.environ["TZ"] = oldTz
+        time.tzset()
+
+
+def test_empty():
+    hist = create_histogram([0.0])
+    assert hist.getMinMaxDay() == (None, None)
+    assert hist.getCounts(700000, 3) == [0, 0, 0]
+    assert hist.getDaysBefore(700000, 5) == []
+    assert hist.getDaysAfter(700000) == []
@@ -0,0 +1,74 @@
+# coding: utf-8
+"""Test ExportManifest.
+
+* Manifest written to a directory must be read back unchanged.
+* Missing or broken manifest files give an empty manifest.
+
+"""
+import os
+import sys
+import tempfile
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+from pwiki import ExportManifest
+
+
+def build_manifest():
+    manifest = ExportManifest.ExportManifest(b"options\x00key")
+
+    deps = ExportManifest.PageDependencies()
+    deps.linkTerms.update(["WikiWord", "Größe", "//Sub"])
+    deps.includedPages.add("IncludedPage")
+    deps.files.add("/tmp/image.png")
+    deps.listsParents = True
+    manifest.setEntry("WikiWord", ExportManifest.ManifestEntry("WikiWord",
+            b"\x01" * 20, b"\x02" * 20, b"\x03" * 20, deps,
+            ["files/image.png"]))
+
+    deps = ExportManifest.PageDependencies()
+    deps.volatile = True
+    manifest.setEntry("Größe", ExportManifest.ManifestEntry("Gr__e",
+            b"", b"", b"", deps))
+
+    return manifest
+
+
+def test_round_trip():
+    manifest = build_manifest()
+    with tempfile.TemporaryDirectory() as exportDest:
+        manifest.writeToDir(exportDest)
+        loaded = ExportManifest.ExportManifest.readFromDir(exportDest)
+
+    assert loaded.optionsKey == manifest.optionsKey
+    assert sorted(loaded.entries) == sorted(manifest.entries)
+    for word, entry in manifest.entries.items():
+        other = loaded.getEntry(word)
+        for attr in ExportManifest.ManifestEntry.__slots__:
+            if attr == "dependencies":
+                continue
+            assert getattr(other, attr) == getattr(entry, attr)
+        for attr in ExportManifest.PageDependencies.__slots__:
+            assert getattr(other.dependencies, attr) == \
+                    getattr(entry.dependencies, attr)
+
+    assert loaded.getFileNames() == {"WikiWord", "Gr__e"}
+
+
+def test_missing_or_broken():
+    with tempfile.TemporaryDirectory() as exportDest:
+        manifest = ExportManifest.ExportManifest.readFromDir(exportDest)
+        assert manifest.optionsKey == b"" and manifest.entries == {}
+
+        build_manifest().writeToDir(exportDest)
+        path = os.path.join(exportDest, ExportManifest.MANIFEST_FILENAME)
+        with open(path, "rb") as f:
+            data = f.read()
+        with open(path, "wb") as f:
+            f.write(data[:len(data) // 2])
+
+        manifest = ExportManifest.ExportManifest.readFromDir(exportDest)
+        assert manifest.optionsKey == b"" and manifest.entries == {}
@@ -0,0 +1,54 @@
+# coding: utf-8
+"""Test the headless application.
+
+* Exporting a page with an eval insertion must not fail, evaluation is
+  switched off even if the global option allows it.
+
+"""
+import io
+import os
+import shutil
+import sys
+import tempfile
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+from tests.helper import createTestWiki, getHeadlessApp
+from pwiki.HeadlessApp import HeadlessAction, HeadlessMainControl
+
+
+def test_export_eval_insertion():
+    app = getHeadlessApp()
+    globalConfig = app.getGlobalConfig()
+    allowEval = globalConfig.get('main', 'insertions_allow_eval')
+    globalConfig.set('main', 'insertions_allow_eval', 'True')
+
+    wikiDir = tempfile.mkdtemp()
+    exportDest = tempfile.mkdtemp()
+    wikidoc = createTestWiki(wikiDir,
+                             {'TestWiki': '++ Test Wiki\n\n[:eval:"6*7"]\n'})
+    try:
+        mainControl = HeadlessMainControl(app, wikidoc)
+        assert not mainControl.getConfig().getboolean(
+            'main', 'insertions_allow_eval', True)
+
+        action = HeadlessAction(['-w', wikidoc.getWikiConfigPath(),
+                                 '--export-what', 'wiki',
+                                 '--export-type', 'html_multi',
+                                 '--export-dest', exportDest])
+        assert action.cmdLineError is None
+        assert action.exportAction(mainControl)
+
+        with io.open(os.path.join(exportDest, 'TestWiki.html'),
+                     encoding='utf-8') as f:
+            html = f.read()
+        assert 'Allow evaluation of insertions' in html
+        assert '42' not in html
+    finally:
+        globalConfig.set('main', 'insertions_allow_eval', allowEval)
+        wikidoc.release()
+        shutil.rmtree(wikiDir, ignore_errors=True)
+        shutil.rmtree(exportDest, ignore_errors=True)
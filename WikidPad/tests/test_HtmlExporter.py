@@ -0,0 +1,265 @@
+# coding: utf-8
+"""Test HtmlExporter.
+
+* Exporting a set of HTML pages with worker processes must give the same
+  files as the export in one process, also for a page which was saved
+  just before exporting.
+* An incremental export keeps the files of unchanged pages, exports pages
+  whose content or dependencies (link targets, with auto-link also the
+  set of wiki words) changed and deletes the files of deleted pages.
+  If the manifest entry of a page can't be built, its file is kept and
+  the page is exported again next time.
+* HtmlOutputSink writing to a file in small chunks must give the same
+  output as collecting it in memory, also when breaks are eaten around
+  a chunk flush.
+
+"""
+import filecmp
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+from tests.helper import createTestWiki, getHeadlessApp, waitForUpdates
+from pwiki.HeadlessApp import HeadlessAction, HeadlessMainControl, \
+    StdoutProgressHandler
+from HtmlExporter import HtmlExporter, HtmlOutputSink
+
+
+EXPORT_WIKI_CONTENT = {
+    'TestWiki': '++ Test Wiki\n\nPageOne\nPageTwo\nPageThree\n',
+    'PageOne': '++ Page One\n\n*bold* and PageTwo\n',
+    'PageTwo': '++ Page Two\n\n    * item\n    * PageThree\n',
+    'PageThree': '++ Page Three\n\nback to PageOne\n',
+}
+
+
+def export_wiki(wikidoc, exportDest, jobs=None, incremental=False):
+    args = ['-w', wikidoc.getWikiConfigPath(), '--export-what', 'wiki',
+            '--export-type', 'html_single', '--export-dest', exportDest]
+    action = HeadlessAction(args)
+    assert action.cmdLineError is None
+    mainControl = HeadlessMainControl(getHeadlessApp(), wikidoc, jobs,
+                                      incremental)
+    assert action.exportAction(mainControl)
+
+
+def run_with_export_wiki(test, wiki_content):
+    tempDir = tempfile.mkdtemp()
+    wikidoc = createTestWiki(os.path.join(tempDir, 'wiki'), wiki_content)
+    try:
+        test(wikidoc, tempDir)
+    finally:
+        wikidoc.release()
+        shutil.rmtree(tempDir, ignore_errors=True)
+
+
+def with_export_wiki(test):
+    def wrapper():
+        run_with_export_wiki(test, EXPORT_WIKI_CONTENT)
+    wrapper.__name__ = test.__name__
+    return wrapper
+
+
+KEPT_MARK = '<!-- kept -->'
+
+
+def mark_files(exportDest):
+    """Mark all exported pages to detect which are written again."""
+    for fileName in os.listdir(exportDest):
+        if fileName.endswith('.html'):
+            with open(os.path.join(exportDest, fileName), 'a') as f:
+                f.write(KEPT_MARK)
+
+
+def get_kept(exportDest):
+    """Return dict {page file name: file wasn't written again}."""
+    result = {}
+    for fileName in os.listdir(exportDest):
+        if fileName.endswith('.html'):
+            with open(os.path.join(exportDest, fileName)) as f:
+                result[fileName[:-5]] = f.read().endswith(KEPT_MARK)
+    return result
+
+
+def set_page(wikidoc, word, content):
+    page = wikidoc.getWikiPageNoError(word)
+    page.replaceLiveText(content, False)
+    page.writeToDatabase()
+    waitForUpdates(wikidoc)
+
+
+@with_export_wiki
+def test_parallel_export(wikidoc, tempDir):
+    page = wikidoc.getWikiPage('PageThree')
+    # Same links, so the pending update of the meta-data doesn't matter
+    page.replaceLiveText(
+        '++ Page Three\n\nsaved before export, back to PageOne\n', False)
+    page.writeToDatabase()
+
+    serialDest = os.path.join(tempDir, 'serial')
+    parallelDest = os.path.join(tempDir, 'parallel')
+    os.mkdir(serialDest)
+    os.mkdir(parallelDest)
+    export_wiki(wikidoc, serialDest)
+    export_wiki(wikidoc, parallelDest, jobs=2)
+
+    fileNames = sorted(os.listdir(serialDest))
+    assert 'PageThree.html' in fileNames
+    assert sorted(os.listdir(parallelDest)) == fileNames
+    match, mismatch, errors = filecmp.cmpfiles(serialDest, parallelDest,
+                                               fileNames, shallow=False)
+    assert mismatch == [] and errors == []
+
+    with open(os.path.join(parallelDest, 'PageThree.html')) as f:
+        assert 'saved before export' in f.read()
+
+
+@with_export_wiki
+def test_incremental_export(wikidoc, tempDir):
+    exportDest = os.path.join(tempDir, 'export')
+    os.mkdir(exportDest)
+    export_wiki(wikidoc, exportDest, incremental=True)
+    assert sorted(get_kept(exportDest)) == sorted(EXPORT_WIKI_CONTENT)
+
+    # Nothing changed
+    mark_files(exportDest)
+    export_wiki(wikidoc, exportDest, incremental=True)
+    assert all(get_kept(exportDest).values())
+
+    # Content changed
+    set_page(wikidoc, 'PageOne', '++ Page One\n\n_italic_ and PageTwo\n')
+    export_wiki(wikidoc, exportDest, incremental=True)
+    assert get_kept(exportDest) == {'TestWiki': True, 'PageOne': False,
+                                    'PageTwo': True, 'PageThree': True}
+
+    # Link target of TestWiki and parent of PageFour created
+    mark_files(exportDest)
+    set_page(wikidoc, 'TestWiki',
+             '++ Test Wiki\n\nPageOne\nPageTwo\nPageThree\nPageFour\n')
+    export_wiki(wikidoc, exportDest, incremental=True)
+    mark_files(exportDest)
+    set_page(wikidoc, 'PageFour', '++ Page Four\n\n')
+    export_wiki(wikidoc, exportDest, incremental=True)
+    assert get_kept(exportDest) == {'TestWiki': False, 'PageOne': True,
+                                    'PageTwo': True, 'PageThree': True,
+                                    'PageFour': False}
+
+    # File of deleted page is removed, pages linking to it or listing it
+    # as parent change
+    mark_files(exportDest)
+    wikidoc.getWikiPage('PageThree').deletePage()
+    waitForUpdates(wikidoc)
+    export_wiki(wikidoc, exportDest, incremental=True)
+    assert get_kept(exportDest) == {'TestWiki': False, 'PageOne': False,
+                                    'PageTwo': False, 'PageFour': True}
+
+
+
+class FailingEntryExporter(HtmlExporter):
+    """Fails to build the manifest entry of PageOne."""
+
+    def _buildManifestEntry(self, word, *args):
+        if word == 'PageOne':
+            raise ValueError('entry failed')
+        return HtmlExporter._buildManifestEntry(self, word, *args)
+
+
+@with_export_wiki
+def test_incremental_export_entry_error(wikidoc, tempDir):
+    exportDest = os.path.join(tempDir, 'export')
+    os.mkdir(exportDest)
+    export_wiki(wikidoc, exportDest, incremental=True)
+
+    set_page(wikidoc, 'PageOne', '++ Page One\n\n_italic_ and PageTwo\n')
+    mainControl = HeadlessMainControl(getHeadlessApp(), wikidoc, None, True)
+    exporter = FailingEntryExporter(mainControl)
+    exporter.export(wikidoc,
+                    wikidoc.getWikiData().getAllDefinedWikiPageNames(),
+                    'html_single', exportDest, False,
+                    exporter.getAddOpt(None), StdoutProgressHandler('Export'))
+    assert sorted(get_kept(exportDest)) == sorted(EXPORT_WIKI_CONTENT)
+
+    mark_files(exportDest)
+    export_wiki(wikidoc, exportDest, incremental=True)
+    assert get_kept(exportDest) == {'TestWiki': True, 'PageOne': False,
+                                    'PageTwo': True, 'PageThree': True}
+
+AUTO_LINK_WIKI_CONTENT = {
+    'TestWiki': '++ Test Wiki\n\n[global.auto_link: relax]\n\nPageOne\n',
+    'PageOne': '++ Page One\n\nsomething about pagefour\n',
+}
+
+
+def test_incremental_export_auto_link():
+    def check(wikidoc, tempDir):
+        exportDest = os.path.join(tempDir, 'export')
+        os.mkdir(exportDest)
+        export_wiki(wikidoc, exportDest, incremental=True)
+        mark_files(exportDest)
+        export_wiki(wikidoc, exportDest, incremental=True)
+        assert all(get_kept(exportDest).values())
+
+        # Plain text of PageOne may become a link to the new page
+        set_page(wikidoc, 'PageFour', '++ Page Four\n\n')
+        export_wiki(wikidoc, exportDest, incremental=True)
+        assert get_kept(exportDest) == {'TestWiki': False, 'PageOne': False,
+                                        'PageFour': False}
+
+    run_with_export_wiki(check, AUTO_LINK_WIKI_CONTENT)
+
+
+BR = '<br class="wikidpad" />'
+
+# Tuples (piece, eatPreBreak, eatPostBreak)
+SINK_PIECES = [
+    ('text1', False, False),
+    (BR, False, False),
+    ('<h2>H</h2>', True, True),  # eats break before and after
+    (BR, False, False),
+    ('more', False, False),
+    (BR, False, False),
+    (BR + '\n', False, False),
+    ('<ul>', True, True),
+    ('item', False, False),
+]
+
+
+def feed_sink(pieces, fileObj=None, chunkSize=65536):
+    """Feed pieces through HtmlExporter.outAppend(), return output."""
+    exporter = HtmlExporter(None)
+    exporter.outSink = HtmlOutputSink(fileObj, chunkSize)
+    exporter.outFlagEatPostBreak = False
+    exporter.outFlagPostBreakEaten = False
+    for piece, eatPreBreak, eatPostBreak in pieces:
+        exporter.outAppend(piece, eatPreBreak, eatPostBreak)
+
+    if fileObj is None:
+        return exporter.outSink.getValue()
+
+    exporter.outSink.flush()
+    assert exporter.outSink.getValue() == ''
+    return fileObj.getvalue()
+
+
+def test_output_sink():
+    expected = 'text1<h2>H</h2>more' + BR + '<ul>item'
+    assert feed_sink(SINK_PIECES) == expected
+    for chunkSize in range(1, 8):
+        assert feed_sink(SINK_PIECES, io.StringIO(), chunkSize) == expected
+
+    rnd = random.Random(42)
+    choices = ['a', 'bc', BR, BR + '\n', '<p>']
+    for i in range(100):
+        pieces = [(rnd.choice(choices), rnd.random() < 0.3,
+                   rnd.random() < 0.3) for j in range(rnd.randint(0, 30))]
+        expected = feed_sink(pieces)
+        for chunkSize in (1, 2, 5):
+            assert feed_sink(pieces, io.StringIO(), chunkSize) == expected
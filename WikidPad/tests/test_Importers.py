@@ -0,0 +1,156 @@
+# coding: utf-8
+"""Test importing multi-page text files.
+
+* Pages are read from their position in the import file. Renamed pages,
+  pages the user doesn't want to import and tags occurring twice (the
+  last one wins) are handled like before.
+* Content and timestamps are written directly and the meta-data of the
+  imported pages is processed afterwards, by the update thread for few
+  pages and by a rebuild for many pages.
+
+"""
+import io
+import os
+import shutil
+import sys
+import tempfile
+from calendar import timegm
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+from tests.helper import createTestWiki, getHeadlessApp, waitForUpdates
+import Consts
+from pwiki import Importers
+from pwiki.HeadlessApp import HeadlessMainControl, StdoutProgressHandler
+
+
+IMPORT_WIKI_CONTENT = {
+    'TestWiki': '++ Test Wiki\n\nPageOne\n',
+    'PageOne': '++ Page One\n\npresent page\n',
+}
+
+SEPARATOR = '----sep----'
+
+
+def mpt_entry(tag, timeStrings, content):
+    return '%s\n%s\n%s' % (tag, '  '.join(timeStrings), content)
+
+
+def time_strings(i):
+    return ('2015-03-%02d/10:11:12' % (i % 28 + 1), '2014-01-01/00:00:00',
+            '2016-05-05/05:05:%02d' % (i % 60))
+
+
+def time_stamps(timeStrings):
+    return tuple(timegm((int(ts[:4]), int(ts[5:7]), int(ts[8:10]),
+                         int(ts[11:13]), int(ts[14:16]), int(ts[17:19])))
+                 for ts in timeStrings)
+
+
+def page_content(i, pageCount):
+    return '++ Imp Page %i\n\nnext ImpPage%i and PageOne\n' % (
+        i, (i + 1) % pageCount)
+
+
+def write_mpt(path, pageCount):
+    """Write import file with pageCount pages ImpPage<n> and a few special
+    entries, return dict {page name: (content, timestamps)} of the pages
+    which must be imported."""
+    entries = []
+    expected = {}
+    for i in range(pageCount):
+        word = 'ImpPage%i' % i
+        content = page_content(i, pageCount)
+        entries.append(mpt_entry('wikipage/' + word, time_strings(i),
+                                 content))
+        expected[word] = (content, time_stamps(time_strings(i)))
+
+    # Collides with present page, renamed by user decision
+    entries.append(mpt_entry('wikipage/PageOne', time_strings(1),
+                             '++ Page One\n\nimported ImpPage0\n'))
+    expected['PageOneImported'] = ('++ Page One\n\nimported ImpPage0\n',
+                                   time_stamps(time_strings(1)))
+    # Not imported by user decision
+    entries.append(mpt_entry('wikipage/ImpSkipped', time_strings(2),
+                             'skipped\n'))
+    # Same tag twice, the last one is imported
+    entries.append(mpt_entry('wikipage/ImpTwice', time_strings(3),
+                             'first ImpPage1\n'))
+    entries.append('unknown/tag\nwhatever\n')
+    entries.append(mpt_entry('wikipage/ImpTwice', time_strings(4),
+                             'second ImpPage1\n'))
+    expected['ImpTwice'] = ('second ImpPage1\n',
+                            time_stamps(time_strings(4)))
+
+    with io.open(path, 'w', encoding='utf-8', newline='\n') as f:
+        f.write('Multipage text format 1\nSeparator: %s\n' % SEPARATOR)
+        f.write(('\n%s\n' % SEPARATOR).join(entries))
+    return expected
+
+
+class DecidingImporter(Importers.MultiPageTextImporter):
+    """Decides about collisions without a dialog."""
+
+    def _doUserDecision(self):
+        self.tempDb.execSql("update entries set renameImportTo = ? "
+                            "where unifName = ?",
+                            ('wikipage/PageOneImported', 'wikipage/PageOne'))
+        self.tempDb.execSql("update entries set dontImport = 1 "
+                            "where unifName = ?", ('wikipage/ImpSkipped',))
+        return True
+
+
+def run_import(pageCount):
+    tempDir = tempfile.mkdtemp()
+    wikidoc = createTestWiki(os.path.join(tempDir, 'wiki'),
+                             IMPORT_WIKI_CONTENT)
+    progressHandler = Importers.ProgressHandler
+    commitPageCount = Consts.BULKUPDATE_COMMIT_PAGECOUNT
+    # No GUI for the rebuild, commit several times during the import
+    Importers.ProgressHandler = lambda title, msg, addsteps, parent: \
+        StdoutProgressHandler(title)
+    Consts.BULKUPDATE_COMMIT_PAGECOUNT = 7
+    try:
+        importPath = os.path.join(tempDir, 'import.mpt')
+        expected = write_mpt(importPath, pageCount)
+
+        mainControl = HeadlessMainControl(getHeadlessApp(), wikidoc)
+        importer = DecidingImporter(mainControl)
+        assert importer.doImport(wikidoc, 'multipage_text', importPath,
+                                 False, (False,))
+        if pageCount < Consts.IMPORT_REBUILD_MIN_PAGECOUNT:
+            waitForUpdates(wikidoc)
+
+        wikiData = wikidoc.getWikiData()
+        assert wikiData.getContent('PageOne') == \
+            IMPORT_WIKI_CONTENT['PageOne']
+        assert not wikidoc.isDefinedWikiPageName('ImpSkipped')
+
+        for word, (content, timeStamps) in expected.items():
+            assert wikiData.getContent(word) == content, word
+            assert tuple(wikiData.getTimestamps(word)) == timeStamps, word
+            assert wikiData.getMetaDataState(word) == \
+                Consts.WIKIWORDMETADATA_STATE_SYNTAXPROCESSED, word
+
+        children = wikidoc.getWikiPage('ImpPage0').getChildRelationships()
+        assert set(children) == {'ImpPage1', 'PageOne'}
+        assert wikidoc.getWikiPage('ImpTwice').getChildRelationships() == \
+            ['ImpPage1']
+        assert 'PageOneImported' in \
+            wikidoc.getWikiPage('ImpPage0').getParentRelationships()
+    finally:
+        Importers.ProgressHandler = progressHandler
+        Consts.BULKUPDATE_COMMIT_PAGECOUNT = commitPageCount
+        wikidoc.release()
+        shutil.rmtree(tempDir, ignore_errors=True)
+
+
+def test_import_few_pages():
+    run_import(10)
+
+
+def test_import_many_pages():
+    run_import(Consts.IMPORT_REBUILD_MIN_PAGECOUNT + 10)
@@ -0,0 +1,242 @@
+# coding: utf-8
+"""Test LinkGraph.
+
+* Compare the queries of LinkGraph with the SQL queries formerly used by
+  the WikiData implementations on a random wiki.
+* Repeat after modifying database and graph.
+
+"""
+import os
+import random
+import sys
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+import pwiki.sqlite3api as sqlite
+from pwiki.wikidata.compact_sqlite import DbStructure
+from pwiki import LinkGraph
+
+import Consts
+
+
+WORD_TYPE = Consts.WIKIWORDMATCHTERMS_TYPE_ASLINK | \
+        Consts.WIKIWORDMATCHTERMS_TYPE_FROM_WORD | \
+        Consts.WIKIWORDMATCHTERMS_TYPE_SYNCUPDATE
+
+ALIAS_TYPE = Consts.WIKIWORDMATCHTERMS_TYPE_EXPLICIT_ALIAS | \
+        Consts.WIKIWORDMATCHTERMS_TYPE_ASLINK | \
+        Consts.WIKIWORDMATCHTERMS_TYPE_FROM_ATTRIBUTES
+
+HEADING_TYPE = Consts.WIKIWORDMATCHTERMS_TYPE_FROM_CONTENT
+
+
+class SqlLinks(object):
+    """Former SQL queries of compact_sqlite.WikiData"""
+    def __init__(self):
+        self.connWrap = DbStructure.ConnectWrapSyncCommit(
+                sqlite.connect(":memory:"))
+        self.connWrap.execSql("create table wikirelations (word text, "
+                "relation text, firstcharpos integer, "
+                "constraint relpk primary key (word, relation))")
+        self.connWrap.execSql("create table wikiwordcontent "
+                "(word text primary key)")
+        self.connWrap.execSql("create table wikiwordmatchterms "
+                "(matchterm text, type integer, word text)")
+
+    def createGraph(self):
+        return LinkGraph.LinkGraph(
+                LinkGraph.iterRelations(self.connWrap.execSqlQuery(
+                    LinkGraph.GROUPED_RELATIONS_SQL)),
+                self.connWrap.execSqlQuerySingleColumn(
+                    "select word from wikiwordcontent"),
+                self.connWrap.execSqlQuery("select matchterm, type, "
+                    "word from wikiwordmatchterms where (type & 2) != 0"))
+
+    def setChildren(self, word, childRelations):
+        self.connWrap.execSql("delete from wikirelations where word = ?",
+                (word,))
+        for relation, pos in childRelations:
+            self.connWrap.execSql("insert or replace into wikirelations"
+                    "(word, relation, firstcharpos) values (?, ?, ?)",
+                    (word, relation, pos))
+
+    def setMatchTerms(self, word, syncUpdate, terms):
+        if syncUpdate:
+            addSql = " and (type & 16) != 0"
+        else:
+            addSql = " and (type & 16) == 0"
+        self.connWrap.execSql("delete from wikiwordmatchterms where "
+                "word = ?" + addSql, (word,))
+        for matchterm, typ in terms:
+            self.connWrap.execSql("insert into wikiwordmatchterms"
+                    "(matchterm, type, word) values (?, ?, ?)",
+                    (matchterm, typ, word))
+
+    def setPageDefined(self, word, defined):
+        if defined:
+            self.connWrap.execSql("insert or ignore into wikiwordcontent"
+                    "(word) values (?)", (word,))
+        else:
+            self.connWrap.execSql("delete from wikiwordcontent "
+                    "where word = ?", (word,))
+
+    def renameWord(self, word, toWord):
+        self.connWrap.execSql("update wikirelations set word = ? "
+                "where word = ?", (toWord, word))
+        self.connWrap.execSql("update wikiwordmatchterms set word = ? "
+                "where word = ?", (toWord, word))
+        self.connWrap.execSql("update wikiwordcontent set word = ? "
+                "where word = ?", (toWord, word))
+
+    def getChildren(self, word, existingonly, selfreference):
+        sql = "select relation from wikirelations where word = ?"
+        if not selfreference:
+            sql += " and relation != word"
+        if existingonly:
+            sql += (" and (exists (select 1 from wikiwordcontent "
+                    "where word = relation) or exists "
+                    "(select 1 from wikiwordmatchterms "
+                    "where wikiwordmatchterms.matchterm = relation and "
+                    "(wikiwordmatchterms.type & 2) != 0))")
+
+        return self.connWrap.execSqlQuerySingleColumn(sql, (word,))
+
+    def getParents(self, word):
+        return self.connWrap.execSqlQuerySingleColumn(
+                "select word from wikirelations where relation = ? or "
+                "relation in (select matchterm from wikiwordmatchterms "
+                "where word = ? and "
+                "(wikiwordmatchterms.type & 2) != 0)", (word, word))
+
+    def getParentlessWords(self):
+        return self.connWrap.execSqlQuerySingleColumn(
+                "select word from wikiwordcontent except "
+                "select wikiwordmatchterms.word from wikiwordmatchterms "
+                "where exists (select 1 from wikirelations where "
+                "wikiwordmatchterms.matchterm == wikirelations.relation and "
+                "wikirelations.word != wikiwordmatchterms.word) and "
+                "(type & 2) != 0")
+
+    def getUndefinedWords(self):
+        return self.connWrap.execSqlQuerySingleColumn(
+                "select relation from wikirelations "
+                "except select word from wikiwordcontent "
+                "except select matchterm from wikiwordmatchterms "
+                "where (type & 2) != 0")
+
+    def getPathLength(self, word, toWord):
+        """Number of steps of shortest path through parents or None"""
+        reached = {word}
+        level = [word]
+        steps = 0
+        while level:
+            steps += 1
+            nextLevel = []
+            for w in level:
+                for p in self.connWrap.execSqlQuerySingleColumn(
+                        "select word from wikirelations where relation = ?",
+                        (w,)):
+                    if p == toWord:
+                        return steps
+                    if p not in reached:
+                        reached.add(p)
+                        nextLevel.append(p)
+            level = nextLevel
+
+        return None
+
+
+def random_modifications(rnd, names):
+    for i in range(60):
+        op = rnd.random()
+        word = rnd.choice(names)
+        if op < 0.4:
+            yield "setChildren", (word, [(rnd.choice(names),
+                    rnd.randint(0, 1000)) for j in range(rnd.randint(0, 8))])
+        elif op < 0.6:
+            yield "setMatchTerms", (word, False, [(rnd.choice(names),
+                    rnd.choice((ALIAS_TYPE, HEADING_TYPE)))
+                    for j in range(rnd.randint(0, 2))])
+        elif op < 0.8:
+            yield "setPageDefined", (word, rnd.random() < 0.5)
+        else:
+            toWord = "Renamed%i" % i
+            names.append(toWord)
+            yield "renameWord", (word, toWord)
+
+
+def build_wiki(sqlLinks, rnd, names):
+    for name in names[:150]:
+        sqlLinks.setPageDefined(name, True)
+        sqlLinks.setMatchTerms(name, True, [(name, WORD_TYPE)])
+        if rnd.random() < 0.2:
+            sqlLinks.setMatchTerms(name, False,
+                    [(rnd.choice(names), ALIAS_TYPE),
+                    ("Heading" + name, HEADING_TYPE)])
+
+    for name in names[:180]:
+        sqlLinks.setChildren(name, [(rnd.choice(names), rnd.randint(0, 1000))
+                for j in range(rnd.randint(0, 6))])
+
+
+def compare(sqlLinks, graph, names):
+    for word in names:
+        for existingonly in (False, True):
+            for selfreference in (False, True):
+                assert sorted(graph.getChildren(word, existingonly,
+                        selfreference)) == sorted(sqlLinks.getChildren(
+                        word, existingonly, selfreference))
+
+        assert sorted(graph.getParents(word)) == \
+                sorted(set(sqlLinks.getParents(word)))
+
+    excludeSet = set(names[::7])
+    for existingonly in (False, True):
+        assert graph.getWordsWithChildren(names, existingonly, excludeSet) == \
+                set(word for word in names if any(child not in excludeSet
+                for child in sqlLinks.getChildren(word, existingonly, False)))
+
+    assert sorted(graph.getParentlessWords()) == \
+            sorted(sqlLinks.getParentlessWords())
+    assert sorted(graph.getUndefinedWords()) == \
+            sorted(sqlLinks.getUndefinedWords())
+
+    for word in names[::13]:
+        for toWord in names[::17]:
+            path = graph.findPath(word, toWord)
+            if word == toWord:
+                assert path == [word]
+                continue
+
+            length = sqlLinks.getPathLength(word, toWord)
+            if length is None:
+                assert path == []
+                continue
+
+            assert len(path) == length + 1
+            assert path[0] == toWord and path[-1] == word
+            for parent, child in zip(path, path[1:]):
+                assert child in graph.getChildren(parent)
+
+
+def test_same_results_as_sql():
+    rnd = random.Random(1)
+    names = ["Word%i" % i for i in range(200)]
+    sqlLinks = SqlLinks()
+    build_wiki(sqlLinks, rnd, names)
+
+    graph = sqlLinks.createGraph()
+    compare(sqlLinks, graph, names)
+
+    for method, args in random_modifications(rnd, names):
+        getattr(sqlLinks, method)(*args)
+        if method == "setMatchTerms":
+            args = args[:2] + ([t for t, typ in args[2]
+                    if typ & Consts.WIKIWORDMATCHTERMS_TYPE_ASLINK],)
+        getattr(graph, method)(*args)
+
+    compare(sqlLinks, graph, names)
+    compare(sqlLinks, sqlLinks.createGraph(), names)
@@ -0,0 +1,67 @@
+# coding: utf-8
+"""Test opening the persistent page AST cache.
+
+* A file which isn't a database is replaced by a new cache.
+* A cache locked by another connection is kept, the cache object works
+  without database then.
+
+"""
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+from tests.helper import getHeadlessApp
+from pwiki.PageAstCache import PageAstCache
+
+
+def test_broken_file():
+    getHeadlessApp()
+    tempDir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tempDir, 'pageastcache.sli')
+        with open(path, 'wb') as f:
+            f.write(b'no database' * 100)
+
+        cache = PageAstCache(path, 1024 * 1024)
+        try:
+            cache.putAstData(b'key', b'data')
+            assert cache.getAstData(b'key') == b'data'
+        finally:
+            cache.close()
+    finally:
+        shutil.rmtree(tempDir, ignore_errors=True)
+
+
+def test_locked_file():
+    getHeadlessApp()
+    tempDir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tempDir, 'pageastcache.sli')
+        cache = PageAstCache(path, 1024 * 1024)
+        cache.putAstData(b'key', b'data')
+        cache.close()
+
+        conn = sqlite3.connect(path, isolation_level=None)
+        try:
+            conn.execute('begin exclusive')
+            cache = PageAstCache(path, 1024 * 1024)
+            assert cache.getAstData(b'key') is None
+            cache.putAstData(b'key2', b'data')
+            cache.close()
+        finally:
+            conn.close()
+
+        cache = PageAstCache(path, 1024 * 1024)
+        try:
+            assert cache.getAstData(b'key') == b'data'
+        finally:
+            cache.close()
+    finally:
+        shutil.rmtree(tempDir, ignore_errors=True)
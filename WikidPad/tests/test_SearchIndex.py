@@ -0,0 +1,277 @@
+# coding: utf-8
+"""Test SearchIndex.
+
+* Compare results of the FTS5 backend with whoosh for queries created by
+  the whoosh query parser.
+* Test replacing and removing documents.
+* Test coalescing of updates by SearchIndexUpdater.
+* Test paging through ranked results of both backends.
+
+"""
+import builtins
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+if not hasattr(builtins, "_"):
+    builtins._ = lambda s: s
+
+import pwiki.sqlite3api as sqlite
+from pwiki.wikidata.compact_sqlite import DbStructure
+from pwiki import SearchIndex
+
+from whoosh.analysis import StandardAnalyzer
+from whoosh.fields import Schema, ID, NUMERIC, TEXT
+from whoosh.qparser import QueryParser
+
+
+class FullTextWikiData(object):
+    """The parts of WikiData used by Fts5SearchIndex."""
+    def __init__(self, connWrap):
+        self.connWrap = connWrap
+
+    def updateFullTextIndex(self, removeNames, documents):
+        SearchIndex.fts5Update(self.connWrap, removeNames, documents)
+
+    def clearFullTextIndex(self, drop=False):
+        SearchIndex.fts5Clear(self.connWrap)
+        self.connWrap.commit()
+
+    def queryFullTextIndex(self, sql, params=()):
+        return self.connWrap.execSqlQuerySingleColumn(sql, params)
+
+    def queryFullTextIndexRows(self, sql, params=()):
+        return self.connWrap.execSqlQuery(sql, params)
+
+    def commit(self):
+        self.connWrap.commit()
+
+
+def make_schema():
+    return Schema(unifName=ID(stored=True, unique=True),
+            modTimestamp=NUMERIC(),
+            content=TEXT(analyzer=StandardAnalyzer(stoplist=None)))
+
+
+def add_documents(searchIdx, documents):
+    writer = searchIdx.writer()
+    for unifName, modTimestamp, content in documents:
+        writer.delete_by_term("unifName", unifName)
+        writer.add_document(unifName=unifName, modTimestamp=modTimestamp,
+                content=content)
+    writer.commit()
+
+
+class UpdaterExecutor(object):
+    def __init__(self):
+        self.jobCount = 0
+        self.jobs = []
+
+    def getJobCount(self, start=None, end=None):
+        return self.jobCount
+
+    def executeAsync(self, idx, fct, *args, **kwargs):
+        self.jobs.append((idx, fct, args, kwargs))
+
+    def runJobs(self):
+        jobs = self.jobs
+        self.jobs = []
+        for idx, fct, args, kwargs in jobs:
+            fct(*args, **kwargs)
+
+
+class UpdaterWikiDocument(object):
+    UEQUEUE_INDEX = 2
+
+    def __init__(self, searchIdx, wikiData):
+        self.searchIdx = searchIdx
+        self.wikiData = wikiData
+        self.executor = UpdaterExecutor()
+
+    def getSearchIndex(self):
+        return self.searchIdx
+
+    def getWikiData(self):
+        return self.wikiData
+
+    def getUpdateExecutor(self):
+        return self.executor
+
+
+class UpdaterPage(object):
+    def __init__(self, wikiWord):
+        self.wikiWord = wikiWord
+        self.liveTextPlaceHold = object()
+        self.lock = threading.RLock()
+
+    def getUnifiedPageName(self):
+        return "wikipage/" + self.wikiWord
+
+    def getWikiWord(self):
+        return self.wikiWord
+
+    def getTextOperationLock(self):
+        return self.lock
+
+    def isInvalid(self):
+        return False
+
+
+class TestSearchIndex(object):
+    def setup_method(self, method):
+        self.tempDir = tempfile.mkdtemp()
+        self.connWrap = DbStructure.ConnectWrapSyncCommit(
+                sqlite.connect(os.path.join(self.tempDir, "wiki.sli")))
+        self.fts5Idx = SearchIndex.Fts5SearchIndex(
+                FullTextWikiData(self.connWrap), clear=True)
+
+    def teardown_method(self, method):
+        self.connWrap.close()
+        shutil.rmtree(self.tempDir, ignore_errors=True)
+
+    def test_same_results_as_whoosh(self):
+        schema = make_schema()
+        whooshIdx = SearchIndex.WhooshSearchIndex(
+                os.path.join(self.tempDir, "indexsearch"), schema, clear=True)
+
+        rnd = random.Random(1)
+        words = ("alpha beta gamma delta zeta eta foo bar baz "
+                "wiki_word").split()
+        documents = [("wikipage/Page%i" % i, float(i), " ".join(
+                rnd.choice(words) for j in range(rnd.randint(0, 20))))
+                for i in range(200)]
+
+        for searchIdx in (whooshIdx, self.fts5Idx):
+            add_documents(searchIdx, documents)
+        whooshIdx.refresh()
+
+        parser = QueryParser("content", schema)
+        for queryStr in ["foo", "foo bar", "foo OR bar", "foo NOT bar",
+                "NOT bar", '"alpha beta"', "al*", "a*a", "?eta",
+                "[a TO c]", "foo ANDMAYBE bar", "wiki_word", "",
+                "(foo OR NOT bar) zeta", "nothing", "unifName:wikipage/Page5"]:
+            q = parser.parse(queryStr)
+            assert sorted(self.fts5Idx.search(q)) == \
+                    sorted(whooshIdx.search(q)), queryStr
+
+        whooshIdx.close()
+
+    def test_replace_and_remove(self):
+        parser = QueryParser("content", make_schema())
+        add_documents(self.fts5Idx, [("wikipage/A", 1.0, "one two"),
+                ("wikipage/B", 1.0, "two three")])
+        add_documents(self.fts5Idx, [("wikipage/A", 2.0, "three four")])
+
+        assert self.fts5Idx.search(parser.parse("one")) == []
+        assert sorted(self.fts5Idx.search(parser.parse("three"))) == \
+                ["wikipage/A", "wikipage/B"]
+
+        writer = self.fts5Idx.writer()
+        writer.delete_by_term("unifName", "wikipage/B")
+        writer.commit()
+
+        assert self.fts5Idx.search(parser.parse("three")) == ["wikipage/A"]
+        assert self.fts5Idx.search(parser.parse("two")) == []
+
+    def test_coalesce_and_staleness(self):
+        states = {}
+        wikiData = self.fts5Idx.wikiData
+        wikiData.setMetaDataState = states.__setitem__
+        wikiDoc = UpdaterWikiDocument(self.fts5Idx, wikiData)
+        wikiDoc.executor.jobCount = 10
+        updater = SearchIndex.SearchIndexUpdater(wikiDoc)
+        parser = QueryParser("content", make_schema())
+
+        pageA = UpdaterPage("A")
+        pageB = UpdaterPage("B")
+        updater.put(pageA, pageA.liveTextPlaceHold, 1.0, "first")
+        updater.put(pageA, pageA.liveTextPlaceHold, 2.0, "second")
+        updater.put(pageB, pageB.liveTextPlaceHold, 1.0, "second")
+        assert updater.getPendingCount() == 2
+        assert self.fts5Idx.search(parser.parse("second")) == []
+
+        # Text of B changed after it was queued
+        pageB.liveTextPlaceHold = object()
+
+        wikiDoc.executor.jobCount = 0
+        updater.remove("wikipage/C")
+
+        assert updater.getPendingCount() == 0
+        assert self.fts5Idx.search(parser.parse("first")) == []
+        assert self.fts5Idx.search(parser.parse("second")) == ["wikipage/A"]
+        assert list(states.keys()) == ["A"]
+
+    def test_ranked_pages(self):
+        schema = make_schema()
+        whooshIdx = SearchIndex.WhooshSearchIndex(
+                os.path.join(self.tempDir, "indexsearch"), schema, clear=True)
+        rnd = random.Random(2)
+        words = "alpha beta gamma delta foo bar".split()
+        documents = [("wikipage/Page%i" % i, float(i), " ".join(
+                rnd.choice(words) for j in range(rnd.randint(1, 30))))
+                for i in range(150)]
+        documents.append(("savedsearch/Other", 0.0, "foo foo foo"))
+
+        for searchIdx in (whooshIdx, self.fts5Idx):
+            add_documents(searchIdx, documents)
+        whooshIdx.refresh()
+
+        parser = QueryParser("content", schema)
+        for queryStr in ["foo", "foo bar", "foo OR gamma", "NOT bar"]:
+            q = parser.parse(queryStr)
+            expected = sorted(unifName[9:] for unifName in
+                    whooshIdx.search(q) if unifName.startswith("wikipage/"))
+
+            for searchIdx in (whooshIdx, self.fts5Idx):
+                results = searchIdx.rankedSearch(q, "wikipage/")
+                assert len(results.getPage(0, 7)) == min(7, len(expected))
+
+                hits = [hit for page in results.iterPages(20) for hit in page]
+                results.close()
+                assert sorted(name for name, score in hits) == expected, \
+                        queryStr
+                assert results.getLength() == len(expected)
+                scores = [score for name, score in hits]
+                assert scores == sorted(scores, reverse=True), queryStr
+
+        whooshIdx.close()
+
+    def test_flush_after_last_job(self):
+        states = {}
+        wikiData = self.fts5Idx.wikiData
+        wikiData.setMetaDataState = states.__setitem__
+        wikiDoc = UpdaterWikiDocument(self.fts5Idx, wikiData)
+        wikiDoc.executor.jobCount = 10
+        updater = SearchIndex.SearchIndexUpdater(wikiDoc)
+        parser = QueryParser("content", make_schema())
+
+        pageA = UpdaterPage("A")
+        pageB = UpdaterPage("B")
+        updater.put(pageA, pageA.liveTextPlaceHold, 1.0, "first")
+        updater.put(pageB, pageB.liveTextPlaceHold, 1.0, "first")
+        # Only one flush job for all pending updates
+        assert len(wikiDoc.executor.jobs) == 1
+        idx = wikiDoc.executor.jobs[0][0]
+        assert idx > wikiDoc.UEQUEUE_INDEX
+
+        # Remaining jobs of the index queue finish without putting anything
+        wikiDoc.executor.jobCount = 0
+        wikiDoc.executor.runJobs()
+
+        assert updater.getPendingCount() == 0
+        assert sorted(self.fts5Idx.search(parser.parse("first"))) == \
+                ["wikipage/A", "wikipage/B"]
+        assert sorted(states.keys()) == ["A", "B"]
+
+        # Next update queues a new flush job
+        wikiDoc.executor.jobCount = 10
+        updater.put(pageA, pageA.liveTextPlaceHold, 2.0, "second")
+        assert len(wikiDoc.executor.jobs) == 1
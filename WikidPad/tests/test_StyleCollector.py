@@ -0,0 +1,98 @@
+# coding: utf-8
+"""Test StyleCollector and SctOffsetTable.
+
+* Style bytes must be the same as built by the former implementation
+  which encoded each gap and styled part separately.
+* Or-ing spell check style bytes.
+
+"""
+import os
+import random
+import sys
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+from pwiki import StringOps
+from pwiki.EnhancedScintillaControl import StyleCollector, SctOffsetTable, \
+        orStyleBytes, bytelenSct
+
+
+class SliceStyleCollector(StringOps.SnippetCollector):
+    """Former StyleCollector"""
+    def __init__(self, defaultStyleNo, text, startCharPos=0):
+        super(SliceStyleCollector, self).__init__(b"")
+        self.defaultStyleNo = defaultStyleNo
+        self.text = text
+        self.charPos = startCharPos
+
+    def bindStyle(self, targetCharPos, targetLength, styleNo):
+        if targetCharPos < 0:
+            return
+
+        if targetCharPos < self.charPos:
+            bytestylelen = bytelenSct(self.text[targetCharPos:self.charPos])
+            self.drop(bytestylelen)
+        else:
+            bytestylelen = bytelenSct(self.text[self.charPos:targetCharPos])
+            self.append(bytes((self.defaultStyleNo,)) * bytestylelen)
+
+        self.charPos = targetCharPos + targetLength
+
+        bytestylelen = bytelenSct(self.text[targetCharPos:self.charPos])
+        self.append(bytes((styleNo,)) * bytestylelen)
+
+    def value(self):
+        if self.charPos < len(self.text):
+            bytestylelen = bytelenSct(self.text[self.charPos:])
+            self.append(bytes((self.defaultStyleNo,)) * bytestylelen)
+
+        return super(SliceStyleCollector, self).value()
+
+
+def random_text(rnd, length, letters):
+    return "".join(rnd.choice(letters) for i in range(length))
+
+
+def test_offset_table():
+    # Last one has an ASCII block and a shorter block with 64 bytes
+    for text in ("", "abc", "äöü", "a€b\U0001f600c",
+            "a" * 64 + "€" * 21 + "x"):
+        table = SctOffsetTable(text)
+        assert table.byteLength == bytelenSct(text)
+        for i in range(len(text) + 1):
+            assert table.byteOffset(i) == bytelenSct(text[:i])
+            assert table.byteLen(i, len(text) - i) == bytelenSct(text[i:])
+
+
+def test_same_as_slicing():
+    rnd = random.Random(1)
+    for letters in ("abc \n", "aä€\U0001f600 \n"):
+        for i in range(50):
+            text = random_text(rnd, rnd.randint(0, 300), letters)
+            startCharPos = rnd.choice((0, 0, rnd.randint(0, len(text))))
+            collector = StyleCollector(0, text, SctOffsetTable(text),
+                    startCharPos)
+            reference = SliceStyleCollector(0, text, startCharPos)
+
+            pos = startCharPos
+            for j in range(rnd.randint(0, 30)):
+                # Mostly increasing positions, some overlapping
+                pos = max(startCharPos, pos + rnd.randint(-10, 30))
+                if pos > len(text):
+                    break
+                length = rnd.randint(0, min(20, len(text) - pos))
+                styleNo = rnd.randint(1, 20)
+                collector.bindStyle(pos, length, styleNo)
+                reference.bindStyle(pos, length, styleNo)
+                pos += length
+
+            assert collector.value() == reference.value()
+
+
+def test_or_style_bytes():
+    assert orStyleBytes(b"", b"") == b""
+    assert orStyleBytes(b"\x01\x02\x03\x00", b"\x80\x00\x80\x00") == \
+            b"\x81\x02\x83\x00"
@@ -0,0 +1,135 @@
+# coding: utf-8
+"""Test TrigramIndex.
+
+* Literals required by regular expressions.
+* Candidates found by the index must include all pages where the regular
+  expression matches.
+* Triggers keep the index up to date.
+* An index the sqlite library can't use is removed when opening the wiki.
+
+"""
+import os
+import random
+import re
+import sys
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+import pwiki.sqlite3api as sqlite
+from pwiki.wikidata.compact_sqlite import DbStructure
+from pwiki import TrigramIndex
+
+
+PATTERNS = [r"foobar", r"\bfoo\w+bar\b", r"(foo|bar)baz", r"fo+bar",
+        r"a(?i:BCD)e", r"(?:abc)?def", r"x*abcd", r"kim[0-9]", r"KİM",
+        r"kım", r"a.c", r"stra(ss|ß)e", r"[ab]cde", r"abc|de"]
+
+
+def create_table(connWrap):
+    connWrap.execSql("create table pages (word text primary key, "
+            "content text)")
+    TrigramIndex.rebuildIndex(connWrap, "pages", "content")
+
+
+def candidates(connWrap, compiledRe):
+    matchExpr = TrigramIndex.buildMatchExpression(
+            TrigramIndex.regexFilter(compiledRe))
+    if matchExpr is None:
+        return set(connWrap.execSqlQuerySingleColumn(
+                "select word from pages"))
+
+    return set(connWrap.execSqlQuerySingleColumn(
+            "select word from pages where rowid in (" +
+            TrigramIndex.buildCandidateRowidSql() + ")", (matchExpr,)))
+
+
+def test_regex_filter():
+    assert TrigramIndex.regexFilter(re.compile(r"\bfoo\w+bar\b")) == \
+            ("and", ["foo", "bar"])
+    assert TrigramIndex.regexFilter(re.compile(r"(foo|bar)baz")) == \
+            ("and", [("or", ["foo", "bar"]), "baz"])
+    assert TrigramIndex.regexFilter(re.compile(r"(foo|ba)baz")) == "baz"
+    assert TrigramIndex.regexFilter(re.compile(r"(?:abc)?d")) is None
+    assert TrigramIndex.regexFilter(re.compile(r"x\d+yz")) is None
+    # A dotted capital I matches "i" and the dotless "ı" with IGNORECASE
+    assert TrigramIndex.regexFilter(re.compile("kİm", re.I)) == "kim"
+    assert TrigramIndex.regexFilter(re.compile("kİm")) == "kİm"
+
+
+def test_candidates_include_matches():
+    rnd = random.Random(1)
+    letters = "abcdefkimorsxzIİıß0123456789 "
+    connWrap = DbStructure.ConnectWrapSyncCommit(sqlite.connect(":memory:"))
+    create_table(connWrap)
+
+    texts = {}
+    for i in range(500):
+        text = "".join(rnd.choice(letters) for j in range(rnd.randint(0, 40)))
+        # Put some matching parts in
+        text += rnd.choice(["foobar", "foo_bar", "FOOBAZ", "aBcDe", "KIM1",
+                "kım", "straße", "Strasse", "abcde", ""])
+        texts["Page%i" % i] = text
+        connWrap.execSql("insert into pages(word, content) values (?, ?)",
+                ("Page%i" % i, text))
+
+    for pattern in PATTERNS:
+        for flags in (0, re.IGNORECASE):
+            compiledRe = re.compile(pattern, flags)
+            matching = set(word for word, text in texts.items()
+                    if compiledRe.search(text))
+            assert matching <= candidates(connWrap, compiledRe), \
+                    (pattern, flags)
+
+    connWrap.close()
+
+
+def test_triggers():
+    connWrap = DbStructure.ConnectWrapSyncCommit(sqlite.connect(":memory:"))
+    connWrap.execSql("create table pages (word text primary key, "
+            "content text)")
+    connWrap.execSql("insert into pages(word, content) values (?, ?)",
+            ("A", "one two"))
+    TrigramIndex.rebuildIndex(connWrap, "pages", "content")
+    assert TrigramIndex.isIndexPresent(connWrap)
+
+    connWrap.execSql("insert into pages(word, content) values (?, ?)",
+            ("B", "two three"))
+    assert candidates(connWrap, re.compile("two")) == {"A", "B"}
+
+    connWrap.execSql("update pages set content = ? where word = ?",
+            ("four", "A"))
+    assert candidates(connWrap, re.compile("two")) == {"B"}
+    assert candidates(connWrap, re.compile("four")) == {"A"}
+
+    connWrap.execSql("delete from pages where word = ?", ("B",))
+    assert candidates(connWrap, re.compile("three")) == set()
+
+    TrigramIndex.dropIndex(connWrap)
+    assert not TrigramIndex.isIndexPresent(connWrap)
+    connWrap.close()
+
+
+def test_check_unavailable():
+    connWrap = DbStructure.ConnectWrapSyncCommit(sqlite.connect(":memory:"))
+    create_table(connWrap)
+    assert TrigramIndex.checkIndex(connWrap)
+
+    isAvailable = TrigramIndex.isAvailable
+    TrigramIndex.isAvailable = lambda connWrap: False
+    try:
+        assert not TrigramIndex.checkIndex(connWrap)
+    finally:
+        TrigramIndex.isAvailable = isAvailable
+
+    assert not TrigramIndex.isIndexPresent(connWrap)
+    assert connWrap.execSqlQuerySingleItem("select count(*) from "
+            "sqlite_master where name glob ?",
+            (TrigramIndex.TRIGRAM_TABLE + "*",)) == 0
+
+    # Writes to the content table don't touch the index anymore
+    connWrap.execSql("insert into pages(word, content) values (?, ?)",
+            ("A", "one two"))
+    connWrap.close()
@@ -0,0 +1,64 @@
+# coding: utf-8
+"""Test the diff engines for versioning.
+
+* Applying the packet of each engine recreates the new version.
+* The line engine finds small packets for small changes.
+
+"""
+import os
+import random
+import sys
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+from pwiki import StringOps
+
+
+def random_edit(rnd, lines):
+    lines = list(lines)
+    for i in range(rnd.randint(1, 5)):
+        op = rnd.random()
+        pos = rnd.randint(0, len(lines))
+        if op < 0.3:
+            lines.insert(pos, b"new line %i\n" % rnd.randint(0, 20))
+        elif op < 0.5:
+            del lines[pos:pos + rnd.randint(1, 4)]
+        elif op < 0.8 and pos < len(lines):
+            line = lines[pos]
+            cut = rnd.randint(0, len(line))
+            lines[pos] = line[:cut] + b"x" + line[cut:]
+        else:
+            # Duplicate lines are no anchors
+            lines.insert(pos, b"\n")
+    return lines
+
+
+def test_round_trip():
+    rnd = random.Random(1)
+    lines = [b"line %i\n" % rnd.randint(0, 50) for i in range(60)]
+    cases = [(b"", b""), (b"", b"a\nb"), (b"a\nb", b""), (b"a\r\nb", b"a\nb"),
+            (b"same\n", b"same\n"), (b"no newline", b"no newline at end")]
+    for i in range(80):
+        newLines = random_edit(rnd, lines)
+        cases.append((b"".join(lines), b"".join(newLines)))
+        lines = newLines
+
+    for a, b in cases:
+        for engine in StringOps.DIFF_ENGINES:
+            packet = StringOps.getBinCompactForDiff(a, b, engine)
+            assert StringOps.applyBinCompact(a, packet) == b, (engine, a, b)
+
+
+def test_small_packet():
+    lines = [b"This is line %i of the page\n" % i for i in range(5000)]
+    a = b"".join(lines)
+    lines[2500] = b"This is the changed line 2500 of the page\n"
+    del lines[100]
+    b = b"".join(lines)
+
+    packet = StringOps.getBinCompactForDiff(a, b, "lines")
+    assert StringOps.applyBinCompact(a, packet) == b
+    assert len(packet) < 60
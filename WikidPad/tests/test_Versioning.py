@@ -0,0 +1,194 @@
+# coding: utf-8
+"""Test reconstruction of versions by VersionOverview.
+
+* Every version is reconstructed correctly with and without the cache.
+* Complete checkpoints are stored when the chain of reverse diffs gets
+  too expensive.
+* The overview is read back unchanged from compact and XML format and
+  appending a version appends to the compact format.
+
+"""
+import builtins
+import os
+import random
+import sys
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+if not hasattr(builtins, "_"):
+    builtins._ = lambda s: s
+if not hasattr(builtins, "N_"):
+    builtins.N_ = lambda s: s
+
+from pwiki.WikiExceptions import VersioningException
+from pwiki.timeView.Versioning import VersionOverview, VersionEntry
+
+
+class StubConfig(object):
+    def __init__(self, options):
+        self.options = options
+
+    def getint(self, section, option, default=None):
+        return int(self.options.get(option, default))
+
+    def get(self, section, option, default=None):
+        return self.options.get(option, default)
+
+    def getboolean(self, section, option, default=None):
+        return bool(self.options.get(option, default))
+
+
+class StubWikiDocument(object):
+    """The parts of WikiDocument used by VersionOverview."""
+    def __init__(self, options):
+        self.config = StubConfig(options)
+        self.dataBlocks = {}
+        self.retrieveCount = 0
+
+    def getWikiConfig(self):
+        return self.config
+
+    def storeDataBlock(self, unifName, data, storeHint=None):
+        self.dataBlocks[unifName] = bytes(data)
+
+    def retrieveDataBlock(self, unifName, default=""):
+        self.retrieveCount += 1
+        return self.dataBlocks.get(unifName, default)
+
+    def deleteDataBlock(self, unifName):
+        self.dataBlocks.pop(unifName, None)
+
+
+def make_versions(rnd, count, lineCount):
+    lines = [b"line %i\n" % i for i in range(lineCount)]
+    result = []
+    for i in range(count):
+        pos = rnd.randint(0, len(lines) - 1)
+        lines[pos] = b"changed %i in version %i\n" % (pos, i)
+        result.append(b"".join(lines))
+    return result
+
+
+def add_versions(options, versions):
+    wikiDocument = StubWikiDocument(options)
+    overview = VersionOverview(wikiDocument, unifiedBasePageName="wikipage/Test")
+    for content in versions:
+        overview.addVersion(content, VersionEntry("wikipage/Test"))
+    return wikiDocument, overview
+
+
+def test_reconstruction():
+    versions = make_versions(random.Random(1), 30, 100)
+    wikiDocument, overview = add_versions({"versioning_completeSteps": 0,
+            "versioning_contentCacheSize": 3}, versions)
+
+    entries = overview.getVersionEntries()
+    assert [e.contentDifferencing for e in entries] == \
+            ["revdiff"] * 29 + ["complete"]
+
+    overview.contentCache.clear()
+    for entry, content in reversed(list(zip(entries, versions))):
+        assert overview.getVersionContentRaw(entry.versionNumber) == content
+
+    # Cached versions need no packets, going back one step from a cached
+    # version needs one packet only
+    assert len(overview.contentCache) == 3
+    count = wikiDocument.retrieveCount
+    assert overview.getVersionContentRaw(entries[2].versionNumber) == \
+            versions[2]
+    assert wikiDocument.retrieveCount == count
+
+    overview.contentCache.clear()
+    assert overview.getVersionContentRaw(entries[10].versionNumber) == \
+            versions[10]
+    count = wikiDocument.retrieveCount
+    assert overview.getVersionContentRaw(entries[9].versionNumber) == \
+            versions[9]
+    assert wikiDocument.retrieveCount == count + 1
+
+    # Without cache
+    wikiDocument.config.options["versioning_contentCacheSize"] = 0
+    for entry, content in zip(entries, versions):
+        assert overview.getVersionContentRaw(entry.versionNumber) == content
+
+    overview.deleteVersion(-1)
+    assert overview.getVersionContentRaw(-1) == versions[-2]
+
+
+def test_checkpoints():
+    versions = make_versions(random.Random(2), 30, 100)
+    pageSize = len(versions[0])
+    wikiDocument, overview = add_versions({"versioning_completeSteps": 0,
+            "versioning_maxChainCost": pageSize * 5}, versions)
+
+    entries = overview.getVersionEntries()
+    chainLength = 0
+    for entry in entries:
+        if entry.contentDifferencing == "complete":
+            assert 3 <= chainLength <= 5
+            chainLength = 0
+        else:
+            chainLength += 1
+
+    overview.contentCache.clear()
+    for entry, content in zip(entries, versions):
+        assert overview.getVersionContentRaw(entry.versionNumber) == content
+
+
+def read_overview(wikiDocument):
+    overview = VersionOverview(wikiDocument,
+            unifiedBasePageName="wikipage/Test")
+    overview.readOverview()
+    return overview
+
+
+def test_overview_formats():
+    rnd = random.Random(3)
+    versions = make_versions(rnd, 20, 10)
+    wikiDocument = StubWikiDocument({})
+    overview = VersionOverview(wikiDocument, unifiedBasePageName="wikipage/Test")
+    for i, content in enumerate(versions):
+        entry = VersionEntry("wikipage/Test",
+                description=rnd.choice((None, "Größe %i" % i)))
+        # XML stores seconds only
+        entry.creationTimeStamp = 1400000000 + i * 1000
+        overview.addVersion(content, entry)
+
+    def entryData(overview):
+        return [(e.creationTimeStamp, e.description, e.versionNumber,
+                e.contentDifferencing, e.contentEncoding)
+                for e in overview.getVersionEntries()]
+
+    unifName = overview.getUnifiedName()
+    for compact in (True, False):
+        wikiDocument.config.options["overviews_compactFormat"] = compact
+        overview.writeOverview()
+        assert wikiDocument.dataBlocks[unifName].startswith(b"<") != compact
+
+        loaded = read_overview(wikiDocument)
+        assert entryData(loaded) == entryData(overview)
+        assert loaded.maxVersionNumber == overview.maxVersionNumber
+        assert loaded.getVersionContentRaw(-1) == versions[-1]
+
+    # Convert XML to compact
+    wikiDocument.config.options["overviews_compactFormat"] = True
+    loaded.writeOverview()
+    content = wikiDocument.dataBlocks[unifName]
+    assert entryData(read_overview(wikiDocument)) == entryData(overview)
+
+    # Adding a version in complete mode only appends a record
+    wikiDocument.config.options["versioning_completeSteps"] = 1
+    loaded.addVersion(b"new content", VersionEntry("wikipage/Test"))
+    loaded.writeOverview()
+    assert wikiDocument.dataBlocks[unifName].startswith(content)
+
+    wikiDocument.dataBlocks[unifName] = content[:-3]
+    try:
+        read_overview(wikiDocument)
+    except VersioningException:
+        pass
+    else:
+        assert False, "Damaged overview not detected"
@@ -18,19 +18,27 @@
   The files tests/test_wikis_*_before_rename.txt and
   tests/test_wikis_*_after_rename.txt hold the contents of all test wikis.
 
+* Test the real WikiDocument.renameWikiWords on a compact_sqlite wiki:
+  dry runs, the returned edit counts and the rollback if writing fails.
+
 
 """
 import os
 import re
+import shutil
 import sys
+import tempfile
 
 # run from WikidPad directory
 wikidpad_dir = os.path.abspath('.')
 sys.path.append(wikidpad_dir)
 sys.path.append(os.path.join(wikidpad_dir, 'lib'))
 
-from tests.helper import MockWikiDocument, get_text, TESTS_DIR
+from tests.helper import MockWikiDocument, get_text, TESTS_DIR, getApp, \
+    createTestWiki, waitForUpdates
 from Consts import ModifyText
+from pwiki.WikiDocument import WikiDocument
+from pwiki.WikiExceptions import DbWriteAccessError
 
 
 UPDATE_METHODS_TO_TEST = [
@@ -203,6 +211,119 @@ def test_renameWikiWords():
     assert no_method_failed, "Failures: " + repr(method_failures)  # no one method failed?
 
 
+def test_updateReferencesBeforeRenaming():
+    """Bulk renaming computes the new texts before renaming the pages,
+    results must be the same as when updating after renaming."""
+    for language_name in test_files:
+        for wiki_name, test in load_tests(language_name).items():
+            wikidoc, renameSeq, wikidoc_after = test
+            after = wikidoc_after.getWikiData().wiki_content
+            renameDict = dict(renameSeq)
+            langHelper = getApp().createWikiLanguageHelper(
+                wikidoc.getWikiDefaultWikiLanguage())
+
+            content = wikidoc.getWikiData().wiki_content
+            result = {}
+            for pageName in list(content):
+                newPageName = renameDict.get(pageName, pageName)
+                if pageName in renameDict:
+                    text = WikiDocument._replacePageTitle(wikidoc, pageName,
+                        newPageName, content[pageName])
+                    if text is not None:
+                        content[pageName] = text
+
+                page = wikidoc.getWikiPage(pageName)
+                ast = page.getLivePageAst().cloneDeep()
+                WikiDocument._updateAstWikiWordReferences(ast, page,
+                    newPageName, renameDict, langHelper)
+                result[newPageName] = langHelper.generate_text(ast, page)
+
+            assert result == after, (language_name, wiki_name)
+
+
+RENAME_WIKI_CONTENT = {
+    'TestWiki': '++ Test Wiki\n\nPageOne and PageTwo\n',
+    'PageOne': '++ Page One\n\nPageTwo, [PageTwo] and PageTwo\n',
+    'PageTwo': '++ Page Two\n\nback to PageOne\n',
+    'Unrelated': '++ Unrelated\n\nnothing here\n',
+}
+
+
+def get_db_content(wikidoc):
+    wikiData = wikidoc.getWikiData()
+    return dict((word, wikiData.getContent(word))
+                for word in wikiData.getAllDefinedWikiPageNames())
+
+
+def with_rename_wiki(test):
+    def wrapper():
+        wikiDir = tempfile.mkdtemp()
+        wikidoc = createTestWiki(wikiDir, RENAME_WIKI_CONTENT)
+        try:
+            test(wikidoc)
+        finally:
+            wikidoc.release()
+            shutil.rmtree(wikiDir, ignore_errors=True)
+    wrapper.__name__ = test.__name__
+    return wrapper
+
+
+@with_rename_wiki
+def test_renameWikiWords_sqlite(wikidoc):
+    renameDict = {'PageTwo': 'PageThree'}
+    expected = {'PageThree': 1, 'PageOne': 3, 'TestWiki': 1}
+
+    edits = wikidoc.renameWikiWords(renameDict, ModifyText.advanced,
+                                    dryRun=True)
+    assert edits == expected
+    assert get_db_content(wikidoc) == RENAME_WIKI_CONTENT
+
+    edits = wikidoc.renameWikiWords(renameDict, ModifyText.advanced)
+    waitForUpdates(wikidoc)
+    assert edits == expected
+    assert get_db_content(wikidoc) == {
+        'TestWiki': '++ Test Wiki\n\nPageOne and PageThree\n',
+        'PageOne': '++ Page One\n\nPageThree, [PageThree] and PageThree\n',
+        'PageThree': '++ Page Three\n\nback to PageOne\n',
+        'Unrelated': '++ Unrelated\n\nnothing here\n',
+    }
+    assert wikidoc.getWikiPage('PageThree').getLiveText() == \
+        '++ Page Three\n\nback to PageOne\n'
+    assert sorted(wikidoc.getWikiData().getParentRelationships(
+        'PageThree')) == ['PageOne', 'TestWiki']
+
+
+@with_rename_wiki
+def test_renameWikiWords_rollback(wikidoc):
+    # renameWords calls setContent of the unwrapped WikiData
+    wikiData = wikidoc.baseWikiData
+    setContent = wikiData.setContent
+
+    def failingSetContent(word, content):
+        if word == 'TestWiki':
+            raise IOError('disk full')
+        setContent(word, content)
+
+    wikiData.setContent = failingSetContent
+    try:
+        try:
+            wikidoc.renameWikiWords({'PageTwo': 'PageThree'},
+                                    ModifyText.advanced)
+        except DbWriteAccessError:
+            pass
+        else:
+            assert False, 'DbWriteAccessError not raised'
+    finally:
+        wikiData.setContent = setContent
+
+    # Neither the rename nor the new texts of the other pages are kept
+    assert get_db_content(wikidoc) == RENAME_WIKI_CONTENT
+    assert wikiData.isDefinedWikiPageName('PageTwo')
+    assert not wikiData.isDefinedWikiPageName('PageThree')
+    assert sorted(wikiData.getParentRelationships('PageTwo')) == \
+        ['PageOne', 'TestWiki']
+
+
 if __name__ == '__main__':
     tests = load_tests('wikidpad_default_2_0')
     print(tests['18'][0])
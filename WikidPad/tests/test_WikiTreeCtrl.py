@@ -0,0 +1,115 @@
+# coding: utf-8
+"""Test the child lists of WikiTreeCtrl.
+
+* WikiWordChildList must behave like the list of all children nodes
+  for indices, negative indices and slices, but create only the nodes
+  of the requested part.
+* Children of a node are put into the tree in batches followed by
+  a MoreChildrenNode until all are added.
+
+"""
+import os
+import sys
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+import tests.helper  # creates app, sets _
+from pwiki.WikiTreeCtrl import WikiTreeCtrl, WikiWordChildList, \
+    MoreChildrenNode
+
+
+class StubParentNode(object):
+    """Stands in for WikiWordNode, nodes are tuples ('node', word)."""
+    def __init__(self):
+        self.treeCtrl = None
+        self.createdWords = []
+
+    def createChildNodes(self, words):
+        self.createdWords.extend(words)
+        return [('node', w) for w in words]
+
+
+class StubTree(object):
+    def __init__(self, childrenBatchSize):
+        self.childrenBatchSize = childrenBatchSize
+
+
+def build_children(wordCount=10):
+    parent = StubParentNode()
+    words = ['Word%02i' % i for i in range(wordCount)]
+    children = WikiWordChildList(parent, words, ('extra1', 'extra2'))
+    expected = [('node', w) for w in words] + ['extra1', 'extra2']
+    return parent, children, expected
+
+
+def test_child_list_index():
+    parent, children, expected = build_children()
+
+    assert len(children) == len(expected)
+    for i in range(-len(expected), len(expected)):
+        assert children[i] == expected[i], i
+
+    for i in (len(expected), -len(expected) - 1):
+        try:
+            children[i]
+        except IndexError:
+            pass
+        else:
+            assert False, 'IndexError not raised for %i' % i
+
+
+def test_child_list_slice():
+    parent, children, expected = build_children()
+
+    for sl in (slice(None), slice(2, 5), slice(8, 11), slice(10, None),
+               slice(-3, None), slice(-5, -1), slice(3, 100),
+               slice(7, 2), slice(None, None, 3), slice(None, None, -1)):
+        assert children[sl] == expected[sl], sl
+
+    assert list(children) == expected
+
+    # Only the nodes of the requested words are created
+    parent.createdWords = []
+    children[2:5]
+    assert parent.createdWords == ['Word02', 'Word03', 'Word04']
+    parent.createdWords = []
+    children[-2:]
+    assert parent.createdWords == []
+
+
+def test_more_children_batches():
+    parent, children, expected = build_children()
+
+    # All children fit in one batch or a batch size of 0 switches it off
+    for batchSize in (0, 12, 20):
+        assert WikiTreeCtrl._getChildrenWindow(StubTree(batchSize), parent,
+                                               children, 0) == expected
+
+    tree = StubTree(5)
+    # At least as many as already in the tree
+    window = WikiTreeCtrl._getChildrenWindow(tree, parent, children, 7)
+    assert window[:-1] == expected[:7]
+    assert window[-1].start == 7
+
+    window = WikiTreeCtrl._getChildrenWindow(tree, parent, children, 0)
+    assert window[:-1] == expected[:5]
+    moreNode = window[-1]
+    assert isinstance(moreNode, MoreChildrenNode)
+    assert moreNode.getParentNode() is parent
+    assert moreNode.getNodePresentation().label == '... 7 more'
+    assert not moreNode.nodeEquality(moreNode)
+
+    # Add further batches as WikiTreeCtrl.loadMoreChildren does
+    inTree = window[:-1]
+    batches = 0
+    while moreNode.start < len(moreNode.children):
+        stop = moreNode.start + tree.childrenBatchSize
+        inTree += moreNode.children[moreNode.start:stop]
+        moreNode.start = stop
+        batches += 1
+
+    assert batches == 2
+    assert inTree == expected
@@ -28,6 +28,7 @@ from collections import defaultdict
 import glob
 import io
 import os
+import random
 import re
 import sys
 
@@ -43,6 +44,8 @@ from tests.helper import (
     WikiWordNotFoundException, NodeFinder, ast_eq)
 
 from wikidPadParser.WikidPadParser import count_max_number_of_consecutive_quotes
+from pwiki.WikiPyparsing import serializeAst, deserializeAst
+from pwiki.Utilities import DUMBTHREADSTOP
 
 
 LANGUAGE_NAME = 'wikidpad_default_2_0'
@@ -1169,3 +1172,107 @@ def test_generate_text_quotes():
         result = langHelper.generate_text(ast, page)
         result_fragment = result.strip()
         assert result == text_out, err_msg()
+
+
+def test_serialize_ast():
+    text = """+ Heading
+
+WikiWord and [../Other Page#anchor|Title] [key: value]
+  * item with *bold* text
+<<pre
+preformatted
+>>
+"""
+    ast = parse(text, 'Page/Sub', LANGUAGE_NAME)
+    ast_ = deserializeAst(serializeAst(ast))
+    assert ast_eq(ast, ast_)
+    assert ast.pprint() == ast_.pprint()
+
+    links = NodeFinder(ast).count('wikiWord')
+    assert links == NodeFinder(ast_).count('wikiWord') == 2
+    for node, node_ in zip(ast.iterDeep(), ast_.iterDeep()):
+        if node.name == 'wikiWord':
+            assert node.wikiWord == node_.wikiWord
+            assert node.linkPath == node_.linkPath
+
+
+def test_deserialize_ast_refuses_foreign_classes():
+    import pickle
+    import zlib
+    data = zlib.compress(pickle.dumps(os.system))
+    with pytest.raises(pickle.UnpicklingError):
+        deserializeAst(data)
+
+
+def test_parse_incremental_reuses_unchanged_paragraphs():
+    text = """+ Heading
+
+First paragraph with WikiWord.
+
+Second paragraph
+  * item
+
+Third paragraph [link]
+"""
+    page = MockWikiDocument({'Page': text}, LANGUAGE_NAME).getWikiPage('Page')
+    formatDetails = page.getFormatDetails()
+    parser = getApp().createWikiParser(LANGUAGE_NAME)
+    ast = parser.parse(LANGUAGE_NAME, text, formatDetails, DUMBTHREADSTOP)
+
+    pos = text.index('Second') + len('Second')
+    text_ = text[:pos] + ' changed' + text[pos:]
+    ast_ = parser.parseIncremental(LANGUAGE_NAME, text_, formatDetails, ast,
+                                   DUMBTHREADSTOP)
+    full = parser.parse(LANGUAGE_NAME, text_, formatDetails, DUMBTHREADSTOP)
+    assert ast_.pprint() == full.pprint()
+    # nodes before the changed paragraph are reused, the previous AST
+    # is left untouched
+    assert ast_.getChildren()[0] is ast.getChildren()[0]
+    assert ast.getString() == text
+    assert ast.pprint() == parser.parse(LANGUAGE_NAME, text, formatDetails,
+                                        DUMBTHREADSTOP).pprint()
+
+
+INCREMENTAL_FUZZ_PIECES = [
+    'foo', 'bar', ' ', ' ', 'WikiWord', 'OtherPage', '[link]',
+    '[Some Page#frag|Title]', '*bold*', '_italic_', '\n', '\n', '\n\n',
+    '\n    ', '\n * ', '\n    * ', '\n 1. ', '\n+ Head', '\n++ Sub',
+    '<<pre\n', '\n>>', '<<|', ' | ', '\t', '[key: value]', '[:page: "x"]',
+    'todo: do it', 'anchor: here', '\n----\n', 'http://x.org/a', '\\',
+    '<% x %>', '"', '#', '!anch', '~NoWord', '<pre>', '</pre>', '&amp;',
+    '[1]', 'CamelCase#frag', 'x_y', ' _a', 'b* ', ' *c', ';']
+
+INCREMENTAL_FUZZ_EDITS = [
+    'a', ' ', 'Word', 'Camel', '\n', '\n\n', '  ', '\t', '1.', 'todo',
+    'anchor', '~', 'http', '\nfoo ', '*', '_', '[', ']', '#', '+', ':', '<']
+
+
+def test_parse_incremental_fuzz():
+    """
+    Apply random edits to random wiki-like texts, the incremental parse
+    must always give the same AST as a full parse.
+    """
+    rnd = random.Random(4)
+    page = MockWikiDocument({'Page': ''}, LANGUAGE_NAME).getWikiPage('Page')
+    parser = getApp().createWikiParser(LANGUAGE_NAME)
+
+    for paragraphMode in (False, True):
+        formatDetails = page.getFormatDetails()
+        formatDetails.paragraphMode = paragraphMode
+        for _ in range(100):
+            text = ''.join(rnd.choice(INCREMENTAL_FUZZ_PIECES)
+                           for _ in range(rnd.randint(1, 40)))
+            ast = parser.parse(LANGUAGE_NAME, text, formatDetails,
+                               DUMBTHREADSTOP)
+            for _ in range(5):
+                start = rnd.randint(0, len(text))
+                end = min(len(text), start + rnd.choice([0, 0, 0, 1, 2, 5]))
+                text_ = (text[:start] + rnd.choice(INCREMENTAL_FUZZ_EDITS) +
+                         text[end:])
+                ast_ = parser.parseIncremental(LANGUAGE_NAME, text_,
+                                               formatDetails, ast,
+                                               DUMBTHREADSTOP)
+                full = parser.parse(LANGUAGE_NAME, text_, formatDetails,
+                                    DUMBTHREADSTOP)
+                assert ast_.pprint() == full.pprint(), (text, text_)
+                text, ast = text_, ast_